@@ -1,54 +1,78 @@
 """
-IVR Adapter - Stub for Interactive Voice Response integration
-This adapter will handle voice-based triage interactions
+IVR Adapter - Interactive Voice Response integration (TwiML)
+Voice calls run through the conversation engine: DTMF digits are menu
+selections and responses are served from precompiled TwiML documents (see ``ivr_prompts``).
 """
 
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..core.conversation import ConversationEngine, InboundMessage, get_conversation_engine
+from ..core.ivr_prompts import get_document, render
+
+
+@lru_cache(maxsize=256)
+def _menu_document(options: Tuple[str, ...]) -> str:
+    menu = "\n".join(f"{i + 1}. {option}" for i, option in enumerate(options))
+    return render("CON", "en", menu)
+
+
 class IVRAdapter:
     """Adapter for IVR (Interactive Voice Response) integration"""
     
-    def __init__(self):
+    def __init__(self, engine: Optional[ConversationEngine] = None):
         self.voice_provider = None  # Twilio, Nexmo, etc.
+        self.engine = engine or get_conversation_engine()
     
-    async def handle_incoming_call(self, call_sid: str, from_number: str) -> dict:
+    async def handle_incoming_call(self, call_sid: str, from_number: str, db: Session) -> dict:
         """
         Handle incoming IVR call
         
         Args:
             call_sid: Call session identifier
             from_number: Caller's phone number
+            db: Database session
         
         Returns:
             dict with TwiML/voice response
         """
-        # Stub implementation
+        reply = await self.engine.handle(
+            InboundMessage(channel="IVR", conversation_id=call_sid, msisdn=from_number, restart=True),
+            db
+        )
         return {
-            "response": "<?xml version='1.0' encoding='UTF-8'?><Response><Say>Welcome to NTAL Telehealth</Say></Response>",
+            "response": get_document(reply.response_type, reply.language, reply.message),
             "call_sid": call_sid
         }
     
-    async def process_dtmf_input(self, call_sid: str, digits: str) -> dict:
+    async def process_dtmf_input(self, call_sid: str, from_number: str, digits: str, db: Session) -> dict:
         """
         Process DTMF (touch-tone) input
         
         Args:
             call_sid: Call session identifier
-            digits: Digits pressed by user
+            from_number: Caller's phone number
+            digits: Digits pressed by user (empty when the caller timed out)
+            db: Database session
         
         Returns:
             dict with next voice prompt
         """
-        # Stub implementation
+        reply = await self.engine.handle(
+            InboundMessage(channel="IVR", conversation_id=call_sid, msisdn=from_number, text=digits.strip()[:1]),
+            db
+        )
         return {
-            "response": "<?xml version='1.0' encoding='UTF-8'?><Response><Say>Thank you</Say></Response>",
+            "response": get_document(reply.response_type, reply.language, reply.message),
             "digits": digits
         }
     
     async def play_voice_menu(self, options: list) -> dict:
         """Generate voice menu from options"""
-        # Stub implementation
-        menu_text = "Press " + ", ".join([f"{i+1} for {opt}" for i, opt in enumerate(options)])
         return {
-            "response": f"<?xml version='1.0' encoding='UTF-8'?><Response><Say>{menu_text}</Say></Response>"
+            "response": _menu_document(tuple(options))
         }
     
     async def record_voice_message(self, call_sid: str) -> dict:
@@ -0,0 +1,195 @@
+"""
+Callback notifier - tells patients about their callback in the background.
+
+Subscribes to callback lifecycle events on the event bus. A fixed number of
+worker tasks (NOTIFY_CONCURRENCY) each take up to NOTIFY_BATCH_SIZE events,
+resolve the patients' contacts in one Redis round trip, and send one bulk
+submission per gateway: SMS (for USSD, IVR and SMS patients) or WhatsApp.
+Urgent callbacks still queued past their SLA (``callback.sla_breached``)
+are texted to SUPERVISOR_ALERT_NUMBERS in the same SMS submission.
+API requests only publish the event and never wait on delivery. Once the
+completion message has gone out, the patient's contact is deleted unless
+another of their callbacks is still open.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..core.config import settings
+from ..core.contacts import forget_contacts, get_contacts
+from ..core.events import CALLBACK_ASSIGNED, CALLBACK_COMPLETED, CALLBACK_SLA_BREACHED, Event, EventBus, event_bus
+from ..core.language_strings import get_message
+from .sms_adapter import SMSAdapter
+from .whatsapp_adapter import WhatsAppAdapter
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_KEYS = {
+    CALLBACK_ASSIGNED: "notify_callback_assigned",
+    CALLBACK_COMPLETED: "notify_callback_completed",
+}
+
+WHATSAPP_CHANNELS = {"WHATSAPP"}
+
+
+class CallbackNotifier:
+    """Event-driven, batched patient notifications."""
+
+    def __init__(
+        self,
+        bus: EventBus = event_bus,
+        sms: Optional[SMSAdapter] = None,
+        whatsapp: Optional[WhatsAppAdapter] = None,
+        concurrency: int = 4,
+        batch_size: int = 100,
+        linger_ms: int = 50,
+        queue_size: int = 10000,
+        supervisor_numbers: Sequence[str] = (),
+    ):
+        self.bus = bus
+        self.sms = sms or SMSAdapter()
+        self.whatsapp = whatsapp or WhatsAppAdapter()
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.queue_size = queue_size
+        self.supervisor_numbers = list(supervisor_numbers)
+        self.queue: Optional[asyncio.Queue] = None
+        self.stats = {"sms": 0, "whatsapp": 0, "no_contact": 0, "failed": 0, "batches": 0, "supervisor_alerts": 0}
+        self._workers: List[asyncio.Task] = []
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "CallbackNotifier":
+        options = dict(
+            concurrency=settings.NOTIFY_CONCURRENCY,
+            batch_size=settings.NOTIFY_BATCH_SIZE,
+            linger_ms=settings.NOTIFY_BATCH_LINGER_MS,
+            queue_size=settings.NOTIFY_QUEUE_SIZE,
+            supervisor_numbers=[n.strip() for n in settings.SUPERVISOR_ALERT_NUMBERS.split(",") if n.strip()],
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    def start(self):
+        event_types = list(MESSAGE_KEYS)
+        if self.supervisor_numbers:
+            event_types.append(CALLBACK_SLA_BREACHED)
+        self.queue = self.bus.subscribe(event_types, maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Unsubscribe and stop, first giving queued events up to drain_timeout."""
+        self.bus.unsubscribe(self.queue)
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Notifier stopped with %d events queued", self.queue.qsize())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _next_batch(self) -> List[Event]:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _worker(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.notify(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats["failed"] += len(batch)
+                logger.exception("Failed to send %d callback notifications", len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def notify(self, events: List[Event]):
+        """Resolve contacts for a batch of events and send one submission per gateway."""
+        self.stats["batches"] += 1
+        outbound: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+        breaches = [event for event in events if event.type == CALLBACK_SLA_BREACHED]
+        for event in breaches:
+            message = get_message("en", "notify_supervisor_sla_breached").format(
+                callback_id=event.payload["callback_id"]
+            )
+            outbound["sms"].extend((number, message) for number in self.supervisor_numbers)
+            self.stats["supervisor_alerts"] += 1
+
+        patient_events = [event for event in events if event.type in MESSAGE_KEYS]
+        # Empty while Redis is unavailable; supervisor alerts don't need contacts and still go out
+        contacts = await get_contacts(event.payload["msisdn_hash"] for event in patient_events)
+        for event in patient_events:
+            contact = contacts.get(event.payload["msisdn_hash"])
+            if contact is None:
+                self.stats["no_contact"] += 1
+                continue
+            message = get_message(contact.get("language", "en"), MESSAGE_KEYS[event.type]).format(
+                ref=event.payload["encounter_id"]
+            )
+            gateway = "whatsapp" if contact.get("channel") in WHATSAPP_CHANNELS else "sms"
+            outbound[gateway].append((contact["msisdn"], message))
+
+        if outbound["sms"]:
+            results = await self.sms.send_bulk(outbound["sms"])
+            self._count("sms", results)
+        if outbound["whatsapp"]:
+            results = await asyncio.gather(
+                *(self.whatsapp.send_message(phone, message) for phone, message in outbound["whatsapp"]),
+                return_exceptions=True
+            )
+            self._count("whatsapp", results)
+
+        finished = [event.payload["msisdn_hash"] for event in events
+                    if event.type == CALLBACK_COMPLETED and event.payload.get("forget_contact")]
+        await forget_contacts(finished)
+
+    def _count(self, gateway: str, results):
+        for result in results:
+            if isinstance(result, Exception) or result.get("status") == "failed":
+                self.stats["failed"] += 1
+            else:
+                self.stats[gateway] += 1
+
+
+# Process-wide notifier, started in the app lifespan
+callback_notifier: Optional[CallbackNotifier] = None
+
+
+def start_callback_notifier() -> CallbackNotifier:
+    global callback_notifier
+    if callback_notifier is None:
+        callback_notifier = CallbackNotifier.from_settings()
+        callback_notifier.start()
+    return callback_notifier
+
+
+async def stop_callback_notifier():
+    global callback_notifier
+    if callback_notifier is not None:
+        await callback_notifier.stop()
+        callback_notifier = None
+
+
+def get_callback_notifier() -> Optional[CallbackNotifier]:
+    """Get the running notifier (None outside the app lifespan)."""
+    return callback_notifier
@@ -1,17 +1,44 @@
 """
-SMS Adapter - Stub for SMS integration
-This adapter will handle SMS-based triage submissions
+SMS Adapter - SMS integration
+Outbound messages go through the batched SMS dispatcher when a gateway is
+configured (SMS_GATEWAY_URL); otherwise sends are stubbed.
+Inbound keyword messages are triaged in a single round trip.
 """
 
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.conversation import ConversationEngine, get_conversation_engine
+from ..core.language_strings import LANGUAGES, get_message
+from ..core.sms_parser import SMSParseError, parse_sms
+from ..core.ussd_utils import mask_msisdn
+from .sms_dispatcher import SMSDispatcher, get_sms_dispatcher
+
+logger = logging.getLogger(__name__)
+
+
 class SMSAdapter:
     """Adapter for SMS integration"""
     
-    def __init__(self):
-        self.provider = None  # Will be configured with SMS gateway provider
+    def __init__(
+        self,
+        dispatcher: Optional[SMSDispatcher] = None,
+        engine: Optional[ConversationEngine] = None
+    ):
+        self._dispatcher = dispatcher
+        self.engine = engine or get_conversation_engine()
+
+    @property
+    def dispatcher(self) -> Optional[SMSDispatcher]:
+        return self._dispatcher or get_sms_dispatcher()
     
     async def send_sms(self, phone_number: str, message: str) -> dict:
         """
-        Send SMS message
+        Send SMS message and wait for the gateway to accept it
         
         Args:
             phone_number: Recipient phone number
@@ -20,6 +47,8 @@ class SMSAdapter:
         Returns:
             dict with status and message_id
         """
+        if self.dispatcher is not None:
+            return await self.dispatcher.send(phone_number, message)
         # Stub implementation
         return {
             "status": "sent",
@@ -27,24 +56,112 @@ class SMSAdapter:
             "phone_number": phone_number
         }
     
-    async def receive_sms(self, phone_number: str, message: str) -> dict:
+    def enqueue_sms(self, phone_number: str, message: str) -> dict:
+        """
+        Queue an SMS for delivery without waiting for the gateway
+        
+        Raises:
+            asyncio.QueueFull: If the outbound queue is full
+        """
+        if self.dispatcher is None:
+            return {"status": "sent", "message_id": "stub-message-id", "phone_number": phone_number}
+        sms = self.dispatcher.submit(phone_number, message)
+        return {"status": "queued", "message_id": sms.message_id, "phone_number": phone_number}
+    
+    async def send_bulk(self, messages: List[Tuple[str, str]]) -> List[dict]:
         """
-        Process incoming SMS
+        Queue several (phone_number, message) pairs in one go
+        
+        The dispatcher submits them to the gateway in batches; a message
+        that does not fit in the outbound queue is reported as failed.
+        """
+        results = []
+        for phone_number, message in messages:
+            try:
+                results.append(self.enqueue_sms(phone_number, message))
+            except asyncio.QueueFull:
+                results.append({"status": "failed", "phone_number": phone_number, "error": "queue full"})
+        return results
+    
+    async def receive_sms(self, phone_number: str, message: str, db: Session) -> dict:
+        """
+        Triage an incoming keyword SMS (e.g. "NTAL 3 F H") in one round trip
+        
+        A message matching the grammar in ``sms_parser`` is scored with the
+        active ruleset and saved as an SMS encounter; urgent outcomes and
+        messages containing CB also queue a callback. The reply (advice, or
+        usage help for malformed messages) is queued for delivery.
         
         Args:
             phone_number: Sender's phone number
             message: SMS message text
+            db: Database session
         
         Returns:
-            dict with parsed triage data
+            dict with parse result, reply text and the saved encounter
         """
-        # Stub implementation - parse SMS keywords
+        if not await self.engine.allow(phone_number, "SMS"):
+            return {
+                "phone_number": phone_number,
+                "message": message,
+                "parsed": False,
+                "error": "rate_limit",
+                "reply": get_message("en", "rate_limit"),
+            }
+        
+        try:
+            triage = parse_sms(message)
+        except SMSParseError as exc:
+            logger.info("Unparsed SMS from %s: %s", mask_msisdn(phone_number), exc.reason)
+            reply = get_message("en", "sms_help")
+            self._queue_reply(phone_number, reply)
+            return {
+                "phone_number": phone_number,
+                "message": message,
+                "parsed": False,
+                "error": exc.reason,
+                "reply": reply,
+            }
+        
+        result = await self.engine.triage_once(
+            "SMS",
+            phone_number,
+            {
+                "language": triage.language,
+                "age_group": triage.age_group,
+                "gender": triage.gender,
+                **triage.symptoms,
+            },
+            db,
+            settings.SMS_CONSENT_VERSION,
+            request_callback=triage.callback
+        )
+        risk_code = result.risk_code
+        
+        result_key = f"sms_{risk_code.lower()}"
+        parts = [get_message(triage.language, result_key) if result_key in LANGUAGES["en"] else result.advice]
+        if result.callback_requested:
+            parts.append(get_message(triage.language, "sms_callback_queued"))
+        parts.append(f"Ref: {result.encounter.id}")
+        reply = " ".join(parts)
+        self._queue_reply(phone_number, reply)
+        
         return {
             "phone_number": phone_number,
             "message": message,
-            "parsed": False
+            "parsed": True,
+            "risk_code": risk_code,
+            "callback_requested": result.callback_requested,
+            "encounter_id": result.encounter.id,
+            "reply": reply,
         }
     
+    def _queue_reply(self, phone_number: str, reply: str):
+        try:
+            self.enqueue_sms(phone_number, reply)
+        except asyncio.QueueFull:
+            logger.warning("SMS queue full; reply to %s dropped", mask_msisdn(phone_number))
+    
     async def send_confirmation(self, phone_number: str, encounter_id: int) -> dict:
         """Send triage confirmation SMS"""
         message = f"Thank you for using NTAL Telehealth. Your case ID is {encounter_id}."
@@ -0,0 +1,333 @@
+"""
+Outbound SMS dispatcher - batched, rate-shaped delivery to the SMS gateway.
+
+Messages are queued and drained by a few sender tasks that share one
+keep-alive HTTP client. Each sender collects up to SMS_BATCH_SIZE messages
+(waiting at most SMS_BATCH_LINGER_MS), takes tokens from a bucket matching
+the gateway's TPS, and submits the batch in a single request. Retryable
+failures are re-queued with jittered exponential backoff; messages that
+exhaust their retries are dead-lettered. On shutdown, messages still queued,
+in flight or waiting to retry after the drain timeout are dead-lettered too,
+so every ``send()`` caller gets an answer.
+
+Gateway protocol (JSON):
+    POST {SMS_GATEWAY_URL}/messages/batch
+    {"messages": [{"id": "...", "to": "+234...", "text": "..."}]}
+    -> {"results": [{"id": "...", "status": "accepted" | "rejected", "retryable": false}]}
+"""
+
+import asyncio
+import logging
+import random
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+import httpx
+
+from ..core.config import settings
+from ..core.token_bucket import TokenBucket
+from ..core.ussd_utils import mask_msisdn
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = "/messages/batch"
+
+
+@dataclass
+class OutboundSMS:
+    """A queued outbound message."""
+
+    phone_number: str
+    message: str
+    message_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    last_error: Optional[str] = None
+    future: Optional[asyncio.Future] = None
+
+
+class SMSDispatcher:
+    """Queue-backed, batched and rate-shaped SMS sender."""
+
+    def __init__(
+        self,
+        gateway_url: str,
+        api_key: str = "",
+        tps: float = 50.0,
+        batch_size: int = 100,
+        linger_ms: int = 50,
+        concurrency: int = 4,
+        queue_size: int = 100000,
+        max_retries: int = 5,
+        retry_base_seconds: float = 0.5,
+        retry_max_seconds: float = 30.0,
+        dead_letter_size: int = 10000,
+        timeout: float = 10.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.gateway_url = gateway_url
+        self.api_key = api_key
+        self.batch_size = batch_size
+        self.linger = linger_ms / 1000
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.timeout = timeout
+        self.transport = transport
+
+        self.queue: "asyncio.Queue[OutboundSMS]" = asyncio.Queue(maxsize=queue_size)
+        self.bucket = TokenBucket(rate=tps, capacity=max(tps, 1.0))
+        self.dead_letters: Deque[OutboundSMS] = deque(maxlen=dead_letter_size)
+        self.stats = {"sent": 0, "rejected": 0, "retried": 0, "dead_lettered": 0, "batches": 0}
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._senders: List[asyncio.Task] = []
+        # Messages taken off the queue by a sender, and messages waiting out a retry backoff
+        self._in_flight: Dict[str, OutboundSMS] = {}
+        self._retrying: Dict[asyncio.Task, OutboundSMS] = {}
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "SMSDispatcher":
+        options = dict(
+            gateway_url=settings.SMS_GATEWAY_URL,
+            api_key=settings.SMS_GATEWAY_API_KEY,
+            tps=settings.SMS_GATEWAY_TPS,
+            batch_size=settings.SMS_BATCH_SIZE,
+            linger_ms=settings.SMS_BATCH_LINGER_MS,
+            concurrency=settings.SMS_SENDER_CONCURRENCY,
+            queue_size=settings.SMS_QUEUE_SIZE,
+            max_retries=settings.SMS_MAX_RETRIES,
+            retry_base_seconds=settings.SMS_RETRY_BASE_SECONDS,
+            retry_max_seconds=settings.SMS_RETRY_MAX_SECONDS,
+            dead_letter_size=settings.SMS_DEAD_LETTER_SIZE,
+            timeout=settings.SMS_GATEWAY_TIMEOUT,
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    async def start(self):
+        """Open the shared HTTP client and start the sender tasks."""
+        headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+        self._client = httpx.AsyncClient(
+            base_url=self.gateway_url,
+            headers=headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.concurrency,
+                max_keepalive_connections=self.concurrency,
+            ),
+            transport=self.transport,
+        )
+        self._senders = [asyncio.create_task(self._sender()) for _ in range(self.concurrency)]
+
+    async def _drain(self):
+        """Wait until the queue is empty and no retry is pending."""
+        while True:
+            await self.queue.join()
+            if not self._retrying:
+                return
+            await asyncio.wait(list(self._retrying))
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """
+        Stop the senders, first giving queued and retrying messages up to
+        drain_timeout to go out. Whatever is left is dead-lettered.
+        """
+        try:
+            await asyncio.wait_for(self._drain(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "SMS dispatcher stopped with %d messages queued, %d in flight and %d waiting to retry",
+                self.queue.qsize(), len(self._in_flight), len(self._retrying)
+            )
+        # Taken before cancelling: cancelled senders and retries drop their messages from these
+        unsent = [*self._in_flight.values(), *self._retrying.values()]
+        tasks = [*self._senders, *self._retrying]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._senders = []
+        self._in_flight.clear()
+        self._retrying.clear()
+        while not self.queue.empty():
+            unsent.append(self.queue.get_nowait())
+            self.queue.task_done()
+        for sms in unsent:
+            self._dead_letter(sms, "dispatcher stopped")
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def submit(self, phone_number: str, message: str) -> OutboundSMS:
+        """
+        Queue a message without waiting for delivery.
+
+        Raises:
+            asyncio.QueueFull: If the outbound queue is at SMS_QUEUE_SIZE
+        """
+        sms = OutboundSMS(phone_number=phone_number, message=message)
+        self.queue.put_nowait(sms)
+        return sms
+
+    async def send(self, phone_number: str, message: str) -> Dict[str, Any]:
+        """Queue a message and wait until the gateway accepts it or it is dead-lettered."""
+        sms = OutboundSMS(
+            phone_number=phone_number,
+            message=message,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        await self.queue.put(sms)
+        return await sms.future
+
+    def _take(self, batch: List[OutboundSMS], sms: OutboundSMS):
+        self._in_flight[sms.message_id] = sms
+        batch.append(sms)
+
+    async def _next_batch(self) -> List[OutboundSMS]:
+        batch: List[OutboundSMS] = []
+        self._take(batch, await self.queue.get())
+        deadline = asyncio.get_running_loop().time() + self.linger
+        while len(batch) < self.batch_size:
+            try:
+                self._take(batch, self.queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
+            try:
+                self._take(batch, await asyncio.wait_for(self.queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _sender(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.bucket.acquire(len(batch))
+                await self._submit_batch(batch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("Unexpected error submitting SMS batch")
+                for sms in batch:
+                    self._fail(sms, repr(exc), retryable=True)
+            finally:
+                for sms in batch:
+                    self._in_flight.pop(sms.message_id, None)
+                    self.queue.task_done()
+
+    async def _submit_batch(self, batch: List[OutboundSMS]):
+        payload = {
+            "messages": [
+                {"id": sms.message_id, "to": sms.phone_number, "text": sms.message}
+                for sms in batch
+            ]
+        }
+        self.stats["batches"] += 1
+        try:
+            response = await self._client.post(BATCH_PATH, json=payload)
+        except httpx.TransportError as exc:
+            for sms in batch:
+                self._fail(sms, repr(exc), retryable=True)
+            return
+
+        if response.status_code == 429 or response.status_code >= 500:
+            for sms in batch:
+                self._fail(sms, f"HTTP {response.status_code}", retryable=True)
+            return
+        if response.status_code >= 400:
+            for sms in batch:
+                self._fail(sms, f"HTTP {response.status_code}", retryable=False)
+            return
+
+        results = {}
+        try:
+            results = {r.get("id"): r for r in response.json().get("results", [])}
+        except ValueError:
+            pass
+        for sms in batch:
+            result = results.get(sms.message_id, {"status": "accepted"})
+            if result.get("status") == "accepted":
+                self.stats["sent"] += 1
+                if sms.future is not None and not sms.future.done():
+                    sms.future.set_result({
+                        "status": "sent",
+                        "message_id": sms.message_id,
+                        "phone_number": sms.phone_number,
+                    })
+            else:
+                self._fail(sms, result.get("error", "rejected"), retryable=bool(result.get("retryable")))
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempt))
+
+    def _fail(self, sms: OutboundSMS, error: str, retryable: bool):
+        sms.attempts += 1
+        sms.last_error = error
+        if retryable and sms.attempts <= self.max_retries:
+            self.stats["retried"] += 1
+            task = asyncio.create_task(self._requeue(sms, self._backoff(sms.attempts)))
+            self._retrying[task] = sms
+            task.add_done_callback(lambda done: self._retrying.pop(done, None))
+            return
+
+        if retryable:
+            self._dead_letter(sms, error)
+            return
+        self.stats["rejected"] += 1
+        self._resolve_failed(sms, error)
+
+    def _dead_letter(self, sms: OutboundSMS, error: str):
+        sms.last_error = error
+        self.stats["dead_lettered"] += 1
+        self.dead_letters.append(sms)
+        self._resolve_failed(sms, error)
+
+    def _resolve_failed(self, sms: OutboundSMS, error: str):
+        logger.warning(
+            "SMS %s to %s failed after %d attempts: %s",
+            sms.message_id, mask_msisdn(sms.phone_number), sms.attempts, error
+        )
+        if sms.future is not None and not sms.future.done():
+            sms.future.set_result({
+                "status": "failed",
+                "message_id": sms.message_id,
+                "phone_number": sms.phone_number,
+                "error": error,
+            })
+
+    async def _requeue(self, sms: OutboundSMS, delay: float):
+        await asyncio.sleep(delay)
+        await self.queue.put(sms)
+
+
+# Process-wide dispatcher, started in the app lifespan when SMS_GATEWAY_URL is set
+sms_dispatcher: Optional[SMSDispatcher] = None
+
+
+async def start_sms_dispatcher() -> Optional[SMSDispatcher]:
+    """Start the process-wide dispatcher if a gateway is configured."""
+    global sms_dispatcher
+    if sms_dispatcher is None and settings.SMS_GATEWAY_URL:
+        sms_dispatcher = SMSDispatcher.from_settings()
+        await sms_dispatcher.start()
+    return sms_dispatcher
+
+
+async def stop_sms_dispatcher():
+    """Drain and stop the process-wide dispatcher."""
+    global sms_dispatcher
+    if sms_dispatcher is not None:
+        await sms_dispatcher.stop()
+        sms_dispatcher = None
+
+
+def get_sms_dispatcher() -> Optional[SMSDispatcher]:
+    """Get the running dispatcher, or None when no gateway is configured."""
+    return sms_dispatcher
@@ -1,36 +1,53 @@
 """
-USSD Adapter - Stub for USSD integration
-This adapter will handle USSD sessions for feature phones
+USSD Adapter - USSD integration for feature phones
+Translates aggregator requests into conversation engine messages and renders
+replies as "CON ..." / "END ..." strings.
 """
 
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from ..core.conversation import ConversationEngine, InboundMessage, get_conversation_engine
+
+
 class USSDAdapter:
     """Adapter for USSD (Unstructured Supplementary Service Data) integration"""
     
-    def __init__(self):
-        self.sessions = {}
+    def __init__(self, engine: Optional[ConversationEngine] = None):
+        self.engine = engine or get_conversation_engine()
     
-    async def handle_ussd_request(self, session_id: str, phone_number: str, text: str) -> dict:
+    async def handle_ussd_request(
+        self, session_id: str, phone_number: str, text: str, db: Session, service_code: str = ""
+    ) -> dict:
         """
         Handle incoming USSD request
         
         Args:
             session_id: USSD session identifier
             phone_number: User's phone number
-            text: USSD input text
+            text: USSD input text (accumulated, e.g. "1*2*3")
+            db: Database session
+            service_code: Short code the user dialled; selects the flow
         
         Returns:
             dict with response text and continue flag
         """
-        # Stub implementation
-        return {
-            "response": "CON Welcome to NTAL Telehealth\n1. Start Triage\n2. Check Status",
-            "continue": True
-        }
-    
-    async def process_triage_menu(self, session_id: str, user_input: str) -> dict:
-        """Process triage menu navigation"""
-        # Stub for future implementation
+        text = text.strip() if text else ""
+        # USSD sends accumulated input like "1*2*3"; the last choice is the answer.
+        # Empty input is a fresh dial and restarts the flow.
+        reply = await self.engine.handle(
+            InboundMessage(
+                channel="USSD",
+                conversation_id=session_id,
+                msisdn=phone_number,
+                text=text.split("*")[-1],
+                restart=(text == ""),
+                service_code=service_code,
+            ),
+            db
+        )
         return {
-            "response": "END Thank you. Your case has been submitted.",
-            "continue": False
+            "response": f"{reply.response_type} {reply.message}",
+            "continue": not reply.ended
         }
@@ -1,14 +1,24 @@
 """
-WhatsApp Adapter - Stub for WhatsApp Business API integration
-This adapter will handle WhatsApp-based interactions
+WhatsApp Adapter - WhatsApp Business API integration
+Inbound messages run through the conversation engine; outbound sends are
+stubbed until the Business API credentials are configured.
 """
 
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from ..core.conversation import ConversationEngine, InboundMessage, get_conversation_engine
+from ..core.database import SessionLocal
+
+
 class WhatsAppAdapter:
     """Adapter for WhatsApp Business API integration"""
     
-    def __init__(self):
+    def __init__(self, engine: Optional[ConversationEngine] = None):
         self.api_key = None
         self.phone_number_id = None
+        self.engine = engine or get_conversation_engine()
     
     async def send_message(self, phone_number: str, message: str) -> dict:
         """
@@ -37,21 +47,46 @@ class WhatsAppAdapter:
             "template": template_name
         }
     
-    async def receive_message(self, webhook_data: dict) -> dict:
+    async def receive_message(self, webhook_data: dict, db: Optional[Session] = None) -> dict:
         """
-        Process incoming WhatsApp webhook
+        Process an incoming WhatsApp message through the conversation engine
         
         Args:
-            webhook_data: Webhook payload from WhatsApp
+            webhook_data: Message object from the WhatsApp webhook payload
+            db: Database session (a new one is opened when omitted, as for
+                messages handled by the ingestion workers)
         
         Returns:
-            dict with parsed message data
+            dict with parsed message data and the reply sent
         """
-        # Stub implementation
+        sender = webhook_data.get("from", "")
+        text = (webhook_data.get("text") or {}).get("body", "")
+        phone_number = sender if sender.startswith("+") else f"+{sender}"
+        
+        own_session = db is None
+        if own_session:
+            db = SessionLocal()
+        try:
+            reply = await self.engine.handle(
+                InboundMessage(
+                    channel="WHATSAPP",
+                    conversation_id=sender,
+                    msisdn=phone_number,
+                    text=text.strip()
+                ),
+                db
+            )
+        finally:
+            if own_session:
+                db.close()
+        
+        await self.send_message(phone_number, reply.message)
         return {
-            "phone_number": webhook_data.get("from", ""),
-            "message": webhook_data.get("text", {}).get("body", ""),
-            "message_type": "text"
+            "phone_number": phone_number,
+            "message": text,
+            "message_type": webhook_data.get("type", "text"),
+            "reply": reply.message,
+            "ended": reply.ended
         }
     
     async def send_interactive_menu(self, phone_number: str, menu_data: dict) -> dict:
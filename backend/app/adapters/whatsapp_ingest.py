@@ -0,0 +1,178 @@
+"""
+WhatsApp webhook ingestion - acknowledge fast, process asynchronously.
+
+Meta retries webhooks that are not acknowledged within a few seconds and
+frequently delivers the same message more than once. The webhook endpoint
+therefore only validates the payload and hands its messages to this module:
+
+- messages are deduplicated by ``wamid`` with ``SET NX EX`` in Redis, so a
+  redelivery is dropped whichever gunicorn worker receives it,
+- each message is routed to one of WHATSAPP_WORKERS queues by a hash of the
+  sender, so one sender's messages received by a worker are handled in order
+  while different senders are processed in parallel.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import zlib
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from ..core.config import settings
+from ..core.redis_client import get_redis
+from ..core.ussd_utils import mask_msisdn
+from .whatsapp_adapter import WhatsAppAdapter
+
+logger = logging.getLogger(__name__)
+
+MessageHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+def dedup_key(wamid: str) -> str:
+    return f"whatsapp:seen:{wamid}"
+
+
+def verify_signature(body: bytes, signature: Optional[str], app_secret: str) -> bool:
+    """
+    Check Meta's X-Hub-Signature-256 header against the raw request body.
+
+    Args:
+        body: Raw request body
+        signature: Header value (``sha256=<hex>``)
+        app_secret: WhatsApp app secret
+
+    Returns:
+        True if the signature matches
+    """
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(app_secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256="):])
+
+
+def extract_messages(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield the message objects from a WhatsApp Business webhook payload."""
+    for entry in payload.get("entry") or []:
+        for change in entry.get("changes") or []:
+            value = change.get("value") or {}
+            for message in value.get("messages") or []:
+                if message.get("id") and message.get("from"):
+                    yield message
+
+
+class WhatsAppIngestor:
+    """Deduplicating, sender-sharded worker pool for webhook messages."""
+
+    def __init__(
+        self,
+        handler: Optional[MessageHandler] = None,
+        workers: int = 8,
+        queue_size: int = 10000,
+        dedup_ttl: int = 86400,
+    ):
+        self.handler = handler or WhatsAppAdapter().receive_message
+        self.queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=queue_size) for _ in range(workers)]
+        self.dedup_ttl = dedup_ttl
+        self.stats = {"received": 0, "duplicates": 0, "processed": 0, "failed": 0}
+        self._workers: List[asyncio.Task] = []
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "WhatsAppIngestor":
+        options = dict(
+            workers=settings.WHATSAPP_WORKERS,
+            queue_size=settings.WHATSAPP_QUEUE_SIZE,
+            dedup_ttl=settings.WHATSAPP_DEDUP_TTL_SECONDS,
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    def start(self):
+        self._workers = [asyncio.create_task(self._worker(queue)) for queue in self.queues]
+
+    async def stop(self, drain_timeout: float = 5.0):
+        """Stop the workers, first giving queued messages up to drain_timeout to finish."""
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self.queues)), timeout=drain_timeout
+            )
+        except asyncio.TimeoutError:
+            logger.warning("WhatsApp ingestor stopped with %d messages queued", self.pending())
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def pending(self) -> int:
+        return sum(queue.qsize() for queue in self.queues)
+
+    async def enqueue(self, payload: Dict[str, Any]) -> int:
+        """
+        Queue the new messages in a webhook payload.
+
+        Returns:
+            Number of messages queued (duplicates are skipped)
+
+        Raises:
+            asyncio.QueueFull: If a sender's queue is full; messages queued
+                before it stay queued and will be skipped as duplicates when
+                Meta retries the webhook
+            RedisError, OSError: If the dedup check cannot reach Redis
+        """
+        redis_client = await get_redis()
+        queued = 0
+        for message in extract_messages(payload):
+            self.stats["received"] += 1
+            key = dedup_key(message["id"])
+            if not await redis_client.set(key, "1", nx=True, ex=self.dedup_ttl):
+                self.stats["duplicates"] += 1
+                continue
+            queue = self.queues[zlib.crc32(message["from"].encode()) % len(self.queues)]
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                await redis_client.delete(key)
+                raise
+            queued += 1
+        return queued
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            message = await queue.get()
+            try:
+                await self.handler(message)
+                self.stats["processed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats["failed"] += 1
+                logger.exception(
+                    "Failed to process WhatsApp message %s from %s",
+                    message.get("id"), mask_msisdn(message.get("from", ""))
+                )
+            finally:
+                queue.task_done()
+
+
+# Process-wide ingestor, started in the app lifespan
+whatsapp_ingestor: Optional[WhatsAppIngestor] = None
+
+
+def start_whatsapp_ingestor() -> WhatsAppIngestor:
+    global whatsapp_ingestor
+    if whatsapp_ingestor is None:
+        whatsapp_ingestor = WhatsAppIngestor.from_settings()
+        whatsapp_ingestor.start()
+    return whatsapp_ingestor
+
+
+async def stop_whatsapp_ingestor():
+    global whatsapp_ingestor
+    if whatsapp_ingestor is not None:
+        await whatsapp_ingestor.stop()
+        whatsapp_ingestor = None
+
+
+def get_whatsapp_ingestor() -> Optional[WhatsAppIngestor]:
+    """Get the running ingestor (None outside the app lifespan)."""
+    return whatsapp_ingestor
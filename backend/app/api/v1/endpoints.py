@@ -1,14 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, Form, HTTPException, status, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from redis.exceptions import RedisError
 from sqlalchemy.orm import Session
 from sqlalchemy import func, case
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
+import asyncio
+import json
 import logging
 
-from ...core.database import get_db
+from ...core import audit
+from ...core.database import get_db, get_read_db
+from ...core.db_routing import mark_provider_write, reads_from_primary
+from ...core.jobs import get_job_queue
+from ...core.events import CALLBACK_ASSIGNED, CALLBACK_COMPLETED, publish
 from ...core.security import decode_access_token
-from ...models.models import Provider, Encounter, Callback, CallbackStatus, CallbackPriority
+from ...models.models import Provider, Encounter, Callback, CallbackStatus, CallbackPriority, RetriageRun, AuditEvent
 from ...schemas.schemas import (
     HealthCheck,
     EncounterCreate,
@@ -18,16 +26,40 @@ from ...schemas.schemas import (
     Token,
     Provider as ProviderSchema,
     USSDRequest,
+    SMSInbound,
+    SMSInboundResult,
     Callback as CallbackSchema,
     CallbackAssign,
     CallbackComplete,
     USSDMetrics,
+    ConversationFunnel,
+    TriageRulesetInfo,
+    USSDFlowInfo,
+    RetriageRunCreate,
+    RetriageSummary,
+    AuditEvent as AuditEventSchema,
+    EncounterSearchHit,
+    ProviderAvailability,
+    AuditVerification,
 )
 from ...core.security import verify_password, create_access_token
 from ...core.config import settings
-from ...core.ussd_session import USSDSession
-from ...core.ussd_state_machine import USSDStateMachine
-from ...core.ussd_utils import hash_msisdn, mask_msisdn
+from ...core.logging_config import log_event
+from ...core.ussd_utils import mask_msisdn
+from ...core.warmup import recheck as recheck_warmup
+from ...core.pool_stats import get_pool_stats
+from ...core.callback_scheduler import get_callback_scheduler
+from ...core.search import search_encounters
+from ...core.funnel import BUCKETS, read_funnel
+from ...core.redis_client import get_session_redis
+from ...core.ussd_flows import CompiledFlow, get_flow_registry
+from ...core.triage_rules import CompiledRuleset, get_active_ruleset, get_registry, resolve_ruleset_path
+from ...adapters.ivr_adapter import IVRAdapter
+from ...adapters.sms_adapter import SMSAdapter
+from ...adapters.ussd_adapter import USSDAdapter
+from ...adapters.whatsapp_ingest import get_whatsapp_ingestor, verify_signature
+from ...jobs.archive import find_encounter
+from ...jobs.retriage import mark_run_failed, start_run, summarize_run
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -62,6 +94,17 @@ def get_current_provider(
     return provider
 
 
+async def get_reader_db(
+    current_provider: Provider = Depends(get_current_provider),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db)
+) -> Session:
+    """Session for read-only endpoints: the replica, unless the provider just wrote."""
+    if await reads_from_primary(current_provider.id):
+        return db
+    return read_db
+
+
 @router.get("/health", response_model=HealthCheck, tags=["health"])
 async def health_check():
     """Health check endpoint"""
@@ -72,6 +115,28 @@ async def health_check():
     )
 
 
+@router.get("/ready", tags=["health"])
+async def readiness_check():
+    """
+    Readiness probe: 200 once this worker has warmed up and reached the DB and Redis, 503 otherwise.
+    
+    Checks that failed are retried on each probe.
+    """
+    warmup_status = await recheck_warmup()
+    if warmup_status["ready"]:
+        state = "ready"
+    else:
+        state = "unavailable" if warmup_status["warmed_up"] else "starting"
+    return JSONResponse(
+        status_code=200 if warmup_status["ready"] else 503,
+        content={
+            "status": state,
+            "warmup_ms": warmup_status["duration_ms"],
+            "checks": warmup_status["checks"],
+        },
+    )
+
+
 @router.post("/auth/login", response_model=Token, tags=["auth"])
 async def login(login_request: LoginRequest, db: Session = Depends(get_db)):
     """Provider login endpoint"""
@@ -95,28 +160,149 @@ async def create_triage(encounter: EncounterCreate, db: Session = Depends(get_db
     return db_encounter
 
 
+def _ruleset_info(ruleset: CompiledRuleset) -> TriageRulesetInfo:
+    return TriageRulesetInfo(
+        version=ruleset.version,
+        symptoms=list(ruleset.symptoms),
+        risk_codes=[outcome.risk_code for outcome in ruleset.outcomes],
+        source=ruleset.source,
+    )
+
+
+@router.get("/triage/ruleset", response_model=TriageRulesetInfo, tags=["triage"])
+async def get_triage_ruleset(current_provider: Provider = Depends(get_current_provider)):
+    """Get the triage ruleset active in this worker (requires authentication)."""
+    return _ruleset_info(get_active_ruleset())
+
+
+@router.post("/triage/ruleset/reload", response_model=TriageRulesetInfo, tags=["triage"])
+async def reload_triage_ruleset(current_provider: Provider = Depends(get_current_provider)):
+    """
+    Reload the triage ruleset from disk in this worker (requires admin authentication).
+    
+    Other workers pick up the change on their next reload poll.
+    """
+    if current_provider.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    try:
+        ruleset = get_registry().reload()
+    except (OSError, ValueError) as exc:
+        raise HTTPException(status_code=422, detail=f"Ruleset could not be loaded: {exc}")
+    return _ruleset_info(ruleset)
+
+
+def _flow_info(flow: CompiledFlow) -> USSDFlowInfo:
+    return USSDFlowInfo(
+        name=flow.name,
+        service_codes=list(flow.service_codes),
+        languages=list(flow.languages),
+        steps=list(flow.steps),
+        ruleset_version=flow.ruleset().version,
+        rate_limit=flow.rate_limit,
+        default=flow.default,
+        source=flow.source,
+    )
+
+
+@router.get("/ussd/flows", response_model=List[USSDFlowInfo], tags=["ussd"])
+async def list_ussd_flows(current_provider: Provider = Depends(get_current_provider)):
+    """List the USSD flows loaded in this worker and the service codes routed to them (requires authentication)."""
+    return [_flow_info(flow) for flow in get_flow_registry().flows.values()]
+
+
+@router.post("/triage/retriage", response_model=RetriageSummary, tags=["triage"], status_code=status.HTTP_202_ACCEPTED)
+async def create_retriage_run(
+    request: RetriageRunCreate,
+    current_provider: Provider = Depends(get_current_provider),
+    db: Session = Depends(get_db)
+):
+    """
+    Start re-scoring historic encounters with a candidate ruleset (requires admin authentication).
+    
+    The run is queued as a `retriage.run` job for `python -m app.worker`, so
+    scoring never competes with requests in the web workers.
+    """
+    if current_provider.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    try:
+        run = start_run(db, str(resolve_ruleset_path(request.ruleset)))
+    except (OSError, ValueError) as exc:
+        raise HTTPException(status_code=422, detail=f"Ruleset could not be loaded: {exc}")
+    
+    try:
+        job_queue = await get_job_queue()
+        await job_queue.enqueue("retriage.run", {"run_id": run.id})
+    except (RedisError, OSError) as exc:
+        logger.exception("Could not queue re-triage run %s", run.id)
+        mark_run_failed(db, run.id, exc)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Job queue unavailable; resume with `python -m app.jobs.retriage --resume {run.id}`"
+        )
+    return RetriageSummary(run=run, transitions={})
+
+
+@router.get("/triage/retriage/{run_id}", response_model=RetriageSummary, tags=["triage"])
+async def get_retriage_run(
+    run_id: int,
+    current_provider: Provider = Depends(get_current_provider),
+    db: Session = Depends(get_db)
+):
+    """Get re-triage progress and diff counts by risk code transition (requires authentication)."""
+    run = db.query(RetriageRun).filter(RetriageRun.id == run_id).first()
+    if run is None:
+        raise HTTPException(status_code=404, detail="Re-triage run not found")
+    return RetriageSummary(run=run, transitions=summarize_run(db, run.id))
+
+
 @router.get("/encounters", response_model=List[EncounterSchema], tags=["encounters"])
 async def list_encounters(
     skip: int = 0,
     limit: int = 100,
     current_provider: Provider = Depends(get_current_provider),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reader_db)
 ):
-    """List all encounters (requires authentication)"""
+    """List all encounters (requires authentication; served from the read replica)"""
     encounters = db.query(Encounter).offset(skip).limit(limit).all()
     return encounters
 
 
+# Declared before /encounters/{encounter_id} so "search" isn't parsed as an id
+@router.get("/encounters/search", response_model=List[EncounterSearchHit], tags=["encounters"])
+async def search_encounter_text(
+    q: str = Query(..., min_length=1, max_length=200, description="Words to find in complaint, symptoms, history and notes"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    current_provider: Provider = Depends(get_current_provider),
+    db: Session = Depends(get_reader_db)
+):
+    """
+    Full-text search over encounter free text, best matches first (requires authentication;
+    served from the read replica).
+    
+    Each hit carries a snippet with the matched terms wrapped in [ ]. Archived encounters are not searched.
+    """
+    hits = search_encounters(db, q, limit=limit, offset=offset)
+    for hit in hits:
+        _audit(current_provider, audit.SEARCH, hit.encounter.id)
+    return [{"encounter": hit.encounter, "score": hit.score, "snippet": hit.snippet} for hit in hits]
+
+
 @router.get("/encounters/{encounter_id}", response_model=EncounterSchema, tags=["encounters"])
 async def get_encounter(
     encounter_id: int,
     current_provider: Provider = Depends(get_current_provider),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reader_db)
 ):
-    """Get a specific encounter by ID (requires authentication)"""
-    encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
+    """
+    Get a specific encounter by ID (requires authentication; served from the read replica).
+    
+    Archived encounters are served from the archive.
+    """
+    encounter, _ = find_encounter(db, encounter_id)
     if encounter is None:
         raise HTTPException(status_code=404, detail="Encounter not found")
+    _audit(current_provider, audit.READ, encounter_id)
     return encounter
 
 
@@ -128,18 +314,72 @@ async def update_encounter(
     db: Session = Depends(get_db)
 ):
     """Update an encounter (requires authentication)"""
-    encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
+    encounter, archived = find_encounter(db, encounter_id)
+    if archived:
+        raise HTTPException(status_code=409, detail="Encounter is archived")
     if encounter is None:
         raise HTTPException(status_code=404, detail="Encounter not found")
     
-    for key, value in encounter_update.model_dump(exclude_unset=True).items():
+    changes = encounter_update.model_dump(exclude_unset=True)
+    for key, value in changes.items():
         setattr(encounter, key, value)
     
     db.commit()
     db.refresh(encounter)
+    await mark_provider_write(current_provider.id)
+    _audit(current_provider, audit.UPDATE, encounter_id, sorted(changes))
     return encounter
 
 
+def _audit(provider: Provider, action: str, encounter_id: int, fields: Optional[List[str]] = None):
+    audit_log = audit.get_audit_log()
+    if audit_log is not None:
+        audit_log.record(provider.id, action, encounter_id, fields or ())
+    else:
+        logger.warning("Audit log not running; %s of encounter %s not recorded", action, encounter_id)
+
+
+@router.get("/encounters/{encounter_id}/audit", response_model=List[AuditEventSchema], tags=["audit"])
+async def get_encounter_audit(
+    encounter_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    current_provider: Provider = Depends(get_current_provider),
+    db: Session = Depends(get_db)
+):
+    """
+    Get who read or updated an encounter, oldest first (requires admin authentication).
+    
+    This worker's buffered events are flushed first; other workers flush
+    within AUDIT_FLUSH_INTERVAL_SECONDS.
+    """
+    if current_provider.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    audit_log = audit.get_audit_log()
+    if audit_log is not None:
+        await audit_log.flush()
+    return (
+        db.query(AuditEvent)
+        .filter(AuditEvent.encounter_id == encounter_id)
+        .order_by(AuditEvent.occurred_at, AuditEvent.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+
+@router.get("/audit/verify", response_model=AuditVerification, tags=["audit"])
+async def verify_audit_log(
+    current_provider: Provider = Depends(get_current_provider),
+    db: Session = Depends(get_db)
+):
+    """Recompute the audit hash chain to detect tampering (requires admin authentication)."""
+    if current_provider.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    valid, checked, broken_at = audit.verify_chain(db)
+    return AuditVerification(valid=valid, checked=checked, broken_at=broken_at)
+
+
 @router.get("/me", response_model=ProviderSchema, tags=["auth"])
 async def get_current_provider_info(
     current_provider: Provider = Depends(get_current_provider)
@@ -159,61 +399,121 @@ async def ussd_handler(
     
     Accepts: sessionId, phoneNumber, serviceCode, text
     Returns: "CON ..." or "END ..."
+    
+    serviceCode picks the flow (campaign) of a new session; unknown codes
+    get the default flow.
     """
     session_id = request.sessionId
     msisdn = request.phoneNumber
-    user_input = request.text.strip() if request.text else ""
-    
-    # Log request with masked MSISDN
-    logger.info(f"USSD request: session={session_id}, msisdn={mask_msisdn(msisdn)}, input='{user_input}'")
-    
-    # Check rate limit
-    msisdn_hash_val = hash_msisdn(msisdn)
-    session = USSDSession(session_id)
-    
-    if not await session.check_rate_limit(msisdn_hash_val):
-        logger.warning(f"Rate limit exceeded for msisdn={mask_msisdn(msisdn)}")
-        return {"response": "END " + "Limit reached. Try again tomorrow."}
     
-    # Get or create session state
-    state = await session.get_state()
-    state["msisdn"] = msisdn
+    result = await USSDAdapter().handle_ussd_request(session_id, msisdn, request.text, db, request.serviceCode)
     
-    # Extract current step and user input
-    current_step = state.get("step", "consent")
-    language = state.get("language", "en")
-    
-    # If this is first request (empty input), show consent
-    if user_input == "":
-        current_step = "consent"
-        state["step"] = "consent"
-    else:
-        # Parse the last input from the text field
-        # USSD sends accumulated input like "1*2*3", we want the last choice
-        input_parts = user_input.split("*")
-        user_input = input_parts[-1] if input_parts else ""
-    
-    # Process the step
-    state_machine = USSDStateMachine(language)
-    response_type, message, new_state = state_machine.process_step(
-        current_step,
-        user_input,
-        state,
-        db
-    )
-    
-    # Save updated state
-    if response_type == "CON":
-        await session.set_state(new_state)
-    else:
-        # Session ended, clear state
-        await session.clear()
+    # One sampled line per hop, with masked MSISDN
+    if logger.isEnabledFor(logging.INFO):
+        log_event(
+            logger, "ussd_hop", "USSD hop: session=%s, input=%r, continue=%s",
+            session_id, request.text, result["continue"],
+            session_id=session_id, msisdn=mask_msisdn(msisdn), service_code=request.serviceCode,
+            ended=not result["continue"],
+        )
+    return {"response": result["response"]}
+
+
+# SMS Endpoints
+@router.post("/sms/inbound", response_model=SMSInboundResult, tags=["sms"])
+async def sms_inbound(
+    request: SMSInbound,
+    db: Session = Depends(get_db)
+):
+    """
+    Handle an inbound SMS from the gateway.
     
-    # Return USSD response
-    response_text = f"{response_type} {message}"
-    logger.info(f"USSD response: session={session_id}, type={response_type}")
+    A keyword message such as "NTAL 3 F H" is triaged and saved in one round
+    trip; the reply is queued for delivery and also returned here.
+    """
+    result = await SMSAdapter().receive_sms(request.phoneNumber, request.text, db)
+    return SMSInboundResult(**result)
+
+
+# IVR Endpoints (Twilio-style form posts, TwiML responses)
+@router.post("/ivr/voice", tags=["ivr"])
+async def ivr_incoming_call(
+    CallSid: str = Form(...),
+    From: str = Form(...),
+    db: Session = Depends(get_db)
+):
+    """Answer an incoming call with the consent prompt."""
+    result = await IVRAdapter().handle_incoming_call(CallSid, From, db)
+    return Response(result["response"], media_type="application/xml")
+
+
+@router.post("/ivr/gather", tags=["ivr"])
+async def ivr_gather(
+    CallSid: str = Form(...),
+    From: str = Form(...),
+    Digits: str = Form(""),
+    db: Session = Depends(get_db)
+):
+    """Advance the call's triage flow with the key the caller pressed."""
+    result = await IVRAdapter().process_dtmf_input(CallSid, From, Digits, db)
+    return Response(result["response"], media_type="application/xml")
+
+
+# WhatsApp Endpoints
+@router.get("/whatsapp/webhook", tags=["whatsapp"])
+async def whatsapp_verify(
+    mode: str = Query("", alias="hub.mode"),
+    verify_token: str = Query("", alias="hub.verify_token"),
+    challenge: str = Query("", alias="hub.challenge")
+):
+    """Answer Meta's webhook verification handshake."""
+    if (
+        mode != "subscribe"
+        or not settings.WHATSAPP_VERIFY_TOKEN
+        or verify_token != settings.WHATSAPP_VERIFY_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="Verification failed")
+    return PlainTextResponse(challenge)
+
+
+@router.post("/whatsapp/webhook", tags=["whatsapp"])
+async def whatsapp_webhook(request: Request):
+    """
+    Receive WhatsApp Business webhooks.
     
-    return {"response": response_text}
+    Validates the signature, queues new messages for asynchronous processing
+    and acknowledges immediately so Meta does not retry. Without
+    WHATSAPP_APP_SECRET every webhook is refused, unless WHATSAPP_ALLOW_UNSIGNED
+    is set for development.
+    """
+    body = await request.body()
+    if settings.WHATSAPP_APP_SECRET:
+        if not verify_signature(body, request.headers.get("X-Hub-Signature-256"), settings.WHATSAPP_APP_SECRET):
+            raise HTTPException(status_code=401, detail="Invalid signature")
+    elif not settings.WHATSAPP_ALLOW_UNSIGNED:
+        logger.error("WhatsApp webhook refused: WHATSAPP_APP_SECRET is not set")
+        raise HTTPException(status_code=403, detail="Webhook signing secret not configured")
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    if not isinstance(payload, dict):
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    ingestor = get_whatsapp_ingestor()
+    if ingestor is None:
+        raise HTTPException(status_code=503, detail="WhatsApp ingestion not running")
+    try:
+        queued = await ingestor.enqueue(payload)
+    except asyncio.QueueFull:
+        # Meta retries non-2xx responses; already-queued messages are deduplicated
+        logger.warning("WhatsApp ingestion queue full")
+        raise HTTPException(status_code=503, detail="Ingestion queue full")
+    except (RedisError, OSError) as exc:
+        # Without the dedup check a redelivery could be processed twice; let Meta retry
+        logger.warning("WhatsApp dedup unavailable: %r", exc)
+        raise HTTPException(status_code=503, detail="Ingestion temporarily unavailable")
+    return {"status": "ok", "queued": queued}
 
 
 # Callback Endpoints
@@ -222,9 +522,9 @@ async def list_callbacks(
     status: Optional[CallbackStatus] = Query(None, description="Filter by status"),
     priority: Optional[CallbackPriority] = Query(None, description="Filter by priority"),
     current_provider: Provider = Depends(get_current_provider),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reader_db)
 ):
-    """List callbacks with optional filters (requires authentication)."""
+    """List callbacks with optional filters (requires authentication; served from the read replica)."""
     query = db.query(Callback)
     
     if status:
@@ -245,6 +545,30 @@ async def list_callbacks(
     return callbacks
 
 
+@router.put("/providers/me/availability", response_model=ProviderAvailability, tags=["callbacks"])
+async def set_callback_availability(
+    availability: ProviderAvailability,
+    current_provider: Provider = Depends(get_current_provider)
+):
+    """
+    Opt in to (or out of) automatic callback assignment (requires authentication).
+    
+    Available providers are given queued callbacks suited to their role, least-loaded first.
+    Being available is a heartbeat: send it again before `expires_in` seconds or the opt-in lapses.
+    """
+    scheduler = get_callback_scheduler()
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="Automatic callback assignment is not enabled")
+    try:
+        await scheduler.set_availability(current_provider.id, current_provider.role, availability.available)
+    except ValueError as exc:
+        raise HTTPException(status_code=403, detail=str(exc))
+    return ProviderAvailability(
+        available=availability.available,
+        expires_in=scheduler.availability_ttl if availability.available else None,
+    )
+
+
 @router.post("/callbacks/{callback_id}/assign", response_model=CallbackSchema, tags=["callbacks"])
 async def assign_callback(
     callback_id: int,
@@ -265,15 +589,27 @@ async def assign_callback(
     if not provider:
         raise HTTPException(status_code=404, detail="Provider not found")
     
-    # Update callback
-    callback.provider_id = assignment.provider_id
-    callback.status = CallbackStatus.IN_PROGRESS
-    callback.assigned_at = datetime.utcnow()
+    # Update callback, unless the scheduler (or someone else) took it in the meantime
+    claimed = db.query(Callback).filter(
+        Callback.id == callback_id, Callback.status == CallbackStatus.QUEUED
+    ).update({
+        Callback.provider_id: assignment.provider_id,
+        Callback.status: CallbackStatus.IN_PROGRESS,
+        Callback.assigned_at: datetime.utcnow(),
+    }, synchronize_session=False)
+    if not claimed:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Callback is not in queued status")
     
     db.commit()
     db.refresh(callback)
+    await mark_provider_write(current_provider.id)
+    
+    publish(CALLBACK_ASSIGNED, callback_id=callback.id, encounter_id=callback.encounter_id,
+            msisdn_hash=callback.msisdn_hash, provider_id=callback.provider_id)
     
-    logger.info(f"Callback {callback_id} assigned to provider {assignment.provider_id}")
+    log_event(logger, "callback_assigned", "Callback %s assigned to provider %s",
+              callback_id, assignment.provider_id, callback_id=callback_id, provider_id=assignment.provider_id)
     return callback
 
 
@@ -300,18 +636,78 @@ async def complete_callback(
     
     db.commit()
     db.refresh(callback)
-    
-    logger.info(f"Callback {callback_id} marked as complete")
+    await mark_provider_write(current_provider.id)
+    
+    # The patient's number is only kept while one of their callbacks is open
+    still_open = db.query(Callback.id).filter(
+        Callback.msisdn_hash == callback.msisdn_hash,
+        Callback.status.in_([CallbackStatus.QUEUED, CallbackStatus.IN_PROGRESS]),
+    ).first() is not None
+    publish(CALLBACK_COMPLETED, callback_id=callback.id, encounter_id=callback.encounter_id,
+            msisdn_hash=callback.msisdn_hash, provider_id=callback.provider_id,
+            forget_contact=not still_open)
+    
+    log_event(logger, "callback_completed", "Callback %s marked as complete",
+              callback_id, callback_id=callback_id, provider_id=current_provider.id)
     return callback
 
 
 # Analytics/Metrics Endpoint
+@router.get("/metrics/pools", tags=["metrics"])
+async def get_connection_pool_metrics(
+    current_provider: Provider = Depends(get_current_provider)
+):
+    """
+    Get DB and Redis connection pool stats for the worker serving this request
+    (requires admin authentication).
+    
+    Rising wait times or timeouts mean requests are starving for connections.
+    """
+    if current_provider.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return get_pool_stats()
+
+
+
+@router.get("/metrics/ussd/funnel", response_model=ConversationFunnel, tags=["metrics"])
+async def get_conversation_funnel(
+    channel: str = Query("USSD", max_length=20, description="Conversation channel (USSD, IVR, ...)"),
+    bucket: str = Query("hour", pattern="^(" + "|".join(BUCKETS) + ")$"),
+    periods: int = Query(24, ge=1, le=366, description="Number of buckets, the current one last"),
+    flow: Optional[str] = Query(None, max_length=64, description="USSD flow name (defaults to the default flow)"),
+    current_provider: Provider = Depends(get_current_provider),
+):
+    """
+    Per-step funnel and unique callers from Redis counters (requires admin authentication).
+
+    Served without SQL, so it's safe to poll for live dashboards. Each flow
+    (service code) has its own counters.
+    """
+    if current_provider.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    flows = get_flow_registry()
+    if flow is not None and flow not in flows.flows:
+        raise HTTPException(status_code=404, detail="Flow not found")
+    compiled = flows.get(flow)
+    channel = channel.upper()
+    redis_client = await get_session_redis()
+    funnel = await read_funnel(redis_client, compiled.funnel_channel(channel), bucket, periods, compiled.steps)
+    funnel.update(channel=channel, flow=compiled.name)
+    return funnel
+
+
 @router.get("/metrics/ussd", response_model=USSDMetrics, tags=["metrics"])
 async def get_ussd_metrics(
     current_provider: Provider = Depends(get_current_provider),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_reader_db)
 ):
-    """Get USSD analytics (requires admin authentication)."""
+    """
+    Get USSD analytics (requires admin authentication; served from the read replica).
+
+    completion_rate is the share of saved USSD encounters that reached a risk
+    code; sessions abandoned before saving never reach the database, so see
+    /metrics/ussd/funnel for drop-off per step.
+    """
     if current_provider.role != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
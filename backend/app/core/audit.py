@@ -0,0 +1,276 @@
+"""Buffered, append-only audit log of provider access to patient records.
+
+Reads and updates of encounters are recorded in memory with ``record`` (no
+database round trip on the request path) and flushed in batches by a
+background task every ``AUDIT_FLUSH_INTERVAL_SECONDS``, or sooner once
+``AUDIT_BATCH_SIZE`` events are pending. A crash loses at most the events of
+the last flush interval.
+
+Each flush locks the single ``audit_chain_head`` row, so batches from all
+workers form one chain: every event's hash covers the event and the previous
+hash, and the head stores the latest hash. ``verify_chain`` recomputes the
+chain to detect edited, deleted or truncated events.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Deque, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from ..models.models import AuditChainHead, AuditEvent
+
+logger = logging.getLogger(__name__)
+
+GENESIS_HASH = "0" * 64
+
+READ = "read"
+UPDATE = "update"
+SEARCH = "search"  # encounter returned in search results
+
+
+@dataclass(frozen=True)
+class AuditRecord:
+    """One access event waiting to be flushed."""
+
+    occurred_at: datetime
+    provider_id: Optional[int]
+    action: str
+    encounter_id: int
+    fields: Tuple[str, ...] = ()
+
+
+def chain_hash(
+    prev_hash: str,
+    occurred_at: datetime,
+    provider_id: Optional[int],
+    action: str,
+    encounter_id: int,
+    fields: Iterable[str],
+) -> str:
+    """Hash of an event chained to the previous event's hash."""
+    payload = json.dumps(
+        [occurred_at.isoformat(), provider_id, action, encounter_id, list(fields)],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(f"{prev_hash}:{payload}".encode()).hexdigest()
+
+
+def _lock_chain_head(db: Session) -> AuditChainHead:
+    # A no-op UPDATE takes the row lock (PostgreSQL) / write lock (SQLite)
+    # before the head is read, so concurrent flushes queue up here.
+    locked = db.execute(
+        update(AuditChainHead).where(AuditChainHead.id == 1).values(event_count=AuditChainHead.event_count)
+    ).rowcount
+    if not locked:
+        db.add(AuditChainHead(id=1, last_hash=GENESIS_HASH, event_count=0))
+        db.flush()
+    return db.get(AuditChainHead, 1)
+
+
+def write_batch(db: Session, batch: Sequence[AuditRecord]):
+    """
+    Append a batch of events to the chain in one transaction.
+
+    Args:
+        db: Database session (committed here)
+        batch: Events in the order they happened
+    """
+    head = _lock_chain_head(db)
+    prev_hash = head.last_hash
+    for record in batch:
+        digest = chain_hash(
+            prev_hash, record.occurred_at, record.provider_id, record.action, record.encounter_id, record.fields
+        )
+        db.add(AuditEvent(
+            period=record.occurred_at.strftime("%Y-%m"),
+            occurred_at=record.occurred_at,
+            provider_id=record.provider_id,
+            action=record.action,
+            encounter_id=record.encounter_id,
+            fields=list(record.fields) or None,
+            prev_hash=prev_hash,
+            hash=digest,
+        ))
+        prev_hash = digest
+    head.last_hash = prev_hash
+    head.event_count += len(batch)
+    db.commit()
+
+
+def verify_chain(db: Session, chunk_size: int = 1000) -> Tuple[bool, int, Optional[int]]:
+    """
+    Recompute the audit chain.
+
+    Returns:
+        (valid, events checked, id of the first bad event or None). A
+        truncated tail shows up as a mismatch with the chain head.
+    """
+    prev_hash = GENESIS_HASH
+    checked = 0
+    last_id = 0
+    while True:
+        events = (
+            db.query(AuditEvent)
+            .filter(AuditEvent.id > last_id)
+            .order_by(AuditEvent.id)
+            .limit(chunk_size)
+            .all()
+        )
+        if not events:
+            break
+        for audit_event in events:
+            expected = chain_hash(
+                prev_hash,
+                audit_event.occurred_at,
+                audit_event.provider_id,
+                audit_event.action,
+                audit_event.encounter_id,
+                audit_event.fields or (),
+            )
+            if audit_event.prev_hash != prev_hash or audit_event.hash != expected:
+                return False, checked, audit_event.id
+            prev_hash = audit_event.hash
+            checked += 1
+        last_id = events[-1].id
+        db.expunge_all()
+
+    head = db.get(AuditChainHead, 1)
+    head_hash = head.last_hash if head is not None else GENESIS_HASH
+    if head_hash != prev_hash or (head is not None and head.event_count != checked):
+        return False, checked, None
+    return True, checked, None
+
+
+class AuditLog:
+    """In-memory buffer of access events with a background batch flusher."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_interval: float = 1.0,
+        batch_size: int = 500,
+        max_pending: int = 100000,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.stats = {"recorded": 0, "flushed": 0, "failed_flushes": 0, "dropped": 0}
+        self._pending: Deque[AuditRecord] = deque()
+        self._flush_lock = asyncio.Lock()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "AuditLog":
+        options = dict(
+            flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+            batch_size=settings.AUDIT_BATCH_SIZE,
+            max_pending=settings.AUDIT_MAX_PENDING,
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    def record(self, provider_id: Optional[int], action: str, encounter_id: int, fields: Iterable[str] = ()):
+        """Buffer an access event; never blocks or touches the database."""
+        if len(self._pending) >= self.max_pending:
+            # Flushes have been failing for a while; keep memory bounded
+            self.stats["dropped"] += 1
+            logger.error("Audit buffer full; dropped %s of encounter %s by provider %s", action, encounter_id, provider_id)
+            return
+        self._pending.append(AuditRecord(datetime.utcnow(), provider_id, action, encounter_id, tuple(fields)))
+        self.stats["recorded"] += 1
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the flusher after writing everything still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def flush(self) -> int:
+        """
+        Write all buffered events.
+
+        Returns:
+            Number of events written. On a database error the failed batch
+            is put back at the front of the buffer for the next attempt.
+        """
+        written = 0
+        async with self._flush_lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+                try:
+                    await asyncio.to_thread(self._write, batch)
+                except Exception:
+                    self._pending.extendleft(reversed(batch))
+                    self.stats["failed_flushes"] += 1
+                    logger.exception("Failed to flush %d audit events; will retry", len(batch))
+                    break
+                written += len(batch)
+                self.stats["flushed"] += len(batch)
+        return written
+
+    def _write(self, batch: List[AuditRecord]):
+        db = self.session_factory()
+        try:
+            try:
+                write_batch(db, batch)
+            except IntegrityError:
+                # Another worker created the chain head first
+                db.rollback()
+                write_batch(db, batch)
+        finally:
+            db.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+
+# Process-wide audit log, started in the app lifespan
+audit_log: Optional[AuditLog] = None
+
+
+def start_audit_log() -> AuditLog:
+    global audit_log
+    if audit_log is None:
+        audit_log = AuditLog.from_settings()
+        audit_log.start()
+    return audit_log
+
+
+async def stop_audit_log():
+    global audit_log
+    if audit_log is not None:
+        await audit_log.stop()
+        audit_log = None
+
+
+def get_audit_log() -> Optional[AuditLog]:
+    """Get the running audit log (None outside the app lifespan)."""
+    return audit_log
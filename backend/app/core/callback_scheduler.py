@@ -0,0 +1,532 @@
+"""Automatic assignment of queued callbacks to available providers.
+
+Providers opt in with ``PUT /providers/me/availability`` and stay available
+only while they repeat it: the opt-in is a heartbeat in a Redis sorted set
+scored by last-seen time, and the leader drops providers not seen for
+CALLBACK_AVAILABILITY_TTL_SECONDS. One worker at a time (the holder of a Redis lock) runs the assignment loop and keeps, in
+memory:
+
+- per priority, a heap of queued callbacks (oldest first);
+- per role, a heap of available providers ordered by open callbacks.
+
+Every worker relays callback lifecycle events from its in-process event bus
+to a Redis stream (the feed). The leader applies feed entries to its heaps
+as they arrive, so matching a callback to a provider is O(log n); the
+callbacks table is only read in full when a worker becomes leader and every
+CALLBACK_SCHEDULER_RECONCILE_SECONDS, which repairs any missed events.
+
+Assignments are compare-and-set (``... WHERE status = 'queued'``): a callback
+that a provider has just taken by hand, or that a previous leader already
+assigned, is skipped rather than reassigned.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import redis.asyncio as redis
+from redis.exceptions import RedisError, WatchError
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .events import (
+    CALLBACK_ASSIGNED,
+    CALLBACK_COMPLETED,
+    CALLBACK_ESCALATED,
+    CALLBACK_QUEUED,
+    PROVIDER_AVAILABILITY,
+    EventBus,
+    event_bus,
+)
+from .logging_config import log_event
+from .redis_client import get_redis
+from ..models.models import Callback, CallbackPriority, CallbackStatus, Provider, ProviderRole
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "callbacks"
+
+# Most urgent first
+PRIORITY_ORDER = (CallbackPriority.URGENT, CallbackPriority.HIGH, CallbackPriority.MEDIUM, CallbackPriority.LOW)
+
+# Roles that may take a callback of each priority, most suitable first
+# (preference only breaks ties between equally loaded providers)
+SUITABLE_ROLES = {
+    CallbackPriority.URGENT: (ProviderRole.DOCTOR, ProviderRole.NURSE),
+    CallbackPriority.HIGH: (ProviderRole.DOCTOR, ProviderRole.NURSE),
+    CallbackPriority.MEDIUM: (ProviderRole.NURSE, ProviderRole.DOCTOR, ProviderRole.CHW),
+    CallbackPriority.LOW: (ProviderRole.CHW, ProviderRole.NURSE, ProviderRole.DOCTOR),
+}
+
+# Roles that take callbacks at all; others (e.g. admins) cannot opt in
+ASSIGNABLE_ROLES = frozenset(role for roles in SUITABLE_ROLES.values() for role in roles)
+
+FEED_EVENTS = (CALLBACK_QUEUED, CALLBACK_ASSIGNED, CALLBACK_COMPLETED, CALLBACK_ESCALATED, PROVIDER_AVAILABILITY)
+# Payload fields the scheduler needs; the rest stays out of Redis
+FEED_FIELDS = ("callback_id", "provider_id", "priority", "role", "available")
+
+
+class AssignmentState:
+    """Queued callbacks and provider loads, updated incrementally from events."""
+
+    def __init__(self, capacity: int = 5):
+        self.capacity = capacity
+        # Callback heaps hold ids; ids grow with creation time, so smaller is older
+        self._queues: Dict[CallbackPriority, List[int]] = {priority: [] for priority in PRIORITY_ORDER}
+        self._queued: Dict[int, CallbackPriority] = {}
+        self._roles: Dict[int, ProviderRole] = {}  # available providers
+        self._open: Dict[int, Set[int]] = defaultdict(set)  # provider id -> open callback ids
+        self._owner: Dict[int, int] = {}  # open callback id -> provider id
+        # (open callbacks, provider id); entries whose load or role changed are
+        # stale and skipped when they reach the top
+        self._load_heaps: Dict[ProviderRole, List[Tuple[int, int]]] = defaultdict(list)
+
+    def queued(self) -> int:
+        return len(self._queued)
+
+    def load(self, provider_id: int) -> int:
+        return len(self._open.get(provider_id, ()))
+
+    def add_callback(self, callback_id: int, priority: CallbackPriority):
+        if callback_id in self._queued or callback_id in self._owner:
+            return
+        self._queued[callback_id] = priority
+        heapq.heappush(self._queues[priority], callback_id)
+
+    def reprioritize(self, callback_id: int, priority: CallbackPriority):
+        """Move a still-queued callback to another priority (e.g. after an SLA breach)."""
+        if callback_id in self._queued and self._queued[callback_id] != priority:
+            self._queued[callback_id] = priority
+            heapq.heappush(self._queues[priority], callback_id)
+
+    def open_callback(self, callback_id: int, provider_id: int):
+        """A callback was assigned, by the scheduler or by hand."""
+        self._queued.pop(callback_id, None)
+        previous = self._owner.get(callback_id)
+        if previous == provider_id:
+            return
+        if previous is not None:
+            self._release(callback_id, previous)
+        self._owner[callback_id] = provider_id
+        self._open[provider_id].add(callback_id)
+        self._push_provider(provider_id)
+
+    def close_callback(self, callback_id: int):
+        """A callback was completed or left the queue some other way."""
+        self._queued.pop(callback_id, None)
+        provider_id = self._owner.pop(callback_id, None)
+        if provider_id is not None:
+            self._release(callback_id, provider_id)
+
+    def set_available(self, provider_id: int, role: Optional[ProviderRole]):
+        """Make a provider available with the given role, or unavailable with None."""
+        if role is None:
+            self._roles.pop(provider_id, None)
+            return
+        self._roles[provider_id] = role
+        self._push_provider(provider_id)
+
+    def _release(self, callback_id: int, provider_id: int):
+        open_ids = self._open[provider_id]
+        open_ids.discard(callback_id)
+        if not open_ids:
+            del self._open[provider_id]
+        self._push_provider(provider_id)
+
+    def _push_provider(self, provider_id: int):
+        role = self._roles.get(provider_id)
+        if role is None:
+            return
+        heap = self._load_heaps[role]
+        heapq.heappush(heap, (self.load(provider_id), provider_id))
+        if len(heap) > 4 * len(self._roles) + 64:
+            # Too many stale entries: rebuild from the live loads
+            heap[:] = [(self.load(pid), pid) for pid, pid_role in self._roles.items() if pid_role == role]
+            heapq.heapify(heap)
+
+    def _least_loaded(self, role: ProviderRole) -> Optional[Tuple[int, int]]:
+        heap = self._load_heaps.get(role)
+        while heap:
+            load, provider_id = heap[0]
+            if self._roles.get(provider_id) == role and self.load(provider_id) == load:
+                return load, provider_id
+            heapq.heappop(heap)
+        return None
+
+    def pick_provider(self, priority: CallbackPriority) -> Optional[int]:
+        """Least-loaded available provider suited to the priority, or None if all are at capacity."""
+        best = None
+        for preference, role in enumerate(SUITABLE_ROLES[priority]):
+            top = self._least_loaded(role)
+            if top is not None and top[0] < self.capacity:
+                candidate = (top[0], preference, top[1])
+                if best is None or candidate < best:
+                    best = candidate
+        return None if best is None else best[2]
+
+    def next_assignments(self, limit: int) -> List[Tuple[int, int]]:
+        """
+        Match the most urgent queued callbacks to the least-loaded suitable providers.
+
+        Matched callbacks count towards their provider's load straight away;
+        call ``close_callback`` for any the database refuses.
+
+        Returns:
+            (callback id, provider id) pairs, most urgent first
+        """
+        assignments: List[Tuple[int, int]] = []
+        for priority in PRIORITY_ORDER:
+            queue = self._queues[priority]
+            while queue and len(assignments) < limit:
+                callback_id = queue[0]
+                if self._queued.get(callback_id) != priority:
+                    heapq.heappop(queue)  # assigned or closed since it was queued
+                    continue
+                provider_id = self.pick_provider(priority)
+                if provider_id is None:
+                    break  # nobody suitable has room; try lower priorities
+                heapq.heappop(queue)
+                self.open_callback(callback_id, provider_id)
+                assignments.append((callback_id, provider_id))
+        return assignments
+
+
+class CallbackScheduler:
+    """Leader-elected loop assigning queued callbacks from an in-memory AssignmentState."""
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        bus: EventBus = event_bus,
+        interval: float = 1.0,
+        lock_ttl: float = 10.0,
+        reconcile_interval: float = 300.0,
+        availability_ttl: float = 120.0,
+        capacity: int = 5,
+        batch_size: int = 100,
+        feed_maxlen: int = 100000,
+        key_prefix: str = KEY_PREFIX,
+    ):
+        self.redis = redis_client
+        self.session_factory = session_factory
+        self.bus = bus
+        self.interval = interval
+        self.lock_ttl = lock_ttl
+        self.reconcile_interval = reconcile_interval
+        self.availability_ttl = availability_ttl
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.feed_maxlen = feed_maxlen
+        self.leader_key = f"{key_prefix}:scheduler:leader"
+        self.feed_key = f"{key_prefix}:feed"
+        # Provider id -> last heartbeat (unix time)
+        self.available_key = f"{key_prefix}:availability"
+        self.token = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.state: Optional[AssignmentState] = None  # only kept while leader
+        self.stats = {"assigned": 0, "conflicts": 0, "reconciles": 0, "relayed": 0, "relay_failures": 0,
+                      "availability_expired": 0}
+        self._cursor = "0-0"
+        self._next_reconcile = 0.0
+        self._events: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "CallbackScheduler":
+        options = dict(
+            interval=settings.CALLBACK_SCHEDULER_INTERVAL_SECONDS,
+            lock_ttl=settings.CALLBACK_SCHEDULER_LOCK_TTL_SECONDS,
+            reconcile_interval=settings.CALLBACK_SCHEDULER_RECONCILE_SECONDS,
+            availability_ttl=settings.CALLBACK_AVAILABILITY_TTL_SECONDS,
+            capacity=settings.CALLBACK_MAX_OPEN_PER_PROVIDER,
+            batch_size=settings.CALLBACK_SCHEDULER_BATCH_SIZE,
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    async def start(self):
+        if self.redis is None:
+            self.redis = await get_redis()
+        self._events = self.bus.subscribe(FEED_EVENTS)
+        self._tasks = [asyncio.create_task(self._relay()), asyncio.create_task(self._run())]
+
+    async def stop(self):
+        """Stop relaying and assigning, and hand leadership over straight away."""
+        if self._events is not None:
+            self.bus.unsubscribe(self._events)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.is_leader:
+            try:
+                await self._release_leadership()
+            except (RedisError, OSError):
+                pass  # the lock expires on its own
+        self.is_leader = False
+        self.state = None
+
+    async def set_availability(self, provider_id: int, role: ProviderRole, available: bool):
+        """
+        Opt a provider in to (or renew their heartbeat) or out of automatic assignment.
+
+        Raises:
+            ValueError: If the role takes no callbacks and the provider opts in
+        """
+        if not available:
+            await self.redis.zrem(self.available_key, provider_id)
+            self.bus.publish(PROVIDER_AVAILABILITY, provider_id=provider_id, role=role.value, available=False)
+            return
+        if role not in ASSIGNABLE_ROLES:
+            raise ValueError(f"Providers with role {role.value!r} do not take callbacks")
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zscore(self.available_key, provider_id)
+            pipe.zadd(self.available_key, {provider_id: now})
+            last_seen, _ = await pipe.execute()
+        if last_seen is not None and last_seen > now - self.availability_ttl:
+            return  # a renewal; the leader already counts them as available
+        self.bus.publish(PROVIDER_AVAILABILITY, provider_id=provider_id, role=role.value, available=True)
+
+    async def expire_availability(self) -> int:
+        """Drop providers whose heartbeat lapsed; returns how many were dropped."""
+        cutoff = time.time() - self.availability_ttl
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrangebyscore(self.available_key, "-inf", cutoff)
+            pipe.zremrangebyscore(self.available_key, "-inf", cutoff)
+            expired, _ = await pipe.execute()
+        for provider_id in expired:
+            self.state.set_available(int(provider_id), None)
+            log_event(logger, "provider_availability_expired", "Provider %s stopped sending availability heartbeats",
+                      provider_id, provider_id=int(provider_id))
+        self.stats["availability_expired"] += len(expired)
+        return len(expired)
+
+    async def step(self, block_ms: Optional[int] = None) -> Optional[int]:
+        """
+        One round: renew leadership, apply new feed entries, assign what can be assigned.
+
+        Args:
+            block_ms: Wait up to this long for feed entries (None doesn't wait)
+
+        Returns:
+            Number of callbacks assigned, or None if another worker is leader
+        """
+        if not await self._hold_leadership():
+            if self.is_leader:
+                logger.info("Lost callback scheduler leadership")
+            self.is_leader = False
+            self.state = None
+            return None
+        if self.state is None or time.monotonic() >= self._next_reconcile:
+            await self.reconcile()
+        if not self.is_leader:
+            logger.info("Became callback scheduler leader (%s)", self.token)
+            self.is_leader = True
+        await self.consume_feed(block_ms)
+        await self.expire_availability()
+        return await self.assign_ready()
+
+    async def reconcile(self):
+        """Rebuild the in-memory state from the database and the live availability heartbeats."""
+        # Feed entries after this point are replayed on top of the snapshot;
+        # applying events is idempotent, so overlap is harmless
+        last = await self.redis.xrevrange(self.feed_key, count=1)
+        cursor = last[0][0] if last else "0-0"
+        live = await self.redis.zrangebyscore(self.available_key, time.time() - self.availability_ttl, "+inf")
+        available = {int(provider_id) for provider_id in live}
+        self.state = await asyncio.to_thread(self._load_state, available)
+        self._cursor = cursor
+        self._next_reconcile = time.monotonic() + self.reconcile_interval
+        self.stats["reconciles"] += 1
+
+    def _load_state(self, available: Set[int]) -> AssignmentState:
+        state = AssignmentState(self.capacity)
+        db = self.session_factory()
+        try:
+            if available:
+                for provider_id, role in db.query(Provider.id, Provider.role).filter(Provider.id.in_(available)):
+                    state.set_available(provider_id, role)
+            open_callbacks = db.query(Callback.id, Callback.provider_id).filter(
+                Callback.status == CallbackStatus.IN_PROGRESS, Callback.provider_id.isnot(None)
+            )
+            for callback_id, provider_id in open_callbacks:
+                state.open_callback(callback_id, provider_id)
+            queued = db.query(Callback.id, Callback.priority).filter(Callback.status == CallbackStatus.QUEUED)
+            for callback_id, priority in queued:
+                state.add_callback(callback_id, priority or CallbackPriority.MEDIUM)
+        finally:
+            db.close()
+        return state
+
+    def apply(self, event_type: str, payload: Dict[str, Any]):
+        """Apply one lifecycle event to the in-memory state."""
+        callback_id = payload.get("callback_id")
+        if event_type == CALLBACK_QUEUED:
+            self.state.add_callback(callback_id, CallbackPriority(payload["priority"]))
+        elif event_type == CALLBACK_ASSIGNED:
+            self.state.open_callback(callback_id, payload["provider_id"])
+        elif event_type == CALLBACK_COMPLETED:
+            self.state.close_callback(callback_id)
+        elif event_type == CALLBACK_ESCALATED:
+            self.state.reprioritize(callback_id, CallbackPriority(payload["priority"]))
+        elif event_type == PROVIDER_AVAILABILITY:
+            role = ProviderRole(payload["role"]) if payload["available"] else None
+            self.state.set_available(payload["provider_id"], role)
+
+    async def consume_feed(self, block_ms: Optional[int] = None) -> int:
+        """Apply feed entries added since the last read; returns how many were read."""
+        response = await self.redis.xread({self.feed_key: self._cursor}, count=self.batch_size, block=block_ms)
+        read = 0
+        for _stream, messages in response or ():
+            for message_id, fields in messages:
+                self._cursor = message_id
+                read += 1
+                try:
+                    self.apply(fields["type"], json.loads(fields["payload"]))
+                except (KeyError, TypeError, ValueError):
+                    logger.warning("Skipping malformed callback feed entry %s", message_id)
+        return read
+
+    async def assign_ready(self) -> int:
+        """Assign queued callbacks to providers with room; returns how many were assigned."""
+        pairs = self.state.next_assignments(self.batch_size)
+        if not pairs:
+            return 0
+        try:
+            claimed = await asyncio.to_thread(self._claim, pairs)
+        except Exception:
+            logger.exception("Failed to save %d callback assignments", len(pairs))
+            self._next_reconcile = 0.0  # the tentative loads are wrong; rebuild next round
+            return 0
+
+        for callback_id, provider_id in pairs:
+            row = claimed.get(callback_id)
+            if row is None:
+                # Taken by hand (or by a previous leader) in the meantime
+                self.state.close_callback(callback_id)
+                self.stats["conflicts"] += 1
+                continue
+            encounter_id, msisdn_hash = row
+            self.stats["assigned"] += 1
+            self.bus.publish(CALLBACK_ASSIGNED, callback_id=callback_id, encounter_id=encounter_id,
+                             msisdn_hash=msisdn_hash, provider_id=provider_id)
+            log_event(logger, "callback_auto_assigned", "Callback %s assigned to provider %s",
+                      callback_id, provider_id, callback_id=callback_id, provider_id=provider_id)
+        return len(claimed)
+
+    def _claim(self, pairs: List[Tuple[int, int]]) -> Dict[int, Tuple[int, str]]:
+        db = self.session_factory()
+        try:
+            now = datetime.utcnow()
+            claimed = {}
+            for callback_id, provider_id in pairs:
+                row = db.execute(
+                    update(Callback)
+                    .where(Callback.id == callback_id, Callback.status == CallbackStatus.QUEUED)
+                    .values(provider_id=provider_id, status=CallbackStatus.IN_PROGRESS, assigned_at=now, updated_at=now)
+                    .returning(Callback.encounter_id, Callback.msisdn_hash)
+                ).first()
+                if row is not None:
+                    claimed[callback_id] = (row.encounter_id, row.msisdn_hash)
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    async def _hold_leadership(self) -> bool:
+        ttl_ms = int(self.lock_ttl * 1000)
+        if await self.redis.set(self.leader_key, self.token, nx=True, px=ttl_ms):
+            return True
+        # Extend the lock only if we still hold it
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.leader_key)
+                if await pipe.get(self.leader_key) != self.token:
+                    return False
+                pipe.multi()
+                pipe.pexpire(self.leader_key, ttl_ms)
+                await pipe.execute()
+                return True
+            except WatchError:
+                return False
+
+    async def _release_leadership(self):
+        async with self.redis.pipeline(transaction=True) as pipe:
+            try:
+                await pipe.watch(self.leader_key)
+                if await pipe.get(self.leader_key) == self.token:
+                    pipe.multi()
+                    pipe.delete(self.leader_key)
+                    await pipe.execute()
+            except WatchError:
+                pass
+
+    async def _relay(self):
+        # Forward local lifecycle events to the shared feed, batched per round trip
+        while True:
+            events = [await self._events.get()]
+            while len(events) < self.batch_size and not self._events.empty():
+                events.append(self._events.get_nowait())
+            try:
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    for event in events:
+                        payload = {key: event.payload[key] for key in FEED_FIELDS if key in event.payload}
+                        pipe.xadd(self.feed_key, {"type": event.type, "payload": json.dumps(payload)},
+                                  maxlen=self.feed_maxlen, approximate=True)
+                    await pipe.execute()
+                self.stats["relayed"] += len(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats["relay_failures"] += len(events)
+                logger.exception("Failed to relay %d callback events; the next reconcile picks them up", len(events))
+
+    async def _run(self):
+        block_ms = max(1, int(self.interval * 1000))
+        while True:
+            try:
+                if await self.step(block_ms) is None:
+                    await asyncio.sleep(self.interval)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Callback scheduler round failed")
+                self.state = None  # rebuild from the database next round
+                await asyncio.sleep(self.interval)
+
+
+# Process-wide scheduler, started in the app lifespan when enabled
+callback_scheduler: Optional[CallbackScheduler] = None
+
+
+async def start_callback_scheduler() -> Optional[CallbackScheduler]:
+    """Start the process-wide scheduler if CALLBACK_SCHEDULER_ENABLED."""
+    global callback_scheduler
+    if callback_scheduler is None and settings.CALLBACK_SCHEDULER_ENABLED:
+        callback_scheduler = CallbackScheduler.from_settings()
+        await callback_scheduler.start()
+    return callback_scheduler
+
+
+async def stop_callback_scheduler():
+    global callback_scheduler
+    if callback_scheduler is not None:
+        await callback_scheduler.stop()
+        callback_scheduler = None
+
+
+def get_callback_scheduler() -> Optional[CallbackScheduler]:
+    """Get the running scheduler (None when disabled or outside the app lifespan)."""
+    return callback_scheduler
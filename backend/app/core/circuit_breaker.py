@@ -0,0 +1,144 @@
+"""Circuit breaker for calls to a shared backend (Redis).
+
+After ``failure_threshold`` consecutive failures or timeouts the circuit
+opens and calls fail fast with ``CircuitOpenError`` instead of waiting on a
+dead or overloaded server. After ``reset_timeout`` seconds a single probe
+call is let through (half-open); its success closes the circuit and its
+failure keeps it open for another ``reset_timeout``.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, TypeVar
+
+from redis.exceptions import RedisError
+
+from .config import settings
+from .logging_config import log_event
+from .metrics import set_circuit_state
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """The circuit is open; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a per-call timeout."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 5.0,
+        call_timeout: Optional[float] = None,
+        failures: tuple = (Exception,),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if failure_threshold < 1:
+            raise ValueError("failure_threshold must be at least 1")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.call_timeout = call_timeout
+        self.failures = tuple(failures) + (asyncio.TimeoutError,)
+        self.clock = clock
+        self._on_close: List[Callable[[], None]] = []
+        self.reset()
+
+    def reset(self):
+        """Close the circuit and forget past failures."""
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        set_circuit_state(self.name, self.state)
+
+    def on_close(self, callback: Callable[[], None]):
+        """Run ``callback`` whenever the circuit closes after being open."""
+        self._on_close.append(callback)
+
+    def allow(self) -> bool:
+        """Whether a call may go through now (claims the probe when half-open)."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and self.clock() - self.opened_at >= self.reset_timeout:
+            self._set_state(HALF_OPEN)
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self._set_state(CLOSED)
+            log_event(logger, "circuit_closed", "Circuit %s closed", self.name, circuit=self.name)
+            for callback in self._on_close:
+                callback()
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+        self._probing = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                log_event(logger, "circuit_opened", "Circuit %s opened after %d failures",
+                          self.name, self.consecutive_failures, level=logging.WARNING, circuit=self.name)
+            self.opened_at = self.clock()
+            self._set_state(OPEN)
+
+    async def call(self, operation: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run ``operation`` through the breaker.
+
+        Raises:
+            CircuitOpenError: the circuit is open and the call was skipped
+            asyncio.TimeoutError: the call took longer than ``call_timeout``
+            Any of ``failures`` raised by the operation (counted as a failure)
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name)
+        try:
+            if self.call_timeout is None:
+                result = await operation()
+            else:
+                result = await asyncio.wait_for(operation(), self.call_timeout)
+        except self.failures:
+            self.record_failure()
+            raise
+        except BaseException:
+            # Not the backend's fault (e.g. a cancelled request); release the probe
+            self._probing = False
+            raise
+        self.record_success()
+        return result
+
+    def _set_state(self, state: str):
+        self.state = state
+        set_circuit_state(self.name, state)
+
+
+_session_breaker: Optional[CircuitBreaker] = None
+
+
+def get_session_breaker() -> CircuitBreaker:
+    """Breaker around the conversation keys (sessions, rate limits, funnel, contacts)."""
+    global _session_breaker
+    if _session_breaker is None:
+        _session_breaker = CircuitBreaker(
+            "redis_sessions",
+            failure_threshold=settings.SESSION_BREAKER_FAILURES,
+            reset_timeout=settings.SESSION_BREAKER_RESET_SECONDS,
+            call_timeout=settings.SESSION_REDIS_TIMEOUT_SECONDS,
+            failures=(RedisError, OSError),
+        )
+    return _session_breaker
@@ -4,18 +4,162 @@ from typing import Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str = "sqlite:///./ntal.db"
+    
+    # Optional read replica for dashboard reads and metrics
+    DATABASE_READ_URL: Optional[str] = None
+    DB_READ_YOUR_WRITES_SECONDS: float = 5.0  # reads stick to the primary after a provider's write
+    
+    # Database connection pool (per worker process)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10.0
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # seconds; -1 disables
+    DB_STATEMENT_CACHE_SIZE: int = 500  # compiled SQL statements cached per engine
     SECRET_KEY: str = "dev-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     
+    # Create tables at startup (dev/tests). Production runs `python -m app.migrate` instead.
+    AUTO_CREATE_SCHEMA: bool = True
+    
+    # Startup warmup before a worker accepts traffic
+    WARMUP_DB_CONNECTIONS: int = 2
+    WARMUP_REDIS_CONNECTIONS: int = 2
+    WARMUP_TIMEOUT_SECONDS: float = 5.0
+    
     # Redis for USSD session state and rate limiting
     REDIS_URL: str = "redis://localhost:6379"
     
+    # Redis connection pool (per worker process)
+    REDIS_MAX_CONNECTIONS: int = 50
+    REDIS_POOL_TIMEOUT: float = 5.0  # seconds to wait for a free connection
+    REDIS_SOCKET_TIMEOUT: float = 5.0
+    REDIS_SOCKET_CONNECT_TIMEOUT: float = 2.0
+    REDIS_HEALTH_CHECK_INTERVAL: int = 30
+    
+    # High availability: Sentinel for the main client, Redis Cluster for conversation keys
+    REDIS_SENTINELS: str = ""  # "host:26379,host:26379"; credentials and db still come from REDIS_URL
+    REDIS_SENTINEL_SERVICE: str = "mymaster"
+    REDIS_SENTINEL_PASSWORD: str = ""
+    REDIS_CLUSTER_NODES: str = ""  # "host:7000,host:7001"; sessions, rate limits, funnel and contacts
+    FUNNEL_SHARDS: int = 8  # hash tags the funnel counters are split over; changing it resets the funnel
+    
+    # Circuit breaker around the conversation keys; while open, sessions are kept in-process
+    SESSION_REDIS_TIMEOUT_SECONDS: float = 0.25  # per session/rate-limit call
+    SESSION_BREAKER_FAILURES: int = 5  # consecutive failures or timeouts that open the circuit
+    SESSION_BREAKER_RESET_SECONDS: float = 5.0  # open time before a probe call
+    SESSION_FALLBACK_MAX_ENTRIES: int = 10000  # in-process sessions per worker, least recently used evicted
+    RATE_LIMIT_FAIL_OPEN: bool = True  # without Redis, allow new conversations (False refuses them)
+    
     # USSD configuration
     HASH_PEPPER: str = "dev-hash-pepper-change-in-production"
     CONSENT_VERSION: str = "v0.1-EN-USSD"
+    SMS_CONSENT_VERSION: str = "v0.1-EN-SMS"  # sending the NTAL keyword is taken as consent
     RATE_LIMIT_MAX: int = 10
     
+    # USSD flows (one JSON file per campaign/service code); empty uses the bundled app/core/flows
+    USSD_FLOWS_DIR: str = ""
+    USSD_DEFAULT_FLOW: str = "general"  # serves unknown service codes and the non-USSD channels
+    
+    # Triage ruleset (JSON); empty uses the bundled app/core/rulesets/triage-v1.json
+    TRIAGE_RULESET_PATH: str = ""
+    TRIAGE_RULESET_RELOAD_SECONDS: float = 5.0
+    
+    # Re-triage of historic encounters (0 workers = one per CPU)
+    RETRIAGE_CHUNK_SIZE: int = 5000
+    RETRIAGE_WORKERS: int = 0
+    
+    # Outbound SMS gateway (batch JSON API); unset keeps SMSAdapter in stub mode
+    SMS_GATEWAY_URL: Optional[str] = None
+    SMS_GATEWAY_API_KEY: str = ""
+    SMS_GATEWAY_TPS: float = 50.0  # messages per second allowed by the gateway
+    SMS_GATEWAY_TIMEOUT: float = 10.0
+    SMS_BATCH_SIZE: int = 100
+    SMS_BATCH_LINGER_MS: int = 50  # wait this long for a batch to fill
+    SMS_SENDER_CONCURRENCY: int = 4
+    SMS_QUEUE_SIZE: int = 100000
+    SMS_MAX_RETRIES: int = 5
+    SMS_RETRY_BASE_SECONDS: float = 0.5
+    SMS_RETRY_MAX_SECONDS: float = 30.0
+    SMS_DEAD_LETTER_SIZE: int = 10000
+    
+    # WhatsApp Business webhook ingestion
+    WHATSAPP_VERIFY_TOKEN: str = ""  # echoed back during Meta's webhook verification
+    WHATSAPP_APP_SECRET: str = ""  # validates X-Hub-Signature-256; webhooks are refused while empty
+    WHATSAPP_ALLOW_UNSIGNED: bool = False  # development only: accept unsigned webhooks when no secret is set
+    WHATSAPP_WORKERS: int = 8  # senders are sharded across workers to keep per-sender order
+    WHATSAPP_QUEUE_SIZE: int = 10000  # per worker
+    WHATSAPP_DEDUP_TTL_SECONDS: int = 86400  # message ids remembered in Redis for redeliveries
+    
+    # Patient notifications on callback events
+    CONTACT_TTL_SECONDS: int = 86400  # upper bound on keeping a number for an open callback (the low-priority SLA)
+    NOTIFY_CONCURRENCY: int = 4
+    NOTIFY_BATCH_SIZE: int = 100
+    NOTIFY_BATCH_LINGER_MS: int = 50
+    NOTIFY_QUEUE_SIZE: int = 10000
+    
+    # Automatic callback assignment (one leader worker, elected through Redis)
+    CALLBACK_SCHEDULER_ENABLED: bool = False
+    CALLBACK_SCHEDULER_INTERVAL_SECONDS: float = 1.0
+    CALLBACK_SCHEDULER_LOCK_TTL_SECONDS: float = 10.0  # another worker takes over this long after the leader dies
+    CALLBACK_SCHEDULER_RECONCILE_SECONDS: float = 300.0  # full reload from the database, repairs missed events
+    CALLBACK_SCHEDULER_BATCH_SIZE: int = 100  # assignments per round
+    CALLBACK_MAX_OPEN_PER_PROVIDER: int = 5  # in-progress callbacks before a provider gets no more
+    CALLBACK_AVAILABILITY_TTL_SECONDS: float = 120.0  # opt-ins lapse unless renewed this often
+    
+    # Callback SLA escalation (deadlines in a Redis sorted set)
+    CALLBACK_SLA_ENABLED: bool = False
+    CALLBACK_SLA_SECONDS: str = "urgent=900,high=3600,medium=14400,low=86400"  # allowed time in QUEUED
+    CALLBACK_SLA_CHECK_INTERVAL_SECONDS: float = 5.0
+    CALLBACK_SLA_BATCH_SIZE: int = 100  # breaches handled per round trip
+    CALLBACK_SLA_RECONCILE_SECONDS: float = 300.0  # re-adds deadlines lost with dropped events
+    SUPERVISOR_ALERT_NUMBERS: str = ""  # comma-separated; texted when an urgent callback breaches its SLA
+    
+    # Background jobs (Redis Streams) and `python -m app.worker`
+    JOBS_STREAM_PREFIX: str = "jobs"
+    JOBS_GROUP: str = "workers"
+    JOBS_MAX_ATTEMPTS: int = 5  # then the job goes to the queue's dead-letter stream
+    JOBS_RETRY_BASE_SECONDS: float = 1.0
+    JOBS_RETRY_MAX_SECONDS: float = 300.0
+    JOBS_VISIBILITY_TIMEOUT_SECONDS: float = 60.0  # unacknowledged jobs are reclaimed after this
+    JOBS_STREAM_MAXLEN: int = 100000
+    WORKER_QUEUES: str = "default"
+    WORKER_CONCURRENCY: int = 4
+    
+    # Prometheus metrics (GET /metrics); multiprocess mode is set up by gunicorn_conf.py
+    METRICS_SAMPLE_INTERVAL_SECONDS: float = 5.0  # queue depth / pool gauges refresh; 0 disables
+    
+    # Per-request timing spans (Server-Timing header)
+    TIMING_ENABLED: bool = False
+    TIMING_LOG_SAMPLE_RATE: float = 0.0  # fraction of timed requests also logged with their spans
+    
+    # Logging (JSON lines written by a background thread)
+    LOG_LEVEL: str = "INFO"
+    LOG_JSON: bool = True
+    LOG_QUEUE_SIZE: int = 10000  # info records are dropped when full; warnings/errors never are
+    LOG_SAMPLE_RATES: str = "ussd_hop=0.1"  # event=fraction logged; unlisted events are always logged
+    
+    # Audit log of provider access to encounters (buffered, flushed in batches)
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 1.0  # bounds how many events a crash can lose
+    AUDIT_BATCH_SIZE: int = 500  # flush early once this many events are pending
+    AUDIT_MAX_PENDING: int = 100000  # events beyond this are dropped while the DB is unavailable
+    
+    # Archival of closed encounters / completed callbacks (python -m app.jobs.archive)
+    ARCHIVE_AFTER_DAYS: float = 365.0
+    ARCHIVE_CHUNK_SIZE: int = 500  # rows moved per transaction
+    ARCHIVE_CHUNK_PAUSE_SECONDS: float = 0.05
+    ARCHIVE_INTERVAL_SECONDS: float = 86400.0  # app.worker enqueues archive.run this often; 0 disables
+    
+    # Encounter full-text search
+    SEARCH_MAX_CANDIDATES: int = 2000  # only the newest N matches are ranked
+    
+    # IVR (TwiML) channel
+    IVR_GATHER_URL: str = "/api/v1/ivr/gather"  # where Twilio posts DTMF digits
+    IVR_GATHER_TIMEOUT: int = 8  # seconds to wait for a key press
+    IVR_AUDIO_DIR: str = ""  # pre-recorded prompts named <prompt_hash>.mp3; empty uses TTS
+    IVR_AUDIO_BASE_URL: str = "/static/ivr"  # public URL of IVR_AUDIO_DIR
+    
     class Config:
         env_file = ".env"
 
@@ -0,0 +1,77 @@
+"""Short-lived contact details for notifying patients.
+
+Encounters and callbacks only store a hashed MSISDN. So that a patient can
+be told about their callback, the phone number, channel and language are
+kept in Redis under the hash once a callback is queued, and deleted when it
+completes. CONTACT_TTL_SECONDS bounds how long an abandoned contact lives.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, Optional
+
+from redis.asyncio.cluster import RedisCluster
+from redis.exceptions import RedisError
+
+from .circuit_breaker import CircuitOpenError, get_session_breaker
+from .config import settings
+from .redis_client import get_session_redis
+from .ussd_utils import hash_msisdn
+
+logger = logging.getLogger(__name__)
+
+
+def _key(msisdn_hash: str) -> str:
+    # Same hash tag as the caller's session and rate-limit keys
+    return f"contact:{{{msisdn_hash}}}"
+
+
+async def remember_contact(msisdn: str, channel: str, language: str = "en"):
+    """Store how to reach a patient; failures are logged, never raised (skipped while the circuit is open)."""
+    contact = {"msisdn": msisdn, "channel": channel, "language": language}
+    try:
+        redis_client = await get_session_redis()
+        await get_session_breaker().call(lambda: redis_client.set(
+            _key(hash_msisdn(msisdn)), json.dumps(contact), ex=settings.CONTACT_TTL_SECONDS
+        ))
+    except (CircuitOpenError, RedisError, OSError, asyncio.TimeoutError) as exc:
+        logger.warning("Could not store contact: %s", exc)
+
+
+async def forget_contacts(msisdn_hashes: Iterable[str]):
+    """Delete stored contacts; failures are logged, never raised (the TTL removes them anyway)."""
+    keys = [_key(h) for h in dict.fromkeys(msisdn_hashes)]
+    if not keys:
+        return
+    try:
+        redis_client = await get_session_redis()
+        # RedisCluster splits a multi-key DEL per slot
+        await get_session_breaker().call(lambda: redis_client.delete(*keys))
+    except (CircuitOpenError, RedisError, OSError, asyncio.TimeoutError) as exc:
+        logger.warning("Could not delete %d contacts: %s", len(keys), exc)
+
+
+async def get_contacts(msisdn_hashes: Iterable[str]) -> Dict[str, Optional[dict]]:
+    """
+    Look up contacts for several hashes in one round trip.
+
+    Returns:
+        Dict of msisdn_hash -> contact (None if expired or unknown); empty
+        when Redis is unavailable or the circuit is open
+    """
+    hashes = list(dict.fromkeys(msisdn_hashes))
+    if not hashes:
+        return {}
+    keys = [_key(h) for h in hashes]
+    try:
+        redis_client = await get_session_redis()
+        if isinstance(redis_client, RedisCluster):
+            # The keys are spread over slots; one MGET per node
+            values = await get_session_breaker().call(lambda: redis_client.mget_nonatomic(keys))
+        else:
+            values = await get_session_breaker().call(lambda: redis_client.mget(keys))
+    except (CircuitOpenError, RedisError, OSError, asyncio.TimeoutError) as exc:
+        logger.warning("Could not look up %d contacts: %s", len(keys), exc)
+        return {}
+    return {h: json.loads(v) if v else None for h, v in zip(hashes, values)}
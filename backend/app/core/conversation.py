@@ -0,0 +1,239 @@
+"""Channel-agnostic conversation engine.
+
+Every channel (USSD, IVR, WhatsApp, SMS) goes through this engine, which owns
+rate limiting, session state, flow routing (``ussd_flows``), flow
+transitions (``USSDStateMachine``), triage and persistence. Adapters only
+translate inbound events into ``InboundMessage`` and render the returned
+``Reply`` for their channel.
+"""
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, NamedTuple, Optional, Type
+
+from sqlalchemy.orm import Session
+
+from .contacts import remember_contact
+from .funnel import FunnelUpdate, funnel_shard
+from .logging_config import log_event
+from .metrics import (
+    count_conversation_end,
+    count_rate_limit_rejection,
+    observe_hop,
+    observe_state_machine_cpu,
+)
+from .timing import span
+from .triage_engine import assess_risk
+from .triage_persistence import save_triage_encounter
+from .triage_rules import get_active_ruleset
+from .ussd_flows import CompiledFlow, FlowRegistry, get_flow_registry
+from .ussd_session import USSDSession
+from .ussd_state_machine import USSDStateMachine
+from .ussd_utils import hash_msisdn, mask_msisdn
+from ..models.models import Encounter
+
+logger = logging.getLogger(__name__)
+
+# Funnel outcome of a conversation ending at a step; other steps end on errors
+END_OUTCOMES = {"consent": "declined", "result": "completed"}
+
+
+@dataclass
+class InboundMessage:
+    """One inbound event from a channel."""
+
+    channel: str  # "USSD", "IVR", "WHATSAPP", ...
+    conversation_id: str  # channel session id (USSD sessionId, CallSid, sender)
+    msisdn: str
+    text: str = ""
+    restart: bool = False  # start the flow over (new USSD dial, new call)
+    service_code: str = ""  # USSD short code dialled; picks the flow of a new conversation
+
+
+class Reply(NamedTuple):
+    """Engine output for the channel to render."""
+
+    response_type: str  # "CON" continues the conversation, "END" closes it
+    message: str
+    language: str
+
+    @property
+    def ended(self) -> bool:
+        return self.response_type == "END"
+
+
+class TriageResult(NamedTuple):
+    """Outcome of a one-shot triage."""
+
+    risk_code: str
+    advice: str
+    urgent: bool
+    encounter: Encounter
+    callback_requested: bool
+
+
+class ConversationEngine:
+    """Runs the triage conversation for every channel."""
+
+    def __init__(self, session_class: Type[USSDSession] = USSDSession, flows: Optional[FlowRegistry] = None):
+        self.session_class = session_class
+        self._flows = flows
+
+    @property
+    def flows(self) -> FlowRegistry:
+        return self._flows or get_flow_registry()
+
+    @staticmethod
+    def session_id(channel: str, conversation_id: str) -> str:
+        """Session key for a conversation; USSD keeps the aggregator's session id."""
+        if channel == "USSD":
+            return conversation_id
+        return f"{channel.lower()}:{conversation_id}"
+
+    @staticmethod
+    def new_state(channel: str, msisdn: str, flow: CompiledFlow) -> Dict[str, Any]:
+        return {
+            "step": "consent",
+            "language": flow.languages[0],
+            "responses": {},
+            "msisdn": msisdn,
+            "channel": channel,
+            "flow": flow.name,
+        }
+
+    async def allow(self, msisdn: str, channel: str = "USSD", flow: Optional[CompiledFlow] = None) -> bool:
+        """Count one conversation (or one-shot message) against the sender's daily limit for the flow."""
+        flow = flow or self.flows.default
+        if await self.session_class.check_rate_limit(hash_msisdn(msisdn), flow.rate_limit, flow.scope):
+            return True
+        count_rate_limit_rejection(channel, flow.name)
+        log_event(logger, "rate_limited", "Rate limit exceeded for msisdn=%s", mask_msisdn(msisdn),
+                  level=logging.WARNING, channel=channel, flow=flow.name)
+        return False
+
+    async def handle(self, event: InboundMessage, db: Session) -> Reply:
+        """
+        Advance a conversation by one inbound message.
+
+        A restart, or a message without a live session, starts the flow for
+        the event's service code at the consent prompt and counts against the
+        sender's daily limit for that flow. Otherwise the message is the
+        answer to the current step of the session's flow.
+
+        Args:
+            event: Inbound message translated by the channel adapter
+            db: Database session (used when the flow saves the encounter)
+
+        Returns:
+            Reply to render back on the channel
+        """
+        start = time.perf_counter()
+        caller = hash_msisdn(event.msisdn)
+        shard = funnel_shard(caller)
+        session = self.session_class(self.session_id(event.channel, event.conversation_id), caller)
+        state = None if event.restart else await session.load()
+        if state is None:
+            flow = self.flows.resolve(event.service_code)
+            funnel_channel = flow.funnel_channel(event.channel)
+            language = flow.languages[0]
+            if not await self.allow(event.msisdn, event.channel, flow):
+                count_conversation_end(event.channel, flow.name, "rate_limited")
+                await self.session_class.record_funnel(
+                    FunnelUpdate(funnel_channel, outcome="rate_limited", caller=caller, shard=shard)
+                )
+                observe_hop(event.channel, flow.name, "start", time.perf_counter() - start)
+                return Reply("END", flow.message(language, "rate_limit"), language)
+            state = self.new_state(event.channel, event.msisdn, flow)
+            await session.set_state(state, FunnelUpdate(
+                funnel_channel, entered=state["step"], caller=caller, shard=shard
+            ))
+            observe_hop(event.channel, flow.name, "start", time.perf_counter() - start)
+            return Reply("CON", flow.message(language, "consent"), language)
+
+        state["msisdn"] = event.msisdn
+        state.setdefault("channel", event.channel)
+        # Sessions stay on the flow they started with; older sessions have none and use the default
+        flow = self.flows.get(state.get("flow"))
+        funnel_channel = flow.funnel_channel(event.channel)
+        step = state.get("step", "consent")
+        state_machine = USSDStateMachine(state.get("language", flow.languages[0]), flow)
+        cpu_start = time.thread_time()
+        # "flow" includes the DB work of steps that save the encounter
+        with span("flow"):
+            response_type, message, new_state = state_machine.process_step(
+                step,
+                event.text,
+                state,
+                db
+            )
+        observe_state_machine_cpu(flow.name, step, time.thread_time() - cpu_start)
+
+        if response_type == "CON":
+            next_step = new_state.get("step")
+            # A re-prompt stays on the same step and counts nothing
+            funnel = (
+                FunnelUpdate(funnel_channel, entered=next_step, exited=step, shard=shard)
+                if next_step != step else None
+            )
+            await session.set_state(new_state, funnel)
+        else:
+            await session.clear(FunnelUpdate(
+                funnel_channel, exited=step, outcome=END_OUTCOMES.get(step, "error"), shard=shard
+            ))
+            count_conversation_end(event.channel, flow.name, new_state.get("responses", {}).get("risk_code"))
+            if new_state.get("callback_queued"):
+                # Keep the number until the callback completes so its updates can reach the patient
+                await remember_contact(event.msisdn, new_state["channel"], new_state.get("language", "en"))
+        observe_hop(event.channel, flow.name, step, time.perf_counter() - start)
+        return Reply(response_type, message, new_state.get("language", flow.languages[0]))
+
+    async def triage_once(
+        self,
+        channel: str,
+        msisdn: str,
+        answers: Dict[str, Any],
+        db: Session,
+        consent_version: str,
+        request_callback: bool = False,
+    ) -> TriageResult:
+        """
+        Triage and save a complete set of answers in one step (e.g. one SMS).
+
+        Args:
+            channel: Channel the answers came from
+            msisdn: Sender's phone number
+            answers: age_group, gender, language and a boolean per symptom
+            db: Database session
+            consent_version: Consent text version the sender agreed to
+            request_callback: Queue a callback; urgent outcomes always do
+
+        Returns:
+            TriageResult with the saved encounter
+        """
+        ruleset = get_active_ruleset()
+        risk_code, advice, urgent_flag = assess_risk(answers, ruleset)
+        responses = {
+            "consent": True,
+            **answers,
+            "risk_code": risk_code,
+            "advice": advice,
+            "urgent_flag": urgent_flag,
+            "ruleset_version": ruleset.version,
+        }
+        request_callback = request_callback or urgent_flag
+        encounter, _ = save_triage_encounter(
+            db, channel, msisdn, responses, consent_version, request_callback=request_callback
+        )
+        if request_callback:
+            await remember_contact(msisdn, channel, answers.get("language", "en"))
+        count_conversation_end(channel, self.flows.default.name, risk_code)
+        return TriageResult(risk_code, advice, urgent_flag, encounter, request_callback)
+
+
+conversation_engine = ConversationEngine()
+
+
+def get_conversation_engine() -> ConversationEngine:
+    """Get the process-wide conversation engine."""
+    return conversation_engine
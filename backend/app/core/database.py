@@ -2,13 +2,37 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from .metrics import instrument_engine
+from .pool_stats import InstrumentedQueuePool
 
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
-)
+
+def build_engine(url: str):
+    """Create an engine with the configured, instrumented connection pool."""
+    is_sqlite = url.startswith("sqlite")
+    kwargs = {
+        "connect_args": {"check_same_thread": False} if is_sqlite else {},
+        "query_cache_size": settings.DB_STATEMENT_CACHE_SIZE,
+    }
+    # In-memory SQLite must keep its single-connection pool
+    if not (is_sqlite and ":memory:" in url):
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_pre_ping=settings.DB_POOL_PRE_PING,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return instrument_engine(create_engine(url, **kwargs))
+
+
+engine = build_engine(settings.DATABASE_URL)
+
+# Read replica; falls back to the primary engine when no replica is configured
+read_engine = build_engine(settings.DATABASE_READ_URL) if settings.DATABASE_READ_URL else engine
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 Base = declarative_base()
 
@@ -19,3 +43,11 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
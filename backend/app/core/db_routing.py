@@ -0,0 +1,67 @@
+"""Read/write routing between the primary database and a read replica.
+
+Read-only dashboard endpoints are served from the replica, except for a short
+window after a provider's own write, during which that provider's reads stick
+to the primary so they always see their own changes despite replication lag.
+"""
+
+import logging
+import time
+from typing import Dict
+
+from .config import settings
+from .database import engine, read_engine
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+STICKY_KEY_PREFIX = "db:sticky"
+
+# Per-worker record of recent writes; Redis shares it across workers
+_recent_writes: Dict[int, float] = {}
+
+
+def replica_configured() -> bool:
+    """Whether reads can be routed to a separate replica engine."""
+    return read_engine is not engine
+
+
+def _sticky_key(provider_id: int) -> str:
+    return f"{STICKY_KEY_PREFIX}:{provider_id}"
+
+
+async def mark_provider_write(provider_id: int):
+    """Pin a provider's reads to the primary for DB_READ_YOUR_WRITES_SECONDS."""
+    if not replica_configured():
+        return
+    window = settings.DB_READ_YOUR_WRITES_SECONDS
+    _recent_writes[provider_id] = time.monotonic() + window
+    try:
+        redis_client = await get_redis()
+        await redis_client.set(_sticky_key(provider_id), "1", px=int(window * 1000))
+    except Exception as exc:
+        logger.warning("Could not share read-your-writes marker for provider %s: %r", provider_id, exc)
+
+
+async def reads_from_primary(provider_id: int) -> bool:
+    """
+    Whether this provider's reads must go to the primary.
+
+    True when no replica is configured, within the read-your-writes window
+    after the provider's last write, or when the window can't be checked.
+    """
+    if not replica_configured():
+        return True
+
+    deadline = _recent_writes.get(provider_id)
+    if deadline is not None:
+        if time.monotonic() < deadline:
+            return True
+        del _recent_writes[provider_id]
+
+    try:
+        redis_client = await get_redis()
+        return bool(await redis_client.exists(_sticky_key(provider_id)))
+    except Exception:
+        # Can't prove the replica has caught up, so stay consistent
+        return True
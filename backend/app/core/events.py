@@ -0,0 +1,70 @@
+"""In-process event bus for domain events (e.g. callback lifecycle changes).
+
+Publishing never blocks: each subscriber has its own bounded queue and an
+event is dropped for a subscriber whose queue is full. Publish after the
+database commit, so subscribers only see changes that actually happened.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Iterable, List, NamedTuple
+
+logger = logging.getLogger(__name__)
+
+CALLBACK_QUEUED = "callback.queued"
+CALLBACK_ASSIGNED = "callback.assigned"
+CALLBACK_COMPLETED = "callback.completed"
+PROVIDER_AVAILABILITY = "provider.availability"
+CALLBACK_ESCALATED = "callback.escalated"
+CALLBACK_SLA_BREACHED = "callback.sla_breached"
+
+
+class Event(NamedTuple):
+    type: str
+    payload: Dict[str, Any]
+    published_at: float
+
+
+class EventBus:
+    """Fan-out of published events to subscriber queues."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    def subscribe(self, event_types: Iterable[str], maxsize: int = 10000) -> asyncio.Queue:
+        """Create a queue receiving every event of the given types."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        for event_type in event_types:
+            self._subscribers.setdefault(event_type, []).append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        for queues in self._subscribers.values():
+            if queue in queues:
+                queues.remove(queue)
+
+    def publish(self, event_type: str, **payload) -> int:
+        """
+        Publish an event without waiting for subscribers.
+
+        Returns:
+            Number of subscribers the event was delivered to
+        """
+        event = Event(event_type, payload, time.time())
+        delivered = 0
+        for queue in self._subscribers.get(event_type, ()):
+            try:
+                queue.put_nowait(event)
+                delivered += 1
+            except asyncio.QueueFull:
+                logger.warning("Dropped %s event: subscriber queue full", event_type)
+        return delivered
+
+
+event_bus = EventBus()
+
+
+def publish(event_type: str, **payload) -> int:
+    """Publish an event on the process-wide bus."""
+    return event_bus.publish(event_type, **payload)
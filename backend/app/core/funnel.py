@@ -0,0 +1,201 @@
+"""Real-time conversation funnel and unique-caller counts in Redis.
+
+Every conversation hop updates, in the same pipeline as the session write:
+
+- ``funnel:{<channel>:<shard>}:<m|h|d>:<period>`` hashes (minute, hour and
+  day buckets) with ``in:<step>`` / ``out:<step>`` counters per flow step
+  and ``end:<outcome>`` counters (completed, declined, rate_limited, ...);
+- ``funnel:{<channel>:<shard>}:callers:<YYYYMMDD>``, a HyperLogLog of the
+  msisdn hashes that started a conversation that day (about 0.8% error, at
+  most 12 KB per day).
+
+Counters are split over FUNNEL_SHARDS hash tags so that on a Redis Cluster
+the hops of a busy channel don't all write to one node. A caller always maps
+to the same shard, so shards count disjoint callers and the unique-caller
+totals are the sum of the per-shard counts.
+
+A step's ``in`` minus its ``out`` is the number of sessions that stopped
+there without answering (timed out or hung up); those never reach the
+database. ``read_funnel`` builds the charts from these keys without SQL.
+"""
+
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional
+
+import redis.asyncio as redis
+
+from .config import settings
+
+
+class Bucket(NamedTuple):
+    code: str  # key segment
+    key_format: str
+    label_format: str  # period label in responses
+    length: timedelta
+    ttl: int  # seconds the bucket is kept
+
+
+BUCKETS = {
+    "minute": Bucket("m", "%Y%m%d%H%M", "%Y-%m-%dT%H:%M", timedelta(minutes=1), 2 * 86400),
+    "hour": Bucket("h", "%Y%m%d%H", "%Y-%m-%dT%H:00", timedelta(hours=1), 35 * 86400),
+    "day": Bucket("d", "%Y%m%d", "%Y-%m-%d", timedelta(days=1), 400 * 86400),
+}
+
+CALLERS_TTL = 400 * 86400
+
+
+def funnel_shard(caller: str, shards: Optional[int] = None) -> int:
+    """Counter shard of a caller (msisdn hash); stable, so each caller is counted in one shard."""
+    return zlib.crc32(caller.encode()) % (shards or settings.FUNNEL_SHARDS)
+
+
+def bucket_key(channel: str, bucket: Bucket, period: datetime, shard: int = 0) -> str:
+    return f"funnel:{{{channel}:{shard}}}:{bucket.code}:{period.strftime(bucket.key_format)}"
+
+
+def callers_key(channel: str, day: datetime, shard: int = 0) -> str:
+    # Same hash tag as the shard's buckets, so PFCOUNT can union days on a Redis Cluster
+    return f"funnel:{{{channel}:{shard}}}:callers:{day.strftime('%Y%m%d')}"
+
+
+def _truncate(moment: datetime, bucket: Bucket) -> datetime:
+    if bucket.code == "m":
+        return moment.replace(second=0, microsecond=0)
+    if bucket.code == "h":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class FunnelUpdate:
+    """Counter changes for one conversation hop."""
+
+    channel: str
+    entered: Optional[str] = None  # step the conversation moved to
+    exited: Optional[str] = None  # step that was answered
+    outcome: Optional[str] = None  # how the conversation ended, if it did
+    caller: Optional[str] = None  # msisdn hash, when a conversation starts
+    shard: int = 0  # funnel_shard() of the caller
+
+    def apply(self, pipe: redis.client.Pipeline, now: Optional[datetime] = None):
+        """Queue the counter updates on a pipeline (executed by the caller)."""
+        now = now or datetime.utcnow()
+        fields = []
+        if self.entered:
+            fields.append(f"in:{self.entered}")
+        if self.exited:
+            fields.append(f"out:{self.exited}")
+        if self.outcome:
+            fields.append(f"end:{self.outcome}")
+        if fields:
+            for bucket in BUCKETS.values():
+                key = bucket_key(self.channel, bucket, now, self.shard)
+                for field in fields:
+                    pipe.hincrby(key, field, 1)
+                pipe.expire(key, bucket.ttl)
+        if self.caller:
+            key = callers_key(self.channel, now, self.shard)
+            pipe.pfadd(key, self.caller)
+            pipe.expire(key, CALLERS_TTL)
+
+
+def _counts(fields: Dict[str, int], prefix: str) -> Dict[str, int]:
+    return {name[len(prefix):]: int(value) for name, value in fields.items() if name.startswith(prefix)}
+
+
+async def read_funnel(
+    redis_client: redis.Redis,
+    channel: str,
+    bucket_name: str,
+    periods: int,
+    steps: Iterable[str],
+    now: Optional[datetime] = None,
+    shards: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Funnel and unique-caller charts for the last ``periods`` buckets, in one round trip.
+
+    Args:
+        redis_client: Redis client
+        channel: Conversation channel ("USSD", "IVR", ...)
+        bucket_name: "minute", "hour" or "day"
+        periods: Number of buckets, the current (partial) one last
+        steps: Flow steps in order
+        now: End of the range (defaults to now, UTC)
+        shards: Counter shards to add up (defaults to FUNNEL_SHARDS)
+
+    Returns:
+        Dict shaped like the ``ConversationFunnel`` schema
+    """
+    bucket = BUCKETS[bucket_name]
+    steps = list(steps)
+    last = _truncate(now or datetime.utcnow(), bucket)
+    starts = [last - bucket.length * i for i in reversed(range(periods))]
+    first_day = _truncate(starts[0], BUCKETS["day"])
+    days: List[datetime] = []
+    day = first_day
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+
+    shards = shards or settings.FUNNEL_SHARDS
+
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for shard in range(shards):
+            for start in starts:
+                pipe.hgetall(bucket_key(channel, bucket, start, shard))
+            # redis-py refuses pfcount() on cluster pipelines because it could
+            # span slots; a shard's keys share one, so send the raw command
+            for day in days:
+                pipe.execute_command("PFCOUNT", callers_key(channel, day, shard))
+            pipe.execute_command("PFCOUNT", *(callers_key(channel, day, shard) for day in days))
+        results = await pipe.execute()
+
+    # Per shard: one hash per period, one count per day, then the count over all days
+    stride = periods + len(days) + 1
+    buckets: List[Dict[str, int]] = [{} for _ in starts]
+    daily_callers = [0] * len(days)
+    total_callers = 0
+    for offset in range(0, len(results), stride):
+        shard_results = results[offset:offset + stride]
+        for merged, fields in zip(buckets, shard_results[:periods]):
+            for name, value in fields.items():
+                merged[name] = merged.get(name, 0) + int(value)
+        for i, count in enumerate(shard_results[periods:-1]):
+            daily_callers[i] += count
+        total_callers += shard_results[-1]
+
+    series = []
+    entered_total: Dict[str, int] = {}
+    exited_total: Dict[str, int] = {}
+    outcomes_total: Dict[str, int] = {}
+    for start, fields in zip(starts, buckets):
+        entered, exited, outcomes = _counts(fields, "in:"), _counts(fields, "out:"), _counts(fields, "end:")
+        series.append({"period": start.strftime(bucket.label_format), "entered": entered,
+                       "exited": exited, "outcomes": outcomes})
+        for totals, counts in ((entered_total, entered), (exited_total, exited), (outcomes_total, outcomes)):
+            for name, count in counts.items():
+                totals[name] = totals.get(name, 0) + count
+
+    return {
+        "channel": channel,
+        "bucket": bucket_name,
+        "steps": [
+            {
+                "step": step,
+                "entered": entered_total.get(step, 0),
+                "exited": exited_total.get(step, 0),
+                # Counters of a conversation can straddle two buckets; never report negative drop-off
+                "dropped": max(0, entered_total.get(step, 0) - exited_total.get(step, 0)),
+            }
+            for step in steps
+        ],
+        "outcomes": outcomes_total,
+        "series": series,
+        "unique_callers": {
+            "daily": {day.strftime("%Y-%m-%d"): count for day, count in zip(days, daily_callers)},
+            "total": total_callers,
+        },
+    }
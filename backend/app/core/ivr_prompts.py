@@ -0,0 +1,162 @@
+"""Precompiled TwiML documents for the IVR channel.
+
+The IVR channel runs the same USSD state machine and message catalog; only
+the rendering differs. Every catalog message (and its "invalid input"
+re-prompt) is compiled once per process into two TwiML documents: a
+``<Gather>`` for CON responses and a ``<Say>``/``<Hangup>`` for END
+responses. Looking up a response is then a dict lookup on the message text.
+
+Menu lines such as "1. Yes" are spoken as "Press 1 for Yes." (the
+``ivr_press`` catalog entry). Prompts with a
+pre-recorded file in IVR_AUDIO_DIR (named ``<prompt_hash>.mp3``) are played
+from IVR_AUDIO_BASE_URL instead of going through text-to-speech; run
+``python -m app.core.ivr_prompts`` to list the hashes and texts to record.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+from typing import Dict, Iterator, Optional, Set, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+from .config import settings
+from .language_strings import LANGUAGES, compile_catalog, get_message, get_reprompt
+
+logger = logging.getLogger(__name__)
+
+AUDIO_EXTENSION = ".mp3"
+
+# Twilio text-to-speech locales; languages without one are read with the default voice
+SAY_LANGUAGES = {"en": "en-GB"}
+
+_MENU_LINE = re.compile(r"^(\d+)\.\s*(.+)$")
+
+XML_HEADER = "<?xml version='1.0' encoding='UTF-8'?>"
+
+# (response_type, language, message text) -> TwiML document
+_documents: Optional[Dict[Tuple[str, str, str], str]] = None
+_audio_hashes: Optional[Set[str]] = None
+
+
+# Catalog entries that are never spoken
+_NON_VOICE_PREFIXES = ("sms_", "ivr_", "notify_")
+
+
+def voice_text(language: str, message: str) -> str:
+    """Turn USSD menu text into a spoken prompt ("1. Yes" -> "Press 1 for Yes.")."""
+    press = get_message(language, "ivr_press")
+    lines = []
+    for line in message.split("\n"):
+        line = line.strip()
+        if not line:
+            continue
+        match = _MENU_LINE.match(line)
+        if match:
+            line = press.format(digit=match.group(1), option=match.group(2))
+        lines.append(line)
+    return " ".join(lines)
+
+
+def prompt_hash(language: str, text: str) -> str:
+    """Key of the pre-recorded audio file for a spoken prompt."""
+    return hashlib.sha256(f"{language}\n{text}".encode()).hexdigest()[:16]
+
+
+def _scan_audio() -> Set[str]:
+    if not settings.IVR_AUDIO_DIR:
+        return set()
+    try:
+        with os.scandir(settings.IVR_AUDIO_DIR) as entries:
+            return {
+                entry.name[:-len(AUDIO_EXTENSION)]
+                for entry in entries
+                if entry.name.endswith(AUDIO_EXTENSION)
+            }
+    except OSError as exc:
+        logger.warning("IVR audio cache %s unavailable: %s", settings.IVR_AUDIO_DIR, exc)
+        return set()
+
+
+def _speak(language: str, message: str, audio: Set[str]) -> str:
+    text = voice_text(language, message)
+    key = prompt_hash(language, text)
+    if key in audio:
+        url = f"{settings.IVR_AUDIO_BASE_URL.rstrip('/')}/{key}{AUDIO_EXTENSION}"
+        return f"<Play>{escape(url)}</Play>"
+    locale = SAY_LANGUAGES.get(language)
+    attrs = f" language={quoteattr(locale)}" if locale else ""
+    return f"<Say{attrs}>{escape(text)}</Say>"
+
+
+def render(response_type: str, language: str, message: str, audio: Optional[Set[str]] = None) -> str:
+    """
+    Render one TwiML document.
+
+    Args:
+        response_type: "CON" gathers one DTMF digit; "END" speaks and hangs up
+        language: Message language
+        message: Catalog message text
+        audio: Hashes of available pre-recorded prompts
+
+    Returns:
+        TwiML document
+    """
+    speech = _speak(language, message, audio if audio is not None else (_audio_hashes or set()))
+    if response_type == "END":
+        return f"{XML_HEADER}<Response>{speech}<Hangup/></Response>"
+    action = quoteattr(settings.IVR_GATHER_URL)
+    return (
+        f"{XML_HEADER}<Response>"
+        f"<Gather input=\"dtmf\" numDigits=\"1\" timeout=\"{settings.IVR_GATHER_TIMEOUT}\" action={action} method=\"POST\">"
+        f"{speech}</Gather>"
+        f"<Redirect method=\"POST\">{escape(settings.IVR_GATHER_URL)}</Redirect>"
+        f"</Response>"
+    )
+
+
+def _messages() -> Iterator[Tuple[str, str]]:
+    for language, messages in LANGUAGES.items():
+        for key in LANGUAGES["en"].keys() | messages.keys():
+            if key.startswith(_NON_VOICE_PREFIXES):
+                continue
+            yield language, get_message(language, key)
+            yield language, get_reprompt(language, key)
+
+
+def compile_prompts() -> Dict[Tuple[str, str, str], str]:
+    """Render every catalog message for both response types, once per process."""
+    global _documents, _audio_hashes
+    if _documents is None:
+        compile_catalog()
+        audio = _scan_audio()
+        documents = {}
+        for language, message in _messages():
+            for response_type in ("CON", "END"):
+                documents[(response_type, language, message)] = render(response_type, language, message, audio)
+        _audio_hashes = audio
+        _documents = documents
+    return _documents
+
+
+def get_document(response_type: str, language: str, message: str) -> str:
+    """Get the precompiled TwiML for a state-machine response (rendered on a miss)."""
+    document = (_documents or compile_prompts()).get((response_type, language, message))
+    if document is None:
+        logger.debug("IVR prompt not precompiled: %s/%s", response_type, language)
+        document = render(response_type, language, message)
+    return document
+
+
+def manifest() -> Dict[str, Dict[str, str]]:
+    """Prompt hash -> language and spoken text, for recording audio files."""
+    prompts = {}
+    for language, message in _messages():
+        text = voice_text(language, message)
+        prompts[prompt_hash(language, text)] = {"language": language, "text": text}
+    return prompts
+
+
+if __name__ == "__main__":
+    print(json.dumps(manifest(), indent=2, ensure_ascii=False))
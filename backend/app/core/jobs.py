@@ -0,0 +1,321 @@
+"""Durable background jobs on Redis Streams.
+
+Each queue is a stream (``<prefix>:<queue>``) read by one consumer group, so
+every job is delivered to exactly one consumer and stays in the group's
+pending list until it is acknowledged.
+
+- A failed job is acknowledged and re-scheduled with jittered exponential
+  backoff in a sorted set (``<prefix>:delayed``); due jobs are moved back
+  into their stream by ``promote_due``.
+- A job not acknowledged within the visibility timeout is claimed by
+  another consumer with XAUTOCLAIM. Workers heartbeat long-running jobs,
+  so this only happens when a worker dies mid-job.
+- A job that fails JOBS_MAX_ATTEMPTS times, or names an unknown task, is
+  moved to the queue's dead-letter stream (``<prefix>:<queue>:dead``).
+
+Tasks are async functions taking the job payload, registered with ``@task``.
+Recurring jobs are enqueued by ``enqueue_periodic``; a Redis key per job name
+makes sure only one worker enqueues each run.
+"""
+
+import json
+import logging
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+from .config import settings
+from .redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+TaskHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+# Task name -> handler, filled by @task
+TASKS: Dict[str, TaskHandler] = {}
+
+
+def task(name: str) -> Callable[[TaskHandler], TaskHandler]:
+    """Register an async function as the handler for jobs named ``name``."""
+    def register(handler: TaskHandler) -> TaskHandler:
+        TASKS[name] = handler
+        return handler
+    return register
+
+
+@dataclass
+class Job:
+    """A unit of background work."""
+
+    name: str
+    payload: Dict[str, Any]
+    queue: str = "default"
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    attempts: int = 0
+    enqueued_at: float = field(default_factory=time.time)
+    # Stream entry id while the job is being processed
+    message_id: Optional[str] = field(default=None, compare=False)
+
+    def dumps(self) -> str:
+        data = asdict(self)
+        data.pop("message_id")
+        return json.dumps(data)
+
+    @classmethod
+    def loads(cls, data: str, message_id: Optional[str] = None) -> "Job":
+        return cls(**json.loads(data), message_id=message_id)
+
+
+class JobQueue:
+    """Producer and consumer operations on the job streams."""
+
+    def __init__(
+        self,
+        redis_client: redis.Redis,
+        prefix: str = "jobs",
+        group: str = "workers",
+        max_attempts: int = 5,
+        retry_base_seconds: float = 1.0,
+        retry_max_seconds: float = 300.0,
+        visibility_timeout: float = 60.0,
+        maxlen: int = 100000,
+    ):
+        self.redis = redis_client
+        self.prefix = prefix
+        self.group = group
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.visibility_timeout = visibility_timeout
+        self.maxlen = maxlen
+        self.delayed_key = f"{prefix}:delayed"
+        self._groups: set = set()
+
+    @classmethod
+    def from_settings(cls, redis_client: redis.Redis, **overrides) -> "JobQueue":
+        options = dict(
+            prefix=settings.JOBS_STREAM_PREFIX,
+            group=settings.JOBS_GROUP,
+            max_attempts=settings.JOBS_MAX_ATTEMPTS,
+            retry_base_seconds=settings.JOBS_RETRY_BASE_SECONDS,
+            retry_max_seconds=settings.JOBS_RETRY_MAX_SECONDS,
+            visibility_timeout=settings.JOBS_VISIBILITY_TIMEOUT_SECONDS,
+            maxlen=settings.JOBS_STREAM_MAXLEN,
+        )
+        options.update(overrides)
+        return cls(redis_client, **options)
+
+    def stream(self, queue: str) -> str:
+        return f"{self.prefix}:{queue}"
+
+    def dead_stream(self, queue: str) -> str:
+        return f"{self.prefix}:{queue}:dead"
+
+    async def ensure_group(self, queue: str):
+        """Create the queue's stream and consumer group if they don't exist."""
+        if queue in self._groups:
+            return
+        try:
+            await self.redis.xgroup_create(self.stream(queue), self.group, id="0", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+        self._groups.add(queue)
+
+    async def enqueue(self, name: str, payload: Dict[str, Any], queue: str = "default", delay: float = 0) -> Job:
+        """
+        Add a job to a queue.
+
+        Args:
+            name: Registered task name
+            payload: JSON-serialisable task arguments
+            queue: Queue (stream) name
+            delay: Seconds to wait before the job becomes available
+
+        Returns:
+            The queued Job
+        """
+        job = Job(name=name, payload=payload, queue=queue)
+        if delay > 0:
+            await self.redis.zadd(self.delayed_key, {job.dumps(): time.time() + delay})
+        else:
+            await self.redis.xadd(self.stream(queue), {"job": job.dumps()}, maxlen=self.maxlen, approximate=True)
+        return job
+
+    async def enqueue_periodic(
+        self, name: str, payload: Dict[str, Any], every: float, queue: str = "default"
+    ) -> Optional[Job]:
+        """
+        Enqueue a recurring job unless it was already enqueued in the last ``every`` seconds.
+
+        Safe to call from every worker on every tick: ``SET NX PX`` on
+        ``<prefix>:periodic:<name>`` lets one of them through per period.
+
+        Returns:
+            The queued Job, or None if this period's run is already queued
+        """
+        if not await self.redis.set(f"{self.prefix}:periodic:{name}", "1", nx=True, px=max(1, int(every * 1000))):
+            return None
+        return await self.enqueue(name, payload, queue=queue)
+
+    async def fetch(self, queues: Iterable[str], consumer: str, count: int = 10, block_ms: int = 1000) -> List[Job]:
+        """
+        Get jobs for a consumer: first jobs whose visibility timeout expired,
+        then new jobs (blocking up to ``block_ms`` if there are none).
+        """
+        queues = list(queues)
+        jobs = []
+        for queue in queues:
+            jobs.extend(await self._claim_stale(queue, consumer, count))
+        if jobs:
+            return jobs
+
+        response = await self.redis.xreadgroup(
+            self.group, consumer, {self.stream(queue): ">" for queue in queues}, count=count, block=block_ms
+        )
+        for _stream, entries in response or []:
+            jobs.extend(self._decode(message_id, fields) for message_id, fields in entries)
+        return [job for job in jobs if job is not None]
+
+    async def _claim_stale(self, queue: str, consumer: str, count: int) -> List[Job]:
+        stream = self.stream(queue)
+        response = await self.redis.xautoclaim(
+            stream, self.group, consumer, min_idle_time=int(self.visibility_timeout * 1000), start_id="0-0", count=count
+        )
+        entries = [(message_id, fields) for message_id, fields in response[1] if fields]
+        if not entries:
+            return []
+
+        # Each earlier delivery that was never acknowledged counts as a failed attempt
+        pending = await self.redis.xpending_range(
+            stream, self.group, min=entries[0][0], max=entries[-1][0], count=len(entries) * 2
+        )
+        deliveries = {p["message_id"]: p["times_delivered"] for p in pending}
+        jobs = []
+        for message_id, fields in entries:
+            job = self._decode(message_id, fields)
+            if job is None:
+                continue
+            job.attempts += max(0, deliveries.get(message_id, 1) - 1)
+            logger.warning("Reclaimed job %s (%s) after visibility timeout", job.id, job.name)
+            if job.attempts >= self.max_attempts:
+                await self.dead_letter(job, "visibility timeout exceeded")
+            else:
+                jobs.append(job)
+        return jobs
+
+    def _decode(self, message_id: str, fields: Dict[str, str]) -> Optional[Job]:
+        try:
+            return Job.loads(fields["job"], message_id=message_id)
+        except (KeyError, TypeError, ValueError):
+            logger.error("Discarding malformed job entry %s", message_id)
+            return None
+
+    async def touch(self, job: Job, consumer: str):
+        """Reset a running job's idle time so it is not reclaimed (heartbeat)."""
+        await self.redis.xclaim(
+            self.stream(job.queue), self.group, consumer, min_idle_time=0,
+            message_ids=[job.message_id], justid=True
+        )
+
+    async def ack(self, job: Job):
+        """Mark a job done and remove it from its stream."""
+        stream = self.stream(job.queue)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(stream, self.group, job.message_id)
+            pipe.xdel(stream, job.message_id)
+            await pipe.execute()
+
+    def backoff(self, attempts: int) -> float:
+        """Full-jitter exponential backoff before attempt ``attempts + 1``."""
+        return random.uniform(0, min(self.retry_max_seconds, self.retry_base_seconds * 2 ** attempts))
+
+    async def retry(self, job: Job, error: str):
+        """Record a failed attempt: re-schedule with backoff, or dead-letter the job."""
+        job.attempts += 1
+        if job.attempts >= self.max_attempts:
+            await self.dead_letter(job, error)
+            return
+        stream = self.stream(job.queue)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.delayed_key, {job.dumps(): time.time() + self.backoff(job.attempts)})
+            pipe.xack(stream, self.group, job.message_id)
+            pipe.xdel(stream, job.message_id)
+            await pipe.execute()
+
+    async def dead_letter(self, job: Job, error: str):
+        """Move a job to its queue's dead-letter stream."""
+        logger.error("Job %s (%s) dead-lettered after %d attempts: %s", job.id, job.name, job.attempts, error)
+        stream = self.stream(job.queue)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(
+                self.dead_stream(job.queue),
+                {"job": job.dumps(), "error": error[:1000], "failed_at": str(time.time())},
+                maxlen=self.maxlen,
+                approximate=True,
+            )
+            pipe.xack(stream, self.group, job.message_id)
+            pipe.xdel(stream, job.message_id)
+            await pipe.execute()
+
+    async def promote_due(self, limit: int = 100) -> int:
+        """
+        Move delayed jobs that are due back into their streams.
+
+        Safe to run from several workers: a job is only moved by the worker
+        whose ZREM removed it.
+        """
+        due = await self.redis.zrangebyscore(self.delayed_key, "-inf", time.time(), start=0, num=limit)
+        promoted = 0
+        for data in due:
+            if not await self.redis.zrem(self.delayed_key, data):
+                continue
+            job = Job.loads(data)
+            await self.redis.xadd(self.stream(job.queue), {"job": data}, maxlen=self.maxlen, approximate=True)
+            promoted += 1
+        return promoted
+
+    async def dead_letters(self, queue: str = "default", count: int = 100) -> List[Dict[str, Any]]:
+        """List the oldest dead-lettered jobs of a queue with their errors."""
+        entries = await self.redis.xrange(self.dead_stream(queue), count=count)
+        return [
+            {"message_id": message_id, "job": Job.loads(fields["job"]), "error": fields.get("error")}
+            for message_id, fields in entries
+        ]
+
+    async def replay_dead(self, queue: str = "default", count: int = 100) -> int:
+        """Re-queue dead-lettered jobs with a fresh attempt count."""
+        replayed = 0
+        for entry in await self.dead_letters(queue, count):
+            job = entry["job"]
+            job.attempts = 0
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.xadd(self.stream(queue), {"job": job.dumps()}, maxlen=self.maxlen, approximate=True)
+                pipe.xdel(self.dead_stream(queue), entry["message_id"])
+                await pipe.execute()
+            replayed += 1
+        return replayed
+
+    async def stats(self, queues: Iterable[str]) -> Dict[str, Dict[str, int]]:
+        """Queue length, pending (in-flight) and dead-letter counts per queue."""
+        result = {}
+        for queue in queues:
+            await self.ensure_group(queue)
+            pending = await self.redis.xpending(self.stream(queue), self.group)
+            result[queue] = {
+                "length": await self.redis.xlen(self.stream(queue)),
+                "pending": pending["pending"],
+                "dead": await self.redis.xlen(self.dead_stream(queue)),
+            }
+        result["delayed"] = {"length": await self.redis.zcard(self.delayed_key)}
+        return result
+
+
+async def get_job_queue() -> JobQueue:
+    """Job queue on the shared Redis connection pool."""
+    return JobQueue.from_settings(await get_redis())
@@ -2,6 +2,8 @@
 Keeping messages concise (≤160 characters) for USSD compatibility.
 """
 
+from typing import Dict, Optional, Tuple
+
 LANGUAGES = {
     "en": {
         "consent": "Welcome to NTAL Health! We'll ask about symptoms. Your data is private. Do you consent?\n1. Yes\n2. No",
@@ -21,6 +23,20 @@ LANGUAGES = {
         "goodbye": "Thank you. Stay healthy!",
         "invalid_input": "Invalid input. Please try again.",
         "rate_limit": "Limit reached. Try again tomorrow.",
+        # One-message SMS triage replies
+        "sms_help": "To check symptoms text NTAL <age 1-4> <M/F/O> <F=fever H=headache D=danger C=cough>, e.g. NTAL 3 F H. Add CB for a callback.",
+        "sms_emergency": "EMERGENCY: Go to nearest clinic NOW or call ambulance.",
+        "sms_malaria_suspect": "Possible malaria. Visit health center soon.",
+        "sms_fever_general": "Monitor symptoms. Visit clinic if persists.",
+        "sms_low_risk": "Low risk. Rest and monitor.",
+        "sms_callback_queued": "A provider will call you soon.",
+        # Patient notifications ({ref} is the case reference)
+        "notify_callback_assigned": "NTAL Health: a provider has your case (Ref: {ref}) and will call you soon.",
+        "notify_callback_completed": "NTAL Health: your callback (Ref: {ref}) is complete. Stay healthy!",
+        # Supervisor alert ({callback_id} is the callback id)
+        "notify_supervisor_sla_breached": "NTAL Health: URGENT callback #{callback_id} is still waiting past its SLA. Please assign it now.",
+        # IVR: spoken form of a USSD menu line
+        "ivr_press": "Press {digit} for {option}.",
     },
     "yo": {  # Yoruba
         "consent": "Kaabo si NTAL Health! A o beere nipa aisan. Data re wa ni aabo. Se o gba?\n1. Beeni\n2. Rara",
@@ -40,11 +56,61 @@ LANGUAGES = {
         "goodbye": "O se. Wa ni ilera!",
         "invalid_input": "Idahun ko tọ. Gbiyanju lẹẹkansi.",
         "rate_limit": "O ti po ju. Gbiyanju lọla.",
+        "sms_help": "Lati se ayewo aisan fi NTAL <ojo ori 1-4> <M/F/O> <F=iba H=ori D=ewu C=iko> ranse, e.g. NTAL 3 F H. Fi CB kun fun ipe.",
+        "sms_emergency": "PAJAWIRI: Lo si ile iwosan tabi pe ambulance.",
+        "sms_malaria_suspect": "O le je iba. Lo si ile iwosan laipe.",
+        "sms_fever_general": "Wo aisan na. Lo si ile iwosan ti o ba tesi.",
+        "sms_low_risk": "Ewu kekere. Sinmi ki o wo.",
+        "sms_callback_queued": "A o pe o laipe.",
+        "notify_callback_assigned": "NTAL Health: osise ilera ti gba oro re (Ref: {ref}), won o pe o laipe.",
+        "notify_callback_completed": "NTAL Health: ipe re (Ref: {ref}) ti pari. Wa ni ilera!",
+        "ivr_press": "Te {digit} fun {option}.",
     }
 }
 
 
+# Flattened (language, key) -> message lookups, built once by compile_catalog()
+_catalog: Optional[Dict[Tuple[str, str], str]] = None
+_reprompts: Optional[Dict[Tuple[str, str], str]] = None
+
+
+def compile_catalog() -> Dict[Tuple[str, str], str]:
+    """
+    Flatten LANGUAGES into a single lookup table with English fallbacks resolved.
+
+    Also precomputes the "invalid input" re-prompt for every message so the
+    USSD hot path never concatenates strings.
+    """
+    global _catalog, _reprompts
+    if _catalog is None:
+        english = LANGUAGES["en"]
+        catalog = {}
+        reprompts = {}
+        for language, messages in LANGUAGES.items():
+            for key in english.keys() | messages.keys():
+                catalog[(language, key)] = messages.get(key, english.get(key))
+            invalid = catalog[(language, "invalid_input")]
+            for key in english.keys() | messages.keys():
+                reprompts[(language, key)] = invalid + "\n\n" + catalog[(language, key)]
+        _reprompts = reprompts
+        _catalog = catalog
+    return _catalog
+
+
 def get_message(language: str, key: str) -> str:
     """Get localized message, fallback to English if not found."""
-    lang = LANGUAGES.get(language, LANGUAGES["en"])
-    return lang.get(key, LANGUAGES["en"].get(key, f"Message not found: {key}"))
+    message = (_catalog or compile_catalog()).get((language, key))
+    if message is None:
+        lang = LANGUAGES.get(language, LANGUAGES["en"])
+        message = lang.get(key, LANGUAGES["en"].get(key, f"Message not found: {key}"))
+    return message
+
+
+def get_reprompt(language: str, key: str) -> str:
+    """Get the "invalid input" notice followed by the localized message for key."""
+    if _reprompts is None:
+        compile_catalog()
+    message = _reprompts.get((language, key))
+    if message is None:
+        message = get_message(language, "invalid_input") + "\n\n" + get_message(language, key)
+    return message
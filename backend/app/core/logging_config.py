@@ -0,0 +1,164 @@
+"""Non-blocking structured logging.
+
+``setup_logging`` puts a ``QueueHandler`` on the root logger. The request path
+only appends the unformatted record to a bounded queue; a ``QueueListener``
+thread formats it (``msg % args``) and writes one JSON object per line, so
+neither formatting nor handler I/O runs on the event loop.
+
+High-volume events are sampled at the call site with ``log_event`` before a
+record is even created. Rates come from ``LOG_SAMPLE_RATES``
+(``"ussd_hop=0.1"``). Warnings and errors (rate limiting included) are never
+sampled, and are never dropped when the queue is full.
+"""
+
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+from typing import Dict, Optional
+
+from .config import settings
+
+# Attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse ``"event=rate,event=rate"`` into a dict.
+
+    Raises:
+        ValueError: If an entry is malformed or a rate is outside 0..1
+    """
+    rates = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        event, _, rate = entry.partition("=")
+        value = float(rate)
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"Sample rate for {event!r} must be between 0 and 1")
+        rates[event.strip()] = value
+    return rates
+
+
+_sample_rates: Dict[str, float] = parse_sample_rates(settings.LOG_SAMPLE_RATES)
+
+
+def log_event(logger: logging.Logger, event: str, msg: str, *args, level: int = logging.INFO, **fields):
+    """
+    Log a named event with structured fields, sampling info-level events.
+
+    ``msg % args`` is only evaluated if the record is emitted, in the
+    listener thread. Warnings and errors are always logged.
+
+    Args:
+        logger: Logger to emit on
+        event: Event name, used for sampling and as the ``event`` field
+        msg: %-style message
+        *args: Message arguments
+        level: Log level
+        **fields: Structured fields added to the JSON line
+    """
+    if level < logging.WARNING:
+        if not logger.isEnabledFor(level):
+            return
+        rate = _sample_rates.get(event)
+        if rate is not None and random.random() >= rate:
+            return
+    fields["event"] = event
+    logger.log(level, msg, *args, extra=fields)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            data["stack_info"] = self.formatStack(record.stack_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats every record before queueing it. Records are
+    passed through unformatted here, and when the queue is full info-level
+    records are dropped (and counted) rather than blocking the caller.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            if record.levelno >= logging.WARNING:
+                self.queue.put(record)
+            else:
+                self.dropped += 1
+
+
+_handler: Optional[DeferredQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def setup_logging(stream=None) -> DeferredQueueHandler:
+    """
+    Route the root logger through the background JSON writer.
+
+    Safe to call more than once; each process (gunicorn worker) must call
+    it itself since the listener thread does not survive a fork.
+
+    Args:
+        stream: Where JSON lines are written (stdout by default)
+    """
+    global _handler, _listener
+    if _handler is not None:
+        return _handler
+
+    target = logging.StreamHandler(stream or sys.stdout)
+    target.setFormatter(JsonFormatter() if settings.LOG_JSON else logging.Formatter(
+        "%(asctime)s %(levelname)s %(name)s %(message)s"
+    ))
+    log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+    _handler = DeferredQueueHandler(log_queue)
+    _listener = logging.handlers.QueueListener(log_queue, target, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(settings.LOG_LEVEL.upper())
+    return _handler
+
+
+def shutdown_logging():
+    """Flush queued records and stop the listener thread."""
+    global _handler, _listener
+    if _handler is None:
+        return
+    logging.getLogger().removeHandler(_handler)
+    _listener.stop()
+    _handler = None
+    _listener = None
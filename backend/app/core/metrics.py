@@ -0,0 +1,281 @@
+"""Prometheus metrics for the conversation hot path.
+
+Exposed at ``GET /metrics``. Under gunicorn every worker process writes its
+samples to mmap'd files in ``PROMETHEUS_MULTIPROC_DIR`` (set up by
+``gunicorn_conf.py``) and a scrape of any worker aggregates all of them.
+Without that variable, metrics live in the process-local default registry.
+
+Hot-path updates go through label children cached in plain dicts, so an
+observation is a dict lookup plus a lock-protected add, with no per-call
+label tuple or string formatting.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional, Tuple
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+
+from .config import settings
+from .timing import record as record_span
+
+logger = logging.getLogger(__name__)
+
+# USSD hops are short; aggregators time out after a few seconds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+IO_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+CPU_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+
+HOP_SECONDS = Histogram(
+    "ntal_conversation_hop_seconds",
+    "Time to answer one inbound conversation message, by channel, flow and flow step",
+    ["channel", "flow", "step"],
+    buckets=LATENCY_BUCKETS,
+)
+STATE_MACHINE_CPU_SECONDS = Histogram(
+    "ntal_state_machine_cpu_seconds",
+    "CPU time spent in the flow state machine per message, by flow and flow step",
+    ["flow", "step"],
+    buckets=CPU_BUCKETS,
+)
+REDIS_COMMAND_SECONDS = Histogram(
+    "ntal_redis_command_seconds",
+    "Redis command latency, including waiting for a pooled connection",
+    ["command"],
+    buckets=IO_BUCKETS,
+)
+DB_QUERY_SECONDS = Histogram(
+    "ntal_db_query_seconds",
+    "Database statement execution latency",
+    ["operation"],
+    buckets=IO_BUCKETS,
+)
+RATE_LIMIT_REJECTIONS = Counter(
+    "ntal_rate_limit_rejections_total",
+    "Conversations refused because the sender hit the daily limit, by channel and flow",
+    ["channel", "flow"],
+)
+CONVERSATION_ENDS = Counter(
+    "ntal_conversation_end_total",
+    "Conversations that reached END, by channel, flow and triage risk code",
+    ["channel", "flow", "risk_code"],
+)
+CALLBACK_SLA_BREACHES = Counter(
+    "ntal_callback_sla_breaches_total",
+    "Callbacks still queued at their SLA deadline, by priority and action taken",
+    ["priority", "action"],
+)
+QUEUE_DEPTH = Gauge(
+    "ntal_queue_depth",
+    "Items waiting in in-process write queues (summed over live workers)",
+    ["queue"],
+    multiprocess_mode="livesum",
+)
+POOL_IN_USE = Gauge(
+    "ntal_pool_connections_in_use",
+    "Connections checked out of the DB and Redis pools (summed over live workers)",
+    ["pool"],
+    multiprocess_mode="livesum",
+)
+CIRCUIT_OPEN = Gauge(
+    "ntal_circuit_open",
+    "1 while a circuit breaker is open or half-open (max over live workers)",
+    ["circuit"],
+    multiprocess_mode="livemax",
+)
+SESSION_FALLBACKS = Counter(
+    "ntal_session_fallback_total",
+    "Session-store operations served without Redis, by operation",
+    ["operation"],
+)
+
+_hop_children: Dict[Tuple[str, str, str], Histogram] = {}
+_cpu_children: Dict[Tuple[str, str], Histogram] = {}
+_redis_children: Dict[str, Histogram] = {}
+_db_children: Dict[str, Histogram] = {}
+_rejection_children: Dict[Tuple[str, str], Counter] = {}
+_end_children: Dict[Tuple[str, str, str], Counter] = {}
+
+# Statement verbs used as DB operation labels; anything else is "other"
+_DB_OPERATIONS = frozenset({"SELECT", "INSERT", "UPDATE", "DELETE", "BEGIN", "COMMIT", "ROLLBACK"})
+
+
+def observe_hop(channel: str, flow: str, step: str, seconds: float):
+    """Record the latency of one conversation hop."""
+    key = (channel, flow, step)
+    child = _hop_children.get(key)
+    if child is None:
+        child = _hop_children[key] = HOP_SECONDS.labels(*key)
+    child.observe(seconds)
+
+
+def observe_state_machine_cpu(flow: str, step: str, seconds: float):
+    """Record CPU time spent in the state machine for one step."""
+    key = (flow, step)
+    child = _cpu_children.get(key)
+    if child is None:
+        child = _cpu_children[key] = STATE_MACHINE_CPU_SECONDS.labels(*key)
+    child.observe(seconds)
+
+
+def observe_redis(command: str, seconds: float):
+    """Record the latency of one Redis command."""
+    child = _redis_children.get(command)
+    if child is None:
+        child = _redis_children[command] = REDIS_COMMAND_SECONDS.labels(command.upper())
+    child.observe(seconds)
+
+
+def observe_db(operation: str, seconds: float):
+    """Record the latency of one database statement."""
+    child = _db_children.get(operation)
+    if child is None:
+        child = _db_children[operation] = DB_QUERY_SECONDS.labels(operation)
+    child.observe(seconds)
+
+
+def count_rate_limit_rejection(channel: str, flow: str):
+    key = (channel, flow)
+    child = _rejection_children.get(key)
+    if child is None:
+        child = _rejection_children[key] = RATE_LIMIT_REJECTIONS.labels(*key)
+    child.inc()
+
+
+def count_conversation_end(channel: str, flow: str, risk_code: Optional[str]):
+    """Count a finished conversation; flows that ended before triage count as "none"."""
+    key = (channel, flow, risk_code or "none")
+    child = _end_children.get(key)
+    if child is None:
+        child = _end_children[key] = CONVERSATION_ENDS.labels(*key)
+    child.inc()
+
+
+def count_sla_breach(priority: str, action: str):
+    """Count a callback that missed its SLA ("escalated" or "supervisor_alerted")."""
+    CALLBACK_SLA_BREACHES.labels(priority, action).inc()
+
+
+def set_circuit_state(circuit: str, state: str):
+    """Publish a circuit breaker's state ("closed", "open" or "half_open")."""
+    CIRCUIT_OPEN.labels(circuit).set(0 if state == "closed" else 1)
+
+
+def count_session_fallback(operation: str):
+    """Count a session, rate-limit or funnel operation that skipped Redis."""
+    SESSION_FALLBACKS.labels(operation).inc()
+
+
+def _statement_operation(statement: str) -> str:
+    operation = statement.lstrip()[:8].split(None, 1)
+    operation = operation[0].upper() if operation else ""
+    return operation if operation in _DB_OPERATIONS else "other"
+
+
+def instrument_engine(engine):
+    """Time every statement executed on a SQLAlchemy engine (metrics and the request's "db" span)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info["ntal_query_start"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info.pop("ntal_query_start", None)
+        if start is not None:
+            elapsed = time.perf_counter() - start
+            observe_db(_statement_operation(statement), elapsed)
+            record_span("db", elapsed)
+
+    return engine
+
+
+def sample_gauges():
+    """Refresh queue depth and pool usage gauges for this worker."""
+    from ..adapters import notifier, sms_dispatcher, whatsapp_ingest
+    from .pool_stats import get_pool_stats
+
+    dispatcher = sms_dispatcher.get_sms_dispatcher()
+    ingestor = whatsapp_ingest.get_whatsapp_ingestor()
+    callback_notifier = notifier.get_callback_notifier()
+    QUEUE_DEPTH.labels("sms_outbound").set(dispatcher.queue.qsize() if dispatcher else 0)
+    QUEUE_DEPTH.labels("whatsapp_inbound").set(ingestor.pending() if ingestor else 0)
+    QUEUE_DEPTH.labels("notifications").set(callback_notifier.queue.qsize() if callback_notifier else 0)
+
+    pools = get_pool_stats()
+    POOL_IN_USE.labels("database").set(pools["database"].get("checked_out", 0))
+    POOL_IN_USE.labels("redis").set(pools["redis"].get("in_use", 0))
+    if "redis_sessions" in pools:
+        POOL_IN_USE.labels("redis_sessions").set(pools["redis_sessions"]["in_use"])
+
+
+def render_metrics() -> Tuple[bytes, str]:
+    """
+    Render the exposition text.
+
+    Returns:
+        (body, content type); aggregated over all workers in multiprocess mode
+    """
+    sample_gauges()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class GaugeSampler:
+    """Refreshes gauges periodically so idle workers still report current values."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                sample_gauges()
+            except Exception:
+                logger.exception("Failed to sample metrics gauges")
+            await asyncio.sleep(self.interval)
+
+
+# Process-wide sampler, started in the app lifespan
+gauge_sampler: Optional[GaugeSampler] = None
+
+
+def start_gauge_sampler() -> Optional[GaugeSampler]:
+    global gauge_sampler
+    if gauge_sampler is None and settings.METRICS_SAMPLE_INTERVAL_SECONDS > 0:
+        gauge_sampler = GaugeSampler(settings.METRICS_SAMPLE_INTERVAL_SECONDS)
+        gauge_sampler.start()
+    return gauge_sampler
+
+
+async def stop_gauge_sampler():
+    global gauge_sampler
+    if gauge_sampler is not None:
+        await gauge_sampler.stop()
+        gauge_sampler = None
@@ -0,0 +1,162 @@
+"""Instrumented DB and Redis connection pools.
+
+Both pools time every connection acquisition so pool starvation shows up as
+wait time and timeouts in the per-worker pool stats.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from redis.asyncio import BlockingConnectionPool
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class AcquireStats:
+    """Counters for connection acquisitions from one pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, elapsed: float, timed_out: bool = False):
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_seconds_total += elapsed
+            if elapsed > self.wait_seconds_max:
+                self.wait_seconds_max = elapsed
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "acquisitions": self.acquisitions,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+                "wait_seconds_avg": round(self.wait_seconds_total / self.acquisitions, 6) if self.acquisitions else 0.0,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """SQLAlchemy QueuePool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquire_stats = AcquireStats()
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.acquire_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        self.acquire_stats.record(time.perf_counter() - start)
+        return connection
+
+
+class InstrumentedBlockingConnectionPool(BlockingConnectionPool):
+    """Redis BlockingConnectionPool that records how long callers wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.acquire_stats = AcquireStats()
+
+    async def get_connection(self, command_name, *keys, **options):
+        # Waits for a free slot under the condition, then connects outside it.
+        # (redis-py 5.0.1 connects while holding the condition and deadlocks
+        # on its own release() when the connect fails.)
+        start = time.perf_counter()
+        try:
+            async with asyncio.timeout(self.timeout):
+                async with self._condition:
+                    await self._condition.wait_for(self.can_get_connection)
+                    try:
+                        connection = self._available_connections.pop()
+                    except IndexError:
+                        connection = self.make_connection()
+                    self._in_use_connections.add(connection)
+        except asyncio.TimeoutError as err:
+            self.acquire_stats.record(time.perf_counter() - start, timed_out=True)
+            raise RedisConnectionError("No connection available.") from err
+        self.acquire_stats.record(time.perf_counter() - start)
+
+        try:
+            await self.ensure_connection(connection)
+        except BaseException:
+            await self.release(connection)
+            raise
+        return connection
+
+
+def database_pool_stats(engine) -> Dict[str, Any]:
+    """Stats for an engine's pool (size, checked out, overflow, wait time)."""
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    acquire_stats: Optional[AcquireStats] = getattr(pool, "acquire_stats", None)
+    if acquire_stats is not None:
+        stats.update(acquire_stats.snapshot())
+    return stats
+
+
+def redis_pool_stats(pool: Optional[BlockingConnectionPool]) -> Dict[str, Any]:
+    """Stats for a Redis connection pool (max, in use, idle, wait time)."""
+    if pool is None:
+        return {"connected": False}
+    stats: Dict[str, Any] = {
+        "pool_class": type(pool).__name__,
+        "max_connections": pool.max_connections,
+        "in_use": len(pool._in_use_connections),
+        "idle": len(pool._available_connections),
+    }
+    acquire_stats: Optional[AcquireStats] = getattr(pool, "acquire_stats", None)
+    if acquire_stats is not None:
+        stats.update(acquire_stats.snapshot())
+    return stats
+
+
+def redis_cluster_stats(client) -> Dict[str, Any]:
+    """Connection counts of a Redis Cluster client, summed over its nodes."""
+    nodes = client.get_nodes()
+    open_connections = sum(len(node._connections) for node in nodes)
+    idle = sum(len(node._free) for node in nodes)
+    return {
+        "pool_class": "cluster",
+        "nodes": len(nodes),
+        "max_connections": sum(node.max_connections for node in nodes),
+        "in_use": open_connections - idle,
+        "idle": idle,
+    }
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool stats for this worker process."""
+    from .database import engine
+    from . import redis_client
+
+    client = redis_client.redis_client
+    stats = {
+        "pid": os.getpid(),
+        "database": database_pool_stats(engine),
+        "redis": redis_pool_stats(client.connection_pool if client is not None else None),
+    }
+    session_client = redis_client.session_redis_client
+    if session_client is not None and session_client is not client:
+        stats["redis_sessions"] = redis_cluster_stats(session_client)
+    return stats
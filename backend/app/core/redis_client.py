@@ -1,26 +1,164 @@
+"""Redis clients.
+
+``get_redis()`` is the main client, used by background jobs, the callback
+scheduler, SLA timers and read-your-writes stickiness. It connects to
+REDIS_URL, or to the master that Sentinel reports for REDIS_SENTINEL_SERVICE
+when REDIS_SENTINELS is set, following failovers.
+
+``get_session_redis()`` holds the conversation keys (sessions, rate limits,
+funnel counters, contacts). With REDIS_CLUSTER_NODES set it is a Redis
+Cluster client, so session throughput scales with the number of shards;
+otherwise it is the main client. Every key a hop touches for one caller is
+hash-tagged with the caller's msisdn hash (``ussd:{<hash>}:session:<id>``,
+``ussd:{<hash>}:rate``, ``contact:{<hash>}``), so they live in one slot.
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Tuple, Union
+
 import redis.asyncio as redis
-from typing import Optional
+from redis.asyncio.cluster import ClusterNode, RedisCluster
+from redis.asyncio.connection import parse_url
+from redis.asyncio.sentinel import Sentinel
+
 from .config import settings
+from .metrics import observe_redis
+from .pool_stats import InstrumentedBlockingConnectionPool
 
-# Redis client instance
+# Redis client instances
 redis_client: Optional[redis.Redis] = None
+session_redis_client: Optional[Union[redis.Redis, RedisCluster]] = None
+
+
+def parse_nodes(nodes: str, default_port: int = 6379) -> List[Tuple[str, int]]:
+    """Parse "host:port,host:port" into (host, port) pairs."""
+    parsed = []
+    for node in nodes.split(","):
+        node = node.strip()
+        if not node:
+            continue
+        host, _, port = node.rpartition(":")
+        if not host:
+            host, port = port, ""
+        parsed.append((host, int(port) if port else default_port))
+    return parsed
+
+
+def _connection_kwargs() -> Dict[str, Any]:
+    return dict(
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        encoding="utf-8",
+        decode_responses=True,
+    )
+
+
+def build_redis_pool(url: str) -> InstrumentedBlockingConnectionPool:
+    """Create a bounded, instrumented connection pool from the configured settings."""
+    return InstrumentedBlockingConnectionPool.from_url(
+        url,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        **_connection_kwargs()
+    )
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that records the latency of every command."""
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            observe_redis(args[0], time.perf_counter() - start)
+
+
+class InstrumentedRedisCluster(RedisCluster):
+    """Redis Cluster client that records the latency of every command."""
+
+    async def execute_command(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **kwargs)
+        finally:
+            observe_redis(args[0], time.perf_counter() - start)
+
+
+def build_sentinel_client(url: str, sentinels: str, service: str) -> InstrumentedRedis:
+    """
+    Client for the master Sentinel reports for a service.
+
+    The master is looked up on connect and again after connection errors,
+    so a failover only costs the commands in flight. Credentials and the
+    database number come from ``url``; its host and port are ignored.
+    """
+    options = {key: value for key, value in parse_url(url).items() if key in ("username", "password", "db")}
+    sentinel = Sentinel(
+        parse_nodes(sentinels, default_port=26379),
+        sentinel_kwargs={
+            "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+            "socket_connect_timeout": settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            "password": settings.REDIS_SENTINEL_PASSWORD or None,
+        },
+    )
+    return sentinel.master_for(
+        service,
+        redis_class=InstrumentedRedis,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        **options,
+        **_connection_kwargs()
+    )
+
+
+def build_cluster_client(nodes: str, url: str) -> InstrumentedRedisCluster:
+    """
+    Redis Cluster client from startup nodes ("host:port,...").
+
+    The slot map is discovered from the startup nodes and refreshed on
+    MOVED/ASK redirects. REDIS_MAX_CONNECTIONS applies per node.
+    Credentials come from ``url``.
+    """
+    options = {key: value for key, value in parse_url(url).items() if key in ("username", "password")}
+    return InstrumentedRedisCluster(
+        startup_nodes=[ClusterNode(host, port) for host, port in parse_nodes(nodes)],
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        **options,
+        **_connection_kwargs()
+    )
 
 
 async def get_redis() -> redis.Redis:
     """Get Redis client instance"""
     global redis_client
     if redis_client is None:
-        redis_client = redis.from_url(
-            settings.REDIS_URL,
-            encoding="utf-8",
-            decode_responses=True
-        )
+        if settings.REDIS_SENTINELS:
+            redis_client = build_sentinel_client(
+                settings.REDIS_URL, settings.REDIS_SENTINELS, settings.REDIS_SENTINEL_SERVICE
+            )
+        else:
+            redis_client = InstrumentedRedis.from_pool(build_redis_pool(settings.REDIS_URL))
     return redis_client
 
 
+async def get_session_redis() -> Union[redis.Redis, RedisCluster]:
+    """Get the client for conversation keys (a cluster client when REDIS_CLUSTER_NODES is set)."""
+    global session_redis_client
+    if session_redis_client is None:
+        if settings.REDIS_CLUSTER_NODES:
+            session_redis_client = build_cluster_client(settings.REDIS_CLUSTER_NODES, settings.REDIS_URL)
+        else:
+            session_redis_client = await get_redis()
+    return session_redis_client
+
+
 async def close_redis():
     """Close Redis connection"""
-    global redis_client
+    global redis_client, session_redis_client
+    if session_redis_client is not None and session_redis_client is not redis_client:
+        await session_redis_client.aclose()
+    session_redis_client = None
     if redis_client:
-        await redis_client.close()
+        await redis_client.aclose()
         redis_client = None
@@ -0,0 +1,192 @@
+"""Indexed full-text search over encounter free text.
+
+Searches ``chief_complaint``, ``symptoms``, ``medical_history`` and ``notes``
+(weighted in that order):
+
+- SQLite: an external-content FTS5 table ``encounters_fts`` kept in sync by
+  insert/update/delete triggers on ``encounters``, ranked with bm25.
+- PostgreSQL: a stored generated ``tsvector`` column with a GIN index,
+  ranked with ts_rank_cd.
+
+Ranking has to score every match, so a common term ("headache") would get
+slower as the table grows. Only the newest ``SEARCH_MAX_CANDIDATES`` matches
+are ranked; finding them is a cheap walk of the index in id order.
+
+The index is created together with the ``encounters`` table and by
+``python -m app.migrate`` for existing databases.
+"""
+
+import re
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import bindparam, event, or_, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .config import settings
+from ..models.models import Encounter
+
+SEARCH_COLUMNS = ("chief_complaint", "symptoms", "medical_history", "notes")
+
+SNIPPET_START = "["
+SNIPPET_END = "]"
+
+MAX_QUERY_TERMS = 10
+
+_SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS encounters_fts USING fts5("
+    "chief_complaint, symptoms, medical_history, notes, "
+    "content='encounters', content_rowid='id', tokenize='porter unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS encounters_fts_insert AFTER INSERT ON encounters BEGIN "
+    "INSERT INTO encounters_fts(rowid, chief_complaint, symptoms, medical_history, notes) "
+    "VALUES (new.id, new.chief_complaint, new.symptoms, new.medical_history, new.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS encounters_fts_delete AFTER DELETE ON encounters BEGIN "
+    "INSERT INTO encounters_fts(encounters_fts, rowid, chief_complaint, symptoms, medical_history, notes) "
+    "VALUES ('delete', old.id, old.chief_complaint, old.symptoms, old.medical_history, old.notes); END",
+    "CREATE TRIGGER IF NOT EXISTS encounters_fts_update "
+    "AFTER UPDATE OF chief_complaint, symptoms, medical_history, notes ON encounters BEGIN "
+    "INSERT INTO encounters_fts(encounters_fts, rowid, chief_complaint, symptoms, medical_history, notes) "
+    "VALUES ('delete', old.id, old.chief_complaint, old.symptoms, old.medical_history, old.notes); "
+    "INSERT INTO encounters_fts(rowid, chief_complaint, symptoms, medical_history, notes) "
+    "VALUES (new.id, new.chief_complaint, new.symptoms, new.medical_history, new.notes); END",
+)
+
+_POSTGRES_DDL = (
+    "ALTER TABLE encounters ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(chief_complaint, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(symptoms, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(medical_history, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(notes, '')), 'D')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_encounters_search ON encounters USING GIN (search_vector)",
+)
+
+# Column weights: chief complaint, symptoms, medical history, notes. bm25()
+# is negative, lower is better.
+_SQLITE_SEARCH = text(
+    "SELECT rowid AS id, -bm25(encounters_fts, 10.0, 5.0, 2.0, 1.0) AS score "
+    "FROM encounters_fts "
+    "WHERE encounters_fts MATCH :query "
+    "AND rowid >= (SELECT coalesce(min(rowid), 0) FROM ("
+    "    SELECT rowid FROM encounters_fts WHERE encounters_fts MATCH :query "
+    "    ORDER BY rowid DESC LIMIT :candidates)) "
+    "ORDER BY score DESC, rowid DESC LIMIT :limit OFFSET :offset"
+)
+
+# Snippets are only built for the page of hits
+_SQLITE_SNIPPETS = text(
+    f"SELECT rowid AS id, snippet(encounters_fts, -1, '{SNIPPET_START}', '{SNIPPET_END}', '…', 12) AS snippet "
+    "FROM encounters_fts WHERE encounters_fts MATCH :query AND rowid IN :ids"
+).bindparams(bindparam("ids", expanding=True))
+
+# Headlines are only computed for the page of hits
+_POSTGRES_SEARCH = text(
+    "SELECT hits.id, hits.score, ts_headline('english', "
+    "concat_ws(' … ', e.chief_complaint, e.symptoms, e.medical_history, e.notes), hits.query, "
+    f"'MaxWords=24, MinWords=8, MaxFragments=2, StartSel={SNIPPET_START}, StopSel={SNIPPET_END}') AS snippet "
+    "FROM (SELECT id, ts_rank_cd(search_vector, query) AS score, query "
+    "      FROM (SELECT id, search_vector, query "
+    "            FROM encounters, websearch_to_tsquery('english', :query) AS query "
+    "            WHERE search_vector @@ query ORDER BY id DESC LIMIT :candidates) AS candidates "
+    "      ORDER BY score DESC, id LIMIT :limit OFFSET :offset) AS hits "
+    "JOIN encounters e ON e.id = hits.id ORDER BY hits.score DESC, hits.id"
+)
+
+
+class SearchHit(NamedTuple):
+    encounter: Encounter
+    score: float
+    snippet: Optional[str]
+
+
+def ensure_search_index(connection: Connection):
+    """Create the full-text index for the connection's dialect if it is missing (idempotent)."""
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'encounters_fts'")
+        ).first()
+        for statement in _SQLITE_DDL:
+            connection.execute(text(statement))
+        if not exists:
+            # Index rows written before the FTS table existed
+            connection.execute(text("INSERT INTO encounters_fts(encounters_fts) VALUES ('rebuild')"))
+    elif dialect == "postgresql":
+        for statement in _POSTGRES_DDL:
+            connection.execute(text(statement))
+
+
+def _drop_search_index(target, connection: Connection, **kw):
+    # The FTS table isn't in the metadata; drop it with encounters so a
+    # recreated table doesn't inherit a stale index
+    if connection.dialect.name == "sqlite":
+        connection.execute(text("DROP TABLE IF EXISTS encounters_fts"))
+
+
+event.listen(Encounter.__table__, "after_create", lambda target, connection, **kw: ensure_search_index(connection))
+event.listen(Encounter.__table__, "before_drop", _drop_search_index)
+
+
+def fts5_query(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 query in which all terms must match.
+
+    Terms are quoted so FTS5 operators in the text are searched as words;
+    stemming (porter) still applies. No prefix queries: expanding a prefix
+    costs more than the rest of the search.
+
+    Returns:
+        The MATCH expression, or None if the text has no searchable terms
+    """
+    terms = re.findall(r"\w+", query.lower())[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms)
+
+
+def search_encounters(db: Session, query: str, limit: int = 20, offset: int = 0) -> List[SearchHit]:
+    """
+    Full-text search of encounter free text, best matches first.
+
+    Args:
+        db: Database session
+        query: Free text typed by the provider
+        limit: Page size
+        offset: Hits to skip
+
+    Returns:
+        Ranked hits with a highlighted snippet, drawn from the newest
+        SEARCH_MAX_CANDIDATES matches
+    """
+    dialect = db.get_bind().dialect.name
+    params = {"limit": limit, "offset": offset, "candidates": settings.SEARCH_MAX_CANDIDATES}
+    if dialect == "sqlite":
+        match = fts5_query(query)
+        if match is None:
+            return []
+        rows = db.execute(_SQLITE_SEARCH, {"query": match, **params}).all()
+        if rows:
+            snippets = dict(db.execute(_SQLITE_SNIPPETS, {"query": match, "ids": [row.id for row in rows]}).all())
+            rows = [(row.id, row.score, snippets.get(row.id)) for row in rows]
+    elif dialect == "postgresql":
+        rows = db.execute(_POSTGRES_SEARCH, {"query": query, **params}).all()
+    else:
+        # No full-text index on this backend: unranked substring match
+        pattern = f"%{query}%"
+        encounters = (
+            db.query(Encounter)
+            .filter(or_(*(getattr(Encounter, column).ilike(pattern) for column in SEARCH_COLUMNS)))
+            .order_by(Encounter.id.desc())
+            .offset(offset)
+            .limit(limit)
+            .all()
+        )
+        return [SearchHit(encounter, 0.0, None) for encounter in encounters]
+
+    if not rows:
+        return []
+    encounters = {e.id: e for e in db.query(Encounter).filter(Encounter.id.in_([row[0] for row in rows]))}
+    return [
+        SearchHit(encounters[encounter_id], float(score), snippet)
+        for encounter_id, score, snippet in rows
+        if encounter_id in encounters
+    ]
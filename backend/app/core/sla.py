@@ -0,0 +1,329 @@
+"""SLA deadlines for queued callbacks, tracked in a Redis sorted set.
+
+When a callback is queued, its deadline (now + the SLA for its priority,
+``CALLBACK_SLA_SECONDS``) is added to ``callbacks:sla`` with the deadline as
+the score; assigning or completing the callback removes it. Each worker
+applies these from callback events on its event bus in batched pipelines,
+so requests never wait on Redis for this. Events are best-effort (a full
+subscriber queue or a Redis error loses them), so every
+``CALLBACK_SLA_RECONCILE_SECONDS`` each worker also re-adds the deadline of
+any queued callback missing from the set.
+
+Every ``CALLBACK_SLA_CHECK_INTERVAL_SECONDS`` each worker reads only the
+entries whose deadline has passed and claims each with ZREM; only the
+worker whose ZREM removed an entry handles it. The cost is proportional to
+breaches, not to the size of the queue. A breached callback that is still
+queued is escalated one priority level and gets that level's deadline. An
+urgent one raises a supervisor alert (warning log, ``callback.sla_breached``
+event, which the notifier texts to SUPERVISOR_ALERT_NUMBERS, and the
+``ntal_callback_sla_breaches_total`` metric) and is re-armed, so the alert
+repeats every urgent SLA period until someone takes it.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .events import (
+    CALLBACK_ASSIGNED,
+    CALLBACK_COMPLETED,
+    CALLBACK_ESCALATED,
+    CALLBACK_QUEUED,
+    CALLBACK_SLA_BREACHED,
+    Event,
+    EventBus,
+    event_bus,
+)
+from .logging_config import log_event
+from .metrics import count_sla_breach
+from .redis_client import get_redis
+from ..models.models import Callback, CallbackPriority, CallbackStatus
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "callbacks"
+
+# Deadlines re-added per ZADD when reconciling
+RECONCILE_BATCH = 1000
+
+# Next priority up when a callback misses its SLA; urgent alerts supervisors instead
+ESCALATION = {
+    CallbackPriority.LOW: CallbackPriority.MEDIUM,
+    CallbackPriority.MEDIUM: CallbackPriority.HIGH,
+    CallbackPriority.HIGH: CallbackPriority.URGENT,
+}
+
+
+def parse_sla_seconds(spec: str) -> Dict[CallbackPriority, float]:
+    """
+    Parse ``"priority=seconds,priority=seconds"`` into a dict.
+
+    Raises:
+        ValueError: If an entry is malformed, a priority is unknown or missing,
+            or a deadline isn't positive
+    """
+    deadlines = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        priority, _, seconds = entry.partition("=")
+        value = float(seconds)
+        if value <= 0:
+            raise ValueError(f"SLA for {priority!r} must be positive")
+        deadlines[CallbackPriority(priority.strip().lower())] = value
+    missing = set(CallbackPriority) - set(deadlines)
+    if missing:
+        raise ValueError(f"No SLA for {', '.join(sorted(p.value for p in missing))}")
+    return deadlines
+
+
+class SLAMonitor:
+    """Tracks callback deadlines in Redis and escalates the ones that pass."""
+
+    def __init__(
+        self,
+        redis_client: Optional[redis.Redis] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        bus: EventBus = event_bus,
+        sla_seconds: Optional[Dict[CallbackPriority, float]] = None,
+        check_interval: float = 5.0,
+        reconcile_interval: float = 300.0,
+        batch_size: int = 100,
+        key_prefix: str = KEY_PREFIX,
+    ):
+        self.redis = redis_client
+        self.session_factory = session_factory
+        self.bus = bus
+        self.sla_seconds = sla_seconds or parse_sla_seconds(settings.CALLBACK_SLA_SECONDS)
+        self.check_interval = check_interval
+        self.reconcile_interval = reconcile_interval
+        self.batch_size = batch_size
+        self.key = f"{key_prefix}:sla"
+        self.stats = {"tracked": 0, "escalated": 0, "supervisor_alerts": 0, "track_failures": 0, "reconciled": 0}
+        self._events: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @classmethod
+    def from_settings(cls, **overrides) -> "SLAMonitor":
+        options = dict(
+            sla_seconds=parse_sla_seconds(settings.CALLBACK_SLA_SECONDS),
+            check_interval=settings.CALLBACK_SLA_CHECK_INTERVAL_SECONDS,
+            reconcile_interval=settings.CALLBACK_SLA_RECONCILE_SECONDS,
+            batch_size=settings.CALLBACK_SLA_BATCH_SIZE,
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    async def start(self):
+        if self.redis is None:
+            self.redis = await get_redis()
+        self._events = self.bus.subscribe([CALLBACK_QUEUED, CALLBACK_ASSIGNED, CALLBACK_COMPLETED])
+        self._tasks = [asyncio.create_task(self._track_events()), asyncio.create_task(self._check_loop())]
+
+    async def stop(self):
+        if self._events is not None:
+            self.bus.unsubscribe(self._events)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def track(self, events: List[Event], now: Optional[float] = None):
+        """Add deadlines for queued callbacks and drop them for assigned or completed ones."""
+        now = time.time() if now is None else now
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for event in events:
+                member = str(event.payload["callback_id"])
+                if event.type == CALLBACK_QUEUED:
+                    deadline = now + self.sla_seconds[CallbackPriority(event.payload["priority"])]
+                    pipe.zadd(self.key, {member: deadline})
+                else:
+                    pipe.zrem(self.key, member)
+            await pipe.execute()
+        self.stats["tracked"] += len(events)
+
+    async def reconcile(self) -> int:
+        """
+        Re-add the deadlines of queued callbacks missing from the set.
+
+        ZADD NX leaves existing (possibly re-armed) deadlines alone. A missing
+        deadline counts from the callback's last change, so one that is
+        already late is handled by the next check.
+
+        Returns:
+            Number of deadlines added
+        """
+        queued = await asyncio.to_thread(self._queued_deadlines)
+        added = 0
+        for start in range(0, len(queued), RECONCILE_BATCH):
+            added += await self.redis.zadd(self.key, dict(queued[start:start + RECONCILE_BATCH]), nx=True)
+        self.stats["reconciled"] += added
+        if added:
+            log_event(logger, "callback_sla_reconciled", "Re-added %d missing callback SLA deadlines", added,
+                      level=logging.WARNING)
+        return added
+
+    def _queued_deadlines(self) -> List[Tuple[str, float]]:
+        db = self.session_factory()
+        try:
+            queued = db.query(Callback.id, Callback.priority, Callback.created_at, Callback.updated_at).filter(
+                Callback.status == CallbackStatus.QUEUED
+            )
+            deadlines = []
+            for callback_id, priority, created_at, updated_at in queued:
+                # Escalation updates the row, so updated_at is when the current priority started
+                since = (updated_at or created_at).replace(tzinfo=timezone.utc).timestamp()
+                deadlines.append((str(callback_id), since + self.sla_seconds[priority or CallbackPriority.MEDIUM]))
+            return deadlines
+        finally:
+            db.close()
+
+    async def claim_expired(self, now: Optional[float] = None) -> List[int]:
+        """
+        Remove up to batch_size passed deadlines, oldest first.
+
+        Returns:
+            Ids of the callbacks whose entry this call removed (entries
+            claimed concurrently by another worker are left to it)
+        """
+        now = time.time() if now is None else now
+        members = await self.redis.zrangebyscore(self.key, "-inf", now, start=0, num=self.batch_size)
+        if not members:
+            return []
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for member in members:
+                pipe.zrem(self.key, member)
+            removed = await pipe.execute()
+        return [int(member) for member, was_removed in zip(members, removed) if was_removed]
+
+    async def check(self, now: Optional[float] = None) -> int:
+        """
+        Handle one batch of passed deadlines.
+
+        Returns:
+            Number of deadlines claimed (callbacks no longer queued are dropped)
+        """
+        now = time.time() if now is None else now
+        claimed = await self.claim_expired(now)
+        if not claimed:
+            return 0
+        try:
+            breaches = await asyncio.to_thread(self._escalate, claimed)
+        except Exception:
+            # Put the deadlines back so the next check retries them
+            await self.redis.zadd(self.key, {str(callback_id): now for callback_id in claimed})
+            raise
+
+        rearm = {}
+        for callback_id, priority, escalated_to in breaches:
+            if escalated_to is None:
+                self.stats["supervisor_alerts"] += 1
+                count_sla_breach(priority.value, "supervisor_alerted")
+                self.bus.publish(CALLBACK_SLA_BREACHED, callback_id=callback_id, priority=priority.value)
+                log_event(logger, "callback_sla_breached", "Urgent callback %s is still queued past its SLA",
+                          callback_id, level=logging.WARNING, callback_id=callback_id, priority=priority.value)
+                rearm[str(callback_id)] = now + self.sla_seconds[priority]
+            else:
+                self.stats["escalated"] += 1
+                count_sla_breach(priority.value, "escalated")
+                self.bus.publish(CALLBACK_ESCALATED, callback_id=callback_id, priority=escalated_to.value)
+                log_event(logger, "callback_escalated", "Callback %s escalated from %s to %s",
+                          callback_id, priority.value, escalated_to.value,
+                          callback_id=callback_id, priority=escalated_to.value)
+                rearm[str(callback_id)] = now + self.sla_seconds[escalated_to]
+        if rearm:
+            await self.redis.zadd(self.key, rearm)
+        return len(claimed)
+
+    def _escalate(self, callback_ids: List[int]) -> List[Tuple[int, CallbackPriority, Optional[CallbackPriority]]]:
+        # Returns (callback id, priority at breach, new priority or None for urgent)
+        db = self.session_factory()
+        try:
+            queued = db.query(Callback.id, Callback.priority).filter(
+                Callback.id.in_(callback_ids), Callback.status == CallbackStatus.QUEUED
+            ).all()
+            breaches = []
+            for callback_id, stored_priority in queued:
+                priority = stored_priority or CallbackPriority.MEDIUM
+                escalated_to = ESCALATION.get(priority)
+                if escalated_to is not None:
+                    # Only if still queued at the same priority
+                    updated = db.query(Callback).filter(
+                        Callback.id == callback_id,
+                        Callback.status == CallbackStatus.QUEUED,
+                        Callback.priority == stored_priority,
+                    ).update({Callback.priority: escalated_to}, synchronize_session=False)
+                    if not updated:
+                        continue
+                breaches.append((callback_id, priority, escalated_to))
+            db.commit()
+            return breaches
+        finally:
+            db.close()
+
+    async def _track_events(self):
+        while True:
+            events = [await self._events.get()]
+            while len(events) < self.batch_size and not self._events.empty():
+                events.append(self._events.get_nowait())
+            try:
+                await self.track(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats["track_failures"] += len(events)
+                logger.exception("Failed to update SLA deadlines for %d callback events", len(events))
+
+    async def _check_loop(self):
+        next_reconcile = 0.0
+        while True:
+            if time.monotonic() >= next_reconcile:
+                try:
+                    await self.reconcile()
+                    next_reconcile = time.monotonic() + self.reconcile_interval
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("SLA reconcile failed")
+            try:
+                # Drain a backlog of breaches before sleeping
+                while await self.check() >= self.batch_size:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("SLA check failed")
+            await asyncio.sleep(self.check_interval)
+
+
+# Process-wide monitor, started in the app lifespan when enabled
+sla_monitor: Optional[SLAMonitor] = None
+
+
+async def start_sla_monitor() -> Optional[SLAMonitor]:
+    """Start the process-wide monitor if CALLBACK_SLA_ENABLED."""
+    global sla_monitor
+    if sla_monitor is None and settings.CALLBACK_SLA_ENABLED:
+        sla_monitor = SLAMonitor.from_settings()
+        await sla_monitor.start()
+    return sla_monitor
+
+
+async def stop_sla_monitor():
+    global sla_monitor
+    if sla_monitor is not None:
+        await sla_monitor.stop()
+        sla_monitor = None
+
+
+def get_sla_monitor() -> Optional[SLAMonitor]:
+    """Get the running monitor (None when disabled or outside the app lifespan)."""
+    return sla_monitor
@@ -0,0 +1,168 @@
+"""Keyword grammar for one-message SMS triage.
+
+    NTAL <age> <gender> [symptoms...] [language] [CB]
+
+    age       1-4 as in the USSD menu, or <5 / U5, 5-17, 18-49, 50+
+    gender    M, F, O (or MALE, FEMALE, OTHER)
+    symptoms  F fever, H severe headache, D danger sign, C cough; as separate
+              tokens ("F H") or run together ("FH"); omitted symptoms are "no"
+    language  EN or YO (optional; defaults to English)
+    CB        request a callback
+
+Tokens may be separated by spaces, commas, semicolons, "*", "#" or "/".
+Tokens are case-insensitive. The token tables are compiled once per process,
+so parsing a message is a regex scan plus one dictionary lookup per token.
+"""
+
+import re
+from typing import Dict, NamedTuple, Optional, Tuple
+
+KEYWORDS = ("NTAL",)
+
+AGE_TOKENS = {
+    "<5": ("1", "<5", "U5"),
+    "5-17": ("2", "5-17"),
+    "18-49": ("3", "18-49"),
+    "50+": ("4", "50+"),
+}
+
+GENDER_TOKENS = {
+    "male": ("M", "MALE"),
+    "female": ("F", "FEMALE"),
+    "other": ("O", "OTHER"),
+}
+
+SYMPTOM_TOKENS = {
+    "fever": ("F", "FEVER"),
+    "severe_headache": ("H", "HEADACHE"),
+    "danger_sign": ("D", "DANGER"),
+    "cough": ("C", "COUGH"),
+}
+
+LANGUAGE_TOKENS = {
+    "en": ("EN", "ENG", "ENGLISH"),
+    "yo": ("YO", "YOR", "YORUBA"),
+}
+
+CALLBACK_TOKENS = ("CB", "CALL", "CALLBACK")
+
+# Longest concatenated SMS (3 parts); anything longer is rejected unparsed
+MAX_MESSAGE_LENGTH = 480
+
+_TOKEN = re.compile(r"[^\s,;*#/]+")
+
+
+class SMSParseError(ValueError):
+    """Raised when an SMS does not match the triage grammar."""
+
+    def __init__(self, reason: str, token: Optional[str] = None):
+        super().__init__(reason if token is None else f"{reason}: {token!r}")
+        self.reason = reason
+        self.token = token
+
+
+class SMSTriage(NamedTuple):
+    """Triage answers parsed from one SMS."""
+
+    age_group: str
+    gender: str
+    symptoms: Dict[str, bool]
+    language: str
+    callback: bool
+
+
+class _Grammar(NamedTuple):
+    keywords: frozenset
+    ages: Dict[str, str]
+    genders: Dict[str, str]
+    # Tokens allowed after the gender, mapped to (kind, value)
+    tail: Dict[str, Tuple[str, str]]
+    # Single-letter symptom codes, for run-together tokens such as "FHC"
+    letters: Dict[str, str]
+
+
+_grammar: Optional[_Grammar] = None
+
+
+def compile_grammar() -> _Grammar:
+    """Build the token lookup tables once per process."""
+    global _grammar
+    if _grammar is None:
+        tail: Dict[str, Tuple[str, str]] = {}
+        letters: Dict[str, str] = {}
+        for name, tokens in SYMPTOM_TOKENS.items():
+            for token in tokens:
+                tail[token] = ("symptom", name)
+                if len(token) == 1:
+                    letters[token] = name
+        for language, tokens in LANGUAGE_TOKENS.items():
+            for token in tokens:
+                tail[token] = ("language", language)
+        for token in CALLBACK_TOKENS:
+            tail[token] = ("callback", "")
+        _grammar = _Grammar(
+            keywords=frozenset(KEYWORDS),
+            ages={token: age for age, tokens in AGE_TOKENS.items() for token in tokens},
+            genders={token: gender for gender, tokens in GENDER_TOKENS.items() for token in tokens},
+            tail=tail,
+            letters=letters,
+        )
+    return _grammar
+
+
+def parse_sms(message: str) -> SMSTriage:
+    """
+    Parse a triage SMS.
+
+    Args:
+        message: Raw SMS text
+
+    Returns:
+        SMSTriage with every symptom in SYMPTOM_TOKENS set to True or False
+
+    Raises:
+        SMSParseError: If the message does not match the grammar
+    """
+    grammar = _grammar or compile_grammar()
+    if len(message) > MAX_MESSAGE_LENGTH:
+        raise SMSParseError("too_long")
+
+    tokens = _TOKEN.findall(message.upper())
+    if not tokens:
+        raise SMSParseError("empty")
+    if tokens[0] not in grammar.keywords:
+        raise SMSParseError("keyword", tokens[0])
+    if len(tokens) < 2 or tokens[1] not in grammar.ages:
+        raise SMSParseError("age_group", tokens[1] if len(tokens) > 1 else None)
+    if len(tokens) < 3 or tokens[2] not in grammar.genders:
+        raise SMSParseError("gender", tokens[2] if len(tokens) > 2 else None)
+
+    symptoms = dict.fromkeys(SYMPTOM_TOKENS, False)
+    language = None
+    callback = False
+    for token in tokens[3:]:
+        match = grammar.tail.get(token)
+        if match is None:
+            names = [grammar.letters.get(letter) for letter in token]
+            if None in names:
+                raise SMSParseError("token", token)
+            for name in names:
+                symptoms[name] = True
+            continue
+        kind, value = match
+        if kind == "symptom":
+            symptoms[value] = True
+        elif kind == "language":
+            if language is not None and language != value:
+                raise SMSParseError("language", token)
+            language = value
+        else:
+            callback = True
+
+    return SMSTriage(
+        age_group=grammar.ages[tokens[1]],
+        gender=grammar.genders[tokens[2]],
+        symptoms=symptoms,
+        language=language or "en",
+        callback=callback,
+    )
@@ -0,0 +1,145 @@
+"""Request-scoped timing spans, reported as a ``Server-Timing`` header.
+
+``TimingMiddleware`` starts a ``RequestTimings`` for each HTTP request and
+stores it in a context variable. Code on the request path wraps work in
+``span(name)`` (or calls ``record(name, seconds)`` when it already has a
+measurement); the durations of spans with the same name are summed. With
+``TIMING_ENABLED`` off no ``RequestTimings`` exists, so ``span`` returns a
+shared no-op and ``record`` returns after one context variable lookup.
+
+    Server-Timing: redis;desc="x3";dur=0.412, flow;dur=0.087, db;dur=1.204, total;dur=2.950
+"""
+
+import logging
+import random
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["RequestTimings"]] = ContextVar("ntal_request_timings", default=None)
+
+
+class RequestTimings:
+    """Accumulated span durations for one request."""
+
+    __slots__ = ("spans",)
+
+    def __init__(self):
+        self.spans: Dict[str, List[float]] = {}  # name -> [seconds, count]
+
+    def add(self, name: str, seconds: float):
+        entry = self.spans.get(name)
+        if entry is None:
+            self.spans[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+    def header(self, total: float) -> str:
+        """Format the spans (in milliseconds) as a Server-Timing header value."""
+        parts = []
+        for name, (seconds, count) in self.spans.items():
+            if count > 1:
+                parts.append(f'{name};desc="x{count}";dur={seconds * 1000:.3f}')
+            else:
+                parts.append(f"{name};dur={seconds * 1000:.3f}")
+        parts.append(f"total;dur={total * 1000:.3f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(seconds * 1000, 3) for name, (seconds, _) in self.spans.items()}
+
+
+class _Span:
+    __slots__ = ("timings", "name", "start")
+
+    def __init__(self, timings: RequestTimings, name: str):
+        self.timings = timings
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timings.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str):
+    """Time a block as part of the current request (no-op outside a timed request)."""
+    timings = _current.get()
+    if timings is None:
+        return _NOOP_SPAN
+    return _Span(timings, name)
+
+
+def record(name: str, seconds: float):
+    """Add an already measured duration to the current request's spans."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def current_timings() -> Optional[RequestTimings]:
+    return _current.get()
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware that times each HTTP request and adds a Server-Timing header.
+
+    A ``log_sample_rate`` fraction of requests is also logged with its spans.
+    """
+
+    def __init__(self, app, log_sample_rate: float = 0.0):
+        self.app = app
+        self.log_sample_rate = log_sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.TIMING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                header = timings.header(time.perf_counter() - start)
+                message.setdefault("headers", [])
+                message["headers"] = [*message["headers"], (b"server-timing", header.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            if self.log_sample_rate > 0 and random.random() < self.log_sample_rate:
+                total = time.perf_counter() - start
+                logger.info(
+                    "Request timing %s %s total=%.3fms %s",
+                    scope["method"],
+                    scope["path"],
+                    total * 1000,
+                    " ".join(f"{name}={ms}ms" for name, ms in timings.as_dict().items()),
+                    extra={"path": scope["path"], "total_ms": round(total * 1000, 3), "spans": timings.as_dict()},
+                )
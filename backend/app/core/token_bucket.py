@@ -0,0 +1,37 @@
+"""Async token bucket for shaping outbound traffic to a provider's rate limit."""
+
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket refilled at ``rate`` tokens per second up to ``capacity``.
+
+    Requests larger than the current balance put the bucket into debt and
+    sleep until it is repaid, so batches bigger than the burst capacity are
+    still shaped to the average rate.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Take ``tokens``, sleeping as long as needed to stay under the rate."""
+        async with self._lock:
+            self._refill()
+            self._tokens -= tokens
+            if self._tokens < 0:
+                await asyncio.sleep(-self._tokens / self.rate)
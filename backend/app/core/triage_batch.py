@@ -0,0 +1,134 @@
+"""Vectorized batch triage over columnar symptom arrays.
+
+Scores many encounters in one NumPy pass for research re-scoring and rule
+simulations. Symptom columns are folded into the ruleset's bitmask and looked
+up in its compiled table, so results are identical to :func:`assess_risk`.
+"""
+
+import weakref
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from .triage_rules import CompiledRuleset, get_active_ruleset
+
+
+class BatchTriageResult(NamedTuple):
+    """Column-oriented triage results, one element per input row."""
+
+    risk_codes: np.ndarray
+    advice: np.ndarray
+    urgent: np.ndarray
+    priorities: np.ndarray
+    ruleset_version: str
+
+    def __len__(self) -> int:
+        return len(self.risk_codes)
+
+
+class _BatchTables(NamedTuple):
+    table: np.ndarray
+    risk_codes: np.ndarray
+    advice: np.ndarray
+    urgent: np.ndarray
+    priorities: np.ndarray
+
+
+_tables_cache: "weakref.WeakKeyDictionary[CompiledRuleset, _BatchTables]" = weakref.WeakKeyDictionary()
+
+
+def _tables(ruleset: CompiledRuleset) -> _BatchTables:
+    tables = _tables_cache.get(ruleset)
+    if tables is None:
+        outcomes = ruleset.outcomes
+        tables = _BatchTables(
+            table=np.frombuffer(ruleset.table, dtype=np.uint8),
+            risk_codes=np.array([o.risk_code for o in outcomes], dtype=object),
+            advice=np.array([o.advice for o in outcomes], dtype=object),
+            urgent=np.array([o.urgent for o in outcomes], dtype=bool),
+            priorities=np.array([ruleset.priority(o.risk_code) for o in outcomes], dtype=object),
+        )
+        _tables_cache[ruleset] = tables
+    return tables
+
+
+def columns_from_rows(
+    rows: Sequence[Optional[Mapping[str, Any]]],
+    ruleset: Optional[CompiledRuleset] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Convert symptom dicts (e.g. ``Encounter.symptoms_json``) into boolean columns.
+
+    Missing rows and missing keys count as ``False``, and values are coerced
+    with ``bool()`` exactly like the scalar engine.
+
+    Args:
+        rows: Sequence of symptom dictionaries (``None`` allowed)
+        ruleset: Ruleset whose symptoms to extract (defaults to the active ruleset)
+
+    Returns:
+        Dictionary of symptom key to boolean NumPy array
+    """
+    if ruleset is None:
+        ruleset = get_active_ruleset()
+    count = len(rows)
+    return {
+        key: np.fromiter(
+            (bool(row.get(key, False)) if row else False for row in rows),
+            dtype=bool,
+            count=count,
+        )
+        for key in ruleset.symptoms
+    }
+
+
+def assess_risk_batch(
+    columns: Mapping[str, Iterable[bool]],
+    ruleset: Optional[CompiledRuleset] = None
+) -> BatchTriageResult:
+    """
+    Assess risk for many encounters at once.
+
+    Args:
+        columns: Mapping of symptom key to a boolean array; absent keys count as ``False``
+        ruleset: Ruleset to evaluate with (defaults to the active ruleset)
+
+    Returns:
+        BatchTriageResult with risk codes, advice, urgent flags and callback priorities
+    """
+    if ruleset is None:
+        ruleset = get_active_ruleset()
+
+    arrays = {key: np.asarray(value, dtype=bool) for key, value in columns.items() if key in ruleset.symptoms}
+    if not arrays:
+        raise ValueError(f"No symptom columns given; expected any of {ruleset.symptoms}")
+
+    shapes = {array.shape for array in arrays.values()}
+    if len(shapes) != 1 or len(next(iter(shapes))) != 1:
+        raise ValueError("Symptom columns must be one-dimensional arrays of equal length")
+    size = next(iter(shapes))[0]
+
+    mask = np.zeros(size, dtype=np.intp)
+    for bit, key in enumerate(ruleset.symptoms):
+        if key in arrays:
+            mask |= arrays[key].astype(np.intp) << bit
+
+    tables = _tables(ruleset)
+    outcome = tables.table[mask]
+    return BatchTriageResult(
+        risk_codes=tables.risk_codes[outcome],
+        advice=tables.advice[outcome],
+        urgent=tables.urgent[outcome],
+        priorities=tables.priorities[outcome],
+        ruleset_version=ruleset.version,
+    )
+
+
+def assess_risk_rows(
+    rows: Sequence[Optional[Mapping[str, Any]]],
+    ruleset: Optional[CompiledRuleset] = None
+) -> BatchTriageResult:
+    """Assess risk for rows of symptom dicts, e.g. pulled from ``symptoms_json``."""
+    if ruleset is None:
+        ruleset = get_active_ruleset()
+    return assess_risk_batch(columns_from_rows(rows, ruleset), ruleset)
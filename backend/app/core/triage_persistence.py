@@ -0,0 +1,77 @@
+"""Persistence of completed channel triages (USSD, SMS, ...)."""
+
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from .events import CALLBACK_QUEUED, publish
+from .timing import span
+from .triage_engine import get_priority_from_risk
+from .triage_rules import CompiledRuleset
+from .ussd_utils import hash_msisdn
+from ..models.models import Callback, Encounter
+
+
+def save_triage_encounter(
+    db: Session,
+    channel: str,
+    msisdn: str,
+    responses: Dict[str, Any],
+    consent_version: str,
+    request_callback: bool = False,
+    ruleset: Optional[CompiledRuleset] = None,
+) -> Tuple[Encounter, Optional[Callback]]:
+    """
+    Save a triaged encounter and, optionally, its callback request.
+
+    Args:
+        db: Database session
+        channel: Channel the triage came from ("USSD", "SMS", ...)
+        msisdn: Caller's phone number (stored hashed)
+        responses: Triage answers plus risk_code, urgent_flag and ruleset_version
+        consent_version: Consent text version the caller agreed to
+        request_callback: Also queue a provider callback
+        ruleset: Ruleset that triaged the answers, for the callback priority
+            (defaults to the active ruleset)
+
+    Returns:
+        Tuple of (encounter, callback or None)
+    """
+    msisdn_hash = hash_msisdn(msisdn)
+    encounter = Encounter(
+        channel=channel,
+        msisdn_hash=msisdn_hash,
+        age_group=responses.get("age_group"),
+        patient_gender=responses.get("gender"),
+        symptoms_json=responses,
+        risk_code=responses.get("risk_code"),
+        triage_ruleset_version=responses.get("ruleset_version"),
+        consent_given=responses.get("consent", False),
+        consent_version=consent_version,
+        status="pending",
+        urgency="critical" if responses.get("urgent_flag") else "medium"
+    )
+    db.add(encounter)
+
+    callback = None
+    queued_event = None
+    if request_callback:
+        db.flush()
+        priority = get_priority_from_risk(responses.get("risk_code", "LOW_RISK"), ruleset)
+        callback = Callback(
+            encounter_id=encounter.id,
+            msisdn_hash=msisdn_hash,
+            priority=priority,
+            status="queued"
+        )
+        db.add(callback)
+        # The commit flushes anyway; flushing here gives us the id without a reload afterwards
+        db.flush()
+        queued_event = dict(callback_id=callback.id, encounter_id=encounter.id, priority=priority)
+
+    with span("commit"):
+        db.commit()
+    db.refresh(encounter)
+    if queued_event is not None:
+        publish(CALLBACK_QUEUED, **queued_event)
+    return encounter, callback
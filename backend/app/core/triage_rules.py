@@ -0,0 +1,254 @@
+"""Versioned, declarative triage rulesets compiled to a bitmask lookup table.
+
+A ruleset is a JSON document listing boolean symptoms and first-match rules.
+At load time every combination of symptoms (2^N for N symptoms) is evaluated
+once, so scoring an encounter is a bitmask computation plus one table lookup.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RULESET_PATH = Path(__file__).parent / "rulesets" / "triage-v1.json"
+
+# 2^16 entries keeps the lookup table small enough to rebuild on every reload
+MAX_SYMPTOMS = 16
+
+DEFAULT_PRIORITY = "medium"
+
+
+@dataclass(frozen=True)
+class TriageOutcome:
+    """Result of a triage rule."""
+
+    risk_code: str
+    advice: str
+    urgent: bool
+
+    def as_tuple(self) -> Tuple[str, str, bool]:
+        return self.risk_code, self.advice, self.urgent
+
+
+class CompiledRuleset:
+    """Triage ruleset compiled into a table indexed by symptom bitmask."""
+
+    def __init__(
+        self,
+        version: str,
+        symptoms: Tuple[str, ...],
+        outcomes: Tuple[TriageOutcome, ...],
+        table: bytes,
+        priorities: Dict[str, str],
+        source: Optional[str] = None,
+    ):
+        self.version = version
+        self.symptoms = symptoms
+        self.outcomes = outcomes
+        self.table = table
+        self.priorities = priorities
+        self.source = source
+        self._bits = tuple((name, 1 << i) for i, name in enumerate(symptoms))
+
+    def mask(self, symptoms: Mapping[str, Any]) -> int:
+        """Build the bitmask for a symptom dictionary (bit i = ``self.symptoms[i]``)."""
+        mask = 0
+        for name, bit in self._bits:
+            if symptoms.get(name, False):
+                mask |= bit
+        return mask
+
+    def evaluate(self, symptoms: Mapping[str, Any]) -> TriageOutcome:
+        """Look up the outcome for a symptom dictionary."""
+        return self.outcomes[self.table[self.mask(symptoms)]]
+
+    def priority(self, risk_code: str) -> str:
+        """Map a risk code to its callback priority."""
+        return self.priorities.get(risk_code, DEFAULT_PRIORITY)
+
+
+def _parse_outcome(data: Mapping[str, Any], where: str) -> TriageOutcome:
+    try:
+        return TriageOutcome(
+            risk_code=str(data["risk_code"]),
+            advice=str(data["advice"]),
+            urgent=bool(data.get("urgent", False)),
+        )
+    except KeyError as exc:
+        raise ValueError(f"{where} is missing {exc.args[0]!r}") from None
+
+
+def compile_ruleset(data: Mapping[str, Any], source: Optional[str] = None) -> CompiledRuleset:
+    """
+    Compile a ruleset document into a lookup table.
+
+    Args:
+        data: Parsed ruleset document
+        source: Where the document was loaded from (for diagnostics)
+
+    Returns:
+        CompiledRuleset ready for O(1) evaluation
+
+    Raises:
+        ValueError: If the document is malformed
+    """
+    version = data.get("version")
+    if not version:
+        raise ValueError("Ruleset must declare a version")
+
+    symptoms = tuple(data.get("symptoms") or ())
+    if not symptoms:
+        raise ValueError("Ruleset must declare at least one symptom")
+    if len(set(symptoms)) != len(symptoms):
+        raise ValueError("Ruleset symptoms must be unique")
+    if len(symptoms) > MAX_SYMPTOMS:
+        raise ValueError(f"Ruleset declares {len(symptoms)} symptoms; at most {MAX_SYMPTOMS} are supported")
+
+    conditions: List[List[Tuple[int, bool]]] = []
+    outcomes: List[TriageOutcome] = []
+    for i, rule in enumerate(data.get("rules") or []):
+        when = rule.get("when") or {}
+        unknown = set(when) - set(symptoms)
+        if unknown:
+            raise ValueError(f"Rule {i} references undeclared symptoms: {sorted(unknown)}")
+        conditions.append([(1 << symptoms.index(name), bool(value)) for name, value in when.items()])
+        outcomes.append(_parse_outcome(rule, f"Rule {i}"))
+
+    if "default" not in data:
+        raise ValueError("Ruleset must declare a default outcome")
+    outcomes.append(_parse_outcome(data["default"], "Default outcome"))
+    if len(outcomes) > 256:
+        raise ValueError("Ruleset may declare at most 255 rules")
+
+    default_index = len(outcomes) - 1
+    table = bytearray(default_index for _ in range(1 << len(symptoms)))
+    for mask in range(len(table)):
+        for index, condition in enumerate(conditions):
+            if all(bool(mask & bit) == value for bit, value in condition):
+                table[mask] = index
+                break
+
+    return CompiledRuleset(
+        version=str(version),
+        symptoms=symptoms,
+        outcomes=tuple(outcomes),
+        table=bytes(table),
+        priorities=dict(data.get("priorities") or {}),
+        source=source,
+    )
+
+
+def load_ruleset(path: os.PathLike) -> CompiledRuleset:
+    """Load and compile a ruleset from a JSON file."""
+    path = Path(path)
+    with path.open(encoding="utf-8") as handle:
+        data = json.load(handle)
+    return compile_ruleset(data, source=str(path))
+
+
+def resolve_ruleset_path(name: str) -> Path:
+    """
+    Resolve a ruleset file name inside the rulesets directory.
+
+    The directory is the one holding the active ruleset, so candidate
+    protocols can be deployed next to it.
+
+    Raises:
+        ValueError: If the name escapes the rulesets directory
+    """
+    directory = Path(settings.TRIAGE_RULESET_PATH or DEFAULT_RULESET_PATH).parent.resolve()
+    path = (directory / name).resolve()
+    if path.parent != directory:
+        raise ValueError(f"Ruleset {name!r} is not in {directory}")
+    return path
+
+
+class RulesetRegistry:
+    """
+    Holds the active ruleset and hot-reloads it when its file changes.
+
+    Each worker process polls the file's mtime at most once per
+    ``reload_interval`` seconds, so a protocol change rolls out to every
+    worker without a restart. A ruleset that fails to compile is logged and
+    the previous version stays active.
+    """
+
+    def __init__(self, path: os.PathLike, reload_interval: float = 5.0):
+        self.path = Path(path)
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._ruleset: Optional[CompiledRuleset] = None
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+
+    def current(self) -> CompiledRuleset:
+        """Return the active ruleset, reloading it if the file changed."""
+        ruleset = self._ruleset
+        if ruleset is None or (self.reload_interval >= 0 and time.monotonic() >= self._next_check):
+            ruleset = self._check()
+        return ruleset
+
+    def reload(self) -> CompiledRuleset:
+        """
+        Force a reload from disk.
+
+        Raises:
+            OSError, ValueError: If the file cannot be read or compiled;
+                the previous ruleset stays active
+        """
+        with self._lock:
+            mtime = self.path.stat().st_mtime
+            ruleset = load_ruleset(self.path)
+            self._ruleset = ruleset
+            self._mtime = mtime
+            self._next_check = time.monotonic() + self.reload_interval
+            return ruleset
+
+    def _check(self) -> CompiledRuleset:
+        with self._lock:
+            self._next_check = time.monotonic() + self.reload_interval
+            mtime = None
+            try:
+                mtime = self.path.stat().st_mtime
+                if self._ruleset is None or mtime != self._mtime:
+                    ruleset = load_ruleset(self.path)
+                    if self._ruleset is not None:
+                        logger.info(
+                            "Triage ruleset reloaded: %s -> %s",
+                            self._ruleset.version,
+                            ruleset.version,
+                        )
+                    self._ruleset = ruleset
+                    self._mtime = mtime
+            except (OSError, ValueError) as exc:
+                if self._ruleset is None:
+                    raise
+                if mtime != self._mtime:
+                    logger.error("Failed to reload triage ruleset from %s: %s", self.path, exc)
+                # Don't retry a broken file until it changes again
+                self._mtime = mtime
+            return self._ruleset
+
+
+_registry = RulesetRegistry(
+    settings.TRIAGE_RULESET_PATH or DEFAULT_RULESET_PATH,
+    reload_interval=settings.TRIAGE_RULESET_RELOAD_SECONDS,
+)
+
+
+def get_active_ruleset() -> CompiledRuleset:
+    """Get the ruleset currently used for live triage."""
+    return _registry.current()
+
+
+def get_registry() -> RulesetRegistry:
+    """Get the process-wide ruleset registry."""
+    return _registry
@@ -0,0 +1,290 @@
+"""Service-code routed USSD flows, compiled once per process.
+
+Each campaign (e.g. a malaria short code and a maternal-health short code)
+is a JSON document in USSD_FLOWS_DIR declaring the service codes it answers,
+its languages, its questions in order, the triage ruleset that scores the
+answers, its daily rate limit and any message overrides. Every flow runs
+consent -> language (when it offers more than one) -> questions -> result.
+
+All flows are compiled on first use into a ``CompiledFlow`` with a flattened
+message table, so routing a hop is a dict lookup on the service code (or on
+the flow name kept in the session) and adding a campaign costs the others
+nothing. Unknown service codes and the other channels (IVR, WhatsApp, SMS)
+use the default flow (USSD_DEFAULT_FLOW).
+"""
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from .config import settings
+from .language_strings import LANGUAGES, compile_catalog, get_message, get_reprompt
+from .triage_rules import CompiledRuleset, RulesetRegistry, get_registry
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FLOWS_DIR = Path(__file__).parent / "flows"
+
+# Steps every flow has; questions can't reuse these names
+FIXED_STEPS = ("consent", "language", "result")
+
+# Messages every flow needs besides its steps and triage results
+REQUIRED_MESSAGES = ("consent_declined", "callback_queued", "goodbye", "invalid_input", "rate_limit")
+
+
+class Question(NamedTuple):
+    """One menu question of a flow."""
+
+    step: str
+    options: Dict[str, Any]  # menu digit -> stored answer
+    next_step: str  # "result" after the last question, which runs triage
+
+
+class CompiledFlow:
+    """A flow definition compiled for O(1) step dispatch and message lookup."""
+
+    def __init__(
+        self,
+        name: str,
+        service_codes: Tuple[str, ...],
+        languages: Tuple[str, ...],
+        questions: Dict[str, Question],
+        steps: Tuple[str, ...],
+        messages: Dict[Tuple[str, str], str],
+        reprompts: Dict[Tuple[str, str], str],
+        rulesets: RulesetRegistry,
+        rate_limit: Optional[int] = None,
+        consent_version: Optional[str] = None,
+        default: bool = False,
+        source: Optional[str] = None,
+    ):
+        self.name = name
+        self.service_codes = service_codes
+        self.languages = languages
+        self.language_options = {str(i): language for i, language in enumerate(languages, 1)}
+        self.questions = questions
+        self.steps = steps
+        self.next_step = dict(zip(steps, steps[1:]))
+        self.messages = messages
+        self.reprompts = reprompts
+        self.rulesets = rulesets
+        self._rate_limit = rate_limit
+        self._consent_version = consent_version
+        self.default = default
+        self.source = source
+        # The default flow keeps the original rate-limit and funnel keys
+        self.scope = "" if default else name
+
+    @property
+    def rate_limit(self) -> int:
+        """Conversations a caller may start per day (RATE_LIMIT_MAX unless the flow sets one)."""
+        return self._rate_limit if self._rate_limit is not None else settings.RATE_LIMIT_MAX
+
+    @property
+    def consent_version(self) -> str:
+        return self._consent_version or settings.CONSENT_VERSION
+
+    def ruleset(self) -> CompiledRuleset:
+        """The flow's triage ruleset (hot-reloaded like the active one)."""
+        return self.rulesets.current()
+
+    def funnel_channel(self, channel: str) -> str:
+        """Channel segment of the flow's funnel keys ("USSD", "USSD.malaria", ...)."""
+        return f"{channel}.{self.scope}" if self.scope else channel
+
+    def message(self, language: str, key: str) -> str:
+        """Get a message in the flow's wording, falling back to the shared catalog."""
+        message = self.messages.get((language, key))
+        if message is None:
+            message = get_message(language, key)
+        return message
+
+    def reprompt(self, language: str, key: str) -> str:
+        """Get the "invalid input" notice followed by the message for key."""
+        message = self.reprompts.get((language, key))
+        if message is None:
+            message = get_reprompt(language, key)
+        return message
+
+
+def normalize_service_code(service_code: str) -> str:
+    """Normalize a USSD service code ("*384*123" and " *384*123# " both become "*384*123#")."""
+    code = "".join(service_code.split())
+    if code and not code.endswith("#"):
+        code += "#"
+    return code
+
+
+def _flatten_messages(
+    languages: Tuple[str, ...], overrides: Mapping[str, Mapping[str, str]]
+) -> Dict[Tuple[str, str], str]:
+    """(language, key) -> text: flow override, then catalog, then the English override and catalog."""
+    catalog = compile_catalog()
+    english = overrides.get("en", {})
+    keys = set(LANGUAGES["en"]).union(*(set(messages) for messages in overrides.values()))
+    messages = {}
+    for language in languages:
+        own = overrides.get(language, {})
+        for key in keys:
+            text = own.get(key) or catalog.get((language, key)) or english.get(key) or catalog.get(("en", key))
+            if text is not None:
+                messages[(language, key)] = text
+    return messages
+
+
+def compile_flow(
+    data: Mapping[str, Any],
+    source: Optional[str] = None,
+    default: bool = False,
+) -> CompiledFlow:
+    """
+    Compile a flow document.
+
+    Args:
+        data: Parsed flow document
+        source: File the document was loaded from; its ruleset path is
+            resolved relative to it
+        default: Whether this is the default flow
+
+    Returns:
+        CompiledFlow ready for routing
+
+    Raises:
+        ValueError: If the document is malformed or refers to messages that don't exist
+    """
+    name = data.get("name")
+    if not name or not str(name).replace("_", "").replace("-", "").isalnum():
+        raise ValueError("Flow must have a name made of letters, digits, '-' and '_'")
+    name = str(name)
+
+    languages = tuple(data.get("languages") or ("en",))
+    if len(set(languages)) != len(languages) or len(languages) > 9:
+        raise ValueError(f"Flow {name!r} must list at most 9 distinct languages")
+
+    raw_questions = data.get("questions") or []
+    if not raw_questions:
+        raise ValueError(f"Flow {name!r} must declare at least one question")
+    question_steps = [str(question.get("step") or "") for question in raw_questions]
+    if not all(question_steps) or len(set(question_steps)) != len(question_steps):
+        raise ValueError(f"Flow {name!r} question steps must be named and unique")
+    reserved = set(question_steps) & set(FIXED_STEPS)
+    if reserved:
+        raise ValueError(f"Flow {name!r} questions can't use the reserved steps {sorted(reserved)}")
+
+    steps = ("consent",) + (("language",) if len(languages) > 1 else ()) + tuple(question_steps) + ("result",)
+    questions = {}
+    for i, question in enumerate(raw_questions):
+        options = {str(digit): answer for digit, answer in (question.get("options") or {}).items()}
+        if not options or not all(len(digit) == 1 and digit.isdigit() for digit in options):
+            raise ValueError(f"Flow {name!r} question {question_steps[i]!r} needs single-digit menu options")
+        step = question_steps[i]
+        questions[step] = Question(step, options, steps[steps.index(step) + 1])
+
+    ruleset_path = data.get("ruleset") or ""
+    if ruleset_path:
+        base = Path(source).parent if source else Path.cwd()
+        rulesets = RulesetRegistry(base / ruleset_path, reload_interval=settings.TRIAGE_RULESET_RELOAD_SECONDS)
+    else:
+        rulesets = get_registry()
+    try:
+        ruleset = rulesets.current()
+    except OSError as exc:
+        raise ValueError(f"Flow {name!r} ruleset can't be loaded: {exc}") from None
+    unanswered = set(ruleset.symptoms) - set(question_steps)
+    if unanswered:
+        raise ValueError(f"Flow {name!r} never asks about ruleset symptoms {sorted(unanswered)}")
+
+    messages = _flatten_messages(languages, data.get("messages") or {})
+    needed = [step for step in steps if step != "result"] + list(REQUIRED_MESSAGES)
+    needed += sorted({outcome.risk_code.lower() for outcome in ruleset.outcomes})
+    for language in languages:
+        missing = [key for key in needed if (language, key) not in messages]
+        if missing:
+            raise ValueError(f"Flow {name!r} has no {language!r} messages for {missing}")
+    reprompts = {
+        (language, key): messages[(language, "invalid_input")] + "\n\n" + text
+        for (language, key), text in messages.items()
+    }
+
+    rate_limit = data.get("rate_limit")
+    return CompiledFlow(
+        name=name,
+        service_codes=tuple(normalize_service_code(code) for code in data.get("service_codes") or ()),
+        languages=languages,
+        questions=questions,
+        steps=steps,
+        messages=messages,
+        reprompts=reprompts,
+        rulesets=rulesets,
+        rate_limit=int(rate_limit) if rate_limit is not None else None,
+        consent_version=data.get("consent_version") or None,
+        default=default,
+        source=source,
+    )
+
+
+class FlowRegistry:
+    """Compiled flows by name and by service code."""
+
+    def __init__(self, flows: Iterable[CompiledFlow]):
+        self.flows: Dict[str, CompiledFlow] = {}
+        self._by_code: Dict[str, CompiledFlow] = {}
+        default = None
+        for flow in flows:
+            if flow.name in self.flows:
+                raise ValueError(f"Flow {flow.name!r} is defined twice")
+            self.flows[flow.name] = flow
+            for code in flow.service_codes:
+                if code in self._by_code:
+                    raise ValueError(f"Service code {code} is claimed by {self._by_code[code].name!r} and {flow.name!r}")
+                self._by_code[code] = flow
+            if flow.default:
+                default = flow
+        if default is None:
+            raise ValueError("No default flow")
+        self.default = default
+
+    def resolve(self, service_code: str) -> CompiledFlow:
+        """Flow answering a service code; unknown or missing codes get the default flow."""
+        flow = self._by_code.get(service_code)
+        if flow is None and service_code:
+            flow = self._by_code.get(normalize_service_code(service_code))
+        return flow or self.default
+
+    def get(self, name: Optional[str]) -> CompiledFlow:
+        """Flow by name; sessions of a flow that has since been removed finish on the default."""
+        return self.flows.get(name, self.default) if name else self.default
+
+
+def load_flows(directory: os.PathLike, default: str) -> FlowRegistry:
+    """
+    Load and compile every ``*.json`` flow in a directory.
+
+    Args:
+        directory: Directory holding the flow documents
+        default: Name of the default flow
+
+    Raises:
+        OSError, ValueError: If a flow can't be read or compiled, or the default is missing
+    """
+    flows: List[CompiledFlow] = []
+    for path in sorted(Path(directory).glob("*.json")):
+        with path.open(encoding="utf-8") as handle:
+            data = json.load(handle)
+        flows.append(compile_flow(data, source=str(path), default=data.get("name") == default))
+    registry = FlowRegistry(flows)
+    logger.info("Loaded USSD flows %s (default %s)", ", ".join(registry.flows), registry.default.name)
+    return registry
+
+
+_registry: Optional[FlowRegistry] = None
+
+
+def get_flow_registry() -> FlowRegistry:
+    """Get the process-wide flow registry, compiling the flows on first use."""
+    global _registry
+    if _registry is None:
+        _registry = load_flows(settings.USSD_FLOWS_DIR or DEFAULT_FLOWS_DIR, settings.USSD_DEFAULT_FLOW)
+    return _registry
@@ -1,11 +1,227 @@
-"""USSD session state management using Redis."""
+"""USSD session state management using Redis.
 
+Keys are hash-tagged with the caller's msisdn hash, so a hop's session,
+rate-limit and contact keys share a Redis Cluster slot.
+
+Every call goes through the session circuit breaker with a
+SESSION_REDIS_TIMEOUT_SECONDS timeout. Each worker also keeps a bounded
+in-process copy of the sessions it serves (``LocalSessionStore``). While
+Redis is failing, sessions are read from and saved to that copy, so
+conversations pinned to the worker carry on; rate limiting fails open or
+closed per RATE_LIMIT_FAIL_OPEN, and funnel updates are dropped. When the
+circuit closes again, sessions saved during the outage are written back.
+
+Every save bumps the session's ``version``. Once Redis answers again, the
+copy with the higher version wins: the write-back only creates sessions
+Redis doesn't have (SET NX), and a local copy is dropped as soon as Redis
+shows one at least as new, so a session another worker has moved on since
+the recovery never goes back a step.
+"""
+
+import asyncio
 import json
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
-import redis.asyncio as redis
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from redis.exceptions import RedisError
+
+from .circuit_breaker import CircuitOpenError, get_session_breaker
 from .config import settings
-from .redis_client import get_redis
+from .funnel import FunnelUpdate
+from .logging_config import log_event
+from .metrics import count_session_fallback
+from .redis_client import get_session_redis
+from .timing import span
+
+logger = logging.getLogger(__name__)
+
+# Errors that send a session operation to the fallback
+UNAVAILABLE = (CircuitOpenError, RedisError, OSError, asyncio.TimeoutError)
+
+# Sessions written back to Redis per pipeline after an outage
+RESYNC_BATCH = 500
+
+
+class LocalSessionStore:
+    """
+    Bounded in-process copy of the sessions this worker serves.
+
+    Every session write is mirrored here, so a conversation pinned to this
+    worker carries on when Redis goes away mid-conversation. Writes made
+    while Redis is unavailable are marked dirty and take precedence over an
+    older Redis copy until they have been written back. Entries expire after
+    their TTL, and beyond ``max_entries`` the least recently used are evicted.
+    Sessions cleared during an outage are remembered until their TTL so the
+    write-back also deletes the copy Redis still holds.
+    """
+
+    def __init__(self, max_entries: int, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._dirty: Set[str] = set()
+        self._cleared: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def has_pending(self) -> bool:
+        """Whether anything is waiting to be written back to Redis."""
+        return bool(self._dirty or self._cleared)
+
+    def get(self, key: str, dirty_only: bool = False) -> Optional[str]:
+        if dirty_only and key not in self._dirty:
+            return None
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= self.clock():
+            self.discard(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def is_cleared(self, key: str) -> bool:
+        expires = self._cleared.get(key)
+        return expires is not None and expires > self.clock()
+
+    def set(self, key: str, data: str, ttl: float, dirty: bool = False):
+        self._cleared.pop(key, None)
+        self._entries[key] = (data, self.clock() + ttl)
+        self._entries.move_to_end(key)
+        if dirty:
+            self._dirty.add(key)
+        else:
+            self._dirty.discard(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            if evicted in self._dirty:
+                self._dirty.discard(evicted)
+                count_session_fallback("evicted")
+
+    def clear(self, key: str, ttl: float):
+        """Record a session cleared while Redis is unavailable."""
+        self.discard(key)
+        self._cleared[key] = self.clock() + ttl
+        self._cleared.move_to_end(key)
+        while len(self._cleared) > self.max_entries:
+            self._cleared.popitem(last=False)
+
+    def discard(self, key: str):
+        self._entries.pop(key, None)
+        self._dirty.discard(key)
+        self._cleared.pop(key, None)
+
+    def pending(self) -> Tuple[Dict[str, Tuple[str, int]], List[str]]:
+        """Dirty sessions (key -> (data, remaining TTL in seconds)) and cleared keys to write back."""
+        now = self.clock()
+        entries = {}
+        for key in list(self._dirty):
+            data, expires = self._entries[key]
+            if expires > now:
+                entries[key] = (data, math.ceil(expires - now))
+            else:
+                self.discard(key)
+        cleared = [key for key, expires in self._cleared.items() if expires > now]
+        return entries, cleared
+
+    def written_back(self, entries: Dict[str, Tuple[str, int]], cleared: List[str]):
+        """Mark keys as in Redis, except sessions that changed since ``pending()``."""
+        for key, (data, _) in entries.items():
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is data:
+                self._dirty.discard(key)
+        for key in cleared:
+            self._cleared.pop(key, None)
+
+    def reset(self):
+        self._entries.clear()
+        self._dirty.clear()
+        self._cleared.clear()
+
+
+_fallback_store: Optional[LocalSessionStore] = None
+_resync_tasks: Set[asyncio.Task] = set()
+
+
+def get_fallback_store() -> LocalSessionStore:
+    """Get this worker's in-process session store (registers the resync on first use)."""
+    global _fallback_store
+    if _fallback_store is None:
+        _fallback_store = LocalSessionStore(settings.SESSION_FALLBACK_MAX_ENTRIES)
+        get_session_breaker().on_close(_schedule_resync)
+    return _fallback_store
+
+
+def _schedule_resync():
+    if not get_fallback_store().has_pending:
+        return
+    task = asyncio.get_running_loop().create_task(resync_fallback())
+    _resync_tasks.add(task)
+    task.add_done_callback(_resync_tasks.discard)
+
+
+def _version(data: Optional[str]) -> int:
+    """Save counter of a stored session (0 for none, or sessions saved before versions)."""
+    return json.loads(data).get("version", 0) if data else 0
+
+
+async def resync_fallback() -> int:
+    """
+    Write sessions saved in-process during an outage back to Redis.
+
+    Sessions are only created where Redis has none (SET NX). Where Redis
+    already holds a copy, the local one is dropped if Redis's is at least
+    as new; an older Redis copy (from before the outage) is left for the
+    caller's next hop, which loads the newer local copy and saves it.
+
+    Returns:
+        Number of sessions and deletions written; anything not written
+        stays in the store for the next recovery
+    """
+    store = get_fallback_store()
+    entries, cleared = store.pending()
+    redis_client = await get_session_redis()
+    items = list(entries.items())
+    written = 0
+    for start in range(0, max(len(items), len(cleared)), RESYNC_BATCH):
+        batch = items[start:start + RESYNC_BATCH]
+        deletions = cleared[start:start + RESYNC_BATCH]
+
+        async def write() -> List[Any]:
+            async with redis_client.pipeline(transaction=False) as pipe:
+                for key, (data, ttl) in batch:
+                    pipe.set(key, data, ex=ttl, nx=True)
+                    pipe.get(key)
+                for key in deletions:
+                    pipe.delete(key)
+                return await pipe.execute()
+
+        try:
+            results = await get_session_breaker().call(write)
+        except UNAVAILABLE as exc:
+            log_event(logger, "session_resync_failed", "Session resync stopped after %d writes: %r",
+                      written, exc, level=logging.WARNING)
+            return written
+        settled = {}
+        for (key, (data, ttl)), created, current in zip(batch, results[0::2], results[1::2]):
+            if created:
+                written += 1
+            elif _version(current) > _version(data):
+                # Moved on by another worker since the recovery
+                store.discard(key)
+                continue
+            elif _version(current) < _version(data):
+                continue
+            settled[key] = (data, ttl)
+        store.written_back(settled, deletions)
+        written += len(deletions)
+    log_event(logger, "session_resync", "Wrote %d in-process sessions back to Redis", written)
+    return written
 
 
 class USSDSession:
@@ -14,65 +230,164 @@ class USSDSession:
     SESSION_TTL = 300  # 5 minutes
     RATE_LIMIT_TTL = 86400  # 24 hours
     
-    def __init__(self, session_id: str):
+    def __init__(self, session_id: str, msisdn_hash: str):
         self.session_id = session_id
-        self.key = f"ussd:session:{session_id}"
+        self.key = f"ussd:{{{msisdn_hash}}}:session:{session_id}"
+    
+    async def load(self) -> Optional[Dict[str, Any]]:
+        """Get the stored session state, or None if there is no live session."""
+        store = get_fallback_store()
+        if store.is_cleared(self.key):
+            # Ended during an outage; Redis's copy is waiting to be deleted
+            return None
+        redis_client = await get_session_redis()
+        with span("redis"):
+            try:
+                data = await get_session_breaker().call(lambda: redis_client.get(self.key))
+            except UNAVAILABLE:
+                count_session_fallback("load")
+                # Last state this worker saw; None for conversations served elsewhere
+                data = store.get(self.key)
+            else:
+                # Saved here during an outage and not written back yet
+                local = store.get(self.key, dirty_only=True)
+                if local is not None:
+                    if _version(local) > _version(data):
+                        data = local
+                    else:
+                        store.discard(self.key)
+        if not data:
+            return None
+        with span("serialize"):
+            return json.loads(data)
     
     async def get_state(self) -> Dict[str, Any]:
         """Get current session state."""
-        redis_client = await get_redis()
-        data = await redis_client.get(self.key)
-        if data:
-            return json.loads(data)
+        state = await self.load()
+        if state is not None:
+            return state
         return {
             "step": "consent",
             "language": "en",
             "responses": {}
         }
     
-    async def set_state(self, state: Dict[str, Any]):
-        """Save session state with TTL."""
-        redis_client = await get_redis()
-        await redis_client.setex(
-            self.key,
-            self.SESSION_TTL,
-            json.dumps(state)
-        )
+    async def set_state(self, state: Dict[str, Any], funnel: Optional[FunnelUpdate] = None):
+        """Save session state with TTL, plus funnel counters in the same round trip."""
+        redis_client = await get_session_redis()
+        state["version"] = state.get("version", 0) + 1
+        with span("serialize"):
+            data = json.dumps(state)
+        
+        async def write():
+            if funnel is None:
+                await redis_client.setex(self.key, self.SESSION_TTL, data)
+                return
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.setex(self.key, self.SESSION_TTL, data)
+                funnel.apply(pipe)
+                await pipe.execute()
+        
+        store = get_fallback_store()
+        with span("redis"):
+            try:
+                await get_session_breaker().call(write)
+            except UNAVAILABLE:
+                count_session_fallback("set_state")
+                store.set(self.key, data, self.SESSION_TTL, dirty=True)
+                return
+        store.set(self.key, data, self.SESSION_TTL)
+    
+    async def clear(self, funnel: Optional[FunnelUpdate] = None):
+        """Clear session data, plus funnel counters in the same round trip."""
+        redis_client = await get_session_redis()
+        
+        async def delete():
+            if funnel is None:
+                await redis_client.delete(self.key)
+                return
+            async with redis_client.pipeline(transaction=False) as pipe:
+                pipe.delete(self.key)
+                funnel.apply(pipe)
+                await pipe.execute()
+        
+        store = get_fallback_store()
+        with span("redis"):
+            try:
+                await get_session_breaker().call(delete)
+            except UNAVAILABLE:
+                count_session_fallback("clear")
+                store.clear(self.key, self.SESSION_TTL)
+                return
+        store.discard(self.key)
     
-    async def clear(self):
-        """Clear session data."""
-        redis_client = await get_redis()
-        await redis_client.delete(self.key)
+    @staticmethod
+    def rate_limit_key(msisdn_hash: str, scope: str = "") -> str:
+        """Daily counter key; each flow other than the default has its own counters."""
+        return f"ussd:{{{msisdn_hash}}}:rate:{scope}" if scope else f"ussd:{{{msisdn_hash}}}:rate"
     
     @staticmethod
-    async def check_rate_limit(msisdn_hash: str) -> bool:
+    async def check_rate_limit(msisdn_hash: str, limit: Optional[int] = None, scope: str = "") -> bool:
         """
         Check if MSISDN has exceeded rate limit.
         
+        Args:
+            msisdn_hash: Hashed phone number
+            limit: Conversations allowed per day (defaults to RATE_LIMIT_MAX)
+            scope: Flow the counter belongs to ("" for the default flow)
+        
         Returns:
-            True if under limit, False if exceeded
+            True if under limit, False if exceeded. Without Redis,
+            RATE_LIMIT_FAIL_OPEN decides.
         """
-        redis_client = await get_redis()
-        key = f"ussd:rate:{msisdn_hash}"
-        count = await redis_client.get(key)
+        redis_client = await get_session_redis()
+        key = USSDSession.rate_limit_key(msisdn_hash, scope)
+        if limit is None:
+            limit = settings.RATE_LIMIT_MAX
         
-        if count is None:
-            # First request, set counter
-            await redis_client.setex(key, USSDSession.RATE_LIMIT_TTL, "1")
+        async def check() -> bool:
+            count = await redis_client.get(key)
+            
+            if count is None:
+                # First request, set counter
+                await redis_client.setex(key, USSDSession.RATE_LIMIT_TTL, "1")
+                return True
+            
+            count_int = int(count)
+            if count_int >= limit:
+                return False
+            
+            # Increment counter
+            await redis_client.incr(key)
             return True
         
-        count_int = int(count)
-        if count_int >= settings.RATE_LIMIT_MAX:
-            return False
+        with span("redis"):
+            try:
+                return await get_session_breaker().call(check)
+            except UNAVAILABLE:
+                count_session_fallback("rate_limit")
+                return settings.RATE_LIMIT_FAIL_OPEN
+    
+    @staticmethod
+    async def record_funnel(funnel: FunnelUpdate):
+        """Update funnel counters for a hop without a session write (dropped without Redis)."""
+        redis_client = await get_session_redis()
+        
+        async def write():
+            async with redis_client.pipeline(transaction=False) as pipe:
+                funnel.apply(pipe)
+                await pipe.execute()
         
-        # Increment counter
-        await redis_client.incr(key)
-        return True
+        with span("redis"):
+            try:
+                await get_session_breaker().call(write)
+            except UNAVAILABLE:
+                count_session_fallback("funnel")
     
     @staticmethod
-    async def get_rate_limit_count(msisdn_hash: str) -> int:
+    async def get_rate_limit_count(msisdn_hash: str, scope: str = "") -> int:
         """Get current rate limit count for MSISDN."""
-        redis_client = await get_redis()
-        key = f"ussd:rate:{msisdn_hash}"
+        redis_client = await get_session_redis()
+        key = USSDSession.rate_limit_key(msisdn_hash, scope)
         count = await redis_client.get(key)
         return int(count) if count else 0
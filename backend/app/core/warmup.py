@@ -0,0 +1,132 @@
+"""Startup warmup run by each worker before it accepts traffic.
+
+Pre-opens DB and Redis connections, compiles the USSD flows, message catalog,
+IVR prompts and triage ruleset, and imports heavy modules, so the first real
+requests don't pay for any of it. Progress is exposed through the readiness
+endpoint, which stays 503 until the DB and Redis checks have passed.
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+from typing import Any, Dict
+
+from sqlalchemy import text
+
+from .config import settings
+from .database import engine
+from .ivr_prompts import compile_prompts
+from .language_strings import compile_catalog
+from .redis_client import get_redis
+from .triage_rules import get_active_ruleset
+from .ussd_flows import get_flow_registry
+
+logger = logging.getLogger(__name__)
+
+# Imported during warmup so their import cost is paid before traffic arrives
+HEAVY_MODULES = (
+    "numpy",
+    "app.core.triage_batch",
+    "app.jobs.retriage",
+)
+
+# Checks that must pass before the worker reports ready
+REQUIRED_CHECKS = ("compile", "database", "redis")
+
+_status: Dict[str, Any] = {
+    "ready": False,
+    "warmed_up": False,
+    "started_at": None,
+    "duration_ms": None,
+    "checks": {},
+}
+_recheck_lock = asyncio.Lock()
+
+
+def _warm_db():
+    """Check out and return connections so the pool starts populated."""
+    connections = []
+    try:
+        for _ in range(max(1, settings.WARMUP_DB_CONNECTIONS)):
+            connection = engine.connect()
+            connections.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+async def _warm_redis():
+    """Open Redis connections concurrently so the pool starts populated."""
+    redis_client = await get_redis()
+    await asyncio.gather(*(redis_client.ping() for _ in range(max(1, settings.WARMUP_REDIS_CONNECTIONS))))
+
+
+def _compile():
+    compile_catalog()
+    get_active_ruleset()
+    get_flow_registry()
+    compile_prompts()
+    for module in HEAVY_MODULES:
+        importlib.import_module(module)
+
+
+def _steps():
+    loop = asyncio.get_running_loop()
+    return {
+        "compile": lambda: loop.run_in_executor(None, _compile),
+        "database": lambda: loop.run_in_executor(None, _warm_db),
+        "redis": _warm_redis,
+    }
+
+
+async def _run_steps(names) -> Dict[str, str]:
+    steps = _steps()
+    checks: Dict[str, str] = {}
+    for name in names:
+        try:
+            await asyncio.wait_for(steps[name](), timeout=settings.WARMUP_TIMEOUT_SECONDS)
+            checks[name] = "ok"
+        except Exception as exc:
+            logger.warning("Warmup step %s failed: %r", name, exc)
+            checks[name] = f"error: {exc!r}"
+    return checks
+
+
+def _set_checks(checks: Dict[str, str]):
+    _status["checks"] = checks
+    _status["ready"] = all(checks.get(name) == "ok" for name in REQUIRED_CHECKS)
+
+
+async def warmup() -> Dict[str, Any]:
+    """
+    Warm this worker up; it is ready once every required check has passed.
+
+    A failing dependency (e.g. Redis not up yet) is logged and reported in
+    the readiness checks and keeps the worker unready, but does not block
+    startup. ``recheck()`` retries the failed checks.
+    """
+    started = time.perf_counter()
+    _status["started_at"] = time.time()
+    checks = await _run_steps(REQUIRED_CHECKS)
+    _status["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    _status["warmed_up"] = True
+    _set_checks(checks)
+    logger.info("Warmup finished in %sms: %s", _status["duration_ms"], checks)
+    return _status
+
+
+async def recheck() -> Dict[str, Any]:
+    """Retry the checks that failed during warmup (called by the readiness probe)."""
+    if _status["warmed_up"] and not _status["ready"]:
+        async with _recheck_lock:
+            failed = [name for name in REQUIRED_CHECKS if _status["checks"].get(name) != "ok"]
+            if failed:
+                _set_checks({**_status["checks"], **await _run_steps(failed)})
+    return _status
+
+
+def get_status() -> Dict[str, Any]:
+    """Get this worker's warmup status."""
+    return _status
@@ -0,0 +1,171 @@
+"""Time-based archival of closed encounters and completed callbacks.
+
+Moves finished (``DONE`` or ``FAILED``) callbacks and ``CLOSED`` encounters
+that have not changed for ``ARCHIVE_AFTER_DAYS`` into ``callbacks_archive`` /
+``encounters_archive``, so the hot tables only hold live work. Rows move in
+small chunks, each its own short transaction (copy, then delete, with the
+chunk's rows locked), and the job pauses between chunks so it never holds
+locks for long. Callbacks move first. An encounter moves once none of its
+callbacks is still queued or in progress, taking any finished callbacks
+that are newer than the cutoff with it.
+
+By-id reads fall back to the archive through ``find_encounter``.
+
+Usage:
+    python -m app.jobs.archive [--older-than-days 365] [--chunk-size 500]
+"""
+
+import argparse
+import logging
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import DateTime, Table, delete, exists, func, insert, literal, select
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..models.models import (
+    ArchivedCallback,
+    ArchivedEncounter,
+    Callback,
+    CallbackStatus,
+    Encounter,
+    EncounterStatus,
+)
+
+logger = logging.getLogger(__name__)
+
+FINISHED_CALLBACKS = (CallbackStatus.DONE, CallbackStatus.FAILED)
+
+
+def _move(db: Session, source: Table, archive: Table, ids: List[int], archived_at: datetime):
+    columns = [column.name for column in source.columns]
+    db.execute(
+        insert(archive).from_select(
+            columns + ["archived_at"],
+            select(*source.columns, literal(archived_at, DateTime)).where(source.c.id.in_(ids)),
+        )
+    )
+    db.execute(delete(source).where(source.c.id.in_(ids)))
+
+
+def archive_callbacks_chunk(db: Session, cutoff: datetime, chunk_size: int) -> int:
+    """Move up to chunk_size finished callbacks older than cutoff; returns how many moved."""
+    ids = db.execute(
+        select(Callback.id)
+        .where(
+            Callback.status.in_(FINISHED_CALLBACKS),
+            # Failed callbacks may never have been completed
+            func.coalesce(Callback.completed_at, Callback.updated_at) < cutoff,
+        )
+        .order_by(Callback.id)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if ids:
+        _move(db, Callback.__table__, ArchivedCallback.__table__, ids, datetime.utcnow())
+    db.commit()
+    return len(ids)
+
+
+def archive_encounters_chunk(db: Session, cutoff: datetime, chunk_size: int) -> int:
+    """
+    Move up to chunk_size closed encounters older than cutoff with no live
+    callbacks, together with their remaining (finished) callbacks.
+    """
+    ids = db.execute(
+        select(Encounter.id)
+        .where(
+            Encounter.status == EncounterStatus.CLOSED,
+            Encounter.updated_at < cutoff,
+            ~exists().where(Callback.encounter_id == Encounter.id, ~Callback.status.in_(FINISHED_CALLBACKS)),
+        )
+        .order_by(Encounter.id)
+        .limit(chunk_size)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    if ids:
+        archived_at = datetime.utcnow()
+        # Finished too recently for the callbacks pass, but they must leave before their encounter
+        callback_ids = db.execute(
+            select(Callback.id).where(Callback.encounter_id.in_(ids)).with_for_update()
+        ).scalars().all()
+        if callback_ids:
+            _move(db, Callback.__table__, ArchivedCallback.__table__, callback_ids, archived_at)
+        _move(db, Encounter.__table__, ArchivedEncounter.__table__, ids, archived_at)
+    db.commit()
+    return len(ids)
+
+
+def run_archive(
+    db: Session,
+    older_than_days: Optional[float] = None,
+    chunk_size: Optional[int] = None,
+    pause: Optional[float] = None,
+) -> Dict[str, int]:
+    """
+    Archive everything currently eligible.
+
+    Args:
+        db: Database session
+        older_than_days: Minimum age (defaults to ARCHIVE_AFTER_DAYS)
+        chunk_size: Rows per transaction (defaults to ARCHIVE_CHUNK_SIZE)
+        pause: Seconds to sleep between chunks (defaults to ARCHIVE_CHUNK_PAUSE_SECONDS)
+
+    Returns:
+        Number of callbacks and encounters moved
+    """
+    older_than_days = settings.ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    chunk_size = chunk_size or settings.ARCHIVE_CHUNK_SIZE
+    pause = settings.ARCHIVE_CHUNK_PAUSE_SECONDS if pause is None else pause
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    moved = {"callbacks": 0, "encounters": 0}
+    for name, archive_chunk in (("callbacks", archive_callbacks_chunk), ("encounters", archive_encounters_chunk)):
+        while True:
+            count = archive_chunk(db, cutoff, chunk_size)
+            moved[name] += count
+            if count < chunk_size:
+                break
+            if pause:
+                time.sleep(pause)
+        logger.info("Archived %d %s older than %s", moved[name], name, cutoff.isoformat())
+    return moved
+
+
+def find_encounter(db: Session, encounter_id: int) -> Tuple[Optional[Union[Encounter, ArchivedEncounter]], bool]:
+    """
+    Look an encounter up in the hot table, then in the archive.
+
+    Returns:
+        (encounter or None, whether it came from the archive)
+    """
+    encounter = db.query(Encounter).filter(Encounter.id == encounter_id).first()
+    if encounter is not None:
+        return encounter, False
+    archived = db.get(ArchivedEncounter, encounter_id)
+    return archived, archived is not None
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Move closed encounters and completed callbacks to archive tables.")
+    parser.add_argument("--older-than-days", type=float, default=None)
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--pause", type=float, default=None, help="Seconds between chunks")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        moved = run_archive(db, args.older_than_days, args.chunk_size, args.pause)
+        print(f"Archived {moved['callbacks']} callbacks and {moved['encounters']} encounters")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,298 @@
+"""Resumable, parallel re-triage of historic encounters.
+
+Re-scores ``Encounter.symptoms_json`` with a candidate ruleset to answer
+"how many past encounters would be scored differently?". Encounters are read
+in keyset-paginated chunks, scored in a process pool with the batch triage
+API, and every chunk's diffs are committed together with the run checkpoint,
+so a crashed run resumes exactly where it stopped.
+
+Usage:
+    python -m app.jobs.retriage --ruleset path/to/ruleset.json
+    python -m app.jobs.retriage --resume RUN_ID
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Text, func, select, type_coerce
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..core.database import SessionLocal
+from ..core.triage_batch import assess_risk_rows
+from ..core.triage_rules import CompiledRuleset, load_ruleset
+from ..models.models import Encounter, RetriageDiff, RetriageRun, RetriageRunStatus
+
+logger = logging.getLogger(__name__)
+
+# (encounter_id, old_risk_code, new_risk_code, new_priority)
+Diff = Tuple[int, Optional[str], str, str]
+
+# Ruleset loaded once per pool worker by _init_worker
+_worker_ruleset: Optional[CompiledRuleset] = None
+
+
+def _init_worker(ruleset_path: str):
+    global _worker_ruleset
+    _worker_ruleset = load_ruleset(ruleset_path)
+
+
+def _parse_symptoms(raw: Any) -> Optional[Dict[str, Any]]:
+    # SQLite hands back JSON text; psycopg2 already decodes json columns
+    if isinstance(raw, (str, bytes)):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            return None
+    return raw if isinstance(raw, dict) else None
+
+
+def score_chunk(
+    ids: Sequence[int],
+    old_codes: Sequence[Optional[str]],
+    raw_symptoms: Sequence[Any],
+    ruleset: Optional[CompiledRuleset] = None
+) -> Tuple[List[Diff], int]:
+    """
+    Score one chunk of encounters and return the ones whose risk code changes.
+
+    Rows whose symptoms are malformed JSON or not an object are skipped and
+    counted instead of failing the run.
+
+    Args:
+        ids: Encounter IDs
+        old_codes: Stored risk codes, aligned with ``ids``
+        raw_symptoms: ``symptoms_json`` values as JSON text or dicts
+        ruleset: Candidate ruleset (defaults to the one loaded in this pool worker)
+
+    Returns:
+        (diffs, skipped): diffs as (encounter_id, old_risk_code, new_risk_code,
+        new_priority), and the number of rows skipped
+    """
+    ruleset = ruleset or _worker_ruleset
+    parsed = [_parse_symptoms(raw) for raw in raw_symptoms]
+    keep = [i for i, symptoms in enumerate(parsed) if symptoms is not None]
+    skipped = len(parsed) - len(keep)
+    if not keep:
+        return [], skipped
+
+    result = assess_risk_rows([parsed[i] for i in keep], ruleset)
+    old = np.array([old_codes[i] for i in keep], dtype=object)
+    changed = np.flatnonzero(result.risk_codes != old)
+    diffs = [
+        (ids[keep[i]], old_codes[keep[i]], result.risk_codes[i], result.priorities[i])
+        for i in changed
+    ]
+    return diffs, skipped
+
+
+def start_run(db: Session, ruleset_path: str) -> RetriageRun:
+    """
+    Create a re-triage run for encounters that exist now.
+
+    The ruleset is compiled up front so a broken file fails before any work.
+    """
+    ruleset = load_ruleset(ruleset_path)
+    max_id = db.query(func.max(Encounter.id)).scalar() or 0
+    run = RetriageRun(
+        ruleset_version=ruleset.version,
+        ruleset_path=str(ruleset_path),
+        status=RetriageRunStatus.RUNNING,
+        last_encounter_id=0,
+        max_encounter_id=max_id,
+        processed_count=0,
+        changed_count=0,
+        skipped_count=0,
+    )
+    db.add(run)
+    db.commit()
+    db.refresh(run)
+    return run
+
+
+def _read_chunks(
+    db: Session,
+    after_id: int,
+    max_id: int,
+    chunk_size: int
+) -> Iterator[Tuple[List[int], List[Optional[str]], List[Any]]]:
+    """Yield (ids, risk_codes, raw symptoms) chunks by keyset pagination on id."""
+    raw_symptoms = type_coerce(Encounter.symptoms_json, Text)
+    while after_id < max_id:
+        rows = db.execute(
+            select(Encounter.id, Encounter.risk_code, raw_symptoms)
+            .where(
+                Encounter.id > after_id,
+                Encounter.id <= max_id,
+                Encounter.symptoms_json.isnot(None),
+            )
+            .order_by(Encounter.id)
+            .limit(chunk_size)
+        ).all()
+        if not rows:
+            return
+        ids, codes, raws = (list(column) for column in zip(*rows))
+        yield ids, codes, raws
+        after_id = ids[-1]
+
+
+def mark_run_failed(db: Session, run_id: int, exc: BaseException) -> Optional[RetriageRun]:
+    """Record a failure on a run; its checkpoint is kept so it can be resumed."""
+    db.rollback()
+    run = db.query(RetriageRun).filter(RetriageRun.id == run_id).first()
+    if run is not None:
+        run.status = RetriageRunStatus.FAILED
+        run.error = (str(exc) or type(exc).__name__)[:1000]
+        db.commit()
+    return run
+
+
+def _checkpoint(
+    db: Session,
+    run: RetriageRun,
+    last_id: int,
+    processed: int,
+    scored: Tuple[List[Diff], int]
+):
+    """Write a chunk's diffs and advance the checkpoint in one transaction."""
+    diffs, skipped = scored
+    if diffs:
+        # Core executemany; the ORM bulk path costs more than scoring at this volume
+        db.connection().execute(
+            RetriageDiff.__table__.insert(),
+            [
+                {
+                    "run_id": run.id,
+                    "encounter_id": encounter_id,
+                    "old_risk_code": old_code,
+                    "new_risk_code": new_code,
+                    "new_priority": priority,
+                }
+                for encounter_id, old_code, new_code, priority in diffs
+            ],
+        )
+    run.last_encounter_id = last_id
+    run.processed_count += processed
+    run.changed_count += len(diffs)
+    run.skipped_count = (run.skipped_count or 0) + skipped
+    db.commit()
+
+
+def run_retriage(
+    db: Session,
+    run: RetriageRun,
+    chunk_size: Optional[int] = None,
+    workers: Optional[int] = None
+) -> RetriageRun:
+    """
+    Execute (or resume) a re-triage run until every encounter is scored.
+
+    Args:
+        db: Database session used for reads and checkpoint writes
+        run: Run created by :func:`start_run`, possibly partially processed
+        chunk_size: Encounters per chunk (defaults to RETRIAGE_CHUNK_SIZE)
+        workers: Pool size; 0 uses one process per CPU, 1 scores in-process
+
+    Returns:
+        The completed run
+    """
+    chunk_size = chunk_size or settings.RETRIAGE_CHUNK_SIZE
+    workers = settings.RETRIAGE_WORKERS if workers is None else workers
+    workers = workers or os.cpu_count() or 1
+
+    run.status = RetriageRunStatus.RUNNING
+    run.error = None
+    db.commit()
+
+    chunks = _read_chunks(db, run.last_encounter_id, run.max_encounter_id, chunk_size)
+    try:
+        if workers == 1:
+            ruleset = load_ruleset(run.ruleset_path)
+            for ids, codes, raws in chunks:
+                _checkpoint(db, run, ids[-1], len(ids), score_chunk(ids, codes, raws, ruleset))
+        else:
+            # Spawned workers don't inherit DB connections or threads from this process
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(run.ruleset_path,),
+            ) as executor:
+                pending = deque()
+                for ids, codes, raws in chunks:
+                    pending.append((ids[-1], len(ids), executor.submit(score_chunk, ids, codes, raws)))
+                    # Checkpoint strictly in order so last_encounter_id never skips a chunk
+                    while len(pending) >= workers * 2:
+                        last_id, processed, future = pending.popleft()
+                        _checkpoint(db, run, last_id, processed, future.result())
+                while pending:
+                    last_id, processed, future = pending.popleft()
+                    _checkpoint(db, run, last_id, processed, future.result())
+    except Exception as exc:
+        mark_run_failed(db, run.id, exc)
+        raise
+
+    run.last_encounter_id = run.max_encounter_id
+    run.status = RetriageRunStatus.COMPLETED
+    run.completed_at = datetime.utcnow()
+    db.commit()
+    return run
+
+
+def summarize_run(db: Session, run_id: int) -> Dict[str, int]:
+    """Count diffs by risk code transition, e.g. ``{"LOW_RISK->FEVER_GENERAL": 12}``."""
+    rows = db.query(
+        RetriageDiff.old_risk_code,
+        RetriageDiff.new_risk_code,
+        func.count(RetriageDiff.id)
+    ).filter(
+        RetriageDiff.run_id == run_id
+    ).group_by(RetriageDiff.old_risk_code, RetriageDiff.new_risk_code).all()
+    return {f"{old or 'NONE'}->{new}": count for old, new, count in rows}
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Re-score historic encounters with a triage ruleset.")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--ruleset", help="Path to the candidate ruleset JSON file")
+    target.add_argument("--resume", type=int, metavar="RUN_ID", help="Resume an interrupted run")
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="0 = one per CPU, 1 = in-process")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    db = SessionLocal()
+    try:
+        if args.resume:
+            run = db.query(RetriageRun).filter(RetriageRun.id == args.resume).first()
+            if run is None:
+                print(f"Run {args.resume} not found", file=sys.stderr)
+                return 1
+            if run.status == RetriageRunStatus.COMPLETED:
+                print(f"Run {run.id} already completed")
+                return 0
+        else:
+            run = start_run(db, args.ruleset)
+        print(f"Run {run.id}: ruleset {run.ruleset_version}, resuming after encounter {run.last_encounter_id}")
+
+        run = run_retriage(db, run, chunk_size=args.chunk_size, workers=args.workers)
+        print(f"Run {run.id} completed: {run.processed_count} scored, {run.changed_count} changed, "
+              f"{run.skipped_count} skipped")
+        for transition, count in sorted(summarize_run(db, run.id).items()):
+            print(f"  {transition}: {count}")
+        return 0
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
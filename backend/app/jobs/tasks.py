@@ -0,0 +1,43 @@
+"""Built-in background tasks run by ``python -m app.worker``."""
+
+import asyncio
+
+from ..core.database import SessionLocal
+from ..core.jobs import task
+from ..models.models import RetriageRun, RetriageRunStatus
+from .archive import run_archive
+from .retriage import run_retriage
+
+
+def _resume_retriage(run_id: int, chunk_size=None, workers=None):
+    db = SessionLocal()
+    try:
+        run = db.query(RetriageRun).filter(RetriageRun.id == run_id).first()
+        if run is None:
+            raise LookupError(f"Retriage run {run_id} not found")
+        if run.status != RetriageRunStatus.COMPLETED:
+            run_retriage(db, run, chunk_size=chunk_size, workers=workers)
+    finally:
+        db.close()
+
+
+@task("retriage.run")
+async def retriage_run(payload: dict):
+    """Run (or resume) a re-triage run; checkpoints make retries pick up where it stopped."""
+    await asyncio.to_thread(
+        _resume_retriage, payload["run_id"], payload.get("chunk_size"), payload.get("workers")
+    )
+
+
+def _archive(older_than_days=None, chunk_size=None):
+    db = SessionLocal()
+    try:
+        return run_archive(db, older_than_days=older_than_days, chunk_size=chunk_size)
+    finally:
+        db.close()
+
+
+@task("archive.run")
+async def archive_run(payload: dict):
+    """Archive closed encounters and completed callbacks; chunks already moved stay moved on retry."""
+    await asyncio.to_thread(_archive, payload.get("older_than_days"), payload.get("chunk_size"))
@@ -1,21 +1,54 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from .api.v1.endpoints import router as api_router
 from .core.database import engine, Base
-from .core.redis_client import get_redis, close_redis
-from .models.models import Provider, Encounter, Callback
+from .core.redis_client import close_redis
+from .core.config import settings
+from .core.warmup import warmup
+from .core.metrics import render_metrics, start_gauge_sampler, stop_gauge_sampler
+from .core.timing import TimingMiddleware
+from .core.logging_config import setup_logging, shutdown_logging
+from .core.audit import start_audit_log, stop_audit_log
+from .core.callback_scheduler import start_callback_scheduler, stop_callback_scheduler
+from .core.sla import start_sla_monitor, stop_sla_monitor
+from .adapters.sms_dispatcher import start_sms_dispatcher, stop_sms_dispatcher
+from .adapters.whatsapp_ingest import start_whatsapp_ingestor, stop_whatsapp_ingestor
+from .adapters.notifier import start_callback_notifier, stop_callback_notifier
+from .models.models import Provider, Encounter, Callback, AuditEvent
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan (startup/shutdown)."""
-    # Startup: Create database tables and initialize Redis
-    Base.metadata.create_all(bind=engine)
-    await get_redis()
+    # Log through the background JSON writer (per worker: the thread doesn't survive fork)
+    setup_logging()
+    # Startup: Create database tables (dev only; production runs `python -m app.migrate`)
+    if settings.AUTO_CREATE_SCHEMA:
+        Base.metadata.create_all(bind=engine)
+    # Pre-open pools and compile hot-path tables before accepting traffic
+    await warmup()
+    # Outbound SMS senders (no-op unless SMS_GATEWAY_URL is set)
+    await start_sms_dispatcher()
+    start_whatsapp_ingestor()
+    start_callback_notifier()
+    start_gauge_sampler()
+    start_audit_log()
+    # Automatic callback assignment (no-op unless CALLBACK_SCHEDULER_ENABLED)
+    await start_callback_scheduler()
+    # Callback SLA escalation (no-op unless CALLBACK_SLA_ENABLED)
+    await start_sla_monitor()
     yield
+    await stop_sla_monitor()
+    await stop_callback_scheduler()
+    await stop_audit_log()
+    await stop_gauge_sampler()
+    await stop_callback_notifier()
+    await stop_whatsapp_ingestor()
+    await stop_sms_dispatcher()
     # Shutdown: Close Redis connection
     await close_redis()
+    shutdown_logging()
 
 
 app = FastAPI(
@@ -37,6 +70,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Server-Timing spans (Redis, DB, flow, serialization) when TIMING_ENABLED
+app.add_middleware(TimingMiddleware, log_sample_rate=settings.TIMING_LOG_SAMPLE_RATE)
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
@@ -48,3 +84,10 @@ async def root():
         "docs": "/api/docs",
         "version": "1.0.0"
     }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus exposition (all gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set)."""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
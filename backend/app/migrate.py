@@ -0,0 +1,27 @@
+"""
+Out-of-band schema management.
+
+Run once per deploy, before starting the workers, so multiple workers never
+race on DDL:
+
+    python -m app.migrate
+"""
+
+import logging
+
+from .core.database import Base, engine
+from .core.search import ensure_search_index
+from .models import models  # noqa: F401  (registers tables on Base.metadata)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=engine)
+    # Tables created by older releases get the full-text index here
+    with engine.begin() as connection:
+        ensure_search_index(connection)
+    logging.getLogger(__name__).info("Schema is up to date (%s)", engine.url.render_as_string(hide_password=True))
+
+
+if __name__ == "__main__":
+    main()
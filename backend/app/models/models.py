@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Boolean, JSON
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Boolean, JSON, Index, DDL, Table, event
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -63,6 +63,7 @@ class Encounter(Base):
     age_group = Column(String(20), nullable=True)  # <5, 5-17, 18-49, 50+
     symptoms_json = Column(JSON, nullable=True)  # Structured symptom responses
     risk_code = Column(String(50), nullable=True)  # EMERGENCY, MALARIA_SUSPECT, etc.
+    triage_ruleset_version = Column(String(50), nullable=True)  # Ruleset that produced risk_code
     consent_given = Column(Boolean, default=False)
     consent_version = Column(String(50), nullable=True)
     
@@ -117,3 +118,113 @@ class Callback(Base):
     assigned_at = Column(DateTime, nullable=True)
     completed_at = Column(DateTime, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+def _archive_table(source: Table, name: str) -> Table:
+    """Archive copy of a table: the same columns without foreign keys or defaults, plus archived_at."""
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+        for column in source.columns
+    ]
+    return Table(name, Base.metadata, *columns, Column("archived_at", DateTime, nullable=False, index=True))
+
+
+class ArchivedEncounter(Base):
+    """A closed encounter moved out of ``encounters`` by the archival job."""
+    __table__ = _archive_table(Encounter.__table__, "encounters_archive")
+
+
+class ArchivedCallback(Base):
+    """A completed callback moved out of ``callbacks`` by the archival job."""
+    __table__ = _archive_table(Callback.__table__, "callbacks_archive")
+
+
+class RetriageRunStatus(str, enum.Enum):
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class RetriageRun(Base):
+    """Re-scoring of historic encounters with a candidate triage ruleset."""
+    __tablename__ = "retriage_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    ruleset_version = Column(String(50), nullable=False)
+    ruleset_path = Column(String(500), nullable=False)
+    status = Column(Enum(RetriageRunStatus), default=RetriageRunStatus.RUNNING, index=True)
+    
+    # Checkpoint: every encounter with id <= last_encounter_id has been scored
+    last_encounter_id = Column(Integer, default=0, nullable=False)
+    max_encounter_id = Column(Integer, nullable=False)  # Upper bound snapshotted at start
+    processed_count = Column(Integer, default=0, nullable=False)
+    changed_count = Column(Integer, default=0, nullable=False)
+    skipped_count = Column(Integer, default=0, nullable=False)  # Rows with malformed symptoms_json
+    error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+    
+    diffs = relationship("RetriageDiff", back_populates="run")
+
+
+class RetriageDiff(Base):
+    """An encounter the candidate ruleset scores differently."""
+    __tablename__ = "retriage_diffs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(Integer, ForeignKey("retriage_runs.id"), nullable=False, index=True)
+    run = relationship("RetriageRun", back_populates="diffs")
+    
+    encounter_id = Column(Integer, nullable=False, index=True)
+    old_risk_code = Column(String(50), nullable=True)
+    new_risk_code = Column(String(50), nullable=False)
+    new_priority = Column(String(20), nullable=False)
+
+
+class AuditEvent(Base):
+    """
+    A provider's access to a patient record.
+
+    Append-only (enforced by triggers) and hash-chained: ``hash`` covers the
+    event and ``prev_hash``, so edited or deleted rows break the chain.
+    """
+    __tablename__ = "audit_log"
+    
+    id = Column(Integer, primary_key=True)
+    period = Column(String(7), nullable=False, index=True)  # "YYYY-MM", to select a month's events
+    occurred_at = Column(DateTime, nullable=False)
+    provider_id = Column(Integer, nullable=True, index=True)
+    action = Column(String(20), nullable=False)  # read, update, search
+    encounter_id = Column(Integer, nullable=False)
+    fields = Column(JSON, nullable=True)  # names (not values) of updated fields
+    prev_hash = Column(String(64), nullable=False)
+    hash = Column(String(64), nullable=False, unique=True)
+    
+    __table_args__ = (Index("ix_audit_log_encounter_time", "encounter_id", "occurred_at"),)
+
+
+class AuditChainHead(Base):
+    """Latest hash of the audit chain; its row lock serializes flushes across workers."""
+    __tablename__ = "audit_chain_head"
+    
+    id = Column(Integer, primary_key=True)
+    last_hash = Column(String(64), nullable=False)
+    event_count = Column(Integer, default=0, nullable=False)
+
+
+# Reject UPDATE and DELETE on the audit log at the database level
+for _operation in ("UPDATE", "DELETE"):
+    event.listen(AuditEvent.__table__, "after_create", DDL(
+        f"CREATE TRIGGER audit_log_no_{_operation.lower()} BEFORE {_operation} ON audit_log "
+        "BEGIN SELECT RAISE(ABORT, 'audit_log is append-only'); END"
+    ).execute_if(dialect="sqlite"))
+event.listen(AuditEvent.__table__, "after_create", DDL(
+    "CREATE OR REPLACE FUNCTION audit_log_append_only() RETURNS trigger AS $$ "
+    "BEGIN RAISE EXCEPTION 'audit_log is append-only'; END; $$ LANGUAGE plpgsql"
+).execute_if(dialect="postgresql"))
+event.listen(AuditEvent.__table__, "after_create", DDL(
+    "CREATE TRIGGER audit_log_append_only BEFORE UPDATE OR DELETE ON audit_log "
+    "FOR EACH ROW EXECUTE FUNCTION audit_log_append_only()"
+).execute_if(dialect="postgresql"))
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 from enum import Enum
 
@@ -89,6 +89,7 @@ class Encounter(EncounterBase):
     source: Optional[str] = None
     channel: Optional[str] = None
     risk_code: Optional[str] = None
+    triage_ruleset_version: Optional[str] = None
     age_group: Optional[str] = None
     assigned_provider_id: Optional[int] = None
     notes: Optional[str] = None
@@ -99,6 +100,12 @@ class Encounter(EncounterBase):
         from_attributes = True
 
 
+class EncounterSearchHit(BaseModel):
+    encounter: Encounter
+    score: float  # higher is a better match
+    snippet: Optional[str] = None  # matched terms wrapped in [ ]
+
+
 # USSD Schemas
 class USSDRequest(BaseModel):
     sessionId: str
@@ -111,6 +118,20 @@ class USSDResponse(BaseModel):
     response: str
 
 
+# SMS Schemas
+class SMSInbound(BaseModel):
+    phoneNumber: str
+    text: str
+
+
+class SMSInboundResult(BaseModel):
+    parsed: bool
+    reply: str
+    risk_code: Optional[str] = None
+    encounter_id: Optional[int] = None
+    error: Optional[str] = None
+
+
 # Callback Schemas
 class CallbackBase(BaseModel):
     encounter_id: int
@@ -126,6 +147,11 @@ class CallbackAssign(BaseModel):
     provider_id: int
 
 
+class ProviderAvailability(BaseModel):
+    available: bool  # receive automatically assigned callbacks
+    expires_in: Optional[float] = None  # seconds until the opt-in lapses unless it is sent again
+
+
 class CallbackComplete(BaseModel):
     outcome: str
     notes: Optional[str] = None
@@ -168,10 +194,104 @@ class HealthCheck(BaseModel):
     version: str = "1.0.0"
 
 
+# Triage Ruleset Schemas
+class TriageRulesetInfo(BaseModel):
+    version: str
+    symptoms: List[str]
+    risk_codes: List[str]
+    source: Optional[str] = None
+
+
+class USSDFlowInfo(BaseModel):
+    name: str
+    service_codes: List[str]
+    languages: List[str]
+    steps: List[str]
+    ruleset_version: str
+    rate_limit: int
+    default: bool
+    source: Optional[str] = None
+
+
+class RetriageRunCreate(BaseModel):
+    ruleset: str  # File name in the rulesets directory
+
+
+class RetriageRun(BaseModel):
+    id: int
+    ruleset_version: str
+    status: str
+    last_encounter_id: int
+    max_encounter_id: int
+    processed_count: int
+    changed_count: int
+    skipped_count: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+
+class RetriageSummary(BaseModel):
+    run: RetriageRun
+    transitions: Dict[str, int]
+
+
+# Audit Schemas
+class AuditEvent(BaseModel):
+    id: int
+    occurred_at: datetime
+    provider_id: Optional[int]
+    action: str
+    encounter_id: int
+    fields: Optional[List[str]] = None
+    hash: str
+    
+    class Config:
+        from_attributes = True
+
+
+class AuditVerification(BaseModel):
+    valid: bool
+    checked: int
+    broken_at: Optional[int] = None  # id of the first event that fails verification
+
+
 # Metrics Schemas
 class USSDMetrics(BaseModel):
     total_sessions: int
-    completion_rate: float
+    completion_rate: float  # % of saved encounters that got a risk code, not of sessions
     risk_distribution: Dict[str, int]
     daily_counts: Dict[str, int]
     callback_sla: Dict[str, Any]
+
+
+class FunnelStep(BaseModel):
+    step: str
+    entered: int
+    exited: int  # answered and moved on (or ended the conversation)
+    dropped: int  # entered minus exited: timed out or hung up at this step
+
+
+class FunnelPeriod(BaseModel):
+    period: str
+    entered: Dict[str, int]
+    exited: Dict[str, int]
+    outcomes: Dict[str, int]
+
+
+class UniqueCallers(BaseModel):
+    daily: Dict[str, int]
+    total: int  # distinct over the whole range, not the sum of the days
+
+
+class ConversationFunnel(BaseModel):
+    channel: str
+    flow: str
+    bucket: str
+    steps: List[FunnelStep]
+    outcomes: Dict[str, int]  # completed, declined, rate_limited, error
+    series: List[FunnelPeriod]
+    unique_callers: UniqueCallers
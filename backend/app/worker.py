@@ -0,0 +1,170 @@
+"""
+Background job worker.
+
+Runs N async consumers of the Redis Streams job queues (see ``app.core.jobs``)
+plus a scheduler that moves due retries back into their streams and enqueues
+periodic jobs (``archive.run`` every ARCHIVE_INTERVAL_SECONDS).
+
+CPU-heavy tasks such as ``retriage.run`` fan out to a process pool here, in
+the worker, never in the web processes.
+
+Usage:
+    python -m app.worker [--queues default,exports] [--concurrency 4]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import socket
+import sys
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
+
+from .core.config import settings
+from .core.jobs import TASKS, Job, JobQueue, TaskHandler, get_job_queue
+from .core.redis_client import close_redis
+from .jobs import tasks  # noqa: F401  (registers the built-in tasks)
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicJob(NamedTuple):
+    """A job enqueued every ``every`` seconds by one of the running workers."""
+
+    name: str
+    every: float
+    payload: Dict[str, Any] = {}
+    queue: str = "default"
+
+
+def periodic_jobs_from_settings() -> List[PeriodicJob]:
+    jobs = []
+    if settings.ARCHIVE_INTERVAL_SECONDS > 0:
+        jobs.append(PeriodicJob("archive.run", settings.ARCHIVE_INTERVAL_SECONDS))
+    return jobs
+
+
+class Worker:
+    """Consumes jobs with a fixed number of concurrent consumers."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        queues: Sequence[str] = ("default",),
+        concurrency: int = 4,
+        tasks: Optional[Dict[str, TaskHandler]] = None,
+        batch_size: int = 10,
+        block_ms: int = 1000,
+        schedule_interval: float = 0.5,
+        periodic: Sequence[PeriodicJob] = (),
+    ):
+        self.queue = queue
+        self.queues = list(queues)
+        self.concurrency = concurrency
+        self.tasks = TASKS if tasks is None else tasks
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.schedule_interval = schedule_interval
+        self.periodic = list(periodic)
+        self.name = f"{socket.gethostname()}-{os.getpid()}"
+        self.stats = {"succeeded": 0, "failed": 0}
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """Ask consumers to finish their current job and exit."""
+        self._stopping.set()
+
+    async def run(self):
+        for queue in self.queues:
+            await self.queue.ensure_group(queue)
+        logger.info("Worker %s consuming %s with %d consumers", self.name, self.queues, self.concurrency)
+        await asyncio.gather(
+            self._schedule(),
+            *(self._consume(f"{self.name}-{i}") for i in range(self.concurrency)),
+        )
+
+    async def _schedule(self):
+        while not self._stopping.is_set():
+            try:
+                await self.queue.promote_due()
+            except Exception:
+                logger.exception("Failed to promote delayed jobs")
+            for job in self.periodic:
+                try:
+                    if await self.queue.enqueue_periodic(job.name, job.payload, job.every, queue=job.queue):
+                        logger.info("Enqueued periodic job %s", job.name)
+                except Exception:
+                    logger.exception("Failed to enqueue periodic job %s", job.name)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.schedule_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _consume(self, consumer: str):
+        while not self._stopping.is_set():
+            try:
+                jobs = await self.queue.fetch(self.queues, consumer, count=self.batch_size, block_ms=self.block_ms)
+            except Exception:
+                logger.exception("Consumer %s failed to fetch jobs", consumer)
+                await asyncio.sleep(1)
+                continue
+            for job in jobs:
+                await self.process(job, consumer)
+
+    async def _run_with_heartbeat(self, handler: TaskHandler, job: Job, consumer: str):
+        running = asyncio.ensure_future(handler(job.payload))
+        interval = self.queue.visibility_timeout / 3
+        try:
+            while True:
+                done, _ = await asyncio.wait({running}, timeout=interval)
+                if done:
+                    return running.result()
+                await self.queue.touch(job, consumer)
+        finally:
+            running.cancel()
+
+    async def process(self, job: Job, consumer: str):
+        """Run one job and acknowledge, retry or dead-letter it."""
+        handler = self.tasks.get(job.name)
+        if handler is None:
+            await self.queue.dead_letter(job, f"unknown task {job.name!r}")
+            self.stats["failed"] += 1
+            return
+        try:
+            await self._run_with_heartbeat(handler, job, consumer)
+        except Exception as exc:
+            self.stats["failed"] += 1
+            logger.warning("Job %s (%s) attempt %d failed: %r", job.id, job.name, job.attempts + 1, exc)
+            await self.queue.retry(job, repr(exc))
+            return
+        await self.queue.ack(job)
+        self.stats["succeeded"] += 1
+
+
+async def _main(queues: List[str], concurrency: int):
+    worker = Worker(await get_job_queue(), queues=queues, concurrency=concurrency,
+                    periodic=periodic_jobs_from_settings())
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await close_redis()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run background job consumers.")
+    parser.add_argument("--queues", default=settings.WORKER_QUEUES, help="Comma-separated queue names")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    queues = [queue.strip() for queue in args.queues.split(",") if queue.strip()]
+    asyncio.run(_main(queues, args.concurrency))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
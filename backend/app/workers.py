@@ -0,0 +1,13 @@
+"""Gunicorn worker classes."""
+
+from uvicorn.workers import UvicornWorker
+
+
+class UvloopUvicornWorker(UvicornWorker):
+    """Uvicorn worker pinned to the uvloop event loop and httptools parser."""
+
+    CONFIG_KWARGS = {
+        **UvicornWorker.CONFIG_KWARGS,
+        "loop": "uvloop",
+        "http": "httptools",
+    }
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the conversation engine across channels.
+Runs N complete triage conversations, split evenly over USSD, IVR, WhatsApp
+and SMS, through the channel adapters concurrently, and reports
+conversations/s and per-message latency. Session state lives in an
+in-memory store by default; pass --redis to use REDIS_URL.
+
+Usage:
+    python -m benchmarks.bench_conversation [conversations] [--concurrency 100] [--redis]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.adapters.ivr_adapter import IVRAdapter
+from app.adapters.sms_adapter import SMSAdapter
+from app.adapters.ussd_adapter import USSDAdapter
+from app.adapters.whatsapp_adapter import WhatsAppAdapter
+from app.core.conversation import ConversationEngine
+from app.core.database import Base
+from app.core.ussd_session import USSDSession
+
+# consent, English, 18-49, female, fever, headache, no danger sign, no cough, no callback
+ANSWERS = ["1", "1", "3", "2", "1", "1", "2", "2", "2"]
+
+
+class MemorySession(USSDSession):
+    """USSDSession backed by a process-local dict instead of Redis."""
+
+    store: Dict[str, str] = {}
+
+    async def load(self):
+        data = self.store.get(self.key)
+        return json.loads(data) if data else None
+
+    async def set_state(self, state, funnel=None):
+        self.store[self.key] = json.dumps(state)
+
+    async def clear(self, funnel=None):
+        self.store.pop(self.key, None)
+
+    @staticmethod
+    async def check_rate_limit(msisdn_hash: str, limit=None, scope="") -> bool:
+        return True
+
+
+async def _ussd(adapter, i, db, latencies):
+    # The aggregator sends the accumulated input: "", "1", "1*1", ...
+    for k in range(len(ANSWERS) + 1):
+        text = "*".join(ANSWERS[:k])
+        start = time.perf_counter()
+        await adapter.handle_ussd_request(f"bench-{i}", f"+23481{i:08d}", text, db)
+        latencies.append(time.perf_counter() - start)
+
+
+async def _ivr(adapter, i, db, latencies):
+    phone = f"+23482{i:08d}"
+    start = time.perf_counter()
+    await adapter.handle_incoming_call(f"CA{i}", phone, db)
+    latencies.append(time.perf_counter() - start)
+    for digit in ANSWERS:
+        start = time.perf_counter()
+        await adapter.process_dtmf_input(f"CA{i}", phone, digit, db)
+        latencies.append(time.perf_counter() - start)
+
+
+async def _whatsapp(adapter, i, db, latencies):
+    sender = f"23483{i:08d}"
+    for body in ["hi"] + ANSWERS:
+        start = time.perf_counter()
+        await adapter.receive_message({"from": sender, "text": {"body": body}}, db)
+        latencies.append(time.perf_counter() - start)
+
+
+async def _sms(adapter, i, db, latencies):
+    start = time.perf_counter()
+    await adapter.receive_sms(f"+23484{i:08d}", "NTAL 3 F F H", db)
+    latencies.append(time.perf_counter() - start)
+
+
+async def run(conversations: int, concurrency: int, use_redis: bool):
+    directory = tempfile.mkdtemp()
+    db_engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    Base.metadata.create_all(db_engine)
+    Session = sessionmaker(bind=db_engine)
+
+    engine = ConversationEngine() if use_redis else ConversationEngine(session_class=MemorySession)
+    channels = {
+        "USSD": (_ussd, USSDAdapter(engine=engine)),
+        "IVR": (_ivr, IVRAdapter(engine=engine)),
+        "WHATSAPP": (_whatsapp, WhatsAppAdapter(engine=engine)),
+        "SMS": (_sms, SMSAdapter(engine=engine)),
+    }
+    latencies = {name: [] for name in channels}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def conversation(i):
+        name = list(channels)[i % len(channels)]
+        driver, adapter = channels[name]
+        async with semaphore:
+            db = Session()
+            try:
+                await driver(adapter, i, db, latencies[name])
+            finally:
+                db.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(i) for i in range(conversations)))
+    elapsed = time.perf_counter() - start
+
+    print(f"Conversations:   {conversations:,} ({'redis' if use_redis else 'in-memory'} sessions)")
+    print(f"Elapsed:         {elapsed:.2f}s")
+    print(f"Throughput:      {conversations / elapsed:,.0f} conversations/s")
+    for name, samples in latencies.items():
+        if samples:
+            samples.sort()
+            p95 = samples[int(len(samples) * 0.95) - 1] * 1000
+            print(f"  {name:<9} {len(samples):>7,} msgs  median {statistics.median(samples) * 1000:6.2f} ms  p95 {p95:6.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("conversations", nargs="?", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--redis", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(run(args.conversations, args.concurrency, args.redis))
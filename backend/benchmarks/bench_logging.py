@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Benchmark of USSD hop latency with logging off and on.
+Runs N USSD conversations through the /ussd endpoint function (in-memory
+sessions, SQLite) once per logging mode and reports per-hop latency:
+
+    off        root logger at WARNING; hop logs are skipped before a record exists
+    sync       plain StreamHandler writing to a file on the event loop
+    queue      background JSON writer, every hop logged
+    sampled    background JSON writer, ussd_hop sampled at LOG_SAMPLE_RATES
+
+Usage:
+    python -m benchmarks.bench_logging [conversations] [--concurrency 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.api.v1.endpoints import ussd_handler
+from app.core import conversation, logging_config
+from app.core.config import settings
+from app.core.conversation import get_conversation_engine
+from app.core.database import Base
+from app.schemas.schemas import USSDRequest
+from benchmarks.bench_conversation import ANSWERS, MemorySession
+
+MODES = ("off", "sync", "queue", "sampled")
+
+
+async def _skip_contact(msisdn, channel, language):
+    return None
+
+
+def configure(mode: str, log_file):
+    root = logging.getLogger()
+    logging_config.shutdown_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging_config._sample_rates.clear()
+
+    if mode == "off":
+        root.setLevel(logging.WARNING)
+    elif mode == "sync":
+        handler = logging.StreamHandler(log_file)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(logging.INFO)
+    else:
+        if mode == "sampled":
+            logging_config._sample_rates.update(logging_config.parse_sample_rates(settings.LOG_SAMPLE_RATES))
+        logging_config.setup_logging(stream=log_file)
+
+
+async def run_mode(mode: str, conversations: int, concurrency: int, Session, log_file):
+    configure(mode, log_file)
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def conversation(i):
+        async with semaphore:
+            db = Session()
+            try:
+                for k in range(len(ANSWERS) + 1):
+                    request = USSDRequest(
+                        sessionId=f"{mode}-{i}",
+                        phoneNumber=f"+23485{i:08d}",
+                        serviceCode="*123#",
+                        text="*".join(ANSWERS[:k]),
+                    )
+                    start = time.perf_counter()
+                    await ussd_handler(request, db)
+                    latencies.append(time.perf_counter() - start)
+            finally:
+                db.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(conversation(i) for i in range(conversations)))
+    elapsed = time.perf_counter() - start
+    logging_config.shutdown_logging()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(
+        f"  {mode:<8} {len(latencies) / elapsed:>8,.0f} hops/s  "
+        f"median {statistics.median(latencies) * 1000:6.3f} ms  p99 {p99:6.3f} ms"
+    )
+
+
+async def run(conversations: int, concurrency: int):
+    directory = tempfile.mkdtemp()
+    # One connection per in-flight conversation: a blocking pool wait would stall the loop
+    db_engine = create_engine(
+        f"sqlite:///{os.path.join(directory, 'bench.db')}", pool_size=concurrency, max_overflow=0
+    )
+    Base.metadata.create_all(db_engine)
+    Session = sessionmaker(bind=db_engine)
+    get_conversation_engine().session_class = MemorySession
+    # Contacts go to Redis; keep that round trip (or its connect timeout) out of the numbers
+    conversation.remember_contact = _skip_contact
+
+    print(f"Conversations:   {conversations:,} x {len(ANSWERS) + 1} hops per logging mode")
+    with open(os.path.join(directory, "bench.log"), "w") as log_file:
+        for mode in MODES:
+            await run_mode(mode, conversations, concurrency, Session, log_file)
+        print(f"Log output:      {log_file.tell() / 1024:,.0f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("conversations", nargs="?", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.conversations, args.concurrency))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the re-triage job.
+Seeds a throwaway SQLite database with synthetic USSD encounters and
+re-scores them with the bundled ruleset, reporting rows per second.
+
+Usage:
+    python -m benchmarks.bench_retriage [rows] [workers]
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core.triage_rules import DEFAULT_RULESET_PATH
+from app.jobs.retriage import run_retriage, start_run
+from app.models.models import Encounter
+
+
+def main(rows: int = 1_000_000, workers: int = 0):
+    path = os.path.join(tempfile.mkdtemp(), "bench_retriage.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(42)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        batch = []
+        for _ in range(rows):
+            symptoms = {key: rng.random() < 0.3 for key in ("fever", "severe_headache", "danger_sign", "cough")}
+            batch.append({"channel": "USSD", "symptoms_json": symptoms, "risk_code": "LOW_RISK"})
+            if len(batch) == 50_000:
+                conn.execute(insert(Encounter), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Encounter), batch)
+    print(f"Seeded {rows:,} encounters in {time.perf_counter() - start:.1f}s")
+
+    db = sessionmaker(bind=engine)()
+    run = start_run(db, str(DEFAULT_RULESET_PATH))
+    start = time.perf_counter()
+    run = run_retriage(db, run, workers=workers)
+    elapsed = time.perf_counter() - start
+    print(
+        f"Re-triaged {run.processed_count:,} rows ({run.changed_count:,} changed) "
+        f"in {elapsed:.1f}s: {run.processed_count / elapsed:,.0f} rows/s"
+    )
+    db.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 0,
+    )
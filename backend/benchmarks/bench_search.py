@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Benchmark for encounter full-text search.
+Seeds a throwaway SQLite database with synthetic encounters (indexed by the
+FTS5 triggers as they are inserted), then runs a mix of common and rare
+queries through search_encounters and reports latency percentiles against
+the 50 ms target.
+
+Usage:
+    python -m benchmarks.bench_search [rows] [queries]
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base
+from app.core.search import search_encounters
+from app.models.models import Encounter
+
+COMPLAINTS = ["headache", "fever", "cough", "abdominal pain", "rash", "back pain", "dizziness", "vomiting"]
+SYMPTOMS = ["nausea", "chills", "fatigue", "sore throat", "shortness of breath", "diarrhoea", "joint pain", "blurred vision"]
+HISTORY = ["hypertension", "diabetes", "asthma", "sickle cell", "pregnancy", "none reported"]
+FILLER = "patient reports onset days ago worse at night improving with rest seen at clinic advised follow up".split()
+RARE = ["convulsions", "jaundice", "haemoptysis", "photophobia"]
+
+QUERIES = ["headache", "fever chills", "shortness breath", "diabetic", "convulsions", "jaundice fever", "back pain rest"]
+
+TARGET_MS = 50.0
+
+
+def fake_encounter(rng: random.Random) -> dict:
+    notes = " ".join(rng.choices(FILLER, k=rng.randint(5, 25)))
+    if rng.random() < 0.001:
+        notes += " " + rng.choice(RARE)
+    return {
+        "channel": "USSD",
+        "chief_complaint": rng.choice(COMPLAINTS),
+        "symptoms": ", ".join(rng.sample(SYMPTOMS, rng.randint(1, 3))),
+        "medical_history": rng.choice(HISTORY),
+        "notes": notes,
+    }
+
+
+def main(rows: int = 1_000_000, queries: int = 200):
+    path = os.path.join(tempfile.mkdtemp(), "bench_search.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+
+    rng = random.Random(42)
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        batch = []
+        for _ in range(rows):
+            batch.append(fake_encounter(rng))
+            if len(batch) == 50_000:
+                conn.execute(insert(Encounter), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Encounter), batch)
+    print(f"Seeded and indexed {rows:,} encounters in {time.perf_counter() - start:.1f}s")
+
+    db = sessionmaker(bind=engine)()
+    search_encounters(db, "warmup")
+    per_query = {query: [] for query in QUERIES}
+    for i in range(queries):
+        query = QUERIES[i % len(QUERIES)]
+        start = time.perf_counter()
+        search_encounters(db, query)
+        per_query[query].append((time.perf_counter() - start) * 1000)
+        db.expunge_all()
+
+    for query, samples in per_query.items():
+        print(f"  {query!r:22} median {statistics.median(samples):6.1f} ms")
+    samples = sorted(sample for query_samples in per_query.values() for sample in query_samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{len(samples)} queries: p50 {statistics.median(samples):.1f} ms, p95 {p95:.1f} ms, "
+        f"max {samples[-1]:.1f} ms ({'within' if p95 <= TARGET_MS else 'over'} the {TARGET_MS:.0f} ms target)"
+    )
+    db.close()
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200,
+    )
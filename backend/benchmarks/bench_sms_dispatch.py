@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the outbound SMS dispatcher.
+Sends N messages through SMSDispatcher to the mock gateway and reports
+throughput, retries and dead letters. By default the mock gateway runs
+in-process; pass --url to target a gateway started with uvicorn.
+
+Usage:
+    python -m benchmarks.bench_sms_dispatch [messages] [--tps 500] [--url http://127.0.0.1:9100]
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from app.adapters.sms_dispatcher import SMSDispatcher
+
+from .mock_sms_gateway import app as mock_gateway
+
+
+async def run(messages: int, tps: float, url: str = None):
+    transport = None if url else httpx.ASGITransport(app=mock_gateway)
+    dispatcher = SMSDispatcher(
+        gateway_url=url or "http://mock-gateway",
+        tps=tps,
+        retry_base_seconds=0.05,
+        retry_max_seconds=1.0,
+        transport=transport,
+    )
+    await dispatcher.start()
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(dispatcher.send(f"+23480{i:08d}", f"Callback reminder {i}") for i in range(messages))
+    )
+    elapsed = time.perf_counter() - start
+    await dispatcher.stop()
+
+    sent = sum(1 for r in results if r["status"] == "sent")
+    print(f"Messages:        {messages:,}")
+    print(f"Target TPS:      {tps:,.0f}")
+    print(f"Elapsed:         {elapsed:.2f}s")
+    print(f"Throughput:      {sent / elapsed:,.0f} msg/s")
+    print(f"Batches:         {dispatcher.stats['batches']:,}")
+    print(f"Retried:         {dispatcher.stats['retried']:,}")
+    print(f"Dead-lettered:   {dispatcher.stats['dead_lettered']:,}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("messages", nargs="?", type=int, default=20000)
+    parser.add_argument("--tps", type=float, default=5000.0)
+    parser.add_argument("--url")
+    args = parser.parse_args()
+    asyncio.run(run(args.messages, args.tps, args.url))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark for server startup time.
+Starts the production server (or plain uvicorn) on a free port and measures
+the time until the readiness endpoint reports that warmup is done.
+
+Usage:
+    python -m benchmarks.bench_startup [gunicorn|uvicorn] [workers]
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main(server: str = "gunicorn", workers: int = 2, timeout: float = 60.0):
+    port = _free_port()
+    env = {**os.environ, "AUTO_CREATE_SCHEMA": "false"}
+    subprocess.run([sys.executable, "-m", "app.migrate"], check=True, env=env, capture_output=True)
+
+    if server == "gunicorn":
+        env.update(BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers))
+        command = ["gunicorn", "-c", "gunicorn_conf.py", "app.main:app"]
+        label = f"gunicorn ({workers} workers)"
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port)]
+        label = "uvicorn (1 worker)"
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        url = f"http://127.0.0.1:{port}/api/v1/ready"
+        while time.perf_counter() - start < timeout:
+            try:
+                response = httpx.get(url, timeout=1.0)
+                if response.status_code == 200:
+                    elapsed = time.perf_counter() - start
+                    data = response.json()
+                    print(f"{label}: ready in {elapsed * 1000:.0f}ms "
+                          f"(worker warmup {data['warmup_ms']}ms, checks {data['checks']})")
+                    return elapsed
+            except httpx.TransportError:
+                pass
+            time.sleep(0.02)
+        print(f"{label} did not become ready within {timeout}s")
+        return None
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1] if len(sys.argv) > 1 else "gunicorn",
+        int(sys.argv[2]) if len(sys.argv) > 2 else 2,
+    )
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the batch triage API.
+Compares rows per second for scalar assess_risk and the vectorized batch path.
+
+Usage:
+    python -m benchmarks.bench_triage_batch [rows]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from app.core.triage_batch import assess_risk_batch, assess_risk_rows
+from app.core.triage_rules import get_active_ruleset
+from app.core.triage_engine import assess_risk
+
+
+def _report(label: str, rows: int, elapsed: float):
+    print(f"{label:<28} {rows:>12,} rows  {elapsed:8.3f}s  {rows / elapsed:>14,.0f} rows/s")
+
+
+def main(rows: int = 1_000_000):
+    rng = np.random.default_rng(42)
+    symptoms = get_active_ruleset().symptoms
+    columns = {key: rng.random(rows) < 0.3 for key in symptoms}
+
+    start = time.perf_counter()
+    assess_risk_batch(columns)
+    _report("batch (columnar arrays)", rows, time.perf_counter() - start)
+
+    sample = min(rows, 200_000)
+    dict_rows = [
+        {key: bool(columns[key][i]) for key in symptoms}
+        for i in range(sample)
+    ]
+
+    start = time.perf_counter()
+    assess_risk_rows(dict_rows)
+    _report("batch (symptoms_json rows)", sample, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for row in dict_rows:
+        assess_risk(row)
+    _report("scalar assess_risk", sample, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Mock SMS gateway implementing the batch JSON API used by SMSDispatcher.
+
+Configurable via environment variables:
+    MOCK_SMS_LATENCY_MS   - per-request latency (default 20)
+    MOCK_SMS_FAILURE_RATE - fraction of messages rejected as retryable (default 0.05)
+    MOCK_SMS_TPS          - messages/second before answering 429 (default 0 = unlimited)
+
+Usage:
+    uvicorn benchmarks.mock_sms_gateway:app --port 9100
+"""
+
+import asyncio
+import os
+import random
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+LATENCY = float(os.getenv("MOCK_SMS_LATENCY_MS", "20")) / 1000
+FAILURE_RATE = float(os.getenv("MOCK_SMS_FAILURE_RATE", "0.05"))
+TPS = float(os.getenv("MOCK_SMS_TPS", "0"))
+
+app = FastAPI(title="Mock SMS gateway")
+app.state.received = 0
+app.state.accepted = 0
+app.state.window = [time.monotonic(), 0]
+
+
+@app.post("/messages/batch")
+async def send_batch(request: Request):
+    payload = await request.json()
+    messages = payload.get("messages", [])
+    await asyncio.sleep(LATENCY)
+
+    if TPS:
+        window = app.state.window
+        now = time.monotonic()
+        if now - window[0] >= 1.0:
+            window[0], window[1] = now, 0
+        if window[1] + len(messages) > TPS * 1.1:
+            return JSONResponse({"error": "rate limited"}, status_code=429)
+        window[1] += len(messages)
+
+    app.state.received += len(messages)
+    results = []
+    for message in messages:
+        if random.random() < FAILURE_RATE:
+            results.append({"id": message["id"], "status": "rejected", "retryable": True})
+        else:
+            app.state.accepted += 1
+            results.append({"id": message["id"], "status": "accepted"})
+    return {"results": results}
+
+
+@app.get("/stats")
+async def stats():
+    return {"received": app.state.received, "accepted": app.state.accepted}
@@ -6,6 +6,8 @@ from app.main import app
 from app.core.database import Base, get_db
 from app.models.models import Provider, ProviderRole
 from app.core.security import get_password_hash
+from app.core.circuit_breaker import get_session_breaker
+from app.core.ussd_session import get_fallback_store
 
 # Test database
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
@@ -13,6 +15,14 @@ engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def session_store():
+    """Start every test with a closed session circuit and an empty in-process session copy."""
+    get_session_breaker().reset()
+    get_fallback_store().reset()
+    yield get_fallback_store()
+
+
 @pytest.fixture
 def db():
     Base.metadata.create_all(bind=engine)
@@ -0,0 +1,163 @@
+"""Local Redis servers for tests and benchmarks.
+
+``LocalRedisServer`` runs one throwaway ``redis-server`` that tests can kill
+and restart. ``LocalRedisCluster`` starts N ``redis-server`` masters with cluster mode enabled on free ports
+and joins them with ``redis-cli --cluster create``. Needs the Redis binaries
+on PATH. Run it directly to keep a cluster up for benchmarks:
+
+    python -m tests.redis_cluster 3
+    REDIS_CLUSTER_NODES=127.0.0.1:7000,... python -m benchmarks.bench_conversation 10000 --redis
+"""
+
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _free_cluster_port() -> int:
+    """A free port whose cluster bus port (port + 10000) is valid and free too."""
+    while True:
+        port = _free_port()
+        if port + 10000 > 65535:
+            continue
+        try:
+            with socket.socket() as sock:
+                sock.bind(("127.0.0.1", port + 10000))
+        except OSError:
+            continue
+        return port
+
+
+class LocalRedisServer:
+    """Context manager running one throwaway redis-server that can be killed and restarted."""
+
+    def __init__(self, port: Optional[int] = None):
+        self.port = port or _free_port()
+        self.process: Optional[subprocess.Popen] = None
+
+    @staticmethod
+    def available() -> bool:
+        return bool(shutil.which("redis-server") and shutil.which("redis-cli"))
+
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 10.0) -> "LocalRedisServer":
+        self.process = subprocess.Popen(
+            ["redis-server", "--port", str(self.port), "--bind", "127.0.0.1", "--save", "", "--appendonly", "no"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        while subprocess.run(["redis-cli", "-p", str(self.port), "ping"], capture_output=True).returncode != 0:
+            if time.monotonic() > deadline:
+                self.kill()
+                raise RuntimeError(f"redis-server on port {self.port} did not start")
+            time.sleep(0.05)
+        return self
+
+    def kill(self):
+        """SIGKILL the server, as a crash would; its data is lost."""
+        if self.process is not None:
+            self.process.kill()
+            self.process.wait()
+            self.process = None
+
+    def __enter__(self) -> "LocalRedisServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.kill()
+
+
+class LocalRedisCluster:
+    """Context manager running a throwaway Redis Cluster."""
+
+    def __init__(self, masters: int = 3, ports: Optional[List[int]] = None):
+        self.ports = ports or [_free_cluster_port() for _ in range(masters)]
+        self.directory: Optional[str] = None
+        self.processes: List[subprocess.Popen] = []
+
+    @staticmethod
+    def available() -> bool:
+        return bool(shutil.which("redis-server") and shutil.which("redis-cli"))
+
+    @property
+    def nodes(self) -> str:
+        """Startup nodes in REDIS_CLUSTER_NODES form."""
+        return ",".join(f"127.0.0.1:{port}" for port in self.ports)
+
+    def start(self, timeout: float = 15.0) -> "LocalRedisCluster":
+        self.directory = tempfile.mkdtemp(prefix="ntal-redis-cluster-")
+        for port in self.ports:
+            self.processes.append(subprocess.Popen(
+                [
+                    "redis-server", "--port", str(port), "--bind", "127.0.0.1",
+                    "--cluster-enabled", "yes", "--cluster-config-file", f"nodes-{port}.conf",
+                    "--dir", self.directory, "--save", "", "--appendonly", "no",
+                ],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            ))
+        deadline = time.monotonic() + timeout
+        for port in self.ports:
+            while subprocess.run(["redis-cli", "-p", str(port), "ping"], capture_output=True).returncode != 0:
+                if time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"redis-server on port {port} did not start")
+                time.sleep(0.05)
+        subprocess.run(
+            ["redis-cli", "--cluster", "create", *[f"127.0.0.1:{port}" for port in self.ports],
+             "--cluster-replicas", "0", "--cluster-yes"],
+            check=True,
+            capture_output=True,
+        )
+        while b"cluster_state:ok" not in subprocess.run(
+            ["redis-cli", "-p", str(self.ports[0]), "cluster", "info"], capture_output=True
+        ).stdout:
+            if time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError("Redis Cluster did not reach cluster_state:ok")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.processes = []
+        if self.directory:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def __enter__(self) -> "LocalRedisCluster":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+if __name__ == "__main__":
+    masters = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    with LocalRedisCluster(masters, ports=[7000 + i for i in range(masters)]) as cluster:
+        print(f"REDIS_CLUSTER_NODES={cluster.nodes}  (Ctrl-C to stop)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
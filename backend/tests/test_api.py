@@ -1,5 +1,9 @@
 import pytest
 from fastapi import status
+from fastapi.testclient import TestClient
+
+from app.core import warmup
+from app.main import app
 
 
 def test_health_check(client):
@@ -144,3 +148,38 @@ def test_get_current_provider(client, auth_headers):
     assert data["username"] == "test_user"
     assert data["email"] == "test@example.com"
     assert data["full_name"] == "Test User"
+
+
+def test_readiness_after_warmup(db, monkeypatch):
+    """Readiness reports ready once the startup warmup has reached every dependency"""
+    async def redis_up():
+        pass
+    
+    monkeypatch.setattr(warmup, "_warm_redis", redis_up)
+    with TestClient(app) as client:
+        response = client.get("/api/v1/ready")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ready"
+    assert data["checks"] == {"compile": "ok", "database": "ok", "redis": "ok"}
+
+
+def test_not_ready_while_redis_is_unreachable(db, monkeypatch):
+    """A worker that cannot reach Redis stays unready until a probe finds it back"""
+    async def redis_down():
+        raise ConnectionError("Connection refused")
+    
+    async def redis_up():
+        pass
+    
+    monkeypatch.setattr(warmup, "_warm_redis", redis_down)
+    with TestClient(app) as client:
+        response = client.get("/api/v1/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "unavailable"
+        assert response.json()["checks"]["redis"].startswith("error")
+        
+        monkeypatch.setattr(warmup, "_warm_redis", redis_up)
+        response = client.get("/api/v1/ready")
+        assert response.status_code == 200
+        assert response.json()["checks"]["redis"] == "ok"
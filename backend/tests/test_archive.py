@@ -0,0 +1,95 @@
+"""Tests for archival of closed encounters and completed callbacks."""
+
+from datetime import datetime, timedelta
+
+from app.jobs.archive import find_encounter, run_archive
+from app.models.models import (
+    ArchivedCallback,
+    ArchivedEncounter,
+    Callback,
+    CallbackStatus,
+    Encounter,
+    EncounterStatus,
+)
+
+OLD = datetime.utcnow() - timedelta(days=400)
+
+
+def add_encounter(db, status, updated_at, callback_status=None):
+    encounter = Encounter(channel="USSD", risk_code="LOW_RISK", status=status, created_at=updated_at)
+    db.add(encounter)
+    db.flush()
+    # onupdate would overwrite updated_at on the flush above
+    encounter.updated_at = updated_at
+    if callback_status is not None:
+        db.add(Callback(
+            encounter_id=encounter.id,
+            msisdn_hash="h" * 64,
+            status=callback_status,
+            completed_at=updated_at if callback_status == CallbackStatus.DONE else None,
+        ))
+    db.commit()
+    return encounter.id
+
+
+def test_archive_moves_only_cold_closed_rows(db):
+    archived_id = add_encounter(db, EncounterStatus.CLOSED, OLD)
+    with_done_callback = add_encounter(db, EncounterStatus.CLOSED, OLD, CallbackStatus.DONE)
+    with_live_callback = add_encounter(db, EncounterStatus.CLOSED, OLD, CallbackStatus.QUEUED)
+    recent = add_encounter(db, EncounterStatus.CLOSED, datetime.utcnow())
+    open_old = add_encounter(db, EncounterStatus.PENDING, OLD)
+
+    moved = run_archive(db, older_than_days=365, chunk_size=1, pause=0)
+
+    assert moved == {"callbacks": 1, "encounters": 2}
+    assert {e.id for e in db.query(Encounter)} == {with_live_callback, recent, open_old}
+    assert {e.id for e in db.query(ArchivedEncounter)} == {archived_id, with_done_callback}
+    assert db.query(Callback).one().status == CallbackStatus.QUEUED
+    archived_callback = db.query(ArchivedCallback).one()
+    assert archived_callback.encounter_id == with_done_callback
+    assert archived_callback.archived_at is not None
+
+    # Nothing left to do on a second run
+    assert run_archive(db, older_than_days=365, pause=0) == {"callbacks": 0, "encounters": 0}
+
+
+def test_finished_callbacks_do_not_pin_their_encounter(db):
+    """Failed callbacks are archived too, and a recent finished callback moves with its cold encounter."""
+    with_failed_callback = add_encounter(db, EncounterStatus.CLOSED, OLD, CallbackStatus.FAILED)
+    db.query(Callback).update({Callback.updated_at: OLD})
+    with_recent_callback = add_encounter(db, EncounterStatus.CLOSED, OLD)
+    db.add(Callback(encounter_id=with_recent_callback, msisdn_hash="h" * 64,
+                    status=CallbackStatus.DONE, completed_at=datetime.utcnow()))
+    db.commit()
+
+    moved = run_archive(db, older_than_days=365, pause=0)
+
+    assert moved == {"callbacks": 1, "encounters": 2}
+    assert db.query(Encounter).count() == 0
+    assert db.query(Callback).count() == 0
+    assert {c.encounter_id for c in db.query(ArchivedCallback)} == {with_failed_callback, with_recent_callback}
+
+
+def test_archived_rows_keep_their_data(db):
+    encounter_id = add_encounter(db, EncounterStatus.CLOSED, OLD)
+    run_archive(db, older_than_days=365, pause=0)
+
+    encounter, archived = find_encounter(db, encounter_id)
+    assert archived is True
+    assert encounter.status == EncounterStatus.CLOSED
+    assert encounter.risk_code == "LOW_RISK"
+    assert encounter.updated_at == OLD
+    assert find_encounter(db, 9999) == (None, False)
+
+
+def test_by_id_reads_fall_back_to_the_archive(client, auth_headers, db):
+    encounter_id = add_encounter(db, EncounterStatus.CLOSED, OLD)
+    run_archive(db, older_than_days=365, pause=0)
+
+    response = client.get(f"/api/v1/encounters/{encounter_id}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json()["status"] == "closed"
+
+    response = client.put(f"/api/v1/encounters/{encounter_id}", headers=auth_headers, json={"notes": "late"})
+    assert response.status_code == 409
+    assert client.get("/api/v1/encounters/9999", headers=auth_headers).status_code == 404
@@ -0,0 +1,121 @@
+"""Tests for the buffered, hash-chained audit log."""
+
+import asyncio
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DatabaseError
+
+from app.core.audit import AuditLog, AuditRecord, verify_chain, write_batch
+from app.models.models import AuditChainHead, AuditEvent, Encounter
+from tests.conftest import TestingSessionLocal
+
+
+def records(n, encounter_id=1):
+    return [AuditRecord(datetime.utcnow(), 7, "read", encounter_id) for _ in range(n)]
+
+
+def test_encounter_reads_and_updates_are_audited(client, auth_headers, db, test_provider):
+    encounter = Encounter(patient_name="Ada", channel="web")
+    db.add(encounter)
+    db.commit()
+    audit_log = AuditLog(session_factory=TestingSessionLocal)
+
+    with patch('app.core.audit.audit_log', audit_log):
+        assert client.get(f"/api/v1/encounters/{encounter.id}", headers=auth_headers).status_code == 200
+        response = client.put(
+            f"/api/v1/encounters/{encounter.id}", headers=auth_headers, json={"notes": "seen", "status": "completed"}
+        )
+        assert response.status_code == 200
+        # Buffered, not written inside the request
+        assert db.query(AuditEvent).count() == 0
+        assert audit_log.pending() == 2
+
+        assert client.get(f"/api/v1/encounters/{encounter.id}/audit", headers=auth_headers).status_code == 403
+        test_provider.role = "admin"
+        db.commit()
+        response = client.get(f"/api/v1/encounters/{encounter.id}/audit", headers=auth_headers)
+
+    assert response.status_code == 200
+    events = response.json()
+    assert [(e["action"], e["provider_id"]) for e in events] == [("read", test_provider.id), ("update", test_provider.id)]
+    assert events[1]["fields"] == ["notes", "status"]
+
+    response = client.get("/api/v1/audit/verify", headers=auth_headers)
+    assert response.json() == {"valid": True, "checked": 2, "broken_at": None}
+
+
+def test_chain_detects_tampering(db):
+    write_batch(db, records(3))
+    write_batch(db, records(2, encounter_id=2))
+    assert verify_chain(db, chunk_size=2) == (True, 5, None)
+
+    # Rows are append-only at the database level
+    with pytest.raises(DatabaseError):
+        db.execute(text("UPDATE audit_log SET encounter_id = 9 WHERE id = 2"))
+    db.rollback()
+
+    # Someone with DDL rights drops the guard and edits a row
+    db.execute(text("DROP TRIGGER audit_log_no_update"))
+    db.execute(text("UPDATE audit_log SET encounter_id = 9 WHERE id = 2"))
+    db.commit()
+    assert verify_chain(db) == (False, 1, 2)
+
+
+def test_chain_detects_truncated_tail(db):
+    write_batch(db, records(3))
+    db.execute(text("DROP TRIGGER audit_log_no_delete"))
+    db.execute(text("DELETE FROM audit_log WHERE id = 3"))
+    db.commit()
+    assert verify_chain(db) == (False, 2, None)
+
+
+@pytest.mark.asyncio
+async def test_flushes_from_two_workers_form_one_chain(db):
+    workers = [AuditLog(session_factory=TestingSessionLocal, batch_size=10) for _ in range(2)]
+    for i in range(25):
+        workers[i % 2].record(i, "read", 1)
+
+    written = await asyncio.gather(*(worker.flush() for worker in workers))
+
+    assert sum(written) == 25
+    assert db.get(AuditChainHead, 1).event_count == 25
+    assert verify_chain(db) == (True, 25, None)
+
+
+@pytest.mark.asyncio
+async def test_full_batch_is_flushed_before_the_interval(db):
+    audit_log = AuditLog(session_factory=TestingSessionLocal, flush_interval=60, batch_size=3)
+    audit_log.start()
+    try:
+        for i in range(3):
+            audit_log.record(1, "read", i)
+        for _ in range(100):
+            if audit_log.stats["flushed"] == 3:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await audit_log.stop()
+
+    assert db.query(AuditEvent).count() == 3
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_events_and_buffer_is_bounded(db):
+    def broken_session():
+        raise RuntimeError("database unavailable")
+
+    audit_log = AuditLog(session_factory=broken_session, batch_size=2, max_pending=3)
+    for i in range(4):
+        audit_log.record(1, "read", i)
+
+    assert await audit_log.flush() == 0
+    assert audit_log.pending() == 3
+    assert audit_log.stats["dropped"] == 1
+    assert audit_log.stats["failed_flushes"] == 1
+
+    audit_log.session_factory = TestingSessionLocal
+    assert await audit_log.flush() == 3
+    assert [e.encounter_id for e in db.query(AuditEvent).order_by(AuditEvent.id)] == [0, 1, 2]
@@ -0,0 +1,230 @@
+"""Tests for automatic callback assignment."""
+
+import asyncio
+import uuid
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.core.callback_scheduler import AssignmentState, CallbackScheduler
+from app.core.config import settings
+from app.core.events import CALLBACK_ASSIGNED, CALLBACK_QUEUED, PROVIDER_AVAILABILITY, EventBus
+from app.core.security import get_password_hash
+from app.models.models import Callback, CallbackPriority, CallbackStatus, Encounter, Provider, ProviderRole
+from tests.conftest import TestingSessionLocal
+
+URGENT, HIGH, MEDIUM, LOW = (CallbackPriority.URGENT, CallbackPriority.HIGH,
+                             CallbackPriority.MEDIUM, CallbackPriority.LOW)
+
+
+def test_most_urgent_callbacks_go_to_least_loaded_suitable_providers():
+    state = AssignmentState(capacity=2)
+    state.set_available(1, ProviderRole.DOCTOR)
+    state.set_available(2, ProviderRole.NURSE)
+    state.set_available(3, ProviderRole.CHW)
+    state.open_callback(100, 1)  # the doctor already has one open
+    for callback_id, priority in [(10, LOW), (11, URGENT), (12, HIGH), (13, URGENT)]:
+        state.add_callback(callback_id, priority)
+
+    assignments = state.next_assignments(limit=10)
+
+    # Urgent first, oldest first; urgent/high never go to a CHW
+    assert assignments == [(11, 2), (13, 1), (12, 2), (10, 3)]
+    assert [state.load(provider_id) for provider_id in (1, 2, 3)] == [2, 2, 1]
+    assert state.queued() == 0
+
+
+def test_providers_at_capacity_or_unavailable_get_nothing():
+    state = AssignmentState(capacity=1)
+    state.set_available(1, ProviderRole.CHW)
+    state.set_available(2, ProviderRole.NURSE)
+    state.add_callback(10, URGENT)
+    state.add_callback(11, URGENT)
+    state.add_callback(12, LOW)
+
+    # Only the nurse may take urgent callbacks, and only one; the CHW still gets the low one
+    assert state.next_assignments(limit=10) == [(10, 2), (12, 1)]
+    assert state.queued() == 1
+
+    # Completing a callback frees the nurse up
+    state.close_callback(10)
+    assert state.next_assignments(limit=10) == [(11, 2)]
+
+    state.close_callback(11)
+    state.set_available(2, None)
+    state.add_callback(13, HIGH)
+    assert state.next_assignments(limit=10) == []
+
+
+def test_events_are_idempotent_and_reassignment_moves_load():
+    state = AssignmentState(capacity=5)
+    state.set_available(1, ProviderRole.NURSE)
+    state.set_available(2, ProviderRole.NURSE)
+    state.add_callback(10, MEDIUM)
+    state.add_callback(10, MEDIUM)
+    state.open_callback(10, 1)
+    state.open_callback(10, 1)
+    assert state.queued() == 0
+    assert state.load(1) == 1
+
+    state.open_callback(10, 2)
+    assert (state.load(1), state.load(2)) == (0, 1)
+    # Queued events arriving after the assignment don't bring it back
+    state.add_callback(10, MEDIUM)
+    assert state.next_assignments(limit=10) == []
+
+    # Many load changes leave the heaps bounded
+    for n in range(1000):
+        state.open_callback(1000 + n, 1)
+        state.close_callback(1000 + n)
+    assert max(len(heap) for heap in state._load_heaps.values()) <= 4 * 2 + 64
+
+
+def add_provider(db, username, role):
+    provider = Provider(username=username, email=f"{username}@example.com", full_name=username,
+                        hashed_password=get_password_hash("x"), role=role)
+    db.add(provider)
+    db.commit()
+    return provider.id
+
+
+def add_callback(db, priority, status=CallbackStatus.QUEUED, provider_id=None):
+    encounter = Encounter(channel="USSD")
+    db.add(encounter)
+    db.flush()
+    callback = Callback(encounter_id=encounter.id, msisdn_hash="h" * 64, priority=priority,
+                        status=status, provider_id=provider_id)
+    db.add(callback)
+    db.commit()
+    return callback.id
+
+
+@pytest.mark.asyncio
+async def test_assignments_are_saved_and_published(db):
+    nurse = add_provider(db, "nurse", ProviderRole.NURSE)
+    doctor = add_provider(db, "doctor", ProviderRole.DOCTOR)
+    add_callback(db, MEDIUM, CallbackStatus.IN_PROGRESS, provider_id=nurse)
+    urgent = add_callback(db, URGENT)
+    medium = add_callback(db, MEDIUM)
+    taken = add_callback(db, LOW)
+
+    bus = EventBus()
+    published = bus.subscribe([CALLBACK_ASSIGNED])
+    scheduler = CallbackScheduler(session_factory=TestingSessionLocal, bus=bus, capacity=5)
+    scheduler.state = scheduler._load_state({nurse, doctor})
+    # A provider takes one by hand before the scheduler gets to it
+    db.query(Callback).filter(Callback.id == taken).update({Callback.status: CallbackStatus.IN_PROGRESS})
+    db.commit()
+
+    assert await scheduler.assign_ready() == 2
+
+    db.expire_all()
+    # The nurse already has one open, so the urgent callback goes to the doctor;
+    # then both have one and nurses are preferred for medium priority
+    assert db.get(Callback, urgent).provider_id == doctor
+    assert db.get(Callback, medium).provider_id == nurse
+    assert db.get(Callback, medium).status == CallbackStatus.IN_PROGRESS
+    assert db.get(Callback, taken).provider_id is None
+    assert scheduler.stats["conflicts"] == 1
+    events = [published.get_nowait() for _ in range(published.qsize())]
+    assert [(e.payload["callback_id"], e.payload["provider_id"]) for e in events] == [(urgent, doctor), (medium, nurse)]
+
+
+def test_availability_requires_the_scheduler(client, auth_headers):
+    response = client.put("/api/v1/providers/me/availability", json={"available": True}, headers=auth_headers)
+    assert response.status_code == 503
+
+
+def test_roles_without_callbacks_cannot_opt_in(client, auth_headers, db, test_provider):
+    test_provider.role = ProviderRole.ADMIN
+    db.commit()
+    scheduler = CallbackScheduler(session_factory=TestingSessionLocal, bus=EventBus())
+
+    with patch('app.api.v1.endpoints.get_callback_scheduler', return_value=scheduler):
+        response = client.put("/api/v1/providers/me/availability", json={"available": True}, headers=auth_headers)
+    assert response.status_code == 403
+
+
+@pytest_asyncio.fixture
+async def redis_client():
+    client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=1)
+    try:
+        await client.ping()
+    except (RedisError, OSError):
+        await client.aclose()
+        pytest.skip("Redis is not reachable at REDIS_URL")
+    prefix = f"test-callbacks-{uuid.uuid4().hex[:8]}"
+    yield client, prefix
+    keys = [key async for key in client.scan_iter(f"{prefix}*")]
+    if keys:
+        await client.delete(*keys)
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_one_leader_assigns_events_from_every_worker(redis_client, db):
+    client, prefix = redis_client
+    nurse = add_provider(db, "nurse", ProviderRole.NURSE)
+    buses = [EventBus(), EventBus()]
+    workers = [
+        CallbackScheduler(client, TestingSessionLocal, bus=bus, interval=0.05, lock_ttl=1.0, key_prefix=prefix)
+        for bus in buses
+    ]
+    for worker in workers:
+        await worker.start()
+    try:
+        await workers[1].set_availability(nurse, ProviderRole.NURSE, True)
+        # A callback queued in whichever worker handled the triage
+        callback_id = add_callback(db, HIGH)
+        buses[1].publish(CALLBACK_QUEUED, callback_id=callback_id, encounter_id=1, priority="high")
+
+        for _ in range(100):
+            if sum(worker.stats["assigned"] for worker in workers) == 1:
+                break
+            await asyncio.sleep(0.02)
+        assert [worker.is_leader for worker in workers].count(True) == 1
+        db.expire_all()
+        assert db.get(Callback, callback_id).provider_id == nurse
+
+        # The leader stepping down hands over to the other worker
+        leader = next(worker for worker in workers if worker.is_leader)
+        follower = next(worker for worker in workers if not worker.is_leader)
+        await leader.stop()
+        for _ in range(100):
+            if follower.is_leader:
+                break
+            await asyncio.sleep(0.02)
+        assert follower.is_leader
+        assert follower.state.load(nurse) == 1
+    finally:
+        for worker in workers:
+            await worker.stop()
+
+
+@pytest.mark.asyncio
+async def test_availability_lapses_without_heartbeats(redis_client, db):
+    client, prefix = redis_client
+    nurse = add_provider(db, "nurse", ProviderRole.NURSE)
+    bus = EventBus()
+    published = bus.subscribe([PROVIDER_AVAILABILITY])
+    scheduler = CallbackScheduler(client, TestingSessionLocal, bus=bus, availability_ttl=0.3, key_prefix=prefix)
+
+    await scheduler.set_availability(nurse, ProviderRole.NURSE, True)
+    await scheduler.set_availability(nurse, ProviderRole.NURSE, True)  # renewal
+    assert published.qsize() == 1
+    await scheduler.step()
+    assert scheduler.state.pick_provider(MEDIUM) == nurse
+
+    await asyncio.sleep(0.4)
+    await scheduler.step()
+    assert scheduler.state.pick_provider(MEDIUM) is None
+    assert scheduler.stats["availability_expired"] == 1
+
+    # Coming back after lapsing is announced again
+    await scheduler.set_availability(nurse, ProviderRole.NURSE, True)
+    assert published.qsize() == 2
+    await scheduler.reconcile()
+    assert scheduler.state.pick_provider(MEDIUM) == nurse
@@ -0,0 +1,313 @@
+"""Tests for the session circuit breaker and the in-process session fallback.
+
+The chaos test kills a real redis-server mid-load (``tests/redis_cluster.py``);
+it needs the Redis binaries, which CI installs, and is skipped without them.
+"""
+
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.core import ussd_session
+from app.core.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, get_session_breaker
+from app.core.config import settings
+from app.core.contacts import get_contacts
+from app.core.conversation import ConversationEngine, InboundMessage
+from app.core.ussd_session import LocalSessionStore, USSDSession
+from app.core.ussd_utils import hash_msisdn
+from app.models.models import Encounter
+from tests.redis_cluster import LocalRedisServer
+from tests.test_ussd import MockPipeline, MockRedis
+
+# consent, English, 18-49, female, fever, headache, no danger sign, no cough, no callback
+ANSWERS = ["1", "1", "3", "2", "1", "1", "2", "2", "2"]
+
+
+class DownRedis:
+    """Redis client whose server refuses every command."""
+
+    def __getattr__(self, name):
+        async def refuse(*args, **kwargs):
+            raise RedisConnectionError("Connection refused")
+        return refuse
+
+    def pipeline(self, transaction=True):
+        return MockPipeline(self)
+
+
+class HungRedis(DownRedis):
+    """Redis client whose server accepts commands and never answers."""
+
+    def __getattr__(self, name):
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(3600)
+        return hang
+
+
+def session_key(session_id, msisdn):
+    return USSDSession(session_id, hash_msisdn(msisdn)).key
+
+
+async def converse(engine, db, session_id, msisdn, answers):
+    replies = [await engine.handle(InboundMessage("USSD", session_id, msisdn, restart=True), db)]
+    for answer in answers:
+        replies.append(await engine.handle(InboundMessage("USSD", session_id, msisdn, text=answer), db))
+    return replies
+
+
+def test_breaker_opens_probes_and_closes():
+    now = [0.0]
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=5, clock=lambda: now[0])
+    closed = []
+    breaker.on_close(lambda: closed.append(now[0]))
+
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    now[0] = 5
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()  # one probe at a time
+    breaker.record_failure()
+    assert breaker.state == OPEN and not breaker.allow()
+
+    now[0] = 10
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and closed == [10]
+
+
+@pytest.mark.asyncio
+async def test_breaker_times_out_calls_and_then_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=1, call_timeout=0.01)
+
+    with pytest.raises(asyncio.TimeoutError):
+        await breaker.call(lambda: asyncio.sleep(1))
+    with pytest.raises(CircuitOpenError):
+        await breaker.call(lambda: asyncio.sleep(1))
+    assert breaker.state == OPEN
+
+
+def test_local_store_is_bounded_and_expires():
+    now = [0.0]
+    store = LocalSessionStore(2, clock=lambda: now[0])
+
+    store.set("a", "1", 10, dirty=True)
+    store.set("b", "2", 10)
+    store.get("a")
+    store.set("c", "3", 10)
+    assert store.get("b") is None  # least recently used
+    assert store.get("c", dirty_only=True) is None
+    assert store.pending() == ({"a": ("1", 10)}, [])
+
+    now[0] = 10
+    assert store.get("a") is None
+    assert not store.has_pending
+
+
+@pytest.mark.asyncio
+async def test_conversation_completes_while_redis_is_down(db):
+    engine = ConversationEngine()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=DownRedis()), \
+            patch('app.core.contacts.get_session_redis', return_value=DownRedis()):
+        replies = await converse(engine, db, "down-1", "+254700000601", ANSWERS)
+
+    assert [reply.ended for reply in replies] == [False] * len(ANSWERS) + [True]
+    assert db.query(Encounter).filter(Encounter.msisdn_hash == hash_msisdn("+254700000601")).count() == 1
+    assert get_session_breaker().state == OPEN
+
+
+@pytest.mark.asyncio
+async def test_hung_redis_costs_one_timeout_per_failure_until_the_circuit_opens(db, monkeypatch):
+    breaker = get_session_breaker()
+    monkeypatch.setattr(breaker, "call_timeout", 0.02)
+    engine = ConversationEngine()
+
+    start = time.perf_counter()
+    with patch('app.core.ussd_session.get_session_redis', return_value=HungRedis()), \
+            patch('app.core.contacts.get_session_redis', return_value=HungRedis()):
+        replies = await converse(engine, db, "hung-1", "+254700000602", ANSWERS)
+    elapsed = time.perf_counter() - start
+
+    assert replies[-1].ended
+    assert breaker.state == OPEN
+    assert elapsed < breaker.call_timeout * breaker.failure_threshold + 1.0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("fail_open", [True, False])
+async def test_rate_limit_without_redis_follows_config(db, monkeypatch, fail_open):
+    monkeypatch.setattr(settings, "RATE_LIMIT_FAIL_OPEN", fail_open)
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=DownRedis()):
+        reply = await ConversationEngine().handle(
+            InboundMessage("USSD", "limit-1", "+254700000603", restart=True), db
+        )
+
+    assert reply.ended is not fail_open
+
+
+@pytest.mark.asyncio
+async def test_contact_lookups_go_through_the_breaker(session_store, monkeypatch):
+    breaker = get_session_breaker()
+    monkeypatch.setattr(breaker, "call_timeout", 0.02)
+    monkeypatch.setattr(breaker, "failure_threshold", 1)
+
+    start = time.perf_counter()
+    with patch('app.core.contacts.get_session_redis', return_value=HungRedis()):
+        assert await get_contacts([hash_msisdn("+254700000608")]) == {}
+        assert breaker.state == OPEN
+        assert await get_contacts([hash_msisdn("+254700000608")]) == {}
+
+    assert time.perf_counter() - start < 1.0
+
+
+@pytest.mark.asyncio
+async def test_sessions_survive_an_outage_and_are_written_back(db, session_store, monkeypatch):
+    """A conversation carries on across the outage; sessions saved meanwhile reach Redis on recovery."""
+    breaker = get_session_breaker()
+    monkeypatch.setattr(breaker, "failure_threshold", 1)
+    monkeypatch.setattr(breaker, "reset_timeout", 0)
+    engine = ConversationEngine()
+    mock_redis = MockRedis()
+    first, second = "+254700000604", "+254700000605"
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis) as session_redis, \
+            patch('app.core.contacts.get_session_redis', return_value=mock_redis):
+        await converse(engine, db, "out-1", first, ["1"])  # consent, healthy
+
+        session_redis.return_value = DownRedis()
+        during = await engine.handle(InboundMessage("USSD", "out-1", first, text="1"), db)  # English
+        await converse(engine, db, "out-2", second, [])  # new conversation during the outage
+        assert breaker.state == OPEN
+        assert session_store.has_pending
+
+        session_redis.return_value = mock_redis
+        after = await engine.handle(InboundMessage("USSD", "out-1", first, text="3"), db)  # age group
+        await asyncio.gather(*ussd_session._resync_tasks)
+
+    assert not during.ended and not after.ended
+    assert breaker.state == CLOSED
+    assert json.loads(mock_redis.storage[session_key("out-1", first)])["step"] == "gender"
+    assert json.loads(mock_redis.storage[session_key("out-2", second)])["step"] == "consent"
+    assert not session_store.has_pending
+
+
+@pytest.mark.asyncio
+async def test_write_back_never_overwrites_a_newer_session(db, session_store, monkeypatch):
+    """A session another worker moved on after the recovery keeps its Redis copy, and the stale one is dropped."""
+    breaker = get_session_breaker()
+    monkeypatch.setattr(breaker, "failure_threshold", 1)
+    monkeypatch.setattr(breaker, "reset_timeout", 0)
+    engine = ConversationEngine()
+    mock_redis = MockRedis()
+    first, second = "+254700000606", "+254700000607"
+    key = session_key("stale-1", first)
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis) as session_redis, \
+            patch('app.core.contacts.get_session_redis', return_value=mock_redis):
+        await converse(engine, db, "stale-1", first, ["1"])  # consent, healthy
+        await converse(engine, db, "stale-2", second, ["1"])
+
+        session_redis.return_value = DownRedis()
+        await engine.handle(InboundMessage("USSD", "stale-1", first, text="1"), db)  # English, kept in-process
+        await engine.handle(InboundMessage("USSD", "stale-2", second, text="1"), db)
+        assert session_store.get(key, dirty_only=True) is not None
+
+        # After the recovery another worker, which never saw the outage copy, moves the first caller on
+        session_redis.return_value = mock_redis
+        newer = {**json.loads(mock_redis.storage[key]), "step": "gender", "version": 10}
+        mock_redis.storage[key] = json.dumps(newer)
+        assert await ussd_session.resync_fallback() == 0
+        await asyncio.gather(*ussd_session._resync_tasks)
+        assert json.loads(mock_redis.storage[key]) == newer
+        assert session_store.get(key) is None
+        # Redis's copy of the second caller is from before the outage, so the local one is kept for now
+        assert session_store.has_pending
+
+        # A dirty copy older than Redis's is dropped as soon as Redis answers
+        other = session_key("stale-2", second)
+        newer = {**json.loads(mock_redis.storage[other]), "step": "gender", "version": 10}
+        mock_redis.storage[other] = json.dumps(newer)
+        assert await USSDSession("stale-2", hash_msisdn(second)).load() == newer
+        assert not session_store.has_pending
+
+
+@pytest.fixture
+def redis_server():
+    if not LocalRedisServer.available():
+        pytest.skip("redis-server is not installed")
+    with LocalRedisServer() as server:
+        yield server
+
+
+@pytest_asyncio.fixture
+async def chaos_redis(redis_server):
+    client = redis.Redis.from_url(
+        redis_server.url, decode_responses=True, socket_timeout=0.5, socket_connect_timeout=0.2
+    )
+    yield client
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_killing_redis_mid_load(db, redis_server, chaos_redis, session_store, monkeypatch):
+    """Every caller is answered while Redis dies under load, and sessions are back in Redis after it returns."""
+    breaker = get_session_breaker()
+    monkeypatch.setattr(breaker, "call_timeout", 0.2)
+    monkeypatch.setattr(breaker, "reset_timeout", 0.2)
+    engine = ConversationEngine()
+    callers = [(f"chaos-{i}", f"+25470001{i:04d}") for i in range(40)]
+    hops = [0]
+
+    async def first_half(session_id, msisdn):
+        replies = [await engine.handle(InboundMessage("USSD", session_id, msisdn, restart=True), db)]
+        for answer in ANSWERS[:6]:
+            await asyncio.sleep(0.005)
+            replies.append(await engine.handle(InboundMessage("USSD", session_id, msisdn, text=answer), db))
+            hops[0] += 1
+        return replies
+
+    async def kill_mid_load():
+        while hops[0] < len(callers) * 3:
+            await asyncio.sleep(0.001)
+        redis_server.kill()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=chaos_redis), \
+            patch('app.core.contacts.get_session_redis', return_value=chaos_redis):
+        killer = asyncio.create_task(kill_mid_load())
+        halves = await asyncio.gather(*(first_half(*caller) for caller in callers))
+        await killer
+        assert all(not reply.ended for replies in halves for reply in replies)
+        assert breaker.state == OPEN
+
+        redis_server.start()
+        # The first command on a connection broken by the kill can still fail; keep probing
+        deadline = time.monotonic() + 5
+        while breaker.state != CLOSED and time.monotonic() < deadline:
+            await asyncio.sleep(breaker.reset_timeout)
+            await engine.handle(InboundMessage("USSD", "chaos-probe", "+254700019999", restart=True), db)
+        await asyncio.gather(*ussd_session._resync_tasks)
+        assert breaker.state == CLOSED
+        assert await chaos_redis.exists(*(session_key(*caller) for caller in callers)) == len(callers)
+
+        for answer in ANSWERS[6:]:
+            finals = await asyncio.gather(*(
+                engine.handle(InboundMessage("USSD", session_id, msisdn, text=answer), db)
+                for session_id, msisdn in callers
+            ))
+
+    # No caller was sent back a step: every conversation ends on the answers it has left
+    assert all(reply.ended for reply in finals)
+    assert not session_store.has_pending
+    assert db.query(Encounter).filter(
+        Encounter.msisdn_hash.in_([hash_msisdn(msisdn) for _, msisdn in callers])
+    ).count() == len(callers)
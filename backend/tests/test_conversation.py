@@ -0,0 +1,86 @@
+"""Tests for the channel-agnostic conversation engine."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+
+from app.adapters.ussd_adapter import USSDAdapter
+from app.adapters.whatsapp_adapter import WhatsAppAdapter
+from app.core.conversation import ConversationEngine, InboundMessage
+from app.core.ussd_utils import hash_msisdn
+from app.models.models import Callback, Encounter
+from tests.test_ussd import MockRedis
+
+
+@pytest.mark.asyncio
+async def test_whatsapp_conversation_saves_encounter(db):
+    adapter = WhatsAppAdapter()
+    sender = "2348000000011"
+    redis = MockRedis()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=redis), \
+            patch('app.core.contacts.get_session_redis', return_value=redis):
+        first = await adapter.receive_message({"from": sender, "text": {"body": "hi"}}, db)
+        assert "Do you consent?" in first["reply"]
+        # consent, English, <5, male, no fever, no headache, danger sign, no cough, callback
+        for answer in ["1", "1", "1", "1", "2", "2", "1", "2"]:
+            result = await adapter.receive_message({"from": sender, "text": {"body": answer}}, db)
+        assert result["reply"].startswith("EMERGENCY")
+        result = await adapter.receive_message({"from": sender, "text": {"body": "1"}}, db)
+
+    assert result["ended"] is True
+    encounter = db.query(Encounter).one()
+    assert encounter.channel == "WHATSAPP"
+    assert encounter.msisdn_hash == hash_msisdn("+" + sender)
+    assert encounter.risk_code == "EMERGENCY"
+    assert db.query(Callback).one().encounter_id == encounter.id
+    # The number is kept (briefly) so callback updates can be sent on WhatsApp
+    assert json.loads(redis.storage[f"contact:{{{encounter.msisdn_hash}}}"]) == {
+        "msisdn": "+" + sender, "channel": "WHATSAPP", "language": "en"
+    }
+
+
+@pytest.mark.asyncio
+async def test_number_is_not_kept_without_a_callback(db):
+    redis = MockRedis()
+    engine = ConversationEngine()
+    phone = "+2348000000014"
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=redis), \
+            patch('app.core.contacts.get_session_redis', return_value=redis):
+        await engine.handle(InboundMessage("USSD", "s2", phone, restart=True), db)
+        # consent, English, 18-49, female, fever, headache, no danger sign, no cough, no callback
+        for answer in ["1", "1", "3", "2", "1", "1", "2", "2", "2"]:
+            reply = await engine.handle(InboundMessage("USSD", "s2", phone, text=answer), db)
+        await engine.triage_once("SMS", phone, {"age_group": "18-49", "gender": "female", "language": "en"},
+                                 db, "v1")
+
+    assert reply.ended
+    assert db.query(Encounter).count() == 2
+    assert f"contact:{{{hash_msisdn(phone)}}}" not in redis.storage
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_counts_conversations_not_messages(db):
+    redis = MockRedis()
+    engine = ConversationEngine()
+    phone = "+2348000000012"
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=redis):
+        await engine.handle(InboundMessage("USSD", "s1", phone, restart=True), db)
+        await engine.handle(InboundMessage("USSD", "s1", phone, text="1"), db)
+        await engine.handle(InboundMessage("USSD", "s1", phone, text="1"), db)
+        assert redis.storage[f"ussd:{{{hash_msisdn(phone)}}}:rate"] == "1"
+
+        await engine.handle(InboundMessage("IVR", "CA1", phone, restart=True), db)
+        assert redis.storage[f"ussd:{{{hash_msisdn(phone)}}}:rate"] == "2"
+
+
+@pytest.mark.asyncio
+async def test_answer_without_session_restarts_flow(db):
+    with patch('app.core.ussd_session.get_session_redis', return_value=MockRedis()):
+        result = await USSDAdapter().handle_ussd_request("expired", "+2348000000013", "1*1*3", db)
+
+    assert result["continue"] is True
+    assert result["response"].startswith("CON Welcome to NTAL Health!")
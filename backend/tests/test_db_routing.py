@@ -0,0 +1,109 @@
+"""Tests for read/write splitting between the primary and a read replica."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core import db_routing
+from app.core.database import Base, get_db, get_read_db
+from app.core.security import get_password_hash
+from app.main import app
+from app.models.models import Encounter, Provider, ProviderRole
+
+
+class _FakeRedis:
+    """Just enough Redis for the read-your-writes marker (expiry is simulated by clearing)."""
+    storage = {}
+
+    async def set(self, key, value, px=None):
+        self.storage[key] = value
+
+    async def exists(self, key):
+        return int(key in self.storage)
+
+
+async def _fake_redis():
+    return _FakeRedis()
+
+
+@pytest.fixture
+def split_databases(tmp_path, monkeypatch):
+    """Two SQLite files standing in for a primary and its replica (no replication)."""
+    sessions = {}
+    for name in ("primary", "replica"):
+        engine = create_engine(f"sqlite:///{tmp_path / name}.db", connect_args={"check_same_thread": False})
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add(Provider(
+            username="test_user",
+            email="test@example.com",
+            hashed_password=get_password_hash("testpassword"),
+            full_name="Test User",
+            role=ProviderRole.DOCTOR
+        ))
+        session.add(Encounter(patient_name="Patient", notes=f"from {name}"))
+        session.commit()
+        sessions[name] = session
+
+    monkeypatch.setattr(db_routing, "replica_configured", lambda: True)
+    monkeypatch.setattr(db_routing, "_recent_writes", {})
+    monkeypatch.setattr(db_routing, "get_redis", _fake_redis)
+    _FakeRedis.storage.clear()
+    app.dependency_overrides[get_db] = lambda: sessions["primary"]
+    app.dependency_overrides[get_read_db] = lambda: sessions["replica"]
+    yield sessions
+    app.dependency_overrides.clear()
+    for session in sessions.values():
+        session.close()
+
+
+def _login(client):
+    response = client.post("/api/v1/auth/login", json={"username": "test_user", "password": "testpassword"})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_reads_go_to_replica_until_own_write(client, split_databases, monkeypatch):
+    """Dashboard reads hit the replica; after a write they stick to the primary."""
+    headers = _login(client)
+
+    response = client.get("/api/v1/encounters/1", headers=headers)
+    assert response.json()["notes"] == "from replica"
+    response = client.get("/api/v1/encounters", headers=headers)
+    assert [e["notes"] for e in response.json()] == ["from replica"]
+
+    response = client.put("/api/v1/encounters/1", json={"notes": "updated"}, headers=headers)
+    assert response.status_code == 200
+
+    # Read-your-writes: the provider sees their update even though the replica lags
+    response = client.get("/api/v1/encounters/1", headers=headers)
+    assert response.json()["notes"] == "updated"
+
+    # Other workers see the shared marker
+    monkeypatch.setattr(db_routing, "_recent_writes", {})
+    response = client.get("/api/v1/encounters/1", headers=headers)
+    assert response.json()["notes"] == "updated"
+
+    # Once the window has passed, reads return to the replica
+    _FakeRedis.storage.clear()
+    response = client.get("/api/v1/encounters/1", headers=headers)
+    assert response.json()["notes"] == "from replica"
+
+
+@pytest.mark.asyncio
+async def test_unreachable_marker_store_reads_primary(monkeypatch):
+    """If stickiness can't be checked, reads stay on the primary."""
+    monkeypatch.setattr(db_routing, "replica_configured", lambda: True)
+    monkeypatch.setattr(db_routing, "_recent_writes", {})
+
+    async def broken_redis():
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(db_routing, "get_redis", broken_redis)
+    assert await db_routing.reads_from_primary(42) is True
+
+
+@pytest.mark.asyncio
+async def test_no_replica_always_reads_primary():
+    """Without DATABASE_READ_URL everything is served by the primary."""
+    assert db_routing.replica_configured() is False
+    assert await db_routing.reads_from_primary(1) is True
@@ -0,0 +1,118 @@
+"""Tests for the Redis conversation funnel and unique-caller counts."""
+
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.core.conversation import ConversationEngine, InboundMessage
+from app.core.funnel import BUCKETS, FunnelUpdate, bucket_key, funnel_shard, read_funnel
+from app.core.ussd_flows import get_flow_registry
+from tests.test_ussd import MockRedis
+
+# consent, English, <5, male, no fever, no headache, no danger sign, no cough, no callback
+COMPLETE = ["1", "1", "1", "1", "2", "2", "2", "2", "2"]
+
+
+async def converse(engine, db, conversation_id, msisdn, answers):
+    await engine.handle(InboundMessage(channel="USSD", conversation_id=conversation_id, msisdn=msisdn), db)
+    for answer in answers:
+        await engine.handle(
+            InboundMessage(channel="USSD", conversation_id=conversation_id, msisdn=msisdn, text=answer), db
+        )
+
+
+@pytest.mark.asyncio
+async def test_conversations_update_step_counters_and_callers(db):
+    redis = MockRedis()
+    engine = ConversationEngine()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=redis), \
+            patch('app.core.contacts.get_session_redis', return_value=redis):
+        await converse(engine, db, "s1", "+254700000001", COMPLETE)
+        await converse(engine, db, "s2", "+254700000002", ["2"])  # declines consent
+        await converse(engine, db, "s3", "+254700000003", ["1", "1", "9"])  # re-prompted, then hangs up
+        await converse(engine, db, "s4", "+254700000001", [])  # same caller again, hangs up
+        funnel = await read_funnel(redis, "USSD", "hour", 2, get_flow_registry().default.steps)
+
+    steps = {step["step"]: step for step in funnel["steps"]}
+    assert [step["step"] for step in funnel["steps"]] == list(get_flow_registry().default.steps)
+    assert steps["consent"] == {"step": "consent", "entered": 4, "exited": 3, "dropped": 1}
+    assert steps["language"] == {"step": "language", "entered": 2, "exited": 2, "dropped": 0}
+    assert steps["age_group"] == {"step": "age_group", "entered": 2, "exited": 1, "dropped": 1}
+    assert steps["result"] == {"step": "result", "entered": 1, "exited": 1, "dropped": 0}
+    assert funnel["outcomes"] == {"completed": 1, "declined": 1}
+    assert funnel["series"][0]["entered"] == {}  # the previous hour
+    assert funnel["series"][-1]["outcomes"] == funnel["outcomes"]
+    assert funnel["unique_callers"]["total"] == 3
+    assert list(funnel["unique_callers"]["daily"].values())[-1] == 3
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_starts_are_counted(db):
+    redis = MockRedis()
+    engine = ConversationEngine()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=redis):
+        for n in range(settings.RATE_LIMIT_MAX + 1):
+            await converse(engine, db, f"s{n}", "+254700000009", [])
+        funnel = await read_funnel(redis, "USSD", "day", 1, get_flow_registry().default.steps)
+
+    assert funnel["outcomes"] == {"rate_limited": 1}
+    assert funnel["steps"][0]["entered"] == settings.RATE_LIMIT_MAX
+    assert funnel["unique_callers"] == {"daily": {datetime.utcnow().strftime("%Y-%m-%d"): 1}, "total": 1}
+
+
+@pytest.mark.asyncio
+async def test_buckets_roll_over():
+    redis = MockRedis()
+    early, late = datetime(2026, 3, 1, 23, 59), datetime(2026, 3, 2, 0, 1)
+    for moment in (early, late):
+        caller = f"caller-{moment.day}"
+        async with redis.pipeline(transaction=False) as pipe:
+            FunnelUpdate("IVR", entered="consent", caller=caller, shard=funnel_shard(caller)).apply(pipe, now=moment)
+            await pipe.execute()
+
+    assert redis.storage[bucket_key("IVR", BUCKETS["minute"], early, funnel_shard("caller-1"))] == {"in:consent": 1}
+    by_minute = await read_funnel(redis, "IVR", "minute", 3, ["consent"], now=late)
+    assert [period["entered"] for period in by_minute["series"]] == [{"consent": 1}, {}, {"consent": 1}]
+    assert by_minute["series"][0]["period"] == "2026-03-01T23:59"
+    by_day = await read_funnel(redis, "IVR", "day", 2, ["consent"], now=late)
+    assert by_day["unique_callers"] == {"daily": {"2026-03-01": 1, "2026-03-02": 1}, "total": 2}
+
+
+@pytest.mark.asyncio
+async def test_shards_are_added_up():
+    """Callers spread over the counter shards; reads add the shards back together."""
+    redis = MockRedis()
+    now = datetime(2026, 3, 1, 12, 0)
+    callers = [f"caller-{n}" for n in range(20)]
+    for caller in callers:
+        async with redis.pipeline(transaction=False) as pipe:
+            FunnelUpdate("USSD", entered="consent", caller=caller, shard=funnel_shard(caller, 4)).apply(pipe, now=now)
+            await pipe.execute()
+
+    assert len({funnel_shard(caller, 4) for caller in callers}) > 1
+    funnel = await read_funnel(redis, "USSD", "day", 1, ["consent"], now=now, shards=4)
+    assert funnel["steps"][0]["entered"] == 20
+    assert funnel["unique_callers"] == {"daily": {"2026-03-01": 20}, "total": 20}
+
+
+def test_funnel_endpoint_requires_admin(client, db, test_provider, auth_headers):
+    response = client.get("/api/v1/metrics/ussd/funnel", headers=auth_headers)
+    assert response.status_code == 403
+
+    test_provider.role = "admin"
+    db.commit()
+    redis = MockRedis()
+    with patch('app.api.v1.endpoints.get_session_redis', return_value=redis):
+        response = client.get("/api/v1/metrics/ussd/funnel?bucket=minute&periods=5", headers=auth_headers)
+        assert client.get("/api/v1/metrics/ussd/funnel?bucket=week", headers=auth_headers).status_code == 422
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["bucket"] == "minute"
+    assert data["flow"] == "general"
+    assert len(data["series"]) == 5
+    assert data["steps"][0] == {"step": "consent", "entered": 0, "exited": 0, "dropped": 0}
@@ -0,0 +1,71 @@
+"""Tests for the IVR channel."""
+
+from unittest.mock import patch
+
+from app.core import ivr_prompts
+from app.core.config import settings
+from app.core.ivr_prompts import compile_prompts, get_document, prompt_hash, voice_text
+from app.core.language_strings import get_message, get_reprompt
+from app.models.models import Encounter
+from tests.test_ussd import MockRedis
+
+
+def test_voice_text_speaks_menu_lines():
+    assert voice_text("en", "Do you have fever?\n1. Yes\n2. No") == \
+        "Do you have fever? Press 1 for Yes. Press 2 for No."
+    assert voice_text("yo", "Nje o ni iba?\n1. Beeni\n2. Rara") == \
+        "Nje o ni iba? Te 1 fun Beeni. Te 2 fun Rara."
+
+
+def test_prompts_are_precompiled():
+    documents = compile_prompts()
+    for language in ("en", "yo"):
+        for key in ("consent", "fever", "emergency"):
+            assert ("CON", language, get_message(language, key)) in documents
+            assert ("CON", language, get_reprompt(language, key)) in documents
+    # Lookups return the cached document itself
+    message = get_message("en", "fever")
+    assert get_document("CON", "en", message) is documents[("CON", "en", message)]
+    assert "<Gather" in documents[("CON", "en", message)]
+    assert "<Hangup/>" in documents[("END", "en", get_message("en", "goodbye"))]
+
+
+def test_recorded_audio_replaces_tts(tmp_path, monkeypatch):
+    message = get_message("en", "fever")
+    key = prompt_hash("en", voice_text("en", message))
+    (tmp_path / f"{key}.mp3").write_bytes(b"")
+    monkeypatch.setattr(settings, "IVR_AUDIO_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "IVR_AUDIO_BASE_URL", "https://cdn.example/ivr/")
+    monkeypatch.setattr(ivr_prompts, "_documents", None)
+    try:
+        document = get_document("CON", "en", message)
+        assert f"<Play>https://cdn.example/ivr/{key}.mp3</Play>" in document
+        assert "<Say" not in document
+        assert "<Say" in get_document("CON", "en", get_message("en", "cough"))
+    finally:
+        ivr_prompts._documents = None
+        ivr_prompts._audio_hashes = None
+
+
+def test_ivr_call_completes_triage(client, db):
+    call = {"CallSid": "CA123", "From": "+2348000000009"}
+    with patch('app.core.ussd_session.get_session_redis', return_value=MockRedis()):
+        response = client.post("/api/v1/ivr/voice", data=call)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/xml")
+        assert "Do you consent?" in response.text
+
+        # Timeout without a key press repeats the prompt
+        assert "Invalid input" in client.post("/api/v1/ivr/gather", data=call).text
+
+        # consent, English, 18-49, female, fever, headache, no danger, no cough
+        for digit in "11321122":
+            response = client.post("/api/v1/ivr/gather", data={**call, "Digits": digit})
+        assert "Possible malaria" in response.text
+
+        response = client.post("/api/v1/ivr/gather", data={**call, "Digits": "2"})
+        assert "<Hangup/>" in response.text
+
+    encounter = db.query(Encounter).one()
+    assert encounter.channel == "IVR"
+    assert encounter.risk_code == "MALARIA_SUSPECT"
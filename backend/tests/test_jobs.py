@@ -0,0 +1,161 @@
+"""Tests for the Redis Streams job queue (need a Redis at REDIS_URL)."""
+
+import asyncio
+import uuid
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.jobs import JobQueue
+from app.worker import PeriodicJob, Worker
+
+
+@pytest_asyncio.fixture
+async def job_queue():
+    client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=1)
+    try:
+        await client.ping()
+    except (RedisError, OSError):
+        await client.aclose()
+        pytest.skip("Redis is not reachable at REDIS_URL")
+
+    prefix = f"test-jobs-{uuid.uuid4().hex[:8]}"
+    yield JobQueue(client, prefix=prefix, max_attempts=3, retry_base_seconds=0.01,
+                   retry_max_seconds=0.05, visibility_timeout=0.2)
+    keys = [key async for key in client.scan_iter(f"{prefix}*")]
+    if keys:
+        await client.delete(*keys)
+    await client.aclose()
+
+
+async def _run_until(worker: Worker, condition, timeout: float = 5.0):
+    running = asyncio.create_task(worker.run())
+    try:
+        deadline = asyncio.get_running_loop().time() + timeout
+        while not condition():
+            assert asyncio.get_running_loop().time() < deadline, "worker did not finish in time"
+            await asyncio.sleep(0.02)
+    finally:
+        worker.stop()
+        await running
+
+
+@pytest.mark.asyncio
+async def test_jobs_are_processed_and_acknowledged(job_queue):
+    seen = []
+
+    async def handler(payload):
+        seen.append(payload["n"])
+
+    for n in range(5):
+        await job_queue.enqueue("test.record", {"n": n})
+    worker = Worker(job_queue, concurrency=2, tasks={"test.record": handler}, block_ms=50, schedule_interval=0.02)
+    await _run_until(worker, lambda: len(seen) == 5)
+
+    assert sorted(seen) == [0, 1, 2, 3, 4]
+    stats = await job_queue.stats(["default"])
+    assert stats["default"] == {"length": 0, "pending": 0, "dead": 0}
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_with_backoff(job_queue):
+    attempts = []
+
+    async def flaky(payload):
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RuntimeError("transient")
+
+    await job_queue.enqueue("test.flaky", {})
+    worker = Worker(job_queue, concurrency=1, tasks={"test.flaky": flaky}, block_ms=50, schedule_interval=0.02)
+    await _run_until(worker, lambda: worker.stats["succeeded"] == 1)
+
+    assert len(attempts) == 2
+    assert worker.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_exhausted_and_unknown_jobs_are_dead_lettered(job_queue):
+    async def broken(payload):
+        raise ValueError("bad payload")
+
+    await job_queue.enqueue("test.broken", {"id": 1})
+    await job_queue.enqueue("test.missing", {"id": 2})
+    worker = Worker(job_queue, concurrency=1, tasks={"test.broken": broken}, block_ms=50, schedule_interval=0.02)
+    await _run_until(worker, lambda: worker.stats["failed"] == 4)
+
+    dead = await job_queue.dead_letters()
+    assert {(d["job"].name, d["job"].attempts) for d in dead} == {("test.broken", 3), ("test.missing", 0)}
+    assert "bad payload" in next(d["error"] for d in dead if d["job"].name == "test.broken")
+
+    assert await job_queue.replay_dead() == 2
+    assert (await job_queue.stats(["default"]))["default"]["dead"] == 0
+
+
+@pytest.mark.asyncio
+async def test_unacknowledged_job_is_reclaimed(job_queue):
+    await job_queue.ensure_group("default")
+    job = await job_queue.enqueue("test.reclaim", {})
+
+    # A consumer takes the job and dies without acknowledging it
+    taken = await job_queue.fetch(["default"], "dead-consumer", block_ms=10)
+    assert [j.id for j in taken] == [job.id]
+    assert await job_queue.fetch(["default"], "other", block_ms=10) == []
+
+    await asyncio.sleep(0.25)
+    reclaimed = await job_queue.fetch(["default"], "other", block_ms=10)
+    assert [j.id for j in reclaimed] == [job.id]
+    assert reclaimed[0].attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_keeps_long_job_from_being_reclaimed(job_queue):
+    async def slow(payload):
+        await asyncio.sleep(0.5)
+
+    await job_queue.enqueue("test.slow", {})
+    worker = Worker(job_queue, concurrency=1, tasks={"test.slow": slow}, block_ms=50, schedule_interval=0.02)
+    running = asyncio.create_task(worker.run())
+    await asyncio.sleep(0.35)
+    # Past the visibility timeout, but the running job is still owned by the worker
+    assert await job_queue.fetch(["default"], "thief", block_ms=10) == []
+    await asyncio.sleep(0.3)
+    worker.stop()
+    await running
+    assert worker.stats == {"succeeded": 1, "failed": 0}
+
+
+@pytest.mark.asyncio
+async def test_delayed_job_waits_until_due(job_queue):
+    await job_queue.ensure_group("default")
+    await job_queue.enqueue("test.later", {}, delay=0.2)
+
+    assert await job_queue.promote_due() == 0
+    await asyncio.sleep(0.25)
+    assert await job_queue.promote_due() == 1
+    jobs = await job_queue.fetch(["default"], "c", block_ms=10)
+    assert [j.name for j in jobs] == ["test.later"]
+
+
+@pytest.mark.asyncio
+async def test_periodic_job_is_enqueued_once_per_period(job_queue):
+    ran = []
+
+    async def archive(payload):
+        ran.append(payload)
+
+    workers = [
+        Worker(job_queue, tasks={"test.archive": archive}, block_ms=10, schedule_interval=0.01,
+               periodic=[PeriodicJob("test.archive", every=60, payload={"older_than_days": 1})])
+        for _ in range(2)
+    ]
+    running = [asyncio.create_task(worker.run()) for worker in workers]
+    await asyncio.sleep(0.3)
+    for worker in workers:
+        worker.stop()
+    await asyncio.gather(*running)
+
+    assert ran == [{"older_than_days": 1}]
@@ -0,0 +1,139 @@
+"""Tests for the queue-based structured logging pipeline."""
+
+import io
+import json
+import logging
+import queue
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from app.core import logging_config
+from app.core.conversation import ConversationEngine, InboundMessage
+from app.core.logging_config import (
+    DeferredQueueHandler,
+    JsonFormatter,
+    log_event,
+    parse_sample_rates,
+    setup_logging,
+    shutdown_logging,
+)
+from tests.test_ussd import MockRedis
+
+
+class Lazy:
+    """Counts how often it is formatted."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __str__(self):
+        self.calls += 1
+        return "lazy"
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("ussd_hop=0.1, sms=1") == {"ussd_hop": 0.1, "sms": 1.0}
+    assert parse_sample_rates("") == {}
+    with pytest.raises(ValueError):
+        parse_sample_rates("ussd_hop=2")
+
+
+def test_records_are_formatted_as_json_in_the_listener():
+    shutdown_logging()
+    stream = io.StringIO()
+    logger = logging.getLogger("ntal.test.json")
+    lazy = Lazy()
+
+    handler = setup_logging(stream=stream)
+    # Keep pytest's capture handlers (which format eagerly) out of the count
+    logger.propagate = False
+    logger.addHandler(handler)
+    try:
+        log_event(logger, "callback_assigned", "Callback %s assigned to %s", 7, lazy, callback_id=7)
+    finally:
+        logger.removeHandler(handler)
+        logger.propagate = True
+        shutdown_logging()
+
+    # Queued unformatted and formatted once, by the listener thread
+    assert handler.queue.empty()
+    assert lazy.calls == 1
+    line = json.loads(stream.getvalue().strip().splitlines()[-1])
+    assert line["message"] == "Callback 7 assigned to lazy"
+    assert line["level"] == "INFO"
+    assert line["logger"] == "ntal.test.json"
+    assert line["event"] == "callback_assigned"
+    assert line["callback_id"] == 7
+
+
+def test_json_formatter_includes_exceptions():
+    logger = logging.getLogger("ntal.test.exc")
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        record = logger.makeRecord(logger.name, logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+    data = json.loads(JsonFormatter().format(record))
+    assert data["message"] == "failed"
+    assert "RuntimeError: boom" in data["exc_info"]
+
+
+def test_info_events_are_sampled_but_warnings_never_are(caplog):
+    logger = logging.getLogger("ntal.test.sampling")
+    lazy = Lazy()
+
+    with patch.dict(logging_config._sample_rates, {"ussd_hop": 0.0, "rate_limited": 0.0}), \
+            caplog.at_level(logging.INFO, logger="ntal.test.sampling"):
+        for _ in range(100):
+            log_event(logger, "ussd_hop", "hop %s", lazy)
+        log_event(logger, "rate_limited", "limited", level=logging.WARNING)
+
+    assert lazy.calls == 0
+    assert [record.event for record in caplog.records] == ["rate_limited"]
+
+
+def test_full_queue_drops_info_records_only():
+    handler = DeferredQueueHandler(queue.Queue(maxsize=1))
+    logger = logging.getLogger("ntal.test.full")
+    handler.handle(logger.makeRecord(logger.name, logging.INFO, __file__, 1, "first", (), None))
+    handler.handle(logger.makeRecord(logger.name, logging.INFO, __file__, 1, "second", (), None))
+    assert handler.dropped == 1
+    assert handler.queue.get_nowait().msg == "first"
+
+
+def test_ussd_hop_is_logged_once_with_fields(client, caplog):
+    mock_redis = MockRedis()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis), \
+            patch.dict(logging_config._sample_rates, {"ussd_hop": 1.0}), \
+            caplog.at_level(logging.INFO, logger="app.api.v1.endpoints"):
+        client.post("/api/v1/ussd", json={
+            "sessionId": "log-session",
+            "phoneNumber": "+254700000501",
+            "serviceCode": "*123#",
+            "text": "",
+        })
+
+    hops = [record for record in caplog.records if getattr(record, "event", None) == "ussd_hop"]
+    assert len(hops) == 1
+    assert hops[0].session_id == "log-session"
+    assert hops[0].msisdn != "+254700000501"
+    assert hops[0].ended is False
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_is_logged_as_warning_event(db, caplog):
+    mock_redis = MockRedis()
+    engine = ConversationEngine()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis), \
+            patch('app.core.ussd_session.settings.RATE_LIMIT_MAX', 0), \
+            caplog.at_level(logging.INFO, logger="app.core.conversation"):
+        await engine.allow("+254700000502", "SMS")
+        await engine.allow("+254700000502", "SMS")
+
+    record = caplog.records[-1]
+    assert record.levelno == logging.WARNING
+    assert record.event == "rate_limited"
+    assert record.channel == "SMS"
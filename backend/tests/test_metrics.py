@@ -0,0 +1,110 @@
+"""Tests for the Prometheus metrics endpoint and instrumentation."""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import redis.asyncio as redis
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, text
+
+from app.core.conversation import ConversationEngine, InboundMessage
+from app.core.metrics import instrument_engine
+from app.core.redis_client import InstrumentedRedis
+from tests.test_ussd import MockRedis
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_metrics_endpoint_reports_ussd_hops(client):
+    before_hops = sample("ntal_conversation_hop_seconds_count", channel="USSD", flow="general", step="age_group")
+    before_ends = sample("ntal_conversation_end_total", channel="USSD", flow="general", risk_code="LOW_RISK")
+    mock_redis = MockRedis()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis), \
+            patch('app.core.contacts.get_session_redis', return_value=mock_redis):
+        text_so_far = ""
+        # consent, English, 18-49, female, no fever, no headache, no danger sign, no cough, no callback
+        for answer in ["", "1", "1", "3", "2", "2", "2", "2", "2", "2"]:
+            text_so_far = answer if not text_so_far else f"{text_so_far}*{answer}"
+            response = client.post("/api/v1/ussd", json={
+                "sessionId": "metrics-session",
+                "phoneNumber": "+254700000301",
+                "serviceCode": "*123#",
+                "text": text_so_far,
+            })
+            assert response.status_code == 200
+        assert response.json()["response"].startswith("END")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'ntal_conversation_hop_seconds_bucket{channel="USSD",flow="general",le="0.001",step="start"}' in body
+    assert 'ntal_state_machine_cpu_seconds_count{flow="general",step="cough"}' in body
+    assert 'ntal_queue_depth{queue="notifications"}' in body
+    assert sample("ntal_conversation_hop_seconds_count", channel="USSD", flow="general", step="age_group") == before_hops + 1
+    assert sample("ntal_conversation_end_total", channel="USSD", flow="general", risk_code="LOW_RISK") == before_ends + 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_rejections_are_counted(db):
+    before = sample("ntal_rate_limit_rejections_total", channel="IVR", flow="general")
+    mock_redis = MockRedis()
+    engine = ConversationEngine()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis), \
+            patch('app.core.ussd_session.settings.RATE_LIMIT_MAX', 1):
+        await engine.handle(InboundMessage("IVR", "CA-metrics-1", "+254700000302", restart=True), db)
+        reply = await engine.handle(InboundMessage("IVR", "CA-metrics-2", "+254700000302", restart=True), db)
+
+    assert reply.ended
+    assert sample("ntal_rate_limit_rejections_total", channel="IVR", flow="general") == before + 1
+
+
+def test_db_statements_are_timed():
+    engine = instrument_engine(create_engine("sqlite:///:memory:"))
+    before = sample("ntal_db_query_seconds_count", operation="SELECT")
+
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("select 2"))
+
+    assert sample("ntal_db_query_seconds_count", operation="SELECT") == before + 2
+
+
+@pytest.mark.asyncio
+async def test_redis_commands_are_timed():
+    client = InstrumentedRedis()
+    before = sample("ntal_redis_command_seconds_count", command="GET")
+
+    with patch.object(redis.Redis, "execute_command", AsyncMock(return_value="1")):
+        assert await client.execute_command("GET", "key") == "1"
+
+    assert sample("ntal_redis_command_seconds_count", command="GET") == before + 1
+
+
+def test_multiprocess_metrics_are_aggregated(tmp_path):
+    """Two worker processes write samples; a scrape in a third sees their sum."""
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    record = (
+        "from app.core.metrics import observe_hop, count_conversation_end\n"
+        "for _ in range(3): observe_hop('USSD', 'general', 'fever', 0.002)\n"
+        "count_conversation_end('USSD', 'general', 'EMERGENCY')\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", record], cwd=BACKEND_DIR, env=env, check=True)
+
+    scrape = "from app.core.metrics import render_metrics\nprint(render_metrics()[0].decode())"
+    output = subprocess.run(
+        [sys.executable, "-c", scrape], cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    assert 'ntal_conversation_hop_seconds_count{channel="USSD",flow="general",step="fever"} 6.0' in output
+    assert 'ntal_conversation_end_total{channel="USSD",flow="general",risk_code="EMERGENCY"} 2.0' in output
@@ -0,0 +1,151 @@
+"""Tests for callback event notifications."""
+
+from unittest.mock import patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.adapters.notifier import CallbackNotifier
+from app.core.contacts import remember_contact
+from app.core.events import CALLBACK_ASSIGNED, CALLBACK_COMPLETED, CALLBACK_SLA_BREACHED, EventBus, event_bus
+from app.core.ussd_utils import hash_msisdn
+from app.models.models import Callback, Encounter
+from tests.test_ussd import MockRedis
+
+
+class RecordingSMS:
+    def __init__(self):
+        self.batches = []
+
+    async def send_bulk(self, messages):
+        self.batches.append(messages)
+        return [{"status": "queued"} for _ in messages]
+
+
+class RecordingWhatsApp:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, phone_number, message):
+        self.sent.append((phone_number, message))
+        return {"status": "sent"}
+
+
+@pytest.mark.asyncio
+async def test_notifier_batches_per_gateway():
+    bus = EventBus()
+    sms, whatsapp = RecordingSMS(), RecordingWhatsApp()
+    notifier = CallbackNotifier(bus=bus, sms=sms, whatsapp=whatsapp, concurrency=1, linger_ms=20)
+
+    with patch('app.core.contacts.get_session_redis', return_value=MockRedis()):
+        await remember_contact("+2348000000021", "USSD")
+        await remember_contact("+2348000000022", "SMS", "yo")
+        await remember_contact("+2348000000023", "WHATSAPP")
+        notifier.start()
+        bus.publish(CALLBACK_ASSIGNED, callback_id=1, encounter_id=11, msisdn_hash=hash_msisdn("+2348000000021"))
+        bus.publish(CALLBACK_ASSIGNED, callback_id=2, encounter_id=12, msisdn_hash=hash_msisdn("+2348000000022"))
+        bus.publish(CALLBACK_COMPLETED, callback_id=3, encounter_id=13, msisdn_hash=hash_msisdn("+2348000000023"))
+        bus.publish(CALLBACK_COMPLETED, callback_id=4, encounter_id=14, msisdn_hash=hash_msisdn("+2340"))
+        await notifier.stop()
+
+    assert sms.batches == [[
+        ("+2348000000021", "NTAL Health: a provider has your case (Ref: 11) and will call you soon."),
+        ("+2348000000022", "NTAL Health: osise ilera ti gba oro re (Ref: 12), won o pe o laipe."),
+    ]]
+    assert whatsapp.sent == [("+2348000000023", "NTAL Health: your callback (Ref: 13) is complete. Stay healthy!")]
+    assert notifier.stats == {"sms": 2, "whatsapp": 1, "no_contact": 1, "failed": 0, "batches": 1,
+                              "supervisor_alerts": 0}
+
+
+@pytest.mark.asyncio
+async def test_contact_is_deleted_after_the_last_callback_completes():
+    bus = EventBus()
+    redis = MockRedis()
+    notifier = CallbackNotifier(bus=bus, sms=RecordingSMS(), whatsapp=RecordingWhatsApp(),
+                                concurrency=1, linger_ms=20)
+    done, waiting = hash_msisdn("+2348000000025"), hash_msisdn("+2348000000026")
+
+    with patch('app.core.contacts.get_session_redis', return_value=redis):
+        await remember_contact("+2348000000025", "USSD")
+        await remember_contact("+2348000000026", "USSD")
+        notifier.start()
+        bus.publish(CALLBACK_COMPLETED, callback_id=5, encounter_id=15, msisdn_hash=done, forget_contact=True)
+        bus.publish(CALLBACK_COMPLETED, callback_id=6, encounter_id=16, msisdn_hash=waiting, forget_contact=False)
+        await notifier.stop()
+
+    assert notifier.stats["sms"] == 2
+    assert f"contact:{{{done}}}" not in redis.storage
+    assert f"contact:{{{waiting}}}" in redis.storage
+
+
+@pytest.mark.asyncio
+async def test_sla_breaches_are_texted_to_supervisors():
+    bus = EventBus()
+    sms = RecordingSMS()
+    notifier = CallbackNotifier(bus=bus, sms=sms, whatsapp=RecordingWhatsApp(), concurrency=1, linger_ms=20,
+                                supervisor_numbers=["+2348000000091", "+2348000000092"])
+
+    with patch('app.core.contacts.get_session_redis', return_value=MockRedis()):
+        notifier.start()
+        bus.publish(CALLBACK_SLA_BREACHED, callback_id=7, priority="urgent")
+        await notifier.stop()
+
+    message = "NTAL Health: URGENT callback #7 is still waiting past its SLA. Please assign it now."
+    assert sms.batches == [[("+2348000000091", message), ("+2348000000092", message)]]
+    assert notifier.stats["supervisor_alerts"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sla_breach_is_texted_when_the_contact_lookup_fails():
+    bus = EventBus()
+    sms = RecordingSMS()
+    notifier = CallbackNotifier(bus=bus, sms=sms, whatsapp=RecordingWhatsApp(), concurrency=1, linger_ms=20,
+                                supervisor_numbers=["+2348000000091"])
+
+    with patch('app.core.contacts.get_session_redis', side_effect=RedisConnectionError("refused")):
+        notifier.start()
+        bus.publish(CALLBACK_SLA_BREACHED, callback_id=8, priority="urgent")
+        bus.publish(CALLBACK_ASSIGNED, callback_id=9, encounter_id=19, msisdn_hash=hash_msisdn("+2348000000027"))
+        await notifier.stop()
+
+    message = "NTAL Health: URGENT callback #8 is still waiting past its SLA. Please assign it now."
+    assert sms.batches == [[("+2348000000091", message)]]
+    assert notifier.stats["supervisor_alerts"] == 1
+    assert notifier.stats["no_contact"] == 1
+
+
+def test_event_bus_drops_when_subscriber_full():
+    bus = EventBus()
+    queue = bus.subscribe([CALLBACK_ASSIGNED], maxsize=1)
+    assert bus.publish(CALLBACK_ASSIGNED, callback_id=1) == 1
+    assert bus.publish(CALLBACK_ASSIGNED, callback_id=2) == 0
+    assert bus.publish(CALLBACK_COMPLETED, callback_id=1) == 0
+    assert queue.qsize() == 1
+
+
+def test_callback_changes_publish_events(client, auth_headers, db, test_provider):
+    encounter = Encounter(channel="USSD", msisdn_hash=hash_msisdn("+2348000000024"), risk_code="EMERGENCY")
+    db.add(encounter)
+    db.flush()
+    callback = Callback(encounter_id=encounter.id, msisdn_hash=encounter.msisdn_hash, status="queued")
+    db.add(callback)
+    db.commit()
+
+    queue = event_bus.subscribe([CALLBACK_ASSIGNED, CALLBACK_COMPLETED])
+    try:
+        response = client.post(f"/api/v1/callbacks/{callback.id}/assign",
+                               json={"provider_id": test_provider.id}, headers=auth_headers)
+        assert response.status_code == 200
+        response = client.post(f"/api/v1/callbacks/{callback.id}/complete",
+                               json={"outcome": "advised"}, headers=auth_headers)
+        assert response.status_code == 200
+    finally:
+        event_bus.unsubscribe(queue)
+
+    events = [queue.get_nowait() for _ in range(queue.qsize())]
+    assert [e.type for e in events] == [CALLBACK_ASSIGNED, CALLBACK_COMPLETED]
+    assert events[0].payload == {
+        "callback_id": callback.id, "encounter_id": encounter.id, "msisdn_hash": encounter.msisdn_hash,
+        "provider_id": test_provider.id,
+    }
+    assert events[1].payload["forget_contact"] is True
@@ -0,0 +1,80 @@
+"""Tests for connection pool configuration and instrumentation."""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.database import build_engine, engine
+from app.core.pool_stats import InstrumentedQueuePool, database_pool_stats, get_pool_stats
+from app.core.config import settings
+
+
+def test_engine_uses_configured_pool():
+    """The app engine is built with the pool settings from Settings."""
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+    assert engine.pool.size() == settings.DB_POOL_SIZE
+    assert engine.pool._max_overflow == settings.DB_MAX_OVERFLOW
+    assert engine.pool._pre_ping == settings.DB_POOL_PRE_PING
+
+
+def test_memory_sqlite_keeps_default_pool():
+    """In-memory SQLite is not given a QueuePool."""
+    memory_engine = build_engine("sqlite:///:memory:")
+    assert not isinstance(memory_engine.pool, InstrumentedQueuePool)
+
+
+def test_pool_records_checkouts_and_timeouts(tmp_path):
+    """Waits and timeouts on an exhausted pool are counted."""
+    starved = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=InstrumentedQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    held = starved.connect()
+    stats = database_pool_stats(starved)
+    assert stats["checked_out"] == 1
+    assert stats["acquisitions"] == 1
+
+    with pytest.raises(PoolTimeoutError):
+        starved.connect()
+
+    stats = database_pool_stats(starved)
+    assert stats["timeouts"] == 1
+    assert stats["wait_seconds_max"] >= 0.05
+    held.close()
+    assert database_pool_stats(starved)["checked_out"] == 0
+
+
+def test_pool_metrics_endpoint_requires_admin(client, auth_headers, db, test_provider):
+    """Pool stats are admin-only and report both pools for this worker."""
+    response = client.get("/api/v1/metrics/pools", headers=auth_headers)
+    assert response.status_code == 403
+
+    test_provider.role = "admin"
+    db.commit()
+    response = client.get("/api/v1/metrics/pools", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["pid"] == get_pool_stats()["pid"]
+    assert {"checked_out", "overflow", "wait_seconds_total"} <= set(data["database"])
+    assert "max_connections" in data["redis"] or data["redis"] == {"connected": False}
+
+
+@pytest.mark.asyncio
+async def test_redis_pool_records_exhaustion():
+    """Waiting on an exhausted Redis pool is counted as a timeout."""
+    from redis.exceptions import ConnectionError as RedisConnectionError
+    from app.core.pool_stats import InstrumentedBlockingConnectionPool, redis_pool_stats
+
+    pool = InstrumentedBlockingConnectionPool(max_connections=1, timeout=0.05)
+    pool._in_use_connections.add(object())
+
+    with pytest.raises(RedisConnectionError):
+        await pool.get_connection("PING")
+
+    stats = redis_pool_stats(pool)
+    assert stats["in_use"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["wait_seconds_max"] >= 0.05
@@ -0,0 +1,144 @@
+"""Tests for Redis Cluster and Sentinel support.
+
+The cluster tests run against REDIS_CLUSTER_NODES when it is set, otherwise
+against a local cluster started from the redis-server binaries
+(``tests/redis_cluster.py``), and are skipped when neither is available.
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from redis.crc import key_slot
+
+from app.core.config import settings
+from app.core.contacts import _key as contact_key
+from app.core.contacts import get_contacts
+from app.core.conversation import ConversationEngine, InboundMessage
+from app.core.funnel import BUCKETS, bucket_key, callers_key, read_funnel
+from app.core.redis_client import build_cluster_client, build_sentinel_client, parse_nodes
+from app.core.ussd_flows import get_flow_registry
+from app.core.ussd_session import USSDSession
+from app.core.ussd_utils import hash_msisdn
+from tests.redis_cluster import LocalRedisCluster
+
+# consent, English, 18-49, female, fever, headache, no danger sign, no cough, callback
+# (contacts are only kept for callers with a queued callback)
+ANSWERS = ["1", "1", "3", "2", "1", "1", "2", "2", "1"]
+
+
+def slot(key: str) -> int:
+    return key_slot(key.encode())
+
+
+def test_hop_keys_share_a_slot():
+    """Session, rate-limit and contact keys of one caller hash to one slot."""
+    caller = hash_msisdn("+254700000501")
+    keys = [
+        USSDSession("ATUid_1", caller).key,
+        USSDSession("whatsapp:254700000501", caller).key,
+        USSDSession.rate_limit_key(caller),
+        USSDSession.rate_limit_key(caller, "maternal"),
+        contact_key(caller),
+    ]
+    assert len({slot(key) for key in keys}) == 1
+    other = hash_msisdn("+254700000502")
+    assert slot(USSDSession("ATUid_2", other).key) == slot(contact_key(other))
+
+
+def test_unique_caller_days_share_a_slot():
+    """PFCOUNT over a range of days needs every day's HyperLogLog of a shard in one slot."""
+    days = [datetime(2026, 3, day) for day in range(1, 8)]
+    for shard in range(settings.FUNNEL_SHARDS):
+        keys = [callers_key("USSD", day, shard) for day in days]
+        keys += [bucket_key("USSD", bucket, days[0], shard) for bucket in BUCKETS.values()]
+        assert len({slot(key) for key in keys}) == 1
+
+
+def test_funnel_shards_spread_over_slots():
+    """A busy channel's funnel counters don't all land on one node."""
+    now = datetime(2026, 3, 1)
+    slots = {slot(bucket_key("USSD", BUCKETS["minute"], now, shard)) for shard in range(settings.FUNNEL_SHARDS)}
+    assert len(slots) == settings.FUNNEL_SHARDS
+
+
+def test_parse_nodes():
+    assert parse_nodes(" 10.0.0.1:7000, 10.0.0.2:7001 ,") == [("10.0.0.1", 7000), ("10.0.0.2", 7001)]
+    assert parse_nodes("sentinel-a,sentinel-b:26380", default_port=26379) == [
+        ("sentinel-a", 26379), ("sentinel-b", 26380),
+    ]
+
+
+def test_sentinel_client_follows_the_service_master():
+    client = build_sentinel_client("redis://:secret@ignored:6379/2", "s1:26379,s2", "ntal")
+
+    pool = client.connection_pool
+    assert pool.service_name == "ntal"
+    assert pool.connection_kwargs["password"] == "secret"
+    assert pool.connection_kwargs["db"] == 2
+    assert [(s.connection_pool.connection_kwargs["host"], s.connection_pool.connection_kwargs["port"])
+            for s in pool.sentinel_manager.sentinels] == [("s1", 26379), ("s2", 26379)]
+
+
+@pytest.fixture(scope="module")
+def cluster_nodes():
+    nodes = os.environ.get("REDIS_CLUSTER_NODES")
+    if nodes:
+        yield nodes
+        return
+    if not LocalRedisCluster.available():
+        pytest.skip("No Redis Cluster: set REDIS_CLUSTER_NODES or install redis-server")
+    with LocalRedisCluster(masters=3) as cluster:
+        yield cluster.nodes
+
+
+@pytest_asyncio.fixture
+async def cluster(cluster_nodes):
+    client = build_cluster_client(cluster_nodes, "redis://")
+    await client.initialize()
+    yield client
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_conversations_run_on_the_cluster(cluster, db):
+    """Concurrent conversations spread over the shards and still share per-caller slots."""
+    engine = ConversationEngine()
+    run = datetime.utcnow().strftime("%H%M%S%f")
+    phones = [f"+2547{run[-6:]}{i:03d}" for i in range(30)]
+
+    async def converse(i, phone):
+        session_id = f"cluster-{run}-{i}"
+        await engine.handle(InboundMessage("USSD", session_id, phone, restart=True), db)
+        for answer in ANSWERS:
+            reply = await engine.handle(InboundMessage("USSD", session_id, phone, text=answer), db)
+        return reply
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=cluster), \
+            patch('app.core.contacts.get_session_redis', return_value=cluster):
+        replies = await asyncio.gather(*(converse(i, phone) for i, phone in enumerate(phones)))
+        contacts = await get_contacts([hash_msisdn(phone) for phone in phones])
+        funnel = await read_funnel(cluster, "USSD", "day", 2, get_flow_registry().default.steps)
+
+    assert all(reply.ended for reply in replies)
+    assert all(contact and contact["channel"] == "USSD" for contact in contacts.values())
+    assert funnel["steps"][-1]["exited"] >= len(phones)
+    assert funnel["unique_callers"]["total"] >= len(phones)
+    # The callers' keys landed on more than one shard
+    nodes = {cluster.get_node_from_key(contact_key(hash_msisdn(phone))).name for phone in phones}
+    assert len(nodes) > 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_on_the_cluster(cluster):
+    caller = hash_msisdn(f"+2547{datetime.utcnow().strftime('%H%M%S%f')[-9:]}")
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=cluster):
+        allowed = [await USSDSession.check_rate_limit(caller, limit=2) for _ in range(3)]
+        count = await USSDSession.get_rate_limit_count(caller)
+
+    assert allowed == [True, True, False]
+    assert count == 2
@@ -0,0 +1,145 @@
+"""Tests for re-triage of historic encounters."""
+
+import json
+from unittest.mock import patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import text
+
+from app.core.triage_rules import DEFAULT_RULESET_PATH
+from app.jobs import retriage
+from app.jobs.retriage import run_retriage, start_run, summarize_run
+from app.models.models import Encounter, RetriageDiff, RetriageRun, RetriageRunStatus
+
+
+class RecordingJobQueue:
+    def __init__(self):
+        self.jobs = []
+
+    async def enqueue(self, name, payload, queue="default", delay=0):
+        self.jobs.append((name, payload))
+
+
+@pytest.fixture
+def candidate_ruleset(tmp_path):
+    """Candidate protocol that escalates any fever to MALARIA_SUSPECT."""
+    data = json.loads(DEFAULT_RULESET_PATH.read_text())
+    data["version"] = "triage-v2-test"
+    data["rules"] = [rule for rule in data["rules"] if rule["risk_code"] != "FEVER_GENERAL"]
+    data["rules"][1]["when"] = {"fever": True}
+    path = tmp_path / "triage-v2.json"
+    path.write_text(json.dumps(data))
+    return str(path)
+
+
+@pytest.fixture
+def historic_encounters(db):
+    """Ten USSD encounters; the four with fever only would change risk code."""
+    samples = [
+        ({"fever": True}, "FEVER_GENERAL"),
+        ({"fever": True, "severe_headache": True}, "MALARIA_SUSPECT"),
+        ({"danger_sign": True}, "EMERGENCY"),
+        ({"cough": True}, "LOW_RISK"),
+        ({"fever": True, "cough": True}, "FEVER_GENERAL"),
+    ]
+    for symptoms, risk_code in samples * 2:
+        db.add(Encounter(channel="USSD", symptoms_json=symptoms, risk_code=risk_code))
+    db.add(Encounter(channel="web", chief_complaint="Web encounter without symptoms_json"))
+    db.commit()
+
+
+def test_retriage_records_diffs(db, historic_encounters, candidate_ruleset):
+    """Changed encounters are written as diffs and the run completes."""
+    run = start_run(db, candidate_ruleset)
+    run = run_retriage(db, run, chunk_size=3, workers=1)
+
+    assert run.status == RetriageRunStatus.COMPLETED
+    assert run.ruleset_version == "triage-v2-test"
+    assert run.processed_count == 10
+    assert run.changed_count == 4
+    assert summarize_run(db, run.id) == {"FEVER_GENERAL->MALARIA_SUSPECT": 4}
+    diff = db.query(RetriageDiff).first()
+    assert diff.new_priority == "high"
+
+
+def test_retriage_resumes_after_crash(db, historic_encounters, candidate_ruleset, monkeypatch):
+    """A failed run keeps its checkpoint and resuming does not duplicate diffs."""
+    real_score_chunk = retriage.score_chunk
+    calls = {"count": 0}
+
+    def crash_on_second_chunk(*args, **kwargs):
+        calls["count"] += 1
+        if calls["count"] == 2:
+            raise RuntimeError("worker died")
+        return real_score_chunk(*args, **kwargs)
+
+    monkeypatch.setattr(retriage, "score_chunk", crash_on_second_chunk)
+    run = start_run(db, candidate_ruleset)
+    with pytest.raises(RuntimeError):
+        run_retriage(db, run, chunk_size=4, workers=1)
+
+    db.refresh(run)
+    assert run.status == RetriageRunStatus.FAILED
+    assert run.processed_count == 4
+    checkpoint = run.last_encounter_id
+    assert checkpoint > 0
+
+    run = run_retriage(db, run, chunk_size=4, workers=1)
+    assert run.status == RetriageRunStatus.COMPLETED
+    assert run.processed_count == 10
+    assert db.query(RetriageDiff).filter(RetriageDiff.run_id == run.id).count() == 4
+
+
+def test_retriage_skips_malformed_rows(db, historic_encounters, candidate_ruleset):
+    """A row with broken symptoms_json is counted as skipped instead of failing the run."""
+    db.execute(text("UPDATE encounters SET symptoms_json = '{not json' WHERE id = 1"))
+    db.execute(text("UPDATE encounters SET symptoms_json = '[1, 2]' WHERE id = 2"))
+    db.commit()
+
+    run = run_retriage(db, start_run(db, candidate_ruleset), chunk_size=3, workers=1)
+
+    assert run.status == RetriageRunStatus.COMPLETED
+    assert run.processed_count == 10
+    assert run.skipped_count == 2
+    assert run.changed_count == 3
+
+
+def test_retriage_process_pool(db, historic_encounters, candidate_ruleset):
+    """Scoring fans out to a process pool with identical results."""
+    run = run_retriage(db, start_run(db, candidate_ruleset), chunk_size=2, workers=2)
+    assert run.changed_count == 4
+
+
+def test_retriage_run_endpoint(client, auth_headers, db, historic_encounters, candidate_ruleset):
+    """Run progress and transition counts are exposed over the API."""
+    run = run_retriage(db, start_run(db, candidate_ruleset), workers=1)
+
+    response = client.get(f"/api/v1/triage/retriage/{run.id}", headers=auth_headers)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["run"]["status"] == "completed"
+    assert data["transitions"] == {"FEVER_GENERAL->MALARIA_SUSPECT": 4}
+
+    response = client.get("/api/v1/triage/retriage/9999", headers=auth_headers)
+    assert response.status_code == 404
+
+
+def test_retriage_endpoint_queues_a_job(client, auth_headers, db, test_provider, historic_encounters):
+    """The web process only queues the run; the job worker scores it."""
+    test_provider.role = "admin"
+    db.commit()
+    job_queue = RecordingJobQueue()
+
+    with patch('app.api.v1.endpoints.get_job_queue', return_value=job_queue):
+        response = client.post("/api/v1/triage/retriage", json={"ruleset": "triage-v1.json"}, headers=auth_headers)
+    assert response.status_code == 202
+    run_id = response.json()["run"]["id"]
+    assert job_queue.jobs == [("retriage.run", {"run_id": run_id})]
+    assert db.query(RetriageDiff).count() == 0
+
+    with patch('app.api.v1.endpoints.get_job_queue', side_effect=RedisConnectionError("refused")):
+        response = client.post("/api/v1/triage/retriage", json={"ruleset": "triage-v1.json"}, headers=auth_headers)
+    assert response.status_code == 503
+    db.expire_all()
+    assert db.query(RetriageRun).order_by(RetriageRun.id.desc()).first().status == RetriageRunStatus.FAILED
@@ -0,0 +1,124 @@
+"""Tests for full-text search over encounter free text."""
+
+from unittest.mock import patch
+
+from sqlalchemy import text
+
+from app.core.audit import AuditLog
+from app.core.database import Base
+from app.core.search import ensure_search_index, fts5_query, search_encounters
+from app.jobs.archive import run_archive
+from app.models.models import Encounter, EncounterStatus
+from tests.conftest import TestingSessionLocal, engine
+
+
+def add_encounter(db, **fields):
+    encounter = Encounter(channel="USSD", **fields)
+    db.add(encounter)
+    db.commit()
+    return encounter.id
+
+
+def test_hits_are_ranked_with_snippets(db):
+    in_notes = add_encounter(db, notes="Mentioned a mild headache last week")
+    in_complaint = add_encounter(db, chief_complaint="Severe headache", symptoms="nausea")
+    add_encounter(db, chief_complaint="Cough", symptoms="fever")
+
+    hits = search_encounters(db, "headache")
+
+    # Chief complaint outweighs notes
+    assert [hit.encounter.id for hit in hits] == [in_complaint, in_notes]
+    assert hits[0].score > hits[1].score
+    assert "[headache]" in hits[0].snippet.lower()
+
+
+def test_query_matches_stems(db):
+    encounter_id = add_encounter(db, symptoms="Vomiting and headaches since Monday", medical_history="Diabetes")
+
+    assert [hit.encounter.id for hit in search_encounters(db, "vomit headache")] == [encounter_id]
+    assert [hit.encounter.id for hit in search_encounters(db, "diabetic")] == [encounter_id]
+    assert search_encounters(db, "vomiting rash") == []
+
+
+def test_index_follows_updates_and_deletes(db):
+    encounter_id = add_encounter(db, chief_complaint="Back pain")
+    encounter = db.get(Encounter, encounter_id)
+
+    encounter.chief_complaint = "Chest pain"
+    db.commit()
+    assert search_encounters(db, "back") == []
+    assert [hit.encounter.id for hit in search_encounters(db, "chest")] == [encounter_id]
+
+    db.delete(encounter)
+    db.commit()
+    assert search_encounters(db, "chest") == []
+    assert db.execute(text("SELECT count(*) FROM encounters_fts")).scalar() == 0
+
+
+def test_archived_encounters_leave_the_index(db):
+    encounter_id = add_encounter(db, chief_complaint="Malaria", status=EncounterStatus.CLOSED)
+    encounter = db.get(Encounter, encounter_id)
+    encounter.updated_at = encounter.created_at.replace(year=encounter.created_at.year - 2)
+    db.commit()
+
+    run_archive(db, older_than_days=365, pause=0)
+
+    assert search_encounters(db, "malaria") == []
+
+
+def test_existing_rows_are_indexed_when_the_index_is_added(db):
+    add_encounter(db, chief_complaint="Rash on both arms")
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE encounters_fts"))
+        for trigger in ("insert", "update", "delete"):
+            connection.execute(text(f"DROP TRIGGER encounters_fts_{trigger}"))
+
+    Base.metadata.create_all(bind=engine)  # no-op: encounters already exists
+    assert db.execute(text("SELECT count(*) FROM sqlite_master WHERE name = 'encounters_fts'")).scalar() == 0
+
+    with engine.begin() as connection:
+        ensure_search_index(connection)
+        ensure_search_index(connection)
+    assert len(search_encounters(db, "rash")) == 1
+
+
+def test_queries_without_terms_or_with_syntax_are_safe(db):
+    add_encounter(db, chief_complaint="Fever")
+
+    assert fts5_query("  ?! ") is None
+    assert fts5_query('fever" OR NEAR(') == '"fever" "or" "near"'
+    assert search_encounters(db, "?!") == []
+    assert search_encounters(db, 'fever" AND') == []
+    assert len(search_encounters(db, "FEVER*")) == 1
+    assert search_encounters(db, "fev") == []
+
+
+def test_search_endpoint(client, auth_headers, db):
+    ids = [add_encounter(db, chief_complaint=f"Headache day {i}") for i in range(3)]
+    audit_log = AuditLog(session_factory=TestingSessionLocal)
+
+    assert client.get("/api/v1/encounters/search?q=headache").status_code in (401, 403)
+    with patch('app.core.audit.audit_log', audit_log):
+        response = client.get("/api/v1/encounters/search?q=headache&limit=2", headers=auth_headers)
+
+    assert response.status_code == 200
+    hits = response.json()
+    assert len(hits) == 2
+    assert {hit["encounter"]["id"] for hit in hits} <= set(ids)
+    assert all("[Headache]" in hit["snippet"] for hit in hits)
+    # Every returned record is an access to patient data
+    assert audit_log.pending() == 2
+
+    response = client.get("/api/v1/encounters/search?q=headache&limit=2&offset=2", headers=auth_headers)
+    assert len(response.json()) == 1
+    assert client.get("/api/v1/encounters/search", headers=auth_headers).status_code == 422
+    assert client.get("/api/v1/encounters/search?q=x&limit=1000", headers=auth_headers).status_code == 422
+
+
+def test_only_the_newest_matches_are_ranked(db):
+    old_strong = add_encounter(db, chief_complaint="Fever", symptoms="fever", notes="fever")
+    newer = [add_encounter(db, notes=f"slight fever {i}") for i in range(3)]
+
+    with patch('app.core.search.settings.SEARCH_MAX_CANDIDATES', 3):
+        assert {hit.encounter.id for hit in search_encounters(db, "fever")} == set(newer)
+    assert search_encounters(db, "fever")[0].encounter.id == old_strong
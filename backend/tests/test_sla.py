@@ -0,0 +1,170 @@
+"""Tests for callback SLA deadlines and escalation."""
+
+import time
+import uuid
+from datetime import timezone
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as redis
+from redis.exceptions import RedisError
+
+from app.core.callback_scheduler import AssignmentState
+from app.core.config import settings
+from app.core.events import (
+    CALLBACK_ASSIGNED,
+    CALLBACK_ESCALATED,
+    CALLBACK_QUEUED,
+    CALLBACK_SLA_BREACHED,
+    Event,
+    EventBus,
+)
+from app.core.sla import SLAMonitor, parse_sla_seconds
+from app.models.models import Callback, CallbackPriority, CallbackStatus, Encounter, ProviderRole
+from tests.conftest import TestingSessionLocal
+
+SLA = {
+    CallbackPriority.URGENT: 900.0,
+    CallbackPriority.HIGH: 3600.0,
+    CallbackPriority.MEDIUM: 14400.0,
+    CallbackPriority.LOW: 86400.0,
+}
+
+
+def add_callback(db, priority, status=CallbackStatus.QUEUED):
+    encounter = Encounter(channel="USSD")
+    db.add(encounter)
+    db.flush()
+    callback = Callback(encounter_id=encounter.id, msisdn_hash="h" * 64, priority=priority, status=status)
+    db.add(callback)
+    db.commit()
+    return callback.id
+
+
+def event(event_type, **payload):
+    return Event(event_type, payload, time.time())
+
+
+def test_parse_sla_seconds():
+    assert parse_sla_seconds(settings.CALLBACK_SLA_SECONDS)[CallbackPriority.URGENT] == 900.0
+    assert parse_sla_seconds(" URGENT=60, high=120,medium=180,low=240 ")[CallbackPriority.LOW] == 240.0
+    for spec in ("urgent=60,high=120,medium=180", "urgent=0,high=1,medium=1,low=1", "soon=1"):
+        with pytest.raises(ValueError):
+            parse_sla_seconds(spec)
+
+
+def test_breached_callbacks_are_escalated_one_level(db):
+    low = add_callback(db, CallbackPriority.LOW)
+    high = add_callback(db, CallbackPriority.HIGH)
+    urgent = add_callback(db, CallbackPriority.URGENT)
+    assigned = add_callback(db, CallbackPriority.HIGH, CallbackStatus.IN_PROGRESS)
+
+    monitor = SLAMonitor(session_factory=TestingSessionLocal, sla_seconds=SLA)
+    breaches = monitor._escalate([low, high, urgent, assigned, 9999])
+
+    assert sorted(breaches) == [
+        (low, CallbackPriority.LOW, CallbackPriority.MEDIUM),
+        (high, CallbackPriority.HIGH, CallbackPriority.URGENT),
+        (urgent, CallbackPriority.URGENT, None),
+    ]
+    db.expire_all()
+    assert db.get(Callback, low).priority == CallbackPriority.MEDIUM
+    assert db.get(Callback, high).priority == CallbackPriority.URGENT
+    assert db.get(Callback, assigned).priority == CallbackPriority.HIGH
+
+
+def test_scheduler_moves_escalated_callbacks_up():
+    state = AssignmentState(capacity=1)
+    state.set_available(1, ProviderRole.NURSE)
+    state.add_callback(10, CallbackPriority.MEDIUM)
+    state.add_callback(11, CallbackPriority.LOW)
+
+    state.reprioritize(11, CallbackPriority.URGENT)
+    state.reprioritize(99, CallbackPriority.URGENT)  # not queued: ignored
+
+    assert state.next_assignments(limit=10) == [(11, 1)]
+    assert state.queued() == 1
+
+
+@pytest_asyncio.fixture
+async def sla_monitor():
+    client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True, socket_connect_timeout=1)
+    try:
+        await client.ping()
+    except (RedisError, OSError):
+        await client.aclose()
+        pytest.skip("Redis is not reachable at REDIS_URL")
+    prefix = f"test-sla-{uuid.uuid4().hex[:8]}"
+    bus = EventBus()
+    yield SLAMonitor(client, TestingSessionLocal, bus=bus, sla_seconds=SLA, batch_size=2, key_prefix=prefix)
+    keys = [key async for key in client.scan_iter(f"{prefix}*")]
+    if keys:
+        await client.delete(*keys)
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_only_expired_deadlines_are_handled(sla_monitor, db):
+    now = time.time()
+    escalates = add_callback(db, CallbackPriority.HIGH)
+    alerts = add_callback(db, CallbackPriority.URGENT)
+    taken = add_callback(db, CallbackPriority.URGENT)
+    not_due = add_callback(db, CallbackPriority.LOW)
+    await sla_monitor.track([
+        event(CALLBACK_QUEUED, callback_id=escalates, priority="high"),
+        event(CALLBACK_QUEUED, callback_id=alerts, priority="urgent"),
+        event(CALLBACK_QUEUED, callback_id=taken, priority="urgent"),
+        event(CALLBACK_QUEUED, callback_id=not_due, priority="low"),
+        event(CALLBACK_ASSIGNED, callback_id=taken, provider_id=1),
+    ], now=now)
+    published = sla_monitor.bus.subscribe([CALLBACK_ESCALATED, CALLBACK_SLA_BREACHED])
+
+    assert await sla_monitor.check(now + 60) == 0
+    # Past the urgent and high SLAs, not the low one
+    assert await sla_monitor.check(now + 3601) == 2
+    assert await sla_monitor.check(now + 3601) == 0
+
+    events = {e.payload["callback_id"]: e for e in (published.get_nowait() for _ in range(published.qsize()))}
+    assert events[escalates].type == CALLBACK_ESCALATED
+    assert events[escalates].payload["priority"] == "urgent"
+    assert events[alerts].type == CALLBACK_SLA_BREACHED
+    assert sla_monitor.stats["escalated"] == sla_monitor.stats["supervisor_alerts"] == 1
+
+    # Both are re-armed with the urgent SLA; the low one still waits
+    deadlines = dict(await sla_monitor.redis.zrange(sla_monitor.key, 0, -1, withscores=True))
+    assert set(deadlines) == {str(escalates), str(alerts), str(not_due)}
+    assert deadlines[str(escalates)] == pytest.approx(now + 3601 + 900)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_checks_claim_each_deadline_once(sla_monitor, db):
+    now = time.time()
+    ids = [add_callback(db, CallbackPriority.LOW) for _ in range(5)]
+    await sla_monitor.track([event(CALLBACK_QUEUED, callback_id=i, priority="low") for i in ids], now=now - 86401)
+    other_worker = SLAMonitor(sla_monitor.redis, TestingSessionLocal, bus=EventBus(), sla_seconds=SLA,
+                              batch_size=2, key_prefix=sla_monitor.key.rsplit(":", 1)[0])
+
+    claimed = []
+    while True:
+        batch = await sla_monitor.claim_expired(now) + await other_worker.claim_expired(now)
+        if not batch:
+            break
+        claimed += batch
+
+    assert sorted(claimed) == ids
+
+
+@pytest.mark.asyncio
+async def test_reconcile_restores_lost_deadlines(sla_monitor, db):
+    tracked = add_callback(db, CallbackPriority.URGENT)
+    lost = add_callback(db, CallbackPriority.HIGH)
+    add_callback(db, CallbackPriority.LOW, status=CallbackStatus.DONE)
+    await sla_monitor.track([event(CALLBACK_QUEUED, callback_id=tracked, priority="urgent")], now=time.time() - 60)
+    before = await sla_monitor.redis.zscore(sla_monitor.key, str(tracked))
+
+    # Only the callback whose queued event never arrived is added
+    assert await sla_monitor.reconcile() == 1
+    assert await sla_monitor.reconcile() == 0
+    assert await sla_monitor.redis.zscore(sla_monitor.key, str(tracked)) == before
+    updated_at = db.get(Callback, lost).updated_at.replace(tzinfo=timezone.utc).timestamp()
+    assert await sla_monitor.redis.zscore(sla_monitor.key, str(lost)) == pytest.approx(updated_at + 3600)
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from app.adapters.sms_adapter import SMSAdapter
+from app.adapters.sms_dispatcher import SMSDispatcher
+from app.core.token_bucket import TokenBucket
+
+
+def _gateway(handler):
+    """Wrap a per-message handler into a batch gateway transport."""
+    calls = []
+
+    def respond(request: httpx.Request):
+        messages = json.loads(request.content)["messages"]
+        calls.append(messages)
+        return handler(messages, len(calls))
+
+    return httpx.MockTransport(respond), calls
+
+
+def _dispatcher(transport, **kwargs):
+    options = dict(
+        gateway_url="http://gateway",
+        tps=10000,
+        batch_size=10,
+        linger_ms=20,
+        concurrency=2,
+        retry_base_seconds=0.01,
+        retry_max_seconds=0.02,
+        transport=transport,
+    )
+    options.update(kwargs)
+    return SMSDispatcher(**options)
+
+
+def _accept_all(messages, _):
+    return httpx.Response(200, json={"results": [{"id": m["id"], "status": "accepted"} for m in messages]})
+
+
+@pytest.mark.asyncio
+async def test_messages_are_batched():
+    transport, calls = _gateway(_accept_all)
+    dispatcher = _dispatcher(transport)
+    await dispatcher.start()
+    results = await asyncio.gather(*(dispatcher.send(f"+2348000000{i:02d}", "hi") for i in range(25)))
+    await dispatcher.stop()
+
+    assert all(r["status"] == "sent" for r in results)
+    assert sum(len(c) for c in calls) == 25
+    assert max(len(c) for c in calls) == 10
+    assert len(calls) <= 5
+
+
+@pytest.mark.asyncio
+async def test_retryable_failures_are_retried():
+    def flaky(messages, call):
+        if call == 1:
+            return httpx.Response(503)
+        return _accept_all(messages, call)
+
+    transport, calls = _gateway(flaky)
+    dispatcher = _dispatcher(transport, batch_size=5)
+    await dispatcher.start()
+    result = await dispatcher.send("+2348000000001", "hello")
+    await dispatcher.stop()
+
+    assert result["status"] == "sent"
+    assert dispatcher.stats["retried"] == 1
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_exhausted_retries_are_dead_lettered():
+    def down(messages, _):
+        return httpx.Response(200, json={"results": [
+            {"id": m["id"], "status": "rejected", "retryable": True} for m in messages
+        ]})
+
+    transport, _ = _gateway(down)
+    dispatcher = _dispatcher(transport, max_retries=2)
+    await dispatcher.start()
+    result = await dispatcher.send("+2348000000001", "hello")
+    await dispatcher.stop()
+
+    assert result["status"] == "failed"
+    assert dispatcher.stats["dead_lettered"] == 1
+    assert dispatcher.dead_letters[0].attempts == 3
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_pending_retries():
+    """A message backing off before its retry still goes out when the dispatcher stops."""
+    def flaky(messages, call):
+        if call == 1:
+            return httpx.Response(503)
+        return _accept_all(messages, call)
+
+    transport, calls = _gateway(flaky)
+    dispatcher = _dispatcher(transport, retry_base_seconds=0.1, retry_max_seconds=0.1)
+    await dispatcher.start()
+    sms = dispatcher.submit("+2348000000001", "hello")
+    while not dispatcher.stats["retried"]:
+        await asyncio.sleep(0.005)
+    await dispatcher.stop(drain_timeout=2)
+
+    assert len(calls) == 2
+    assert dispatcher.stats["sent"] == 1
+    assert not dispatcher.dead_letters
+    assert sms.attempts == 1
+
+
+@pytest.mark.asyncio
+async def test_stop_dead_letters_undelivered_messages():
+    """After the drain timeout, retrying and queued messages are dead-lettered and callers get an answer."""
+    transport, _ = _gateway(lambda messages, _: httpx.Response(503))
+    dispatcher = _dispatcher(transport, retry_base_seconds=10, retry_max_seconds=10)
+    await dispatcher.start()
+    pending = asyncio.gather(*(dispatcher.send(f"+2348000000{i:02d}", "hi") for i in range(3)))
+    while dispatcher.stats["retried"] < 3:
+        await asyncio.sleep(0.005)
+    await dispatcher.stop(drain_timeout=0.05)
+
+    results = await asyncio.wait_for(pending, timeout=1)
+    assert [r["status"] for r in results] == ["failed"] * 3
+    assert all(r["error"] == "dispatcher stopped" for r in results)
+    assert dispatcher.stats["dead_lettered"] == 3
+    assert len(dispatcher.dead_letters) == 3
+
+
+@pytest.mark.asyncio
+async def test_permanent_rejection_is_not_retried():
+    def invalid(messages, _):
+        return httpx.Response(200, json={"results": [
+            {"id": m["id"], "status": "rejected", "retryable": False, "error": "invalid number"}
+            for m in messages
+        ]})
+
+    transport, calls = _gateway(invalid)
+    dispatcher = _dispatcher(transport)
+    await dispatcher.start()
+    result = await dispatcher.send("+2340", "hello")
+    await dispatcher.stop()
+
+    assert result == {"status": "failed", "message_id": result["message_id"],
+                      "phone_number": "+2340", "error": "invalid number"}
+    assert len(calls) == 1
+    assert not dispatcher.dead_letters
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_shapes_rate():
+    bucket = TokenBucket(rate=100, capacity=10)
+    start = time.monotonic()
+    for _ in range(5):
+        await bucket.acquire(10)
+    # 10 tokens of burst, then 40 more at 100/s
+    assert time.monotonic() - start >= 0.35
+
+
+@pytest.mark.asyncio
+async def test_adapter_uses_dispatcher_and_stub():
+    assert (await SMSAdapter().send_sms("+2348000000001", "hi"))["message_id"] == "stub-message-id"
+
+    transport, calls = _gateway(_accept_all)
+    dispatcher = _dispatcher(transport)
+    await dispatcher.start()
+    adapter = SMSAdapter(dispatcher=dispatcher)
+    queued = adapter.enqueue_sms("+2348000000001", "queued")
+    sent = await adapter.send_confirmation("+2348000000002", 42)
+    await dispatcher.stop()
+
+    assert queued["status"] == "queued"
+    assert sent["status"] == "sent"
+    assert sorted(m["text"] for c in calls for m in c) == [
+        "Thank you for using NTAL Telehealth. Your case ID is 42.", "queued"
+    ]
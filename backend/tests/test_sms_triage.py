@@ -0,0 +1,118 @@
+"""Tests for one-message SMS triage."""
+
+import random
+import string
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core.sms_parser import SMSParseError, parse_sms
+from app.models.models import Callback, Encounter
+from tests.test_ussd import MockRedis
+
+
+def test_parse_basic_message():
+    triage = parse_sms("NTAL 3 F H")
+    assert triage.age_group == "18-49"
+    assert triage.gender == "female"
+    assert triage.symptoms == {
+        "fever": False, "severe_headache": True, "danger_sign": False, "cough": False
+    }
+    assert triage.language == "en"
+    assert triage.callback is False
+
+
+def test_parse_variants():
+    triage = parse_sms("  ntal,50+*male fhc yo cb ")
+    assert triage.age_group == "50+"
+    assert triage.gender == "male"
+    assert triage.symptoms == {
+        "fever": True, "severe_headache": True, "danger_sign": False, "cough": True
+    }
+    assert triage.language == "yo"
+    assert triage.callback is True
+
+    assert parse_sms("NTAL U5 O DANGER").symptoms["danger_sign"] is True
+
+
+@pytest.mark.parametrize("message,reason", [
+    ("", "empty"),
+    ("hello there", "keyword"),
+    ("NTAL", "age_group"),
+    ("NTAL 9 M", "age_group"),
+    ("NTAL 3", "gender"),
+    ("NTAL 3 X", "gender"),
+    ("NTAL 3 M FX", "token"),
+    ("NTAL 3 M EN YO", "language"),
+    ("NTAL 3 M " + "F" * 500, "too_long"),
+])
+def test_parse_errors(message, reason):
+    with pytest.raises(SMSParseError) as exc:
+        parse_sms(message)
+    assert exc.value.reason == reason
+
+
+def test_parse_malformed_corpus_throughput():
+    """A large corpus of junk must only ever raise SMSParseError, and quickly."""
+    rng = random.Random(7)
+    alphabet = string.ascii_letters + string.digits + " ,*#+-<" + "ẹọṣ"
+    fragments = ["NTAL", "ntal", "3", "F", "H", "M", "50+", "CB", "YO", "??", "NTAL3"]
+    corpus = []
+    for i in range(100_000):
+        if i % 2:
+            corpus.append("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40))))
+        else:
+            corpus.append(" ".join(rng.choice(fragments) for _ in range(rng.randint(0, 8))))
+
+    start = time.perf_counter()
+    parsed = 0
+    for message in corpus:
+        try:
+            parse_sms(message)
+            parsed += 1
+        except SMSParseError:
+            pass
+    elapsed = time.perf_counter() - start
+
+    assert 0 < parsed < len(corpus)
+    assert len(corpus) / elapsed > 50_000  # messages per second
+
+
+def test_sms_inbound_triage(client, db):
+    with patch('app.core.ussd_session.get_session_redis', return_value=MockRedis()):
+        response = client.post("/api/v1/sms/inbound", json={"phoneNumber": "+2348000000001", "text": "NTAL 3 F F H"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["parsed"] is True
+    assert data["risk_code"] == "MALARIA_SUSPECT"
+    assert data["reply"] == f"Possible malaria. Visit health center soon. Ref: {data['encounter_id']}"
+
+    encounter = db.get(Encounter, data["encounter_id"])
+    assert encounter.channel == "SMS"
+    assert encounter.age_group == "18-49"
+    assert encounter.patient_gender == "female"
+    assert encounter.consent_given is True
+    assert db.query(Callback).count() == 0
+
+
+def test_sms_inbound_emergency_queues_callback(client, db):
+    with patch('app.core.ussd_session.get_session_redis', return_value=MockRedis()):
+        data = client.post("/api/v1/sms/inbound", json={"phoneNumber": "+2348000000002", "text": "NTAL 1 M D YO"}).json()
+
+    assert data["risk_code"] == "EMERGENCY"
+    assert data["reply"].startswith("PAJAWIRI")
+    callback = db.query(Callback).one()
+    assert callback.encounter_id == data["encounter_id"]
+    assert callback.priority.value == "urgent"
+
+
+def test_sms_inbound_malformed_replies_with_help(client, db):
+    with patch('app.core.ussd_session.get_session_redis', return_value=MockRedis()):
+        data = client.post("/api/v1/sms/inbound", json={"phoneNumber": "+2348000000003", "text": "help"}).json()
+
+    assert data["parsed"] is False
+    assert data["error"] == "keyword"
+    assert data["reply"].startswith("To check symptoms text NTAL")
+    assert db.query(Encounter).count() == 0
@@ -0,0 +1,132 @@
+"""Tests for request timing spans and the Server-Timing header."""
+
+import logging
+import time
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.core import timing
+from app.core.metrics import instrument_engine
+from app.core.timing import RequestTimings, TimingMiddleware, record, span
+from tests.test_ussd import MockRedis
+
+
+def server_timing_names(header):
+    return [part.split(";", 1)[0] for part in header.split(", ")]
+
+
+def test_ussd_hop_reports_server_timing(client):
+    mock_redis = MockRedis()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis), \
+            patch('app.core.timing.settings.TIMING_ENABLED', True):
+        client.post("/api/v1/ussd", json={
+            "sessionId": "timing-session",
+            "phoneNumber": "+254700000401",
+            "serviceCode": "*123#",
+            "text": "",
+        })
+        response = client.post("/api/v1/ussd", json={
+            "sessionId": "timing-session",
+            "phoneNumber": "+254700000401",
+            "serviceCode": "*123#",
+            "text": "1",
+        })
+
+    names = server_timing_names(response.headers["server-timing"])
+    assert {"redis", "serialize", "flow", "total"} <= set(names)
+    assert names[-1] == "total"
+    # load + setex share one summed entry
+    assert 'redis;desc="x2"' in response.headers["server-timing"]
+
+
+def test_no_header_when_disabled(client):
+    mock_redis = MockRedis()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis):
+        response = client.post("/api/v1/ussd", json={
+            "sessionId": "timing-off",
+            "phoneNumber": "+254700000402",
+            "serviceCode": "*123#",
+            "text": "",
+        })
+
+    assert response.status_code == 200
+    assert "server-timing" not in response.headers
+
+
+def test_db_statements_and_spans_accumulate():
+    engine = instrument_engine(create_engine("sqlite:///:memory:"))
+    timings = RequestTimings()
+    token = timing._current.set(timings)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+        with span("flow"):
+            pass
+        record("redis", 0.002)
+    finally:
+        timing._current.reset(token)
+
+    assert timings.spans["db"][1] == 2
+    assert timings.spans["flow"][1] == 1
+    assert 'redis;dur=2.000' in timings.header(0.01)
+    assert timings.header(0.01).endswith("total;dur=10.000")
+
+
+def test_spans_are_noops_outside_a_request():
+    assert timing.current_timings() is None
+    with span("redis") as first, span("db") as second:
+        pass
+    assert first is second
+    record("redis", 1.0)
+    assert timing.current_timings() is None
+
+
+def test_span_overhead_is_a_few_microseconds():
+    n = 50_000
+    token = timing._current.set(RequestTimings())
+    try:
+        start = time.perf_counter()
+        for _ in range(n):
+            with span("redis"):
+                pass
+        enabled = (time.perf_counter() - start) / n
+    finally:
+        timing._current.reset(token)
+
+    start = time.perf_counter()
+    for _ in range(n):
+        with span("redis"):
+            pass
+    disabled = (time.perf_counter() - start) / n
+
+    assert enabled < 5e-6
+    assert disabled < enabled
+
+
+@pytest.mark.asyncio
+async def test_sampled_requests_are_logged(caplog):
+    async def endpoint(scope, receive, send):
+        with span("redis"):
+            pass
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    middleware = TimingMiddleware(endpoint, log_sample_rate=1.0)
+    with patch('app.core.timing.settings.TIMING_ENABLED', True), \
+            caplog.at_level(logging.INFO, logger="app.core.timing"):
+        await middleware({"type": "http", "method": "POST", "path": "/api/v1/ussd"}, None, send)
+
+    assert dict(sent[0]["headers"])[b"server-timing"].startswith(b"redis;dur=")
+    record_ = caplog.records[-1]
+    assert record_.path == "/api/v1/ussd"
+    assert "redis" in record_.spans
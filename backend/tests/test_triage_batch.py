@@ -0,0 +1,84 @@
+"""Tests for the vectorized batch triage API."""
+
+import itertools
+
+import numpy as np
+import pytest
+
+from app.core.triage_batch import (
+    assess_risk_batch,
+    assess_risk_rows,
+    columns_from_rows,
+)
+from app.core.triage_engine import assess_risk, get_priority_from_risk
+from app.core.triage_rules import get_active_ruleset
+
+SYMPTOMS = get_active_ruleset().symptoms
+
+
+def _assert_matches_scalar(rows, result):
+    assert len(result) == len(rows)
+    for i, row in enumerate(rows):
+        risk_code, advice, urgent = assess_risk(row or {})
+        assert result.risk_codes[i] == risk_code
+        assert result.advice[i] == advice
+        assert bool(result.urgent[i]) is urgent
+        assert result.priorities[i] == get_priority_from_risk(risk_code)
+
+
+def test_batch_matches_scalar_for_every_combination():
+    """Every symptom combination scores identically to assess_risk."""
+    rows = [
+        dict(zip(SYMPTOMS, values))
+        for values in itertools.product([False, True], repeat=len(SYMPTOMS))
+    ]
+    _assert_matches_scalar(rows, assess_risk_rows(rows))
+
+
+def test_batch_rows_from_symptoms_json():
+    """Rows shaped like Encounter.symptoms_json, including gaps, are handled."""
+    rows = [
+        {"consent": True, "age_group": "18-49", "fever": True, "severe_headache": True, "risk_code": "LOW_RISK"},
+        {"fever": True},
+        {"danger_sign": 1},
+        {},
+        None,
+    ]
+    result = assess_risk_rows(rows)
+
+    _assert_matches_scalar(rows, result)
+    assert list(result.risk_codes) == [
+        "MALARIA_SUSPECT", "FEVER_GENERAL", "EMERGENCY", "LOW_RISK", "LOW_RISK"
+    ]
+
+
+def test_batch_columnar_numpy_input():
+    """Random columnar input agrees with the scalar function row by row."""
+    rng = np.random.default_rng(7)
+    columns = {key: rng.random(5000) < 0.4 for key in SYMPTOMS}
+    result = assess_risk_batch(columns)
+
+    rows = [{key: bool(columns[key][i]) for key in SYMPTOMS} for i in range(5000)]
+    _assert_matches_scalar(rows, result)
+    assert result.urgent.dtype == bool
+
+
+def test_batch_missing_columns_default_to_false():
+    """Columns that are not supplied are treated as absent symptoms."""
+    result = assess_risk_batch({"fever": np.array([True, False])})
+    assert list(result.risk_codes) == ["FEVER_GENERAL", "LOW_RISK"]
+
+
+def test_batch_rejects_mismatched_columns():
+    """Columns of different lengths are rejected."""
+    with pytest.raises(ValueError):
+        assess_risk_batch({"fever": [True, False], "cough": [True]})
+    with pytest.raises(ValueError):
+        assess_risk_batch({"unknown": [True]})
+
+
+def test_columns_from_rows_shapes():
+    """Row conversion produces one boolean column per symptom."""
+    columns = columns_from_rows([{"fever": True}, None])
+    assert set(columns) == set(SYMPTOMS)
+    assert columns["fever"].tolist() == [True, False]
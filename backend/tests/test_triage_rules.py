@@ -0,0 +1,84 @@
+"""Tests for declarative triage rulesets."""
+
+import json
+import os
+
+import pytest
+
+from app.core.triage_rules import (
+    DEFAULT_RULESET_PATH,
+    RulesetRegistry,
+    compile_ruleset,
+    load_ruleset,
+)
+
+RULESET = {
+    "version": "test-v1",
+    "symptoms": ["fever", "rash", "cough"],
+    "rules": [
+        {"when": {"fever": True, "rash": True}, "risk_code": "MEASLES_SUSPECT", "advice": "Isolate.", "urgent": True},
+        {"when": {"cough": True, "fever": False}, "risk_code": "COUGH_ONLY", "advice": "Rest."},
+    ],
+    "default": {"risk_code": "LOW_RISK", "advice": "Monitor."},
+    "priorities": {"MEASLES_SUSPECT": "urgent", "LOW_RISK": "low"},
+}
+
+
+def test_compile_builds_full_lookup_table():
+    """Every symptom bitmask gets a precomputed outcome."""
+    ruleset = compile_ruleset(RULESET)
+
+    assert len(ruleset.table) == 2 ** 3
+    assert ruleset.evaluate({"fever": True, "rash": True}).risk_code == "MEASLES_SUSPECT"
+    assert ruleset.evaluate({"fever": True, "rash": True}).urgent is True
+    assert ruleset.evaluate({"cough": True}).risk_code == "COUGH_ONLY"
+    # Negative condition: cough with fever falls through to the default
+    assert ruleset.evaluate({"cough": True, "fever": True}).risk_code == "LOW_RISK"
+    assert ruleset.evaluate({}).risk_code == "LOW_RISK"
+
+
+def test_priorities_fall_back_to_medium():
+    """Risk codes without an explicit priority map to medium."""
+    ruleset = compile_ruleset(RULESET)
+    assert ruleset.priority("MEASLES_SUSPECT") == "urgent"
+    assert ruleset.priority("COUGH_ONLY") == "medium"
+
+
+@pytest.mark.parametrize("broken", [
+    {**RULESET, "version": ""},
+    {**RULESET, "symptoms": []},
+    {**RULESET, "rules": [{"when": {"unknown": True}, "risk_code": "X", "advice": "x"}]},
+    {key: value for key, value in RULESET.items() if key != "default"},
+    {**RULESET, "symptoms": [f"s{i}" for i in range(17)]},
+])
+def test_compile_rejects_malformed_rulesets(broken):
+    """Malformed documents fail loudly at load time."""
+    with pytest.raises(ValueError):
+        compile_ruleset(broken)
+
+
+def test_bundled_ruleset_loads():
+    """The bundled ruleset compiles and carries its version."""
+    ruleset = load_ruleset(DEFAULT_RULESET_PATH)
+    assert ruleset.version == "triage-v1"
+    assert ruleset.evaluate({"danger_sign": True}).risk_code == "EMERGENCY"
+
+
+def test_registry_hot_reloads_changed_file(tmp_path):
+    """A changed file is picked up without restarting; a broken one is ignored."""
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULESET))
+    registry = RulesetRegistry(path, reload_interval=0)
+
+    assert registry.current().version == "test-v1"
+
+    path.write_text(json.dumps({**RULESET, "version": "test-v2"}))
+    os.utime(path, (1, 1))
+    assert registry.current().version == "test-v2"
+
+    path.write_text("{not json")
+    os.utime(path, (2, 2))
+    assert registry.current().version == "test-v2"
+    with pytest.raises(ValueError):
+        registry.reload()
+    assert registry.current().version == "test-v2"
@@ -113,15 +113,71 @@ class MockRedis:
     async def setex(self, key, ttl, value):
         self.storage[key] = value
     
+    async def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.storage:
+            return None
+        self.storage[key] = value
+        return True
+    
+    async def mget(self, keys):
+        return [self.storage.get(key) for key in keys]
+    
     async def incr(self, key):
         val = self.storage.get(key, "0")
         new_val = str(int(val) + 1)
         self.storage[key] = new_val
         return int(new_val)
     
-    async def delete(self, key):
-        if key in self.storage:
-            del self.storage[key]
+    async def delete(self, *keys):
+        for key in keys:
+            self.storage.pop(key, None)
+    
+    async def hincrby(self, key, field, amount=1):
+        fields = self.storage.setdefault(key, {})
+        fields[field] = fields.get(field, 0) + amount
+        return fields[field]
+    
+    async def hgetall(self, key):
+        return {field: str(value) for field, value in self.storage.get(key, {}).items()}
+    
+    async def expire(self, key, ttl):
+        return key in self.storage
+    
+    async def pfadd(self, key, *values):
+        members = self.storage.setdefault(key, set())
+        added = not set(values) <= members
+        members.update(values)
+        return int(added)
+    
+    async def pfcount(self, *keys):
+        return len(set().union(*(self.storage.get(key, set()) for key in keys)))
+    
+    async def execute_command(self, command, *args):
+        return await getattr(self, command.lower())(*args)
+    
+    def pipeline(self, transaction=True):
+        return MockPipeline(self)
+
+
+class MockPipeline:
+    """Queues MockRedis calls until execute(), like a redis pipeline."""
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.calls = []
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        self.calls = []
+    
+    def __getattr__(self, name):
+        method = getattr(self.redis, name)
+        return lambda *args, **kwargs: self.calls.append((method, args, kwargs))
+    
+    async def execute(self):
+        calls, self.calls = self.calls, []
+        return [await method(*args, **kwargs) for method, args, kwargs in calls]
 
 
 @pytest.mark.asyncio
@@ -134,7 +190,7 @@ async def test_ussd_happy_path_low_risk(client, db):
     # Mock Redis with state persistence
     mock_redis = MockRedis()
     
-    with patch('app.core.ussd_session.get_redis', return_value=mock_redis):
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis):
         # Step 1: Initial consent
         response = client.post("/api/v1/ussd", json={
             "sessionId": session_id,
@@ -268,7 +324,7 @@ async def test_ussd_emergency_path(client, db):
     
     mock_redis = MockRedis()
     
-    with patch('app.core.ussd_session.get_redis', return_value=mock_redis):
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis):
         # Accept consent, English, age 18-49, male, yes fever, yes severe headache, YES danger sign
         # Step through to danger sign
         client.post("/api/v1/ussd", json={"sessionId": session_id, "phoneNumber": phone, "serviceCode": "*123#", "text": ""})
@@ -322,6 +378,7 @@ async def test_ussd_emergency_path(client, db):
         ).first()
         assert encounter is not None
         assert encounter.urgency == "critical"
+        assert encounter.triage_ruleset_version == "triage-v1"
         
         callback = db.query(Callback).filter(Callback.encounter_id == encounter.id).first()
         assert callback is not None
@@ -335,9 +392,9 @@ async def test_rate_limit_blocks_after_10(client):
     
     mock_redis = MockRedis()
     # Pre-set rate limit to exceeded
-    mock_redis.storage[f"ussd:rate:{hash_msisdn(phone)}"] = "11"
+    mock_redis.storage[f"ussd:{{{hash_msisdn(phone)}}}:rate"] = "11"
     
-    with patch('app.core.ussd_session.get_redis', return_value=mock_redis):
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis):
         response = client.post("/api/v1/ussd", json={
             "sessionId": "rate-limit-test",
             "phoneNumber": phone,
@@ -358,7 +415,7 @@ def test_msisdn_is_hashed_on_encounter(client, db):
     
     mock_redis = MockRedis()
     
-    with patch('app.core.ussd_session.get_redis', return_value=mock_redis):
+    with patch('app.core.ussd_session.get_session_redis', return_value=mock_redis):
         # Complete a minimal USSD flow
         session_id = "hash-test"
         
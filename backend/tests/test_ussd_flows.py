@@ -0,0 +1,155 @@
+"""Tests for service-code routed USSD flows."""
+
+import json
+import shutil
+from unittest.mock import patch
+
+import pytest
+
+from app.core.conversation import ConversationEngine, InboundMessage
+from app.core.funnel import read_funnel
+from app.core.ussd_flows import DEFAULT_FLOWS_DIR, compile_flow, load_flows
+from app.core.ussd_utils import hash_msisdn
+from app.models.models import Callback, Encounter
+from tests.test_ussd import MockRedis
+
+MATERNAL_RULESET = {
+    "version": "maternal-v1",
+    "symptoms": ["bleeding", "swelling"],
+    "rules": [
+        {"when": {"bleeding": True}, "risk_code": "OBSTETRIC_EMERGENCY", "advice": "Go to a facility now.", "urgent": True},
+    ],
+    "default": {"risk_code": "ROUTINE_ANC", "advice": "Keep your antenatal visits."},
+    "priorities": {"OBSTETRIC_EMERGENCY": "urgent", "ROUTINE_ANC": "low"},
+}
+
+MATERNAL_FLOW = {
+    "name": "maternal",
+    "service_codes": ["*384*2#"],
+    "languages": ["en"],
+    "ruleset": "rulesets/maternal-v1.json",
+    "rate_limit": 1,
+    "consent_version": "v0.1-EN-MATERNAL",
+    "questions": [
+        {"step": "trimester", "options": {"1": "first", "2": "second", "3": "third"}},
+        {"step": "bleeding", "options": {"1": True, "2": False}},
+        {"step": "swelling", "options": {"1": True, "2": False}},
+    ],
+    "messages": {
+        "en": {
+            "consent": "NTAL Mama: questions about your pregnancy. Do you consent?\n1. Yes\n2. No",
+            "trimester": "How far along are you?\n1. 0-3 months\n2. 4-6 months\n3. 7-9 months",
+            "bleeding": "Any bleeding?\n1. Yes\n2. No",
+            "swelling": "Swollen face or hands?\n1. Yes\n2. No",
+            "obstetric_emergency": "Go to a facility NOW. Request callback?\n1. Yes\n2. No",
+            "routine_anc": "Keep your antenatal visits. Request callback?\n1. Yes\n2. No",
+        }
+    },
+}
+
+
+@pytest.fixture
+def flows_dir(tmp_path):
+    shutil.copy(DEFAULT_FLOWS_DIR / "general.json", tmp_path / "general.json")
+    (tmp_path / "maternal.json").write_text(json.dumps(MATERNAL_FLOW))
+    (tmp_path / "rulesets").mkdir()
+    (tmp_path / "rulesets" / "maternal-v1.json").write_text(json.dumps(MATERNAL_RULESET))
+    return tmp_path
+
+
+async def dial(engine, db, session_id, msisdn, service_code, answers):
+    reply = await engine.handle(
+        InboundMessage("USSD", session_id, msisdn, restart=True, service_code=service_code), db
+    )
+    replies = [reply]
+    for answer in answers:
+        replies.append(await engine.handle(InboundMessage("USSD", session_id, msisdn, text=answer), db))
+    return replies
+
+
+@pytest.mark.asyncio
+async def test_service_code_selects_flow(db, flows_dir):
+    """A campaign short code runs its own questions, wording, ruleset and consent version."""
+    engine = ConversationEngine(flows=load_flows(flows_dir, "general"))
+    redis = MockRedis()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=redis), \
+            patch('app.core.contacts.get_session_redis', return_value=redis):
+        # Single-language flow: consent goes straight to the first question
+        replies = await dial(engine, db, "m1", "+254700000401", " *384*2 ", ["1", "3", "1", "2", "1"])
+
+    assert replies[0].message.startswith("NTAL Mama")
+    assert replies[1].message.startswith("How far along")
+    assert replies[4].message.startswith("Go to a facility NOW")
+    assert replies[5].ended
+    encounter = db.query(Encounter).filter(Encounter.msisdn_hash == hash_msisdn("+254700000401")).one()
+    assert encounter.risk_code == "OBSTETRIC_EMERGENCY"
+    assert encounter.triage_ruleset_version == "maternal-v1"
+    assert encounter.consent_version == "v0.1-EN-MATERNAL"
+    assert encounter.symptoms_json["trimester"] == "third"
+    callback = db.query(Callback).filter(Callback.encounter_id == encounter.id).one()
+    assert callback.priority == "urgent"
+
+
+@pytest.mark.asyncio
+async def test_unknown_service_code_uses_default_flow(db, flows_dir):
+    engine = ConversationEngine(flows=load_flows(flows_dir, "general"))
+    redis = MockRedis()
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=redis):
+        replies = await dial(engine, db, "g1", "+254700000402", "*999#", ["1"])
+
+    assert replies[0].message.startswith("Welcome to NTAL Health")
+    assert replies[1].message.startswith("Choose language")
+    assert json.loads(redis.storage[f"ussd:{{{hash_msisdn('+254700000402')}}}:session:g1"])["flow"] == "general"
+
+
+@pytest.mark.asyncio
+async def test_rate_limits_and_funnels_are_per_flow(db, flows_dir):
+    """The campaign's limit of 1 doesn't touch the caller's default-flow allowance."""
+    engine = ConversationEngine(flows=load_flows(flows_dir, "general"))
+    redis = MockRedis()
+    msisdn = "+254700000403"
+
+    with patch('app.core.ussd_session.get_session_redis', return_value=redis):
+        first = await dial(engine, db, "r1", msisdn, "*384*2#", [])
+        second = await dial(engine, db, "r2", msisdn, "*384*2#", [])
+        general = await dial(engine, db, "r3", msisdn, "*123#", [])
+        maternal = await read_funnel(redis, "USSD.maternal", "day", 1, ["consent"])
+        default = await read_funnel(redis, "USSD", "day", 1, ["consent"])
+
+    assert not first[0].ended
+    assert second[0].ended
+    assert not general[0].ended
+    assert redis.storage[f"ussd:{{{hash_msisdn(msisdn)}}}:rate:maternal"] == "1"
+    assert redis.storage[f"ussd:{{{hash_msisdn(msisdn)}}}:rate"] == "1"
+    assert maternal["outcomes"] == {"rate_limited": 1}
+    assert maternal["steps"][0]["entered"] == 1
+    assert default["steps"][0]["entered"] == 1
+
+
+@pytest.mark.parametrize("change, error", [
+    ({"questions": [{"step": "consent", "options": {"1": True}}]}, "reserved"),
+    ({"questions": [{"step": "trimester", "options": {"10": "x"}}]}, "single-digit"),
+    ({"messages": {}}, "no 'en' messages"),
+    ({"questions": MATERNAL_FLOW["questions"][:2]}, "never asks"),
+])
+def test_compile_rejects_broken_flows(flows_dir, change, error):
+    with pytest.raises(ValueError, match=error):
+        compile_flow({**MATERNAL_FLOW, **change}, source=str(flows_dir / "maternal.json"))
+
+
+def test_service_codes_must_be_unique(flows_dir):
+    (flows_dir / "copy.json").write_text(json.dumps({**MATERNAL_FLOW, "name": "copy"}))
+    with pytest.raises(ValueError, match=r"\*384\*2#"):
+        load_flows(flows_dir, "general")
+
+
+def test_flows_endpoint(client, auth_headers):
+    response = client.get("/api/v1/ussd/flows", headers=auth_headers)
+
+    assert response.status_code == 200
+    flows = {flow["name"]: flow for flow in response.json()}
+    assert flows["general"]["default"] is True
+    assert flows["general"]["steps"][:2] == ["consent", "language"]
+    assert flows["general"]["ruleset_version"] == "triage-v1"
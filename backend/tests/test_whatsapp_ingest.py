@@ -0,0 +1,153 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from unittest.mock import patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.adapters import whatsapp_ingest
+from app.adapters.whatsapp_ingest import WhatsAppIngestor, dedup_key, verify_signature
+from app.core.config import settings
+from tests.test_ussd import MockRedis
+
+
+def _payload(*messages):
+    return {
+        "object": "whatsapp_business_account",
+        "entry": [{"changes": [{"value": {"messages": [
+            {"id": wamid, "from": sender, "type": "text", "text": {"body": text}}
+            for wamid, sender, text in messages
+        ]}}]}],
+    }
+
+
+def test_verify_signature():
+    body = b'{"entry": []}'
+    signature = "sha256=" + hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+    assert verify_signature(body, signature, "secret")
+    assert not verify_signature(body, signature, "other")
+    assert not verify_signature(body, None, "secret")
+
+
+@pytest.mark.asyncio
+async def test_dedup_and_per_sender_order():
+    handled = []
+
+    async def handler(message):
+        # Later messages finish faster, so only sharding keeps them in order
+        await asyncio.sleep(0.01 if message["text"]["body"] == "1" else 0)
+        handled.append((message["from"], message["text"]["body"]))
+
+    ingestor = WhatsAppIngestor(handler=handler, workers=4)
+    ingestor.start()
+    with patch('app.adapters.whatsapp_ingest.get_redis', return_value=MockRedis()):
+        queued = await ingestor.enqueue(_payload(
+            ("wamid.1", "2348000000001", "1"),
+            ("wamid.2", "2348000000001", "2"),
+            ("wamid.3", "2348000000002", "1"),
+            ("wamid.4", "2348000000002", "2"),
+        ))
+        duplicate = await ingestor.enqueue(_payload(("wamid.1", "2348000000001", "1")))
+    await ingestor.stop()
+
+    assert queued == 4
+    assert duplicate == 0
+    assert ingestor.stats["duplicates"] == 1
+    for sender in ("2348000000001", "2348000000002"):
+        assert [body for s, body in handled if s == sender] == ["1", "2"]
+
+
+@pytest.mark.asyncio
+async def test_handler_failure_does_not_stop_worker():
+    async def handler(message):
+        if message["id"] == "wamid.bad":
+            raise RuntimeError("boom")
+
+    ingestor = WhatsAppIngestor(handler=handler, workers=1)
+    ingestor.start()
+    with patch('app.adapters.whatsapp_ingest.get_redis', return_value=MockRedis()):
+        await ingestor.enqueue(_payload(("wamid.bad", "1", "x"), ("wamid.good", "1", "y")))
+    await ingestor.stop()
+
+    assert ingestor.stats == {"received": 2, "duplicates": 0, "processed": 1, "failed": 1}
+
+
+def test_webhook_verification(client, monkeypatch):
+    monkeypatch.setattr(settings, "WHATSAPP_VERIFY_TOKEN", "token")
+    params = {"hub.mode": "subscribe", "hub.verify_token": "token", "hub.challenge": "42"}
+    response = client.get("/api/v1/whatsapp/webhook", params=params)
+    assert response.status_code == 200
+    assert response.text == "42"
+
+    params["hub.verify_token"] = "wrong"
+    assert client.get("/api/v1/whatsapp/webhook", params=params).status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_redelivery_to_another_worker_is_dropped():
+    """Dedup lives in Redis, so two worker processes never both queue one message."""
+    shared = MockRedis()
+    handled = []
+
+    async def handler(message):
+        handled.append(message["id"])
+
+    workers = [WhatsAppIngestor(handler=handler, workers=2) for _ in range(2)]
+    for ingestor in workers:
+        ingestor.start()
+    payload = _payload(("wamid.again", "2348000000003", "hi"))
+    with patch('app.adapters.whatsapp_ingest.get_redis', return_value=shared):
+        queued = [await ingestor.enqueue(payload) for ingestor in workers]
+    for ingestor in workers:
+        await ingestor.stop()
+
+    assert queued == [1, 0]
+    assert handled == ["wamid.again"]
+    assert dedup_key("wamid.again") in shared.storage
+
+
+def test_webhook_acks_and_queues(client, monkeypatch):
+    monkeypatch.setattr(settings, "WHATSAPP_APP_SECRET", "secret")
+    body = json.dumps(_payload(("wamid.hook", "2348000000001", "hello"))).encode()
+    signature = "sha256=" + hmac.new(b"secret", body, hashlib.sha256).hexdigest()
+
+    with patch('app.adapters.whatsapp_ingest.get_redis', return_value=MockRedis()):
+        response = client.post("/api/v1/whatsapp/webhook", content=body,
+                               headers={"X-Hub-Signature-256": signature})
+        assert response.status_code == 200
+        assert response.json() == {"status": "ok", "queued": 1}
+
+        # Meta redelivery is acknowledged but not queued again
+        response = client.post("/api/v1/whatsapp/webhook", content=body,
+                               headers={"X-Hub-Signature-256": signature})
+        assert response.json()["queued"] == 0
+        assert whatsapp_ingest.get_whatsapp_ingestor().stats["duplicates"] == 1
+
+        response = client.post("/api/v1/whatsapp/webhook", content=body,
+                               headers={"X-Hub-Signature-256": "sha256=bad"})
+        assert response.status_code == 401
+
+
+def test_webhook_without_secret_is_refused(client, monkeypatch):
+    monkeypatch.setattr(settings, "WHATSAPP_APP_SECRET", "")
+    body = json.dumps(_payload(("wamid.unsigned", "2348000000001", "hello"))).encode()
+
+    response = client.post("/api/v1/whatsapp/webhook", content=body)
+    assert response.status_code == 403
+
+    monkeypatch.setattr(settings, "WHATSAPP_ALLOW_UNSIGNED", True)
+    with patch('app.adapters.whatsapp_ingest.get_redis', return_value=MockRedis()):
+        response = client.post("/api/v1/whatsapp/webhook", content=body)
+    assert response.status_code == 200
+    assert response.json()["queued"] == 1
+
+
+def test_webhook_asks_for_redelivery_when_redis_is_down(client, monkeypatch):
+    monkeypatch.setattr(settings, "WHATSAPP_ALLOW_UNSIGNED", True)
+    body = json.dumps(_payload(("wamid.later", "2348000000001", "hello"))).encode()
+
+    with patch('app.adapters.whatsapp_ingest.get_redis', side_effect=RedisConnectionError("refused")):
+        response = client.post("/api/v1/whatsapp/webhook", content=body)
+    assert response.status_code == 503